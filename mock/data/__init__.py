@@ -1,3 +1,6 @@
+from .archives import get_archive
+from .blame import get_blame
+from .blob_store import is_binary
 from .branches import (
     delete_branch_protection,
     get_branch,
@@ -20,15 +23,20 @@ from .commits import (
     get_combined_status,
     get_commit,
     get_commit_statuses,
+    get_contributor_stats,
     get_repository_commits,
 )
+from .compare import compare_commits, iter_range_diff
 from .contents import (
+    create_commit,
     create_or_update_file,
     get_contents,
     get_raw_content,
     get_repository_readme,
 )
 from .git_refs import create_ref, delete_ref, get_all_refs, get_ref, update_ref
+from .git_transport import get_upload_pack_advertisement, upload_pack
+from .git_trees import get_tree
 from .issues import (
     create_comment,
     create_issue,
@@ -69,8 +77,10 @@ from .pull_requests import (
     create_pull_request,
     get_pull_request,
     get_pull_request_commits,
+    get_pull_request_files,
     get_repository_pull_requests,
     is_pull_request_merged,
+    iter_pull_request_diff,
     merge_pull_request,
     update_pull_request,
 )
@@ -83,12 +93,19 @@ from .repositories import (
     get_repository_tags,
     get_user_repositories,
 )
-from .users import USERS, create_user, get_user_by_username, update_user
+from .users import (
+    USERS,
+    create_user,
+    get_next_user_id,
+    get_user_by_username,
+    update_user,
+)
 
 __all__ = [
     # Users
     "USERS",
     "get_user_by_username",
+    "get_next_user_id",
     "create_user",
     "update_user",
     # Organizations
@@ -125,17 +142,29 @@ __all__ = [
     "get_commit_statuses",
     "get_combined_status",
     "create_commit_status",
+    "get_contributor_stats",
+    "compare_commits",
+    "iter_range_diff",
+    "get_blame",
     # Contents
     "get_repository_readme",
     "get_contents",
     "create_or_update_file",
+    "create_commit",
     "get_raw_content",
+    "is_binary",
+    "get_archive",
     # Git References
     "get_all_refs",
     "get_ref",
     "create_ref",
     "update_ref",
     "delete_ref",
+    # Git Trees
+    "get_tree",
+    # Git Transport
+    "get_upload_pack_advertisement",
+    "upload_pack",
     # Issues
     "get_repository_issues",
     "get_issue",
@@ -169,6 +198,8 @@ __all__ = [
     "create_pull_request",
     "update_pull_request",
     "get_pull_request_commits",
+    "get_pull_request_files",
+    "iter_pull_request_diff",
     "is_pull_request_merged",
     "merge_pull_request",
 ]
@@ -0,0 +1,338 @@
+"""Repository archives (zipball and tarball)
+
+Archives hold the files of a commit under a ``{repository}-{ref}/``
+directory, as GitBucket names them, and are built from the tree store (or
+the repository on disk) by walking the root tree:
+
+- archives are written by a build thread to a file of the archive
+  directory, one blob at a time, and responses stream that file in chunks:
+  neither the archive nor the list of its files is held in memory.
+- a finished archive is kept, keyed by its root tree SHA and directory
+  name, and later downloads only read the file. The directory name embeds
+  the ref, so a tag and a branch get separate archives even on the same
+  commit; a ref moved to a commit with the same files keeps its archive.
+- an archive is built once however many clients ask for it at the same
+  time: while it is being built, every download follows the partial file
+  as the build thread writes it.
+
+Entries carry a fixed date (``ARCHIVE_DATE``) instead of the commit date,
+so the archive of a tree is the same whichever commit points to it. The
+archive directory is taken from ``GITBUCKET_MOCK_ARCHIVE_DIR`` (default:
+next to the SQLite database, or a temporary directory removed at exit with
+the memory backend).
+"""
+
+import atexit
+import gzip
+import hashlib
+import io
+import os
+import shutil
+import stat
+import tarfile
+import tempfile
+import threading
+import zipfile
+from typing import Any, Dict, Iterator, NamedTuple, Optional
+
+from data.blob_store import Buffer
+from data.contents import get_snapshot
+from data.storage import backend
+
+# Size of the chunks of streamed archives
+ARCHIVE_CHUNK_SIZE = 64 * 1024
+
+# Date of the archive entries (1980-01-01, the earliest date of zip files)
+ARCHIVE_DATE = 315532800
+
+# File extension per archive format
+ARCHIVE_EXTENSIONS = {"zip": "zip", "tar": "tar.gz"}
+
+# Seconds between checks of a build followed by a download
+BUILD_WAIT = 1.0
+
+
+class Archive(NamedTuple):
+    """Streamed archive of a commit"""
+
+    filename: str
+    size: Optional[int]  # Known once the archive is built
+    chunks: Iterator[bytes]
+
+
+class _Build:
+    """Archive being written by a build thread"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.size = 0
+        self.done = False
+        self.failed = False
+        self.condition = threading.Condition()
+
+
+# Builds in progress per archive file
+_builds: Dict[str, _Build] = {}
+_lock = threading.Lock()
+_directory: Optional[str] = None
+
+
+def get_archive(
+    owner: str, repo_name: str, ref: str, archive_format: str
+) -> Optional[Archive]:
+    """Get the archive of a ref, archive_format being ``zip`` or ``tar``
+
+    The archive is built in the background if it is not cached yet. None
+    when the repository or ref does not exist.
+    """
+    snapshot = get_snapshot(owner, repo_name, ref)
+    if snapshot is None or archive_format not in ARCHIVE_EXTENSIONS:
+        return None
+
+    name = f"{repo_name}-{ref.replace('/', '-')}"
+    extension = ARCHIVE_EXTENSIONS[archive_format]
+    name_hash = hashlib.sha1(name.encode()).hexdigest()[:16]
+
+    with _lock:
+        path = os.path.join(
+            _archive_directory(), f"{snapshot.root}-{name_hash}.{extension}"
+        )
+        build = _builds.get(path)
+        if build is None:
+            try:
+                archive_file = open(path, "rb")
+            except FileNotFoundError:
+                build = _start_build(path, name, archive_format, snapshot)
+                archive_file = open(build.path, "rb")
+        else:
+            archive_file = open(build.path, "rb")
+
+    if build is None:
+        size = os.fstat(archive_file.fileno()).st_size
+        return Archive(f"{name}.{extension}", size, _iter_file(archive_file))
+    return Archive(f"{name}.{extension}", None, _iter_build(archive_file, build))
+
+
+def _start_build(path: str, name: str, archive_format: str, snapshot: Any) -> _Build:
+    """Create the file of an archive and start writing it (under _lock)"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    build = _Build(f"{path}.{os.getpid()}.tmp")
+    open(build.path, "wb").close()
+    _builds[path] = build
+
+    thread = threading.Thread(
+        target=_build,
+        args=(path, build, name, archive_format, snapshot),
+        name="archive",
+        daemon=True,
+    )
+    thread.start()
+    return build
+
+
+def _build(
+    path: str, build: _Build, name: str, archive_format: str, snapshot: Any
+) -> None:
+    """Write an archive, then move it to its place in the archive directory"""
+    try:
+        with (
+            open(build.path, "wb") as archive_file,
+            _BuildOutput(archive_file, build) as output,
+        ):
+            if archive_format == "zip":
+                _write_zip(output, name, snapshot)
+            else:
+                _write_tar(output, name, snapshot)
+
+        # Downloads following the build keep reading the moved file
+        with _lock:
+            os.replace(build.path, path)
+            del _builds[path]
+    except Exception:
+        with _lock:
+            del _builds[path]
+        if os.path.exists(build.path):
+            os.remove(build.path)
+        build.failed = True
+    finally:
+        with build.condition:
+            build.done = True
+            build.condition.notify_all()
+
+
+def _write_zip(output: "_BuildOutput", name: str, snapshot: Any) -> None:
+    """Write the files of a snapshot as a zip archive
+
+    The output cannot seek, so sizes and checksums are written after each
+    file (data descriptors) and the archive is written in one pass.
+    """
+    with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr(_zip_info(f"{name}/", stat.S_IFDIR | 0o755), b"")
+        for path, entry in snapshot.trees.walk(snapshot.root):
+            if entry["type"] != "blob":
+                # Directories, and submodules as empty directories
+                info = _zip_info(f"{name}/{path}/", stat.S_IFDIR | 0o755)
+                archive.writestr(info, b"")
+                continue
+
+            data = snapshot.blobs.get(entry["sha"]) or b""
+            info = _zip_info(f"{name}/{path}", _file_mode(entry["mode"]))
+            info.compress_type = zipfile.ZIP_DEFLATED
+            with archive.open(info, "w") as member:
+                view = memoryview(data)
+                for start in range(0, len(view), ARCHIVE_CHUNK_SIZE):
+                    member.write(view[start : start + ARCHIVE_CHUNK_SIZE])
+
+
+def _write_tar(output: "_BuildOutput", name: str, snapshot: Any) -> None:
+    """Write the files of a snapshot as a gzipped tar archive"""
+    with gzip.GzipFile(
+        filename="", mode="wb", fileobj=output, mtime=ARCHIVE_DATE
+    ) as compressed:
+        with tarfile.open(
+            fileobj=compressed, mode="w|", format=tarfile.PAX_FORMAT
+        ) as archive:
+            archive.addfile(_tar_info(f"{name}/", tarfile.DIRTYPE, 0o755))
+            for path, entry in snapshot.trees.walk(snapshot.root):
+                if entry["type"] != "blob":
+                    # Directories, and submodules as empty directories
+                    archive.addfile(
+                        _tar_info(f"{name}/{path}/", tarfile.DIRTYPE, 0o755)
+                    )
+                    continue
+
+                data = snapshot.blobs.get(entry["sha"]) or b""
+                mode = _file_mode(entry["mode"])
+                if stat.S_ISLNK(mode):
+                    info = _tar_info(f"{name}/{path}", tarfile.SYMTYPE, 0o777)
+                    info.linkname = bytes(data).decode("utf-8", "replace")
+                    archive.addfile(info)
+                    continue
+
+                info = _tar_info(f"{name}/{path}", tarfile.REGTYPE, mode & 0o777)
+                info.size = len(data)
+                archive.addfile(info, _BufferReader(data))
+
+
+def _file_mode(mode: str) -> int:
+    """Get the file mode of a blob entry (regular, executable or symlink)"""
+    if mode == "120000":
+        return stat.S_IFLNK | 0o777
+    if mode == "100755":
+        return stat.S_IFREG | 0o755
+    return stat.S_IFREG | 0o644
+
+
+def _zip_info(name: str, mode: int) -> zipfile.ZipInfo:
+    """Build the zip entry of a file or directory"""
+    info = zipfile.ZipInfo(name, date_time=(1980, 1, 1, 0, 0, 0))
+    info.external_attr = mode << 16
+    if stat.S_ISDIR(mode):
+        info.external_attr |= 0x10  # MS-DOS directory flag
+    info.create_system = 3  # Unix, for the file modes
+    return info
+
+
+def _tar_info(name: str, entry_type: bytes, mode: int) -> tarfile.TarInfo:
+    """Build the tar entry of a file, directory or symlink"""
+    info = tarfile.TarInfo(name)
+    info.type = entry_type
+    info.mode = mode
+    info.mtime = ARCHIVE_DATE
+    info.uname = info.gname = "root"
+    return info
+
+
+class _BuildOutput(io.RawIOBase):
+    """File of a build, telling the downloads following it about new bytes
+
+    It cannot seek, so archive writers write it in one pass.
+    """
+
+    def __init__(self, archive_file: Any, build: _Build):
+        super().__init__()
+        self._file = archive_file
+        self._build = build
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: Any) -> int:
+        size = self._file.write(data)
+        self._file.flush()
+        with self._build.condition:
+            self._build.size += size
+            self._build.condition.notify_all()
+        return size
+
+    def tell(self) -> int:
+        return self._build.size
+
+    def flush(self) -> None:
+        if not self.closed:
+            self._file.flush()
+
+
+class _BufferReader:
+    """Read a blob in slices, for tarfile (without copying it whole)"""
+
+    def __init__(self, data: Buffer):
+        self._view = memoryview(data)
+        self._position = 0
+
+    def read(self, size: int = -1) -> bytes:
+        end = len(self._view) if size < 0 else self._position + size
+        chunk = bytes(self._view[self._position : end])
+        self._position += len(chunk)
+        return chunk
+
+
+def _iter_file(archive_file: Any) -> Iterator[bytes]:
+    """Iterate the chunks of a built archive"""
+    with archive_file:
+        while True:
+            chunk = archive_file.read(ARCHIVE_CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+
+def _iter_build(archive_file: Any, build: _Build) -> Iterator[bytes]:
+    """Iterate the chunks of an archive as its build writes them
+
+    Raises when the build fails, which aborts the download.
+    """
+    with archive_file:
+        position = 0
+        while True:
+            with build.condition:
+                while build.size == position and not build.done:
+                    build.condition.wait(BUILD_WAIT)
+                size, done = build.size, build.done
+            if build.failed:
+                raise RuntimeError("Archive build failed")
+
+            while position < size:
+                chunk = archive_file.read(min(ARCHIVE_CHUNK_SIZE, size - position))
+                if not chunk:
+                    break
+                position += len(chunk)
+                yield chunk
+
+            if done and position >= size:
+                return
+
+
+def _archive_directory() -> str:
+    """Get the directory of the archives (under _lock)"""
+    global _directory
+
+    if _directory is None:
+        _directory = os.environ.get("GITBUCKET_MOCK_ARCHIVE_DIR")
+        if not _directory:
+            if backend.name == "sqlite":
+                _directory = f"{backend.path}.archives"
+            else:
+                _directory = tempfile.mkdtemp(prefix="gitbucket-mock-archives-")
+                atexit.register(shutil.rmtree, _directory, ignore_errors=True)
+    return _directory
@@ -0,0 +1,233 @@
+"""Line blame of files
+
+``get_blame`` attributes every line of a file at a commit to the commit
+that last changed it, as ``git blame`` does (without move or copy
+detection):
+
+- a commit whose file is the same as in one of its parents takes the blame
+  of that parent.
+- otherwise the lines it shares with its parents (matched by ``data.diff``)
+  take their blame from the parents, first parent first, and the other
+  lines are its own.
+
+Blames are cached per (repository, path, commit), and blobs are read only
+for the commits that changed the file. A commit that did not change the
+file caches the commit whose blame it shares instead of a copy. Blaming a
+file again after new commits costs one diff per commit that changed it
+since the last cached blame, not a walk of the whole history.
+"""
+
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from data.blob_store import LARGE_BLOB_SIZE, is_binary
+from data.commit_dag import CommitDag
+from data.commits import get_commit_dag, get_commits_by_sha, resolve_ref_to_sha
+from data.contents import get_snapshot, resolve_ref_path
+from data.diff import Change, ReadBlob, diff_lines, split_lines
+from data.git_repository import ObjectCache
+
+# Memory used by the cached blames, in bytes
+BLAME_CACHE_SIZE = 32 * 1024 * 1024
+
+# Approximate size of one line of a cached blame, and of a shared blame
+LINE_SIZE = 100
+REFERENCE_SIZE = 200
+
+# Origin of a line: (commit SHA, line number in that commit, from 1)
+Origin = Tuple[str, int]
+
+# Blame of a file: (commit owning the blame, origin of every line)
+Blame = Tuple[str, Tuple[Origin, ...]]
+
+# Origins per (repository key, path, commit), or the commit whose blame is the same
+_BLAMES = ObjectCache(BLAME_CACHE_SIZE)
+
+
+def get_blame(owner: str, repo_name: str, path: str) -> Optional[Dict]:
+    """Get the blame of a file, path being {ref}/{file_path}
+
+    Lines are grouped into ranges of consecutive lines from the same commit.
+    None when the repository, ref or file does not exist, or for binary and
+    large files.
+    """
+    resolved = resolve_ref_path(owner, repo_name, path)
+    if resolved is None:
+        return None
+
+    ref, snapshot, file_path = resolved
+    entry = snapshot.trees.lookup(snapshot.root, file_path)
+    sha = resolve_ref_to_sha(owner, repo_name, ref)
+    commit_dag = get_commit_dag(owner, repo_name)
+    if entry is None or entry["type"] != "blob" or sha is None or commit_dag is None:
+        return None
+
+    blame = _blame(owner, repo_name, commit_dag, snapshot.blobs.get, file_path, sha)
+    if blame is None:
+        return None
+
+    ranges = []
+    for line, origin in enumerate(blame[1], 1):
+        last = ranges[-1] if ranges else None
+        if (
+            last is not None
+            and last["sha"] == origin[0]
+            and last["original_ending_line"] == origin[1] - 1
+        ):
+            last["ending_line"] = line
+            last["original_ending_line"] = origin[1]
+        else:
+            ranges.append(
+                {
+                    "sha": origin[0],
+                    "starting_line": line,
+                    "ending_line": line,
+                    "original_starting_line": origin[1],
+                    "original_ending_line": origin[1],
+                }
+            )
+
+    commits = {
+        commit["sha"]: commit
+        for commit in get_commits_by_sha(
+            owner,
+            repo_name,
+            list(dict.fromkeys(line_range["sha"] for line_range in ranges)),
+        )
+    }
+    return {
+        "sha": sha,
+        "path": file_path,
+        "ranges": [
+            {
+                "starting_line": line_range["starting_line"],
+                "ending_line": line_range["ending_line"],
+                "original_starting_line": line_range["original_starting_line"],
+                "commit": commits[line_range["sha"]],
+            }
+            for line_range in ranges
+            if line_range["sha"] in commits
+        ],
+    }
+
+
+def _blame(
+    owner: str,
+    repo_name: str,
+    commit_dag: CommitDag,
+    read_blob: ReadBlob,
+    path: str,
+    sha: str,
+) -> Optional[Blame]:
+    """Blame a file at a commit, from the cached blames of its history
+
+    None when the file is binary or large at that commit. Binary and large
+    versions in its history have no lines to pass on.
+    """
+    repo_key = f"{owner}/{repo_name}"
+    blobs: Dict[str, Optional[str]] = {}
+    computed: Dict[str, Blame] = {}
+
+    def blob_of(commit: str) -> Optional[str]:
+        """Get the blob SHA of the file at a commit (None: no such file)"""
+        if commit not in blobs:
+            snapshot = get_snapshot(owner, repo_name, commit)
+            entry = snapshot.trees.lookup(snapshot.root, path) if snapshot else None
+            blobs[commit] = entry["sha"] if entry and entry["type"] == "blob" else None
+        return blobs[commit]
+
+    def cached(commit: str) -> Optional[Blame]:
+        """Get the blame of a commit computed so far, or from the cache
+
+        Blames found in the cache are kept in ``computed``, so that they
+        stay available while the blame is computed.
+        """
+        if commit in computed:
+            return computed[commit]
+        value = _BLAMES.get((repo_key, path, commit))
+        if isinstance(value, str):
+            owner_commit = value
+            value = _BLAMES.get((repo_key, path, owner_commit))
+            if value is None:
+                return None
+            computed[commit] = (owner_commit, value)
+        elif value is not None:
+            computed[commit] = (commit, value)
+        return computed.get(commit)
+
+    head_blob = blob_of(sha)
+    if head_blob is None or _read_lines(read_blob, head_blob) is None:
+        return None
+
+    # Commits are blamed after the parents they need, without recursion
+    stack = [sha]
+    while stack:
+        commit = stack[-1]
+        if cached(commit) is not None:
+            stack.pop()
+            continue
+
+        # Only commits with the file are stacked, and parents without it
+        # pass no lines on
+        blob = blob_of(commit)
+        if blob is None:
+            raise ValueError(f"{path} is missing from commit {commit}")
+        position = commit_dag.position(commit)
+        parents: List[Tuple[str, str]] = []
+        for parent_position in (
+            commit_dag.parents(position) if position is not None else ()
+        ):
+            parent = commit_dag.sha(parent_position)
+            parent_blob = blob_of(parent)
+            if parent_blob is not None:
+                parents.append((parent, parent_blob))
+        same = next(
+            (parent for parent, parent_blob in parents if parent_blob == blob), None
+        )
+        needed = [same] if same is not None else [parent for parent, _ in parents]
+        pending = [parent for parent in needed if cached(parent) is None]
+        if pending:
+            stack.extend(pending)
+            continue
+        stack.pop()
+
+        if same is not None:
+            # Unchanged: share the blame of the parent
+            computed[commit] = computed[same]
+            _BLAMES.put((repo_key, path, commit), computed[commit][0], REFERENCE_SIZE)
+            continue
+
+        lines = _read_lines(read_blob, blob) or []
+        origins: List[Optional[Origin]] = [None] * len(lines)
+        for parent, parent_blob in parents:
+            parent_lines = _read_lines(read_blob, parent_blob) or []
+            parent_origins = computed[parent][1]
+            changes = diff_lines(parent_lines, lines)
+            for old, new in _matched_lines(changes, len(parent_lines)):
+                if origins[new] is None:
+                    origins[new] = parent_origins[old]
+
+        blame = tuple(
+            origin if origin is not None else (commit, line)
+            for line, origin in enumerate(origins, 1)
+        )
+        computed[commit] = (commit, blame)
+        _BLAMES.put((repo_key, path, commit), blame, LINE_SIZE * (len(blame) + 1))
+
+    return computed[sha]
+
+
+def _matched_lines(changes: List[Change], old_count: int) -> Iterator[Tuple[int, int]]:
+    """Iterate the (old line, new line) pairs left unchanged, from 0"""
+    old_position = new_position = 0
+    for old_start, old_end, _, new_end in changes + [(old_count, old_count, 0, 0)]:
+        for offset in range(old_start - old_position):
+            yield old_position + offset, new_position + offset
+        old_position, new_position = old_end, new_end
+
+
+def _read_lines(read_blob: ReadBlob, blob: str) -> Optional[List[str]]:
+    """Read the lines of a blob, or None if it is binary or large"""
+    data = read_blob(blob) or b""
+    if len(data) >= LARGE_BLOB_SIZE or is_binary(data):
+        return None
+    return split_lines(data)
@@ -0,0 +1,217 @@
+"""Content-addressed blob store
+
+File contents are stored once per distinct content, keyed by their git blob
+SHA-1, across all repositories: the same file in several repositories,
+forks, branches or commits is a single blob. Trees (see ``data.tree_store``)
+only reference blobs by SHA.
+
+Blobs are raw bytes, so binary files are stored as they are. Blobs of at
+least ``LARGE_BLOB_SIZE`` bytes are written to a file of the blob directory
+instead of the table and read back through ``mmap``: serving them does not
+load or copy them into Python memory. A large blob is mapped once while it
+is in use, and the maps still open are closed when the store is collected
+or the process exits. The blob directory is taken from
+``GITBUCKET_MOCK_BLOB_DIR`` (default: next to the SQLite database, or a
+temporary directory with the memory backend, removed at exit).
+
+``Base64Cache`` keeps the base64 encodings used by the contents API, so
+repeated reads of the same file skip the encoding.
+"""
+
+import atexit
+import base64
+import mmap
+import os
+import shutil
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, MutableMapping, Optional, Tuple, Union
+
+from data.git_objects import blob_sha
+from data.storage import backend
+
+LARGE_BLOB_SIZE = 1024 * 1024
+
+# Memory used by the cached base64 encodings and sizes
+BASE64_CACHE_SIZE = 64 * 1024 * 1024
+
+# Approximate memory of one cached entry, besides its encoding
+ENTRY_SIZE = 100
+
+# Bytes checked for NUL to tell binary from text, as git does
+BINARY_CHECK_SIZE = 8000
+
+Buffer = Union[bytes, mmap.mmap]
+
+# Directory of the large blobs, found on first use
+_directory: Optional[str] = None
+_directory_lock = threading.Lock()
+
+
+class BlobStore:
+    """File contents keyed by their blob SHA
+
+    The table holds the bytes of small blobs, and None for the blobs kept
+    in the blob directory.
+    """
+
+    def __init__(self, blobs: MutableMapping[str, Optional[bytes]]):
+        self._blobs = blobs
+        # Maps of the large blobs in use, shared by their readers
+        self._maps: "weakref.WeakValueDictionary[str, mmap.mmap]" = (
+            weakref.WeakValueDictionary()
+        )
+        self._lock = threading.Lock()
+        weakref.finalize(self, _close_maps, self._maps)
+
+    def get(self, sha: str) -> Optional[Buffer]:
+        """Get the content of a blob (memory-mapped for large blobs)"""
+        if sha not in self._blobs:
+            return None
+
+        data = self._blobs[sha]
+        if data is not None:
+            return data
+
+        with self._lock:
+            mapped = self._maps.get(sha)
+            if mapped is None:
+                with open(self._path(sha), "rb") as blob_file:
+                    if os.fstat(blob_file.fileno()).st_size == 0:
+                        return b""
+                    mapped = mmap.mmap(blob_file.fileno(), 0, access=mmap.ACCESS_READ)
+                self._maps[sha] = mapped
+        return mapped
+
+    def size(self, sha: str) -> Optional[int]:
+        """Get the size of a blob in bytes"""
+        data = self.get(sha)
+        return len(data) if data is not None else None
+
+    def put(self, data: bytes) -> str:
+        """Store a content (once) and get its blob SHA"""
+        sha = blob_sha(data)
+        if sha in self._blobs:
+            return sha
+
+        if len(data) < LARGE_BLOB_SIZE:
+            self._blobs[sha] = data
+            return sha
+
+        # Write the file first, so the blob never points to a partial file
+        path = self._path(sha)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as blob_file:
+            blob_file.write(data)
+        os.replace(temp_path, path)
+
+        self._blobs[sha] = None
+        return sha
+
+    def _path(self, sha: str) -> str:
+        """Get the file of a large blob"""
+        return os.path.join(_blob_directory(), sha[:2], sha[2:])
+
+
+def is_binary(data: Buffer) -> bool:
+    """Check whether a content is binary (has a NUL byte near its start)"""
+    return b"\0" in data[:BINARY_CHECK_SIZE]
+
+
+def _blob_directory() -> str:
+    """Get the directory of the large blobs"""
+    global _directory
+
+    with _directory_lock:
+        if _directory is None:
+            _directory = os.environ.get("GITBUCKET_MOCK_BLOB_DIR")
+            if not _directory:
+                if backend.name == "sqlite":
+                    _directory = f"{backend.path}.blobs"
+                else:
+                    _directory = tempfile.mkdtemp(prefix="gitbucket-mock-blobs-")
+                    atexit.register(shutil.rmtree, _directory, ignore_errors=True)
+        return _directory
+
+
+def _close_maps(maps: "weakref.WeakValueDictionary[str, mmap.mmap]") -> None:
+    """Close the maps of large blobs still open"""
+    for mapped in list(maps.values()):
+        try:
+            mapped.close()
+        except BufferError:
+            pass  # Still exported by a memoryview, released with it
+
+
+class Base64Cache:
+    """Base64 encodings and sizes of blobs, bounded in bytes (LRU)
+
+    Blobs never change, so an entry stays valid as long as it is cached. The
+    size of a blob is cached with its encoding, or alone when only the size
+    was asked for, and is evicted along with it. ``blobs`` is a
+    ``BlobStore`` or any other blob source with the same ``get`` and
+    ``size`` methods (such as a repository on disk).
+    """
+
+    def __init__(self, blobs: Any, max_bytes: int):
+        self._blobs = blobs
+        self._max_bytes = max_bytes
+        # (size, encoding or None) per blob SHA
+        self._entries: "OrderedDict[str, Tuple[int, Optional[str]]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def encoded(self, sha: str) -> Optional[str]:
+        """Get the base64 encoding of a blob"""
+        with self._lock:
+            entry = self._entries.get(sha)
+            if entry is not None and entry[1] is not None:
+                self._entries.move_to_end(sha)
+                return entry[1]
+
+        data = self._blobs.get(sha)
+        if data is None:
+            return None
+
+        encoded = base64.b64encode(data).decode("ascii")
+        with self._lock:
+            fits = ENTRY_SIZE + len(encoded) <= self._max_bytes
+            self._put(sha, (len(data), encoded if fits else None))
+
+        return encoded
+
+    def size(self, sha: str) -> Optional[int]:
+        """Get the size of a blob in bytes"""
+        with self._lock:
+            entry = self._entries.get(sha)
+            if entry is not None:
+                self._entries.move_to_end(sha)
+                return entry[0]
+
+        size = self._blobs.size(sha)
+        if size is None:
+            return None
+
+        with self._lock:
+            if sha not in self._entries:
+                self._put(sha, (size, None))
+        return size
+
+    def _put(self, sha: str, entry: Tuple[int, Optional[str]]) -> None:
+        """Cache the entry of a blob and evict the oldest ones (under _lock)"""
+        old = self._entries.pop(sha, None)
+        if old is not None:
+            self._bytes -= _entry_bytes(old)
+        self._entries[sha] = entry
+        self._bytes += _entry_bytes(entry)
+        while self._bytes > self._max_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= _entry_bytes(evicted)
+
+
+def _entry_bytes(entry: Tuple[int, Optional[str]]) -> int:
+    """Get the memory counted for a cached entry"""
+    return ENTRY_SIZE + (len(entry[1]) if entry[1] is not None else 0)
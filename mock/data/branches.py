@@ -1,4 +1,11 @@
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Set
+
+from data.commits import get_commit_dag
+from data.events import RepositoryChange, record, subscribe
+from data.git_repository import ObjectCache, get_disk_repository
+from data.indexes import RepoIndexCache
+from data.repositories import REPOSITORIES
+from data.storage import backend
 
 # Repository branch data
 # Format: {repo_key: {branch_name: branch_data}}
@@ -89,9 +96,52 @@ REPOSITORY_BRANCHES = {
     },
 }
 
+# Load the fixture data into the storage backend
+REPOSITORY_BRANCHES = backend.repo_table("repository_branches", REPOSITORY_BRANCHES)
+
+
+def _build_branch_heads(repo_key: str) -> Dict[str, Set[str]]:
+    """Build the head SHA -> branch names index of a repository"""
+    branch_heads: Dict[str, Set[str]] = {}
+    if repo_key in REPOSITORY_BRANCHES:
+        for branch_name, branch_data in REPOSITORY_BRANCHES[repo_key].items():
+            branch_heads.setdefault(branch_data["commit"]["sha"], set()).add(
+                branch_name
+            )
+
+    return branch_heads
+
+
+# Reverse index of the branch heads
+# Format: {repo_key: {sha: set(branch_name)}}
+BRANCH_HEADS = RepoIndexCache(_build_branch_heads)
+
+# Memory used by the cached ahead/behind counts, in bytes
+AHEAD_BEHIND_CACHE_SIZE = 1024 * 1024
+
+# Approximate size of one cached count
+AHEAD_BEHIND_SIZE = 200
+
+# (ahead_by, behind_by) per (repo_key, default branch head, branch head).
+# Commits never change, so the counts of a pair of heads never do either.
+_AHEAD_BEHIND = ObjectCache(AHEAD_BEHIND_CACHE_SIZE)
+
 
 def get_repository_branches(owner: str, repo_name: str) -> Optional[List[Dict]]:
-    """Get list of branches for a repository"""
+    """Get list of branches for a repository
+
+    Each branch counts the commits it is ahead of and behind the default
+    branch (None when a commit is not in the repository).
+    """
+    disk = get_disk_repository(owner, repo_name)
+    if disk is not None:
+        branches = [
+            {"name": ref[len("refs/heads/") :], "commit": {"sha": sha}}
+            for ref, sha in disk.refs().items()
+            if ref.startswith("refs/heads/")
+        ]
+        return _count_ahead_behind(owner, repo_name, branches, disk.default_branch())
+
     repo_key = f"{owner}/{repo_name}"
     if repo_key not in REPOSITORY_BRANCHES:
         return None
@@ -100,6 +150,35 @@ def get_repository_branches(owner: str, repo_name: str) -> Optional[List[Dict]]:
     for branch_name, branch_data in REPOSITORY_BRANCHES[repo_key].items():
         branches.append({"name": branch_name, "commit": branch_data["commit"]})
 
+    repository = REPOSITORIES.get(repo_key)
+    default_branch = repository["default_branch"] if repository else "main"
+    return _count_ahead_behind(owner, repo_name, branches, default_branch)
+
+
+def _count_ahead_behind(
+    owner: str, repo_name: str, branches: List[Dict], default_branch: str
+) -> List[Dict]:
+    """Add ahead_by/behind_by (against the default branch) to branches
+
+    Counts are cached by the heads they compare, so listing branches that
+    did not move does not walk the history again.
+    """
+    repo_key = f"{owner}/{repo_name}"
+    heads = {branch["name"]: branch["commit"]["sha"] for branch in branches}
+    default_head = heads.get(default_branch)
+    commit_dag = None
+    for branch in branches:
+        key = (repo_key, default_head, branch["commit"]["sha"])
+        counts = _AHEAD_BEHIND.get(key)
+        if counts is None and default_head is not None:
+            if commit_dag is None:
+                commit_dag = get_commit_dag(owner, repo_name)
+            if commit_dag is not None:
+                counts = commit_dag.ahead_behind(default_head, key[2])
+            if counts is not None:
+                _AHEAD_BEHIND.put(key, counts, AHEAD_BEHIND_SIZE)
+        branch["ahead_by"], branch["behind_by"] = counts or (None, None)
+
     return branches
 
 
@@ -159,34 +238,36 @@ def update_branch_protection(
     ):
         return None
 
-    branch = REPOSITORY_BRANCHES[repo_key][branch_name]
-
-    # Update protection settings
-    if "protection" in protection_data:
-        protection = protection_data["protection"]
-        branch["protection"]["enabled"] = protection["enabled"]
-
-        if protection["enabled"] and "required_status_checks" in protection:
-            if branch["protection"]["required_status_checks"] is None:
-                branch["protection"]["required_status_checks"] = {
-                    "url": f"/api/v3/repos/{owner}/{repo_name}/branches/{branch_name}/protection/required_status_checks",
-                    "enforcement_level": "off",
-                    "contexts": [],
-                    "contexts_url": f"/api/v3/repos/{owner}/{repo_name}/branches/{branch_name}/protection/required_status_checks/contexts",
-                }
-
-            status_checks = protection["required_status_checks"]
-            if "enforcement_level" in status_checks:
-                branch["protection"]["required_status_checks"]["enforcement_level"] = (
-                    status_checks["enforcement_level"]
-                )
-
-            if "contexts" in status_checks:
-                branch["protection"]["required_status_checks"]["contexts"] = (
-                    status_checks["contexts"]
-                )
+    with backend.transaction():
+        branch = REPOSITORY_BRANCHES[repo_key][branch_name]
 
-    return branch
+        # Update protection settings
+        if "protection" in protection_data:
+            protection = protection_data["protection"]
+            branch["protection"]["enabled"] = protection["enabled"]
+
+            if protection["enabled"] and "required_status_checks" in protection:
+                if branch["protection"]["required_status_checks"] is None:
+                    branch["protection"]["required_status_checks"] = {
+                        "url": f"/api/v3/repos/{owner}/{repo_name}/branches/{branch_name}/protection/required_status_checks",
+                        "enforcement_level": "off",
+                        "contexts": [],
+                        "contexts_url": f"/api/v3/repos/{owner}/{repo_name}/branches/{branch_name}/protection/required_status_checks/contexts",
+                    }
+
+                status_checks = protection["required_status_checks"]
+                if "enforcement_level" in status_checks:
+                    branch["protection"]["required_status_checks"][
+                        "enforcement_level"
+                    ] = status_checks["enforcement_level"]
+
+                if "contexts" in status_checks:
+                    branch["protection"]["required_status_checks"]["contexts"] = (
+                        status_checks["contexts"]
+                    )
+
+        REPOSITORY_BRANCHES[repo_key][branch_name] = branch
+        return branch
 
 
 def delete_branch_protection(owner: str, repo_name: str, branch_name: str) -> bool:
@@ -198,10 +279,96 @@ def delete_branch_protection(owner: str, repo_name: str, branch_name: str) -> bo
     ):
         return False
 
-    branch = REPOSITORY_BRANCHES[repo_key][branch_name]
+    with backend.transaction():
+        branch = REPOSITORY_BRANCHES[repo_key][branch_name]
+
+        # Disable protection settings
+        branch["protection"]["enabled"] = False
+        branch["protection"]["required_status_checks"] = None
 
-    # Disable protection settings
-    branch["protection"]["enabled"] = False
-    branch["protection"]["required_status_checks"] = None
+        REPOSITORY_BRANCHES[repo_key][branch_name] = branch
+        return True
+
+
+def get_branch_names_for_head(owner: str, repo_name: str, sha: str) -> List[str]:
+    """Get names of the branches whose head is a commit"""
+    repo_key = f"{owner}/{repo_name}"
+    return sorted(BRANCH_HEADS.get(repo_key).get(sha, set()))
+
+
+def set_branch_head(owner: str, repo_name: str, branch_name: str, sha: str) -> Dict:
+    """Create a branch or move it to another commit"""
+    repo_key = f"{owner}/{repo_name}"
+    with backend.transaction():
+        if repo_key not in REPOSITORY_BRANCHES:
+            REPOSITORY_BRANCHES[repo_key] = {}
+
+        old_sha = None
+        if branch_name in REPOSITORY_BRANCHES[repo_key]:
+            # A new record, so that a failed transaction restores the old one
+            branch = REPOSITORY_BRANCHES[repo_key][branch_name]
+            old_sha = branch["commit"]["sha"]
+            branch = {**branch, "commit": {**branch["commit"], "sha": sha}}
+        else:
+            branch = {
+                "name": branch_name,
+                "commit": {"sha": sha},
+                "protection": {
+                    "url": f"/api/v3/repos/{owner}/{repo_name}/branches/{branch_name}/protection",
+                    "enabled": False,
+                    "required_status_checks": None,
+                },
+                "_links": {
+                    "self": f"/api/v3/repos/{owner}/{repo_name}/branches/{branch_name}",
+                    "html": f"/{owner}/{repo_name}/tree/{branch_name}",
+                },
+            }
+
+        REPOSITORY_BRANCHES[repo_key][branch_name] = branch
+        record(repo_key).move_branch(branch_name, old_sha, sha)
+
+    return branch
+
+
+def delete_branch(owner: str, repo_name: str, branch_name: str) -> bool:
+    """Delete a branch"""
+    repo_key = f"{owner}/{repo_name}"
+    with backend.transaction():
+        if (
+            repo_key not in REPOSITORY_BRANCHES
+            or branch_name not in REPOSITORY_BRANCHES[repo_key]
+        ):
+            return False
+
+        branch = REPOSITORY_BRANCHES[repo_key][branch_name]
+        del REPOSITORY_BRANCHES[repo_key][branch_name]
+        record(repo_key).move_branch(branch_name, branch["commit"]["sha"], None)
 
     return True
+
+
+@subscribe
+def _update_branch_heads(change: RepositoryChange) -> None:
+    """Move the changed branches in the head index, if already built"""
+    branch_heads = BRANCH_HEADS.peek(change.repo_key)
+    if branch_heads is None:
+        return
+
+    for branch_name, (old_sha, new_sha) in change.branches.items():
+        if old_sha is not None:
+            _discard_branch_head(branch_heads, old_sha, branch_name)
+        if new_sha is not None:
+            branch_heads.setdefault(new_sha, set()).add(branch_name)
+
+
+def _discard_branch_head(
+    branch_heads: Dict[str, Set[str]], sha: str, branch_name: str
+) -> None:
+    """Remove a branch from the reverse index of its head"""
+    branch_names = branch_heads.get(sha)
+    if branch_names is None:
+        return
+
+    branch_names.discard(branch_name)
+    if not branch_names:
+        del branch_heads[sha]
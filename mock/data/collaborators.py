@@ -1,5 +1,6 @@
 from typing import Dict, List, Optional, Tuple
 
+from data.storage import backend
 from data.users import USERS
 
 # Repository collaborator data
@@ -10,6 +11,11 @@ REPOSITORY_COLLABORATORS = {
     "org1/repo3": {"admin": "ADMIN", "user1": "DEVELOPER"},
 }
 
+# Load the fixture data into the storage backend
+REPOSITORY_COLLABORATORS = backend.repo_table(
+    "repository_collaborators", REPOSITORY_COLLABORATORS
+)
+
 
 def get_repository_collaborators(owner: str, repo_name: str) -> Optional[List[Dict]]:
     """Get collaborators for a repository"""
@@ -57,32 +63,32 @@ def add_collaborator(
 ) -> bool:
     """Add a collaborator"""
     repo_key = f"{owner}/{repo_name}"
+    with backend.transaction():
+        # Fail if repository does not exist
+        if repo_key not in REPOSITORY_COLLABORATORS:
+            REPOSITORY_COLLABORATORS[repo_key] = {}
 
-    # Fail if repository does not exist
-    if repo_key not in REPOSITORY_COLLABORATORS:
-        REPOSITORY_COLLABORATORS[repo_key] = {}
-
-    # Fail if user does not exist
-    if username not in USERS:
-        return False
+        # Fail if user does not exist
+        if username not in USERS:
+            return False
 
-    # Set permissions
-    REPOSITORY_COLLABORATORS[repo_key][username] = permission
-    return True
+        # Set permissions
+        REPOSITORY_COLLABORATORS[repo_key][username] = permission
+        return True
 
 
 def remove_collaborator(owner: str, repo_name: str, username: str) -> bool:
     """Remove a collaborator"""
     repo_key = f"{owner}/{repo_name}"
-
-    # Fail if repository does not exist
-    if repo_key not in REPOSITORY_COLLABORATORS:
-        return False
-
-    # Fail if user is not a collaborator
-    if username not in REPOSITORY_COLLABORATORS[repo_key]:
-        return False
-
-    # Remove collaborator
-    del REPOSITORY_COLLABORATORS[repo_key][username]
-    return True
+    with backend.transaction():
+        # Fail if repository does not exist
+        if repo_key not in REPOSITORY_COLLABORATORS:
+            return False
+
+        # Fail if user is not a collaborator
+        if username not in REPOSITORY_COLLABORATORS[repo_key]:
+            return False
+
+        # Remove collaborator
+        del REPOSITORY_COLLABORATORS[repo_key][username]
+        return True
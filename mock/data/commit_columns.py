@@ -0,0 +1,220 @@
+"""Columnar commit metadata
+
+Keeps the metadata used by the statistics endpoints (author date, author,
+additions, deletions) of one repository in flat columns sorted by author
+date, instead of walking the nested commit dicts:
+
+- dates are epoch seconds, so a date window is a binary search
+  (``searchsorted``) on the date column.
+- authors are small integer ids into ``users``.
+- aggregations work on whole column slices.
+
+When NumPy is installed (``pip install gitbucket-mock[columnar]``) the
+columns are NumPy arrays and the aggregations are vectorized. Without NumPy
+the same columns are Python lists and the aggregations are plain loops.
+"""
+
+import bisect
+from datetime import datetime
+from typing import TYPE_CHECKING, Dict, Iterable, List, Literal, Optional, Tuple, Union
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional
+    np = None
+
+if TYPE_CHECKING:
+    import numpy
+    from numpy.typing import NDArray
+
+    # Column of integers: a NumPy array, or a list without NumPy
+    Column = Union[NDArray[numpy.int64], List[int]]
+
+WEEK = 7 * 24 * 60 * 60
+
+# Unix time 0 is a Thursday; weeks start on Sunday as in the GitHub API
+WEEK_OFFSET = 4 * 24 * 60 * 60
+
+
+class CommitColumns:
+    """Commit metadata of a repository in columns sorted by author date"""
+
+    def __init__(self, commits: Iterable[Dict]):
+        rows = []
+        for commit in commits:
+            stats = commit.get("stats") or {}
+            rows.append(
+                (
+                    int(commit["commit"]["author"]["date"].timestamp()),
+                    commit["sha"],
+                    commit.get("author"),
+                    stats.get("additions", 0),
+                    stats.get("deletions", 0),
+                )
+            )
+        rows.sort(key=lambda row: row[0])
+
+        # Authors without a user account get the id -1
+        self.users: List[Dict] = []
+        user_ids: Dict[str, int] = {}
+        author_ids = []
+        for _, _, user, _, _ in rows:
+            if user is None:
+                author_ids.append(-1)
+                continue
+            if user["login"] not in user_ids:
+                user_ids[user["login"]] = len(self.users)
+                self.users.append(user)
+            author_ids.append(user_ids[user["login"]])
+
+        self.shas = [row[1] for row in rows]
+        self.epochs = _column([row[0] for row in rows])
+        self.author_ids = _column(author_ids)
+        self.additions = _column([row[3] for row in rows])
+        self.deletions = _column([row[4] for row in rows])
+
+    def window(
+        self, since: Optional[datetime] = None, until: Optional[datetime] = None
+    ) -> Tuple[int, int]:
+        """Get the row range of the commits between two dates"""
+        low = 0 if since is None else _search(self.epochs, since.timestamp(), "left")
+        high = (
+            len(self.shas)
+            if until is None
+            else _search(self.epochs, until.timestamp(), "right")
+        )
+        return low, max(low, high)
+
+    def contributor_stats(
+        self, since: Optional[datetime] = None, until: Optional[datetime] = None
+    ) -> List[Dict]:
+        """Get weekly commit, addition and deletion counts per author
+
+        Every author gets one entry per week between the first and the last
+        commit of the window. Authors are sorted by total commits, ascending.
+        """
+        low, high = self.window(since, until)
+        if np is None:
+            return self._contributor_stats_python(low, high)
+
+        author_ids = _array(self.author_ids)[low:high]
+        mask = author_ids >= 0
+        if not mask.any():
+            return []
+
+        author_ids = author_ids[mask]
+        weeks = _week_start(_array(self.epochs)[low:high][mask])
+        first_week = int(weeks.min())
+        slots = (weeks - first_week) // WEEK
+        shape = (len(self.users), int(slots.max()) + 1)
+
+        commits = np.zeros(shape, dtype=np.int64)
+        additions = np.zeros(shape, dtype=np.int64)
+        deletions = np.zeros(shape, dtype=np.int64)
+        np.add.at(commits, (author_ids, slots), 1)
+        np.add.at(
+            additions, (author_ids, slots), _array(self.additions)[low:high][mask]
+        )
+        np.add.at(
+            deletions, (author_ids, slots), _array(self.deletions)[low:high][mask]
+        )
+
+        totals = commits.sum(axis=1)
+        week_starts = (first_week + np.arange(shape[1]) * WEEK).tolist()
+        stats = []
+        for author_id in np.argsort(totals, kind="stable"):
+            if totals[author_id] == 0:
+                continue
+            stats.append(
+                _contributor(
+                    self.users[author_id],
+                    int(totals[author_id]),
+                    week_starts,
+                    additions[author_id].tolist(),
+                    deletions[author_id].tolist(),
+                    commits[author_id].tolist(),
+                )
+            )
+
+        return stats
+
+    def _contributor_stats_python(self, low: int, high: int) -> List[Dict]:
+        """Get contributor statistics without NumPy"""
+        rows = [
+            (author_id, _week_start(epoch), additions, deletions)
+            for author_id, epoch, additions, deletions in zip(
+                self.author_ids[low:high],
+                self.epochs[low:high],
+                self.additions[low:high],
+                self.deletions[low:high],
+            )
+            if author_id >= 0
+        ]
+        if not rows:
+            return []
+
+        first_week = min(row[1] for row in rows)
+        week_count = (max(row[1] for row in rows) - first_week) // WEEK + 1
+        week_starts = [first_week + i * WEEK for i in range(week_count)]
+
+        counts: Dict[int, List[List[int]]] = {}
+        for author_id, week, additions, deletions in rows:
+            if author_id not in counts:
+                counts[author_id] = [[0] * week_count for _ in range(3)]
+            slot = (week - first_week) // WEEK
+            counts[author_id][0][slot] += additions
+            counts[author_id][1][slot] += deletions
+            counts[author_id][2][slot] += 1
+
+        totals = {author_id: sum(c[2]) for author_id, c in counts.items()}
+        return [
+            _contributor(self.users[author_id], totals[author_id], week_starts, *c)
+            for author_id, c in sorted(
+                counts.items(), key=lambda item: (totals[item[0]], item[0])
+            )
+        ]
+
+
+def _column(values: List[int]) -> "Column":
+    """Create a column from a list of integers"""
+    return np.array(values, dtype=np.int64) if np is not None else values
+
+
+def _array(column: "Column") -> "NDArray[numpy.int64]":
+    """View a column as a NumPy array (NumPy installed), without copying it"""
+    if np is None:
+        raise RuntimeError("NumPy is not installed")
+    return np.asarray(column, dtype=np.int64)
+
+
+def _search(column: "Column", value: float, side: Literal["left", "right"]) -> int:
+    """Binary search in a sorted column"""
+    if np is not None:
+        return int(np.searchsorted(_array(column), value, side=side))
+    if side == "left":
+        return bisect.bisect_left(column, value)
+    return bisect.bisect_right(column, value)
+
+
+def _week_start(epochs):
+    """Get the start of the week (Sunday 00:00 UTC) of epoch seconds"""
+    return (epochs + WEEK_OFFSET) // WEEK * WEEK - WEEK_OFFSET
+
+
+def _contributor(
+    user: Dict,
+    total: int,
+    week_starts: List[int],
+    additions: List[int],
+    deletions: List[int],
+    commits: List[int],
+) -> Dict:
+    """Build one entry of the contributor statistics"""
+    return {
+        "author": user,
+        "total": total,
+        "weeks": [
+            {"w": w, "a": a, "d": d, "c": c}
+            for w, a, d, c in zip(week_starts, additions, deletions, commits)
+        ],
+    }
@@ -0,0 +1,403 @@
+"""Commit DAG with generation numbers and reachability bitmaps
+
+Answers ancestry questions about the commits of one repository: whether a
+commit is an ancestor of another, the merge bases of two commits, the
+commits reachable from one commit but not from another and how far two
+commits are ahead of and behind each other.
+
+Commits are numbered (their position) and each has a generation number:
+1 for root commits, else one more than the highest generation of its
+parents. A commit only reaches commits of lower generations, so ancestry
+walks go highest generation first and stop early.
+
+A reachability bitmap (an int with bit n set when the commit at position n
+is reachable) is kept for checkpoint commits, one generation in
+``BITMAP_INTERVAL``. The bitmap of any other commit is the union of the
+checkpoint bitmaps its walk reaches and of the few commits walked before
+reaching them, so the commits between two commits of a long history cost a
+short walk and a few big integer operations. Checkpoint bitmaps are built on
+first use, oldest first, and kept in an LRU bounded in bytes.
+"""
+
+import heapq
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from data.git_repository import GitRepository, ObjectCache
+
+# One generation in BITMAP_INTERVAL keeps a reachability bitmap
+BITMAP_INTERVAL = 1024
+
+# Checkpoint bitmaps kept per repository, in bytes (1M commits: 125 KiB each)
+BITMAP_CACHE_SIZE = 64 * 1024 * 1024
+
+# Merge base walk flags
+_FIRST = 1
+_SECOND = 2
+_STALE = 4
+
+
+class CommitDag:
+    """Ancestry queries over the numbered commits of one repository
+
+    Subclasses number the commits: ``position``, ``sha``, ``parents`` and
+    ``generation``.
+    """
+
+    def __init__(self):
+        self._bitmaps = ObjectCache(BITMAP_CACHE_SIZE)
+
+    def position(self, sha: str) -> Optional[int]:
+        """Get the position of a commit, or None for unknown commits"""
+        raise NotImplementedError
+
+    def sha(self, position: int) -> str:
+        """Get the SHA of the commit at a position"""
+        raise NotImplementedError
+
+    def parents(self, position: int) -> Sequence[int]:
+        """Get the positions of the parents of a commit"""
+        raise NotImplementedError
+
+    def generation(self, position: int) -> int:
+        """Get the generation number of a commit"""
+        raise NotImplementedError
+
+    # Queries
+
+    def is_ancestor(self, ancestor: str, descendant: str) -> bool:
+        """Check whether a commit is reachable from another (or the same)"""
+        first = self.position(ancestor)
+        second = self.position(descendant)
+        if first is None or second is None:
+            return False
+        return self._reaches(second, first)
+
+    def merge_bases(self, first: str, second: str) -> Optional[List[str]]:
+        """Get the best common ancestors of two commits, as ``git merge-base --all``
+
+        None when a commit is unknown, empty for unrelated histories.
+        """
+        first_position = self.position(first)
+        second_position = self.position(second)
+        if first_position is None or second_position is None:
+            return None
+        # One commit in the history of the other is the only merge base
+        if self._reaches(second_position, first_position):
+            return [first]
+        if self._reaches(first_position, second_position):
+            return [second]
+
+        # Paint the ancestors of each side, highest generation first: a
+        # commit painted by both sides is a common ancestor, and everything
+        # below it is stale. Parents always come after their children.
+        flags = {first_position: _FIRST, second_position: _SECOND}
+        heap = [
+            (-self.generation(first_position), first_position),
+            (-self.generation(second_position), second_position),
+        ]
+        heapq.heapify(heap)
+        candidates = []
+        while any(not flags[position] & _STALE for _, position in heap):
+            _, position = heapq.heappop(heap)
+            flag = flags[position]
+            if flag & (_FIRST | _SECOND) == _FIRST | _SECOND and not flag & _STALE:
+                candidates.append(position)
+                flag |= _STALE
+
+            for parent in self.parents(position):
+                parent_flag = flags.get(parent)
+                if parent_flag is None:
+                    flags[parent] = flag
+                    heapq.heappush(heap, (-self.generation(parent), parent))
+                else:
+                    flags[parent] = parent_flag | flag
+
+        # A candidate reachable from another one is not a best common ancestor
+        bases = [
+            candidate
+            for candidate in candidates
+            if not any(
+                other != candidate and self._reaches(other, candidate)
+                for other in candidates
+            )
+        ]
+        return [self.sha(position) for position in bases]
+
+    def ahead_behind(self, base: str, head: str) -> Optional[Tuple[int, int]]:
+        """Count the commits of head not in base and of base not in head"""
+        base_position = self.position(base)
+        head_position = self.position(head)
+        if base_position is None or head_position is None:
+            return None
+        if base_position == head_position:
+            return 0, 0
+
+        base_bitmap = self.reachable(base_position)
+        head_bitmap = self.reachable(head_position)
+        return (
+            (head_bitmap & ~base_bitmap).bit_count(),
+            (base_bitmap & ~head_bitmap).bit_count(),
+        )
+
+    def range(self, base: Optional[str], head: str) -> Optional[List[str]]:
+        """Get the commits reachable from head but not from base, oldest first
+
+        As ``git rev-list base..head`` in topological order (parents first).
+        Without base, the whole history of head.
+        """
+        head_position = self.position(head)
+        base_position = self.position(base) if base is not None else None
+        if head_position is None or (base is not None and base_position is None):
+            return None
+
+        excluded = b""
+        if base_position is not None:
+            bitmap = self.reachable(base_position)
+            excluded = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, "little")
+
+        def is_excluded(position: int) -> bool:
+            index = position >> 3
+            return index < len(excluded) and bool(excluded[index] >> (position & 7) & 1)
+
+        positions = []
+        if not is_excluded(head_position):
+            stack = [head_position]
+            seen = {head_position}
+            while stack:
+                position = stack.pop()
+                positions.append(position)
+                for parent in self.parents(position):
+                    if parent not in seen and not is_excluded(parent):
+                        seen.add(parent)
+                        stack.append(parent)
+
+        positions.sort(key=lambda position: (self.generation(position), position))
+        return [self.sha(position) for position in positions]
+
+    # Bitmaps
+
+    def _reaches(self, position: int, ancestor: int) -> bool:
+        """Check whether a commit reaches another (or is the same)"""
+        if position == ancestor:
+            return True
+        if self.generation(ancestor) >= self.generation(position):
+            return False
+        return bool(self.reachable(position) >> ancestor & 1)
+
+    def reachable(self, position: int) -> int:
+        """Get the bitmap of the commits reachable from a commit (itself included)"""
+        bitmap = self._bitmaps.get(position)
+        if bitmap is not None:
+            return bitmap
+
+        # Build the missing checkpoints below first, oldest first, so that
+        # each walk stops at the checkpoints under it
+        for checkpoint in sorted(
+            self._missing_checkpoints(position), key=self.generation
+        ):
+            self._walk_bitmap(checkpoint)
+
+        return self._walk_bitmap(position)
+
+    def _is_checkpoint(self, position: int) -> bool:
+        return self.generation(position) % BITMAP_INTERVAL == 0
+
+    def _missing_checkpoints(self, position: int) -> List[int]:
+        """Find the checkpoints without a bitmap under a commit"""
+        missing = []
+        stack = [position]
+        seen = {position}
+        while stack:
+            current = stack.pop()
+            if current != position and self._is_checkpoint(current):
+                if self._bitmaps.get(current) is not None:
+                    continue
+                missing.append(current)
+
+            for parent in self.parents(current):
+                if parent not in seen:
+                    seen.add(parent)
+                    stack.append(parent)
+
+        return missing
+
+    def _walk_bitmap(self, position: int) -> int:
+        """Build the bitmap of a commit from the checkpoint bitmaps under it"""
+        reached = []
+        bitmaps = []
+        stack = [position]
+        seen = {position}
+        while stack:
+            current = stack.pop()
+            if current != position:
+                bitmap = self._bitmaps.get(current)
+                if bitmap is not None:
+                    bitmaps.append(bitmap)
+                    continue
+
+            reached.append(current)
+            for parent in self.parents(current):
+                if parent not in seen:
+                    seen.add(parent)
+                    stack.append(parent)
+
+        bits = bytearray(max(reached) // 8 + 1)
+        for current in reached:
+            bits[current >> 3] |= 1 << (current & 7)
+        result = int.from_bytes(bits, "little")
+        for bitmap in bitmaps:
+            result |= bitmap
+
+        if self._is_checkpoint(position):
+            self._bitmaps.put(position, result, (result.bit_length() + 7) // 8)
+        return result
+
+
+class TableCommitDag(CommitDag):
+    """Commit DAG of commit records, numbered parents first
+
+    Parents that are not commit records (placeholder SHAs) are left out.
+    """
+
+    def __init__(self, commits: Iterable[Dict]):
+        super().__init__()
+        self._positions: Dict[str, int] = {}
+        self._shas: List[str] = []
+        self._parents: List[Tuple[int, ...]] = []
+        self._generations: List[int] = []
+
+        records = {
+            commit["sha"]: [parent["sha"] for parent in commit["parents"]]
+            for commit in commits
+        }
+        for sha in records:
+            stack = [sha]
+            while stack:
+                current = stack[-1]
+                if current in self._positions:
+                    stack.pop()
+                    continue
+
+                pending = [
+                    parent
+                    for parent in records[current]
+                    if parent in records and parent not in self._positions
+                ]
+                if pending:
+                    stack.extend(pending)
+                    continue
+
+                stack.pop()
+                self.add(current, records[current])
+
+    def add(self, sha: str, parents: List[str]) -> None:
+        """Add a commit whose parents were added before"""
+        if sha in self._positions:
+            return
+
+        parent_positions = tuple(
+            self._positions[parent] for parent in parents if parent in self._positions
+        )
+        self._positions[sha] = len(self._shas)
+        self._shas.append(sha)
+        self._parents.append(parent_positions)
+        self._generations.append(
+            1 + max((self._generations[p] for p in parent_positions), default=0)
+        )
+
+    def position(self, sha: str) -> Optional[int]:
+        return self._positions.get(sha)
+
+    def sha(self, position: int) -> str:
+        return self._shas[position]
+
+    def parents(self, position: int) -> Sequence[int]:
+        return self._parents[position]
+
+    def generation(self, position: int) -> int:
+        return self._generations[position]
+
+
+class DiskCommitDag(CommitDag):
+    """Commit DAG of a repository on disk
+
+    Commits in the commit-graph keep their graph position and generation.
+    Other commits are read on first use and numbered after them.
+    """
+
+    def __init__(self, repository: GitRepository):
+        super().__init__()
+        self._repository = repository
+        self._graph = repository.graph
+        self._base = self._graph.count if self._graph else 0
+        self._positions: Dict[str, int] = {}
+        self._shas: List[str] = []
+        self._parents: List[Tuple[int, ...]] = []
+        self._generations: List[int] = []
+        self._missing: set = set()
+
+    def position(self, sha: str) -> Optional[int]:
+        position = self._known(sha)
+        if position is None and sha not in self._missing:
+            position = self._add(sha)
+        return position
+
+    def sha(self, position: int) -> str:
+        if self._graph is not None and position < self._base:
+            return self._graph.sha(position)
+        return self._shas[position - self._base]
+
+    def parents(self, position: int) -> Sequence[int]:
+        if self._graph is not None and position < self._base:
+            return self._graph.commit(position)[1]
+        return self._parents[position - self._base]
+
+    def generation(self, position: int) -> int:
+        if self._graph is not None and position < self._base:
+            return self._graph.commit(position)[2]
+        return self._generations[position - self._base]
+
+    def _known(self, sha: str) -> Optional[int]:
+        """Get the position of a commit already numbered"""
+        position = self._graph.position(sha) if self._graph else None
+        return position if position is not None else self._positions.get(sha)
+
+    def _add(self, sha: str) -> Optional[int]:
+        """Number a commit outside the commit-graph and its new ancestors"""
+        stack = [sha]
+        while stack:
+            current = stack[-1]
+            info = self._repository.parents(current)
+            if info is None:
+                # Not a commit (yet), or a missing parent (shallow repository):
+                # only missing parents are remembered, pushes may add the others
+                stack.pop()
+                if current != sha:
+                    self._missing.add(current)
+                continue
+
+            pending = [
+                parent
+                for parent in info[1]
+                if self._known(parent) is None and parent not in self._missing
+            ]
+            if pending:
+                stack.extend(pending)
+                continue
+
+            stack.pop()
+            if current in self._positions:
+                continue
+            parent_positions = tuple(
+                position
+                for position in (self._known(parent) for parent in info[1])
+                if position is not None
+            )
+            self._positions[current] = self._base + len(self._shas)
+            self._shas.append(current)
+            self._parents.append(parent_positions)
+            self._generations.append(
+                1 + max((self.generation(p) for p in parent_positions), default=0)
+            )
+
+        return self._positions.get(sha)
@@ -0,0 +1,162 @@
+"""Commit log index
+
+Keeps the commits of one repository in structures that answer the commit
+list filters without copying or scanning the repository:
+
+- ``(date, sha)`` pairs sorted by author date. ``since``/``until`` are a
+  bisect on this list and a page is a slice taken from its end.
+- the same sorted pairs per file path (inverted index of ``files``) and per
+  author (commit email and user login).
+- every SHA in one sorted list. All SHAs starting with a prefix form one
+  contiguous run of that list, found with a bisect.
+
+A query walks the smallest matching list newest first, checks the remaining
+filters per commit and stops after the requested page.
+"""
+
+import bisect
+from datetime import datetime
+from itertools import islice
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+
+
+class CommitEntry(NamedTuple):
+    """Indexed fields of a commit"""
+
+    sha: str
+    date: datetime
+    authors: FrozenSet[str]
+    paths: FrozenSet[str]
+
+    @classmethod
+    def from_commit(cls, commit: Dict) -> "CommitEntry":
+        authors = {commit["commit"]["author"]["email"]}
+        if commit.get("author"):
+            authors.add(commit["author"]["login"])
+
+        return cls(
+            sha=commit["sha"],
+            date=commit["commit"]["author"]["date"],
+            authors=frozenset(authors),
+            paths=frozenset(f["filename"] for f in commit.get("files") or []),
+        )
+
+    @property
+    def key(self) -> Tuple[datetime, str]:
+        return (self.date, self.sha)
+
+
+class CommitIndex:
+    """Commit SHAs of a repository indexed by the commit list filters"""
+
+    def __init__(self, commits: Iterable[Dict]):
+        self._entries: Dict[str, CommitEntry] = {}
+        self._dates: List[Tuple[datetime, str]] = []
+        self._paths: Dict[str, List[Tuple[datetime, str]]] = {}
+        self._authors: Dict[str, List[Tuple[datetime, str]]] = {}
+        self._shas: List[str] = []
+
+        # Append everything first and sort the lists once
+        for commit in commits:
+            entry = CommitEntry.from_commit(commit)
+            self._entries[entry.sha] = entry
+            self._dates.append(entry.key)
+            self._shas.append(entry.sha)
+            for path in entry.paths:
+                self._paths.setdefault(path, []).append(entry.key)
+            for author in entry.authors:
+                self._authors.setdefault(author, []).append(entry.key)
+
+        self._dates.sort()
+        self._shas.sort()
+        for keys in self._paths.values():
+            keys.sort()
+        for keys in self._authors.values():
+            keys.sort()
+
+    def add(self, commit: Dict) -> None:
+        """Add a new commit"""
+        entry = CommitEntry.from_commit(commit)
+        if entry.sha in self._entries:
+            return
+
+        self._entries[entry.sha] = entry
+        bisect.insort(self._dates, entry.key)
+        bisect.insort(self._shas, entry.sha)
+        for path in entry.paths:
+            bisect.insort(self._paths.setdefault(path, []), entry.key)
+        for author in entry.authors:
+            bisect.insort(self._authors.setdefault(author, []), entry.key)
+
+    def find_prefix(self, prefix: str, limit: Optional[int] = None) -> List[str]:
+        """Get every SHA starting with a prefix (at most limit SHAs)"""
+        shas = []
+        position = bisect.bisect_left(self._shas, prefix)
+        while position < len(self._shas) and self._shas[position].startswith(prefix):
+            if len(shas) == limit:
+                break
+            shas.append(self._shas[position])
+            position += 1
+
+        return shas
+
+    def query(
+        self,
+        sha: Optional[str] = None,
+        path: Optional[str] = None,
+        author: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        page: int = 1,
+        per_page: int = 30,
+    ) -> List[str]:
+        """Get one page of commit SHAs matching every filter, newest first"""
+        candidates = [self._dates]
+        if sha:
+            candidates.append(
+                sorted(self._entries[s].key for s in self.find_prefix(sha))
+            )
+        if path:
+            candidates.append(self._paths.get(path, []))
+        if author:
+            candidates.append(self._authors.get(author, []))
+
+        # Walk the smallest list between the date bounds
+        keys = min(candidates, key=len)
+        low = 0 if since is None else bisect.bisect_left(keys, since, key=_date)
+        high = (
+            len(keys) if until is None else bisect.bisect_right(keys, until, key=_date)
+        )
+        start = (page - 1) * per_page
+
+        # Only the date index was selected: the page is a plain slice
+        if keys is self._dates and not (sha or path or author):
+            end = max(high - start, low)
+            return [s for _, s in reversed(keys[max(end - per_page, low) : end])]
+
+        shas = (
+            s
+            for _, s in (keys[i] for i in range(high - 1, low - 1, -1))
+            if self._matches(s, sha, path, author)
+        )
+        return list(islice(shas, start, start + per_page))
+
+    def _matches(
+        self,
+        sha: str,
+        prefix: Optional[str],
+        path: Optional[str],
+        author: Optional[str],
+    ) -> bool:
+        """Check the SHA, path and author filters for a commit"""
+        entry = self._entries[sha]
+        if prefix and not sha.startswith(prefix):
+            return False
+        if path and path not in entry.paths:
+            return False
+        return not author or author in entry.authors
+
+
+def _date(key: Tuple[datetime, str]) -> datetime:
+    """Get the date of a (date, sha) pair"""
+    return key[0]
@@ -1,6 +1,18 @@
 from datetime import datetime
-from typing import Dict, List, Optional
-
+from itertools import islice
+from typing import Dict, List, Optional, Tuple
+
+from data.commit_columns import CommitColumns
+from data.commit_dag import CommitDag, DiskCommitDag, TableCommitDag
+from data.commit_index import CommitIndex
+from data.diff import ReadBlob, get_patch
+from data.events import RepositoryChange, record, subscribe
+from data.git_repository import Commit, GitRepository, get_disk_repository
+from data.indexes import RepoIndexCache
+from data.ref_table import RefTable
+from data.sequences import next_id
+from data.status_summary import StatusSummary
+from data.storage import backend
 from data.users import USERS
 
 # Repository commit data
@@ -173,6 +185,91 @@ COMMIT_STATUSES = {
     }
 }
 
+# Load the fixture data into the storage backend
+REPOSITORY_COMMITS = backend.repo_table("repository_commits", REPOSITORY_COMMITS)
+COMMIT_STATUSES = backend.repo_table("commit_statuses", COMMIT_STATUSES)
+
+# Commit SHAs per repository, indexed by the commit list filters
+COMMIT_INDEXES = RepoIndexCache(
+    lambda repo_key: CommitIndex(REPOSITORY_COMMITS[repo_key].values())
+)
+
+
+def _build_ref_table(repo_key: str) -> RefTable:
+    """Build the ref table of a repository"""
+    from data.branches import REPOSITORY_BRANCHES
+    from data.git_refs import REPOSITORY_REFS
+    from data.repositories import REPOSITORY_TAGS
+
+    commits = REPOSITORY_COMMITS[repo_key] if repo_key in REPOSITORY_COMMITS else {}
+    branches = REPOSITORY_BRANCHES[repo_key] if repo_key in REPOSITORY_BRANCHES else {}
+    refs = REPOSITORY_REFS[repo_key] if repo_key in REPOSITORY_REFS else {}
+    return RefTable(
+        commits.keys(),
+        ((name, branch["commit"]["sha"]) for name, branch in branches.items()),
+        (
+            (tag["name"], tag["commit"]["sha"])
+            for tag in REPOSITORY_TAGS.get(repo_key, [])
+        ),
+        ((ref, reference["object"]["sha"]) for ref, reference in refs.items()),
+    )
+
+
+HEX_DIGITS = set("0123456789abcdef")
+
+# Maximum number of files of a commit read from disk, as in the GitHub API
+COMMIT_FILE_LIMIT = 300
+
+# Names (SHAs, branches, tags, refs) resolving to commits per repository
+REF_TABLES = RepoIndexCache(_build_ref_table)
+
+# Status summaries per repository, built per commit on first use
+# Format: {repo_key: {sha: StatusSummary}}
+STATUS_SUMMARIES = RepoIndexCache(lambda repo_key: {})
+
+
+def _get_status_summary(repo_key: str, sha: str) -> StatusSummary:
+    """Get the status summary of a commit"""
+    summaries = STATUS_SUMMARIES.get(repo_key)
+    if sha not in summaries:
+        statuses = []
+        if repo_key in COMMIT_STATUSES and sha in COMMIT_STATUSES[repo_key]:
+            statuses = COMMIT_STATUSES[repo_key][sha]
+        summaries[sha] = StatusSummary(statuses)
+
+    return summaries[sha]
+
+
+def _set_status_summary(
+    repo_key: str, sha: str, context: str, position: int, state: str
+) -> None:
+    """Record a status in the summary of its commit once the transaction is kept"""
+
+    def change(summaries: Dict[str, StatusSummary]) -> None:
+        summary = summaries.get(sha)
+        if summary is not None:
+            summary.set(context, position, state)
+
+    STATUS_SUMMARIES.update(repo_key, change)
+
+
+# Commit metadata per repository in columns, for statistics
+COMMIT_COLUMNS = RepoIndexCache(
+    lambda repo_key: CommitColumns(
+        with_file_patches(repo_key, commit)
+        for commit in REPOSITORY_COMMITS[repo_key].values()
+    )
+)
+
+# Commit DAGs per repository, for ancestry queries
+COMMIT_DAGS = RepoIndexCache(
+    lambda repo_key: TableCommitDag(REPOSITORY_COMMITS[repo_key].values())
+)
+
+# Commit DAGs of the repositories on disk, with the repository they read,
+# by repository key
+_DISK_DAGS: Dict[str, Tuple[GitRepository, DiskCommitDag]] = {}
+
 
 def get_repository_commits(
     owner: str,
@@ -185,73 +282,444 @@ def get_repository_commits(
     page: int = 1,
     per_page: int = 30,
 ) -> Optional[List[Dict]]:
-    """Get list of commits for a repository"""
+    """Get list of commits for a repository
+
+    For repositories on disk, ``sha`` is the ref or commit the history
+    starts from (default: HEAD), as in the GitHub API.
+    """
+    repo_key = f"{owner}/{repo_name}"
+    if (
+        repo_key not in REPOSITORY_COMMITS
+        and get_disk_repository(owner, repo_name) is None
+    ):
+        return None
+
+    # Commit dates are stored as naive local times
+    if since is not None and since.tzinfo is not None:
+        since = since.astimezone().replace(tzinfo=None)
+    if until is not None and until.tzinfo is not None:
+        until = until.astimezone().replace(tzinfo=None)
+
+    disk = get_disk_repository(owner, repo_name)
+    if disk is not None:
+        return _get_disk_commits(
+            disk, repo_key, sha, path, author, since, until, page, per_page
+        )
+
+    # Page through the index (by date, descending)
+    shas = COMMIT_INDEXES.get(repo_key).query(
+        sha, path, author, since, until, page, per_page
+    )
+
+    repo_commits = REPOSITORY_COMMITS[repo_key]
+    return [repo_commits[commit_sha] for commit_sha in shas]
+
+
+def get_contributor_stats(
+    owner: str,
+    repo_name: str,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> Optional[List[Dict]]:
+    """Get weekly commit statistics per contributor"""
     repo_key = f"{owner}/{repo_name}"
     if repo_key not in REPOSITORY_COMMITS:
         return None
 
-    commits = list(REPOSITORY_COMMITS[repo_key].values())
+    return COMMIT_COLUMNS.get(repo_key).contributor_stats(since, until)
 
-    # Filtering
-    if sha:
-        commits = [c for c in commits if c["sha"].startswith(sha)]
 
-    if path:
-        commits = [c for c in commits if any(f["filename"] == path for f in c["files"])]
+def get_commit(owner: str, repo_name: str, sha: str) -> Optional[Dict]:
+    """Get specific commit information"""
+    repo_key = f"{owner}/{repo_name}"
+    disk = get_disk_repository(owner, repo_name)
+    if disk is not None:
+        commit = disk.commit(disk.resolve(sha) or sha)
+        if commit is None:
+            return None
+        return _format_disk_commit(disk, repo_key, commit, _users_by_email(), True)
 
-    if author:
-        commits = [
-            c
-            for c in commits
-            if c["commit"]["author"]["email"] == author
-            or (c["author"] and c["author"]["login"] == author)
-        ]
+    if repo_key not in REPOSITORY_COMMITS or sha not in REPOSITORY_COMMITS[repo_key]:
+        return None
 
-    if since:
-        commits = [c for c in commits if c["commit"]["author"]["date"] >= since]
+    return with_file_patches(repo_key, REPOSITORY_COMMITS[repo_key][sha])
 
-    if until:
-        commits = [c for c in commits if c["commit"]["author"]["date"] <= until]
 
-    # Sort (by date, descending)
-    commits.sort(key=lambda c: c["commit"]["author"]["date"], reverse=True)
+def get_commits_by_sha(owner: str, repo_name: str, shas: List[str]) -> List[Dict]:
+    """Get the commit records of commits, in order (unknown SHAs are skipped)
 
-    # Pagination
-    start = (page - 1) * per_page
-    end = start + per_page
+    Commits on disk are read without their files.
+    """
+    repo_key = f"{owner}/{repo_name}"
+    disk = get_disk_repository(owner, repo_name)
+    if disk is not None:
+        users = _users_by_email()
+        commits = (disk.commit(sha) for sha in shas)
+        return [
+            _format_disk_commit(disk, repo_key, commit, users)
+            for commit in commits
+            if commit is not None
+        ]
 
-    return commits[start:end]
+    repo_commits = (
+        REPOSITORY_COMMITS[repo_key] if repo_key in REPOSITORY_COMMITS else {}
+    )
+    return [repo_commits[sha] for sha in shas if sha in repo_commits]
 
 
-def get_commit(owner: str, repo_name: str, sha: str) -> Optional[Dict]:
-    """Get specific commit information"""
+def get_commit_dag(owner: str, repo_name: str) -> Optional[CommitDag]:
+    """Get the commit DAG of a repository, for ancestry queries"""
     repo_key = f"{owner}/{repo_name}"
-    if repo_key not in REPOSITORY_COMMITS or sha not in REPOSITORY_COMMITS[repo_key]:
+    disk = get_disk_repository(owner, repo_name)
+    if disk is not None:
+        # A repository opened again (moved or recreated) gets a new DAG
+        cached = _DISK_DAGS.get(repo_key)
+        if cached is None or cached[0] is not disk:
+            cached = _DISK_DAGS[repo_key] = (disk, DiskCommitDag(disk))
+        return cached[1]
+
+    if repo_key not in REPOSITORY_COMMITS:
         return None
+    return COMMIT_DAGS.get(repo_key)
+
+
+def _get_disk_commits(
+    disk: GitRepository,
+    repo_key: str,
+    sha: Optional[str],
+    path: Optional[str],
+    author: Optional[str],
+    since: Optional[datetime],
+    until: Optional[datetime],
+    page: int,
+    per_page: int,
+) -> Optional[List[Dict]]:
+    """Get one page of the history of a repository on disk, newest first
+
+    The history is walked lazily and stops after the requested page, or at
+    the first commit older than ``since`` (as ``git log --since`` does).
+    """
+    start = disk.resolve(sha or "HEAD")
+    if start is None:
+        return [] if sha is None else None  # Empty repository
+
+    users = _users_by_email()
+    path = path.strip("/") if path else None
+    skip = (page - 1) * per_page
+    commits = []
+    for commit_sha in disk.walk([start]):
+        # The path filter only needs the commit-graph
+        if path:
+            info = disk.parents(commit_sha)
+            if info is None or not disk.touches(commit_sha, info[1], path):
+                continue
+
+        # Without date or author filters, skipped commits are not parsed
+        if skip and since is None and until is None and not author:
+            skip -= 1
+            continue
+
+        commit = disk.commit(commit_sha)
+        if commit is None:
+            continue
+        if since is not None and commit.author["date"] < since:
+            if commit.committer["date"] < since:
+                break
+            continue
+        if until is not None and commit.author["date"] > until:
+            continue
+        if author and not _is_disk_author(commit, author, users):
+            continue
+
+        if skip:
+            skip -= 1
+            continue
+        commits.append(_format_disk_commit(disk, repo_key, commit, users))
+        if len(commits) == per_page:
+            break
+
+    return commits
+
+
+def _format_disk_commit(
+    disk: GitRepository,
+    repo_key: str,
+    commit: Commit,
+    users: Dict[str, Dict],
+    include_files: bool = False,
+) -> Dict:
+    """Build the commit record of a commit on disk
+
+    Files are compared with the first parent, and limited to
+    ``COMMIT_FILE_LIMIT`` as in the GitHub API.
+    """
+    files = []
+    if include_files:
+        parent_root = disk.root_tree(commit.parents[0]) if commit.parents else None
+        changes = disk.trees.diff(parent_root, commit.tree)
+        for path, status, old_blob, blob in islice(changes, COMMIT_FILE_LIMIT):
+            files.append(
+                format_commit_file(
+                    repo_key,
+                    commit.sha,
+                    path,
+                    status,
+                    old_blob,
+                    blob,
+                    disk.get,
+                )
+            )
 
-    return REPOSITORY_COMMITS[repo_key][sha]
+    record = format_commit(
+        repo_key,
+        commit.sha,
+        commit.tree,
+        commit.parents,
+        commit.author,
+        commit.committer,
+        commit.message,
+        users.get(commit.author["email"]) or _git_user(commit.author),
+        files,
+    )
+    record["committer"] = users.get(commit.committer["email"]) or _git_user(
+        commit.committer
+    )
+    return record
+
+
+def _users_by_email() -> Dict[str, Dict]:
+    """Get the users by email, to link git identities to users"""
+    return {user["email"]: user for user in USERS.values()}
+
+
+def _git_user(person: Dict) -> Dict:
+    """Build a user for a git identity without a matching user"""
+    login = person["email"].split("@")[0] or person["name"]
+    return {
+        "login": login,
+        "id": 0,
+        "name": person["name"],
+        "email": person["email"],
+        "type": "User",
+        "site_admin": False,
+        "created_at": person["date"],
+        "url": f"/api/v3/users/{login}",
+        "html_url": f"/{login}",
+        "avatar_url": f"/{login}/avatar",
+    }
+
+
+def _is_disk_author(commit: Commit, author: str, users: Dict[str, Dict]) -> bool:
+    """Check the author filter (login, email or name) for a commit on disk"""
+    email = commit.author["email"]
+    user = users.get(email)
+    return author in (email, commit.author["name"]) or (
+        user is not None and user["login"] == author
+    )
+
+
+def add_commit(owner: str, repo_name: str, commit: Dict) -> None:
+    """Store a new commit (indexed when the transaction ends)"""
+    repo_key = f"{owner}/{repo_name}"
+    with backend.transaction():
+        if repo_key not in REPOSITORY_COMMITS:
+            REPOSITORY_COMMITS[repo_key] = {}
+
+        REPOSITORY_COMMITS[repo_key][commit["sha"]] = commit
+        record(repo_key).add_commit(commit)
+
+
+@subscribe
+def _update_commit_indexes(change: RepositoryChange) -> None:
+    """Add the new commits, refs and branches to the indexes already built"""
+    repo_key = change.repo_key
+    if change.commits:
+        COMMIT_COLUMNS.discard(repo_key)
+
+    commit_index = COMMIT_INDEXES.peek(repo_key)
+    if commit_index is not None:
+        for commit in change.commits:
+            commit_index.add(commit)
+
+    commit_dag = COMMIT_DAGS.peek(repo_key)
+    if commit_dag is not None:
+        for commit in change.commits:
+            commit_dag.add(
+                commit["sha"], [parent["sha"] for parent in commit["parents"]]
+            )
+
+    ref_table = REF_TABLES.peek(repo_key)
+    if ref_table is None:
+        return
+
+    for commit in change.commits:
+        ref_table.add_commit(commit["sha"])
+    for ref, (_, sha) in change.refs.items():
+        if sha is None:
+            ref_table.delete_ref(ref)
+        else:
+            ref_table.set_ref(ref, sha)
+    for branch_name, (_, sha) in change.branches.items():
+        if sha is None:
+            ref_table.delete_branch(branch_name)
+        else:
+            ref_table.set_branch(branch_name, sha)
+
+
+def format_commit(
+    repo_key: str,
+    sha: str,
+    root: str,
+    parents: List[str],
+    author: Dict,
+    committer: Dict,
+    message: str,
+    user: Optional[Dict],
+    files: Optional[List[Dict]] = None,
+) -> Dict:
+    """Build a commit record in the format of REPOSITORY_COMMITS"""
+    files = files or []
+    additions = sum(commit_file["additions"] for commit_file in files)
+    deletions = sum(commit_file["deletions"] for commit_file in files)
+    return {
+        "url": f"/api/v3/repos/{repo_key}/commits/{sha}",
+        "sha": sha,
+        "html_url": f"/{repo_key}/commit/{sha}",
+        "comment_url": f"/api/v3/repos/{repo_key}/commits/{sha}/comments",
+        "commit": {
+            "url": f"/api/v3/repos/{repo_key}/git/commits/{sha}",
+            "author": author,
+            "committer": committer,
+            "message": message,
+            "comment_count": 0,
+            "tree": {"url": f"/api/v3/repos/{repo_key}/git/trees/{root}", "sha": root},
+        },
+        "author": user,
+        "committer": user,
+        "parents": [
+            {"url": f"/api/v3/repos/{repo_key}/git/commits/{parent}", "sha": parent}
+            for parent in parents
+        ],
+        "stats": {
+            "additions": additions,
+            "deletions": deletions,
+            "total": additions + deletions,
+        },
+        "files": files,
+    }
+
+
+def format_stored_commit(
+    repo_key: str,
+    sha: str,
+    root: str,
+    parents: List[str],
+    author: Dict,
+    committer: Dict,
+    message: str,
+    user: Optional[Dict],
+    changed_files: List[Tuple[str, str, Optional[str], Optional[str]]],
+) -> Dict:
+    """Build a commit record to store, with the changes of its files only
+
+    ``changed_files`` are (path, status, old blob, new blob) as produced by
+    ``TreeStore.diff``. The patches of the files and the stats of the commit
+    are computed on read (see ``with_file_patches``).
+    """
+    record = format_commit(
+        repo_key, sha, root, parents, author, committer, message, user
+    )
+    del record["stats"]
+    record["files"] = [
+        {"filename": path, "status": status, "old_blob": old_blob, "blob": blob}
+        for path, status, old_blob, blob in changed_files
+    ]
+    return record
+
+
+def with_file_patches(repo_key: str, commit: Dict) -> Dict:
+    """Get a commit record with the patches of its files and its stats
+
+    Records built by ``format_stored_commit`` get them from the patches
+    cached by blob pair (see ``data.diff``); other records have them already.
+    """
+    if "stats" in commit:
+        return commit
+
+    from data.contents import BLOBS
+
+    files = [
+        format_commit_file(
+            repo_key,
+            commit["sha"],
+            commit_file["filename"],
+            commit_file["status"],
+            commit_file["old_blob"],
+            commit_file["blob"],
+            BLOBS.get,
+        )
+        for commit_file in commit["files"]
+    ]
+    additions = sum(commit_file["additions"] for commit_file in files)
+    deletions = sum(commit_file["deletions"] for commit_file in files)
+    return {
+        **commit,
+        "stats": {
+            "additions": additions,
+            "deletions": deletions,
+            "total": additions + deletions,
+        },
+        "files": files,
+    }
+
+
+def format_commit_file(
+    repo_key: str,
+    sha: str,
+    path: str,
+    status: str,
+    old_blob: Optional[str],
+    blob: Optional[str],
+    read_blob: ReadBlob,
+) -> Dict:
+    """Build the file entry of a commit, with its patch
+
+    Patches are cached by blob pair (see ``data.diff``). Binary and large
+    files get no patch and no line counts.
+    """
+    patch = get_patch(old_blob, blob, read_blob)
+    return {
+        "filename": path,
+        "additions": patch.additions,
+        "deletions": patch.deletions,
+        "changes": patch.additions + patch.deletions,
+        "status": status,
+        "raw_url": f"/{repo_key}/raw/{sha}/{path}",
+        "blob_url": f"/{repo_key}/blob/{sha}/{path}",
+        "patch": patch.patch,
+    }
 
 
 def get_branches_for_head_commit(
     owner: str, repo_name: str, sha: str
 ) -> Optional[List[Dict]]:
     """Get branches where specific commit is HEAD"""
-    from data.branches import REPOSITORY_BRANCHES
+    from data.branches import REPOSITORY_BRANCHES, get_branch_names_for_head
 
     repo_key = f"{owner}/{repo_name}"
     if repo_key not in REPOSITORY_BRANCHES:
         return None
 
     branches = []
-    for branch_name, branch_data in REPOSITORY_BRANCHES[repo_key].items():
-        if branch_data["commit"]["sha"] == sha:
-            branches.append(
-                {
-                    "name": branch_name,
-                    "commit": branch_data["commit"],
-                    "protected": branch_data["protection"]["enabled"],
-                }
-            )
+    for branch_name in get_branch_names_for_head(owner, repo_name, sha):
+        branch_data = REPOSITORY_BRANCHES[repo_key][branch_name]
+        branches.append(
+            {
+                "name": branch_name,
+                "commit": branch_data["commit"],
+                "protected": branch_data["protection"]["enabled"],
+            }
+        )
 
     return branches
 
@@ -285,22 +753,12 @@ def get_combined_status(owner: str, repo_name: str, ref: str) -> Optional[Dict]:
         return None
 
     statuses = get_commit_statuses(owner, repo_name, sha) or []
-
-    # Calculate combined status
-    state = "success"
-    if not statuses:
-        state = "pending"
-    elif any(s["state"] == "failure" for s in statuses):
-        state = "failure"
-    elif any(s["state"] == "error" for s in statuses):
-        state = "error"
-    elif any(s["state"] == "pending" for s in statuses):
-        state = "pending"
+    summary = _get_status_summary(repo_key, sha)
 
     return {
-        "state": state,
+        "state": summary.state,
         "sha": sha,
-        "total_count": len(statuses),
+        "total_count": summary.total_count,
         "statuses": statuses,
         "repository": REPOSITORIES[repo_key],
         "url": f"/api/v3/repos/{owner}/{repo_name}/commits/{sha}/status",
@@ -317,78 +775,97 @@ def create_commit_status(
     if repo_key not in REPOSITORY_COMMITS or sha not in REPOSITORY_COMMITS[repo_key]:
         return None
 
-    # Prepare status data
-    if repo_key not in COMMIT_STATUSES:
-        COMMIT_STATUSES[repo_key] = {}
+    with backend.transaction():
+        # Prepare status data
+        if repo_key not in COMMIT_STATUSES:
+            COMMIT_STATUSES[repo_key] = {}
 
-    if sha not in COMMIT_STATUSES[repo_key]:
-        COMMIT_STATUSES[repo_key][sha] = []
+        if sha not in COMMIT_STATUSES[repo_key]:
+            COMMIT_STATUSES[repo_key][sha] = []
 
-    # Generate new status ID
-    status_id = 1
-    if COMMIT_STATUSES[repo_key][sha]:
-        status_id = max(s["id"] for s in COMMIT_STATUSES[repo_key][sha]) + 1
+        # New records, so that a failed transaction restores the old ones
+        statuses = list(COMMIT_STATUSES[repo_key][sha])
+        summary = _get_status_summary(repo_key, sha)
 
-    # Default value for context
-    context = status_data.get("context", "default")
+        # Default value for context
+        context = status_data.get("context") or "default"
 
-    # Update existing context or create new one
-    now = datetime.now()
-    existing_status = next(
-        (s for s in COMMIT_STATUSES[repo_key][sha] if s["context"] == context), None
-    )
+        # Update existing context or create new one
+        now = datetime.now()
+        position = summary.find(context)
 
-    if existing_status:
-        existing_status["state"] = status_data["state"]
-        existing_status["updated_at"] = now
-
-        if "target_url" in status_data:
-            existing_status["target_url"] = status_data["target_url"]
-
-        if "description" in status_data:
-            existing_status["description"] = status_data["description"]
-
-        return existing_status
-    else:
-        new_status = {
-            "created_at": now,
-            "updated_at": now,
-            "state": status_data["state"],
-            "target_url": status_data.get("target_url"),
-            "description": status_data.get("description"),
-            "id": status_id,
-            "context": context,
-            "creator": USERS[
-                "admin"
-            ],  # In actual implementation, use authenticated user
-            "url": f"/api/v3/repos/{owner}/{repo_name}/statuses/{sha}",
-        }
+        if position is not None:
+            existing_status = dict(statuses[position])
+            statuses[position] = existing_status
+            existing_status["state"] = status_data["state"]
+            existing_status["updated_at"] = now
 
-        COMMIT_STATUSES[repo_key][sha].append(new_status)
-        return new_status
+            if "target_url" in status_data:
+                existing_status["target_url"] = status_data["target_url"]
 
+            if "description" in status_data:
+                existing_status["description"] = status_data["description"]
 
-def resolve_ref_to_sha(owner: str, repo_name: str, ref: str) -> Optional[str]:
-    """Resolve reference (branch name, tag name, SHA) to SHA"""
-    repo_key = f"{owner}/{repo_name}"
-
-    # Return as-is if already SHA
-    if repo_key in REPOSITORY_COMMITS and ref in REPOSITORY_COMMITS[repo_key]:
-        return ref
-
-    # For branches
-    from data.branches import REPOSITORY_BRANCHES
+            COMMIT_STATUSES[repo_key][sha] = statuses
+            _set_status_summary(
+                repo_key, sha, context, position, existing_status["state"]
+            )
+            return existing_status
+        else:
+            new_status = {
+                "created_at": now,
+                "updated_at": now,
+                "state": status_data["state"],
+                "target_url": status_data.get("target_url"),
+                "description": status_data.get("description"),
+                "id": get_next_status_id(),
+                "context": context,
+                "creator": USERS[
+                    "admin"
+                ],  # In actual implementation, use authenticated user
+                "url": f"/api/v3/repos/{owner}/{repo_name}/statuses/{sha}",
+            }
 
-    if repo_key in REPOSITORY_BRANCHES and ref in REPOSITORY_BRANCHES[repo_key]:
-        return REPOSITORY_BRANCHES[repo_key][ref]["commit"]["sha"]
+            statuses.append(new_status)
+            COMMIT_STATUSES[repo_key][sha] = statuses
+            _set_status_summary(
+                repo_key, sha, context, len(statuses) - 1, new_status["state"]
+            )
+            return new_status
+
+
+def get_next_status_id() -> int:
+    """Generate next commit status ID"""
+    return next_id(
+        "commit_status_id",
+        lambda: max(
+            (
+                status["id"]
+                for repo_statuses in COMMIT_STATUSES.values()
+                for statuses in repo_statuses.values()
+                for status in statuses
+            ),
+            default=0,
+        ),
+    )
 
-    # For tags
-    from data.repositories import REPOSITORY_TAGS
 
-    if repo_key in REPOSITORY_TAGS:
-        for tag in REPOSITORY_TAGS[repo_key]:
-            if tag["name"] == ref:
-                return tag["commit"]["sha"]
+def resolve_ref_to_sha(owner: str, repo_name: str, ref: str) -> Optional[str]:
+    """Resolve reference (branch name, tag name, SHA) to SHA"""
+    repo_key = f"{owner}/{repo_name}"
+    disk = get_disk_repository(owner, repo_name)
+    if disk is not None:
+        return disk.resolve(ref)
+
+    sha = REF_TABLES.get(repo_key).resolve(ref)
+    if sha is not None:
+        return sha
+
+    # Abbreviated SHAs of other lengths: unique prefix of a commit SHA
+    if len(ref) >= 4 and set(ref) <= HEX_DIGITS and repo_key in REPOSITORY_COMMITS:
+        matches = COMMIT_INDEXES.get(repo_key).find_prefix(ref, limit=2)
+        if len(matches) == 1:
+            return matches[0]
 
     # Return None if not found
     return None
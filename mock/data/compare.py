@@ -0,0 +1,142 @@
+"""Commit comparisons
+
+Compares two commits of a repository as the GitHub compare API does: how
+far head is ahead of and behind base, the commits of head that base does not
+have and the files changed since their merge base. Ancestry comes from the
+commit DAG of the repository (see ``data.commit_dag``), patches from the
+blob pair cache (see ``data.diff``).
+"""
+
+from typing import Dict, Iterator, List, Optional
+
+from data.commits import (
+    get_commit_dag,
+    get_commits_by_sha,
+    resolve_ref_to_sha,
+)
+from data.contents import diff_commits, iter_diff
+
+# Maximum number of commits listed by a comparison, as in the GitHub API
+COMPARE_COMMIT_LIMIT = 250
+
+
+def compare_commits(
+    owner: str,
+    repo_name: str,
+    base: str,
+    head: str,
+    page: int = 1,
+    per_page: int = COMPARE_COMMIT_LIMIT,
+) -> Optional[Dict]:
+    """Compare two refs or commits of a repository
+
+    ``commits`` lists the commits of head that base does not have, oldest
+    first, one page at a time. None when the repository or either commit
+    does not exist.
+    """
+    commit_dag = get_commit_dag(owner, repo_name)
+    if commit_dag is None:
+        return None
+
+    base_sha = resolve_ref_to_sha(owner, repo_name, base)
+    head_sha = resolve_ref_to_sha(owner, repo_name, head)
+    if base_sha is None or head_sha is None:
+        return None
+
+    counts = commit_dag.ahead_behind(base_sha, head_sha)
+    merge_bases = commit_dag.merge_bases(base_sha, head_sha)
+    commits = commit_dag.range(base_sha, head_sha)
+    if counts is None or merge_bases is None or commits is None:
+        return None
+
+    ahead_by, behind_by = counts
+    if ahead_by and behind_by:
+        status = "diverged"
+    elif ahead_by:
+        status = "ahead"
+    elif behind_by:
+        status = "behind"
+    else:
+        status = "identical"
+
+    # Unrelated histories have no merge base: every file of head is new
+    merge_base = merge_bases[0] if merge_bases else None
+    start = (page - 1) * per_page
+    base_commit = get_commits_by_sha(owner, repo_name, [base_sha])[0]
+    merge_base_commit = (
+        get_commits_by_sha(owner, repo_name, [merge_base])[0] if merge_base else None
+    )
+
+    repo_key = f"{owner}/{repo_name}"
+    return {
+        "url": f"/api/v3/repos/{repo_key}/compare/{base}...{head}",
+        "html_url": f"/{repo_key}/compare/{base}...{head}",
+        "status": status,
+        "ahead_by": ahead_by,
+        "behind_by": behind_by,
+        "total_commits": len(commits),
+        "base_commit": base_commit,
+        "merge_base_commit": merge_base_commit,
+        "commits": get_commits_by_sha(
+            owner, repo_name, commits[start : start + per_page]
+        ),
+        "files": diff_commits(owner, repo_name, merge_base, head_sha) or [],
+    }
+
+
+def get_commit_range(
+    owner: str, repo_name: str, base: str, head: str, limit: int
+) -> Optional[List[Dict]]:
+    """Get the commits of head that base does not have, oldest first
+
+    None when either commit is not in the repository.
+    """
+    commit_dag = get_commit_dag(owner, repo_name)
+    if commit_dag is None:
+        return None
+
+    commits = commit_dag.range(base, head)
+    if commits is None:
+        return None
+    return get_commits_by_sha(owner, repo_name, commits[:limit])
+
+
+def get_range_files(
+    owner: str, repo_name: str, base: str, head: str, start: int, limit: int
+) -> Optional[List[Dict]]:
+    """Get the files changed by the commits of head that base does not have
+
+    Files are compared from the merge base of the commits to head, from
+    ``start``, at most ``limit`` of them. Refs are resolved. None when either
+    commit is not in the repository.
+    """
+    merge_bases = _merge_bases(owner, repo_name, base, head)
+    if merge_bases is None:
+        return None
+    merge_base = merge_bases[0] if merge_bases else None
+    return diff_commits(owner, repo_name, merge_base, head, start, limit)
+
+
+def iter_range_diff(
+    owner: str, repo_name: str, base: str, head: str
+) -> Optional[Iterator[bytes]]:
+    """Iterate the git diff from the merge base of two commits to head, in chunks
+
+    None when either commit is not in the repository.
+    """
+    merge_bases = _merge_bases(owner, repo_name, base, head)
+    if merge_bases is None:
+        return None
+    return iter_diff(owner, repo_name, merge_bases[0] if merge_bases else None, head)
+
+
+def _merge_bases(
+    owner: str, repo_name: str, base: str, head: str
+) -> Optional[List[str]]:
+    """Get the merge bases of two refs or commits, or None when either is unknown"""
+    commit_dag = get_commit_dag(owner, repo_name)
+    base_sha = resolve_ref_to_sha(owner, repo_name, base)
+    head_sha = resolve_ref_to_sha(owner, repo_name, head)
+    if commit_dag is None or base_sha is None or head_sha is None:
+        return None
+    return commit_dag.merge_bases(base_sha, head_sha)
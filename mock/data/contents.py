@@ -1,96 +1,228 @@
 import base64
-import os
-from typing import Dict, List, Optional, Union
-
-# Repository content data (directory structure)
-# Format: {repo_key: {path: {type: "file"|"dir", name: str, path: str, sha: str, content: str}}}
-REPOSITORY_CONTENT_METADATA = {
+import binascii
+from datetime import datetime
+from functools import lru_cache
+from itertools import islice
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from data.blob_store import BASE64_CACHE_SIZE, Base64Cache, BlobStore, Buffer
+from data.branches import REPOSITORY_BRANCHES
+from data.commits import (
+    COMMIT_FILE_LIMIT,
+    REPOSITORY_COMMITS,
+    add_commit,
+    format_commit_file,
+    format_stored_commit,
+    get_commit_dag,
+    resolve_ref_to_sha,
+    with_file_patches,
+)
+from data.diff import ReadBlob, iter_patch
+from data.git_objects import commit_sha
+from data.git_refs import REPOSITORY_REFS, compare_and_swap_ref
+from data.git_repository import get_disk_repository
+from data.repositories import REPOSITORIES, REPOSITORY_TAGS
+from data.storage import backend
+from data.tree_merge import merge_trees
+from data.tree_store import EMPTY_TREE, TreeStore, blob_entry
+from data.users import USERS
+
+# Repository file contents of the default branch
+# The fixtures are loaded into the blob and tree stores below.
+# Format: {repo_key: {path: content}}
+REPOSITORY_FILES = {
     "admin/repo1": {
-        "": {
-            "type": "dir",
-            "name": "",
-            "path": "",
-            "sha": "abcdef1234567890abcdef1234567890abcdef12",
-            "contents": ["README.md", "file.txt"],
-        },
-        "README.md": {
-            "type": "file",
-            "name": "README.md",
-            "path": "README.md",
-            "sha": "1234567890abcdef1234567890abcdef12345678",
-            "content": "# Repository 1\n\nThis is a test repository.",
-        },
-        "file.txt": {
-            "type": "file",
-            "name": "file.txt",
-            "path": "file.txt",
-            "sha": "2345678901abcdef2345678901abcdef23456789",
-            "content": "This is a test file.",
-        },
-    },
-    "user1/repo2": {
-        "": {
-            "type": "dir",
-            "name": "",
-            "path": "",
-            "sha": "3456789012abcdef3456789012abcdef34567890",
-            "contents": ["README.md"],
-        },
-        "README.md": {
-            "type": "file",
-            "name": "README.md",
-            "path": "README.md",
-            "sha": "4567890123abcdef4567890123abcdef45678901",
-            "content": "# Repository 2\n\nThis is another test repository.",
-        },
+        "README.md": "# Repository 1\n\nThis is a test repository.",
+        "file.txt": "This is a test file.",
     },
+    "user1/repo2": {"README.md": "# Repository 2\n\nThis is another test repository."},
     "org1/repo3": {
-        "": {
-            "type": "dir",
-            "name": "",
-            "path": "",
-            "sha": "5678901234abcdef5678901234abcdef56789012",
-            "contents": ["README.md", "src"],
-        },
-        "README.md": {
-            "type": "file",
-            "name": "README.md",
-            "path": "README.md",
-            "sha": "6789012345abcdef6789012345abcdef67890123",
-            "content": "# Repository 3\n\nThis is an organization repository.",
-        },
-        "src": {
-            "type": "dir",
-            "name": "src",
-            "path": "src",
-            "sha": "7890123456abcdef7890123456abcdef78901234",
-            "contents": ["main.py"],
-        },
-        "src/main.py": {
-            "type": "file",
-            "name": "main.py",
-            "path": "src/main.py",
-            "sha": "8901234567abcdef8901234567abcdef89012345",
-            "content": "print('Hello, World!')",
-        },
+        "README.md": "# Repository 3\n\nThis is an organization repository.",
+        "src/main.py": "print('Hello, World!')",
     },
 }
 
 
+@lru_cache(maxsize=None)
+def _fixture_snapshots() -> Dict[str, Tuple[Dict, Dict, str]]:
+    """Build the trees and blobs of the fixture contents
+
+    Format: {repo_key: (trees, blobs, root_tree_sha)}
+    """
+    snapshots = {}
+    for repo_key, files in REPOSITORY_FILES.items():
+        trees: Dict[str, Dict] = {}
+        blobs: Dict[str, Optional[bytes]] = {}
+        changes = {}
+        for path, content in files.items():
+            data = content.encode("utf-8")
+            changes[path] = blob_entry(BlobStore(blobs).put(data), len(data))
+        root = TreeStore(trees).update(EMPTY_TREE, changes)
+        snapshots[repo_key] = (trees, blobs, root)
+
+    return snapshots
+
+
+def _fixture_commit_trees() -> Dict[str, Dict[str, str]]:
+    """Map the commits of the fixtures to the root tree of their repository
+
+    The fixtures hold one snapshot per repository, so every fixture commit,
+    branch, ref and tag points to that snapshot.
+    """
+    commit_trees = {}
+    for repo_key, (_, _, root) in _fixture_snapshots().items():
+        shas = set()
+        if repo_key in REPOSITORY_COMMITS:
+            shas.update(REPOSITORY_COMMITS[repo_key])
+        if repo_key in REPOSITORY_BRANCHES:
+            shas.update(
+                branch["commit"]["sha"]
+                for branch in REPOSITORY_BRANCHES[repo_key].values()
+            )
+        if repo_key in REPOSITORY_REFS:
+            shas.update(
+                reference["object"]["sha"]
+                for reference in REPOSITORY_REFS[repo_key].values()
+            )
+        shas.update(tag["commit"]["sha"] for tag in REPOSITORY_TAGS.get(repo_key, []))
+        commit_trees[repo_key] = dict.fromkeys(shas, root)
+
+    return commit_trees
+
+
+# Versioned repository contents: immutable trees keyed by their git SHA and
+# the root tree of every commit (see data.tree_store)
+# Format: {repo_key: {tree_sha: {name: {mode, type, sha}}}}
+GIT_TREES = backend.repo_table(
+    "git_trees",
+    lambda: {repo_key: s[0] for repo_key, s in _fixture_snapshots().items()},
+)
+# Format: {repo_key: {commit_sha: root_tree_sha}}
+COMMIT_TREES = backend.repo_table("commit_trees", _fixture_commit_trees)
+
+# File contents of every repository, stored once per distinct content
+# Format: {blob_sha: bytes, or None for the blobs in the blob directory}
+GIT_BLOBS = backend.table(
+    "blobs",
+    lambda: {
+        sha: content
+        for _, blobs, _ in _fixture_snapshots().values()
+        for sha, content in blobs.items()
+    },
+)
+BLOBS = BlobStore(GIT_BLOBS)
+BASE64_CACHE = Base64Cache(BLOBS, BASE64_CACHE_SIZE)
+
+# Size of the chunks of streamed diffs, in bytes
+DIFF_CHUNK_SIZE = 64 * 1024
+
+# Documentation of the file writes, for their error responses
+CONTENTS_DOCS = (
+    "https://docs.github.com/rest/repos/contents#create-or-update-file-contents"
+)
+
+# Documentation of the commits created from file changes
+COMMIT_DOCS = "https://docs.github.com/rest/git/commits#create-a-commit"
+
+
+class SnapshotView(Mapping):
+    """Read-only view of the default branch contents of every repository
+
+    ``view[repo_key][path]`` is read from the tree and blob stores on access;
+    nothing is copied. ``value`` builds the value of a path from the trees
+    and its tree entry, and directories are only listed when ``directories``
+    is set.
+    """
+
+    def __init__(self, value: Callable[[TreeStore, str, Dict], Any], directories: bool):
+        self._value = value
+        self._directories = directories
+
+    def __getitem__(self, repo_key: str) -> Mapping:
+        owner, _, repo_name = repo_key.partition("/")
+        root = get_root_tree(owner, repo_name, _default_branch(owner, repo_name))
+        if root is None:
+            raise KeyError(repo_key)
+        return _SnapshotFiles(TreeStore(GIT_TREES[repo_key]), root, self)
+
+    def __iter__(self) -> Iterator[str]:
+        return (repo_key for repo_key in COMMIT_TREES if repo_key in self)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+
+class _SnapshotFiles(Mapping):
+    """Paths of one snapshot, seen through a SnapshotView"""
+
+    def __init__(self, trees: TreeStore, root: str, view: SnapshotView):
+        self._trees = trees
+        self._root = root
+        self._view = view
+
+    def __getitem__(self, path: str) -> Any:
+        entry = self._trees.lookup(self._root, path)
+        if entry is None or (entry["type"] == "tree" and not self._view._directories):
+            raise KeyError(path)
+        return self._view._value(self._trees, path, entry)
+
+    def __iter__(self) -> Iterator[str]:
+        if self._view._directories:
+            yield ""
+        for path, entry in self._trees.walk(self._root):
+            if entry["type"] == "blob" or self._view._directories:
+                yield path
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+
+def _metadata(trees: TreeStore, path: str, entry: Dict) -> Dict:
+    """Build the metadata of a path (the former content metadata format)"""
+    item = _content_item(path, entry, include_content=entry["type"] == "blob")
+    if entry["type"] == "tree":
+        item["contents"] = sorted(trees.get(entry["sha"]) or {})
+    return item
+
+
+# Views of the default branch of each repository
+# Format: {repo_key: {path: {type: "file"|"dir", name: str, path: str, sha: str, content: str}}}
+REPOSITORY_CONTENT_METADATA = SnapshotView(_metadata, directories=True)
+# Format: {repo_key: {path: bytes}}
+REPOSITORY_CONTENTS = SnapshotView(
+    lambda trees, path, entry: BLOBS.get(entry["sha"]), directories=False
+)
+
+
 def get_repository_readme(
     owner: str, repo_name: str, ref: Optional[str] = None
 ) -> Optional[Dict]:
     """Get repository README"""
-    repo_key = f"{owner}/{repo_name}"
-    if repo_key not in REPOSITORY_CONTENT_METADATA:
+    ref = ref or _default_branch(owner, repo_name)
+    snapshot = get_snapshot(owner, repo_name, ref)
+    if snapshot is None:
         return None
 
     # Search for README file
     readme_candidates = ["README.md", "README", "readme.md", "readme"]
     for candidate in readme_candidates:
-        if candidate in REPOSITORY_CONTENT_METADATA[repo_key]:
-            file_data = REPOSITORY_CONTENT_METADATA[repo_key][candidate]
-            return format_file_response(owner, repo_name, file_data)
+        entry = snapshot.trees.lookup(snapshot.root, candidate)
+        if entry is not None and entry["type"] == "blob":
+            file_data = _content_item(candidate, entry)
+            return format_file_response(
+                owner, repo_name, file_data, ref, snapshot.base64
+            )
 
     return None
 
@@ -99,55 +231,54 @@ def get_contents(
     owner: str, repo_name: str, path: str = "", ref: Optional[str] = None
 ) -> Optional[Union[Dict, List[Dict]]]:
     """Get repository contents"""
-    repo_key = f"{owner}/{repo_name}"
-    if repo_key not in REPOSITORY_CONTENT_METADATA:
+    ref = ref or _default_branch(owner, repo_name)
+    snapshot = get_snapshot(owner, repo_name, ref)
+    if snapshot is None:
         return None
 
     # Path normalization
     path = path.strip("/")
-    if path == "":
-        # For root directory
-        root_dir = REPOSITORY_CONTENT_METADATA[repo_key][""]
-        contents = []
-        for item_name in root_dir["contents"]:
-            item_data = REPOSITORY_CONTENT_METADATA[repo_key][item_name]
-            contents.append(
-                format_content_response(
-                    owner, repo_name, item_data, include_content=False
-                )
-            )
-        return contents
-
-    # For specific path
-    if path not in REPOSITORY_CONTENT_METADATA[repo_key]:
+    trees = snapshot.trees
+    entry = trees.lookup(snapshot.root, path)
+    if entry is None:
         return None
 
-    item_data = REPOSITORY_CONTENT_METADATA[repo_key][path]
-
-    if item_data["type"] == "dir":
+    if entry["type"] == "tree":
         # For directory
         contents = []
-        for item_name in item_data["contents"]:
-            full_path = f"{path}/{item_name}" if path else item_name
-            if full_path in REPOSITORY_CONTENT_METADATA[repo_key]:
-                sub_item_data = REPOSITORY_CONTENT_METADATA[repo_key][full_path]
-                contents.append(
-                    format_content_response(
-                        owner, repo_name, sub_item_data, include_content=False
-                    )
+        for name, sub_entry in sorted((trees.get(entry["sha"]) or {}).items()):
+            full_path = f"{path}/{name}" if path else name
+            sub_item_data = _content_item(full_path, sub_entry)
+            contents.append(
+                format_content_response(
+                    owner,
+                    repo_name,
+                    sub_item_data,
+                    ref,
+                    include_content=False,
+                    base64_cache=snapshot.base64,
                 )
+            )
         return contents
     else:
         # For files
-        return format_file_response(owner, repo_name, item_data)
+        file_data = _content_item(path, entry)
+        return format_file_response(owner, repo_name, file_data, ref, snapshot.base64)
 
 
 def create_or_update_file(
-    owner: str, repo_name: str, path: str, file_data: Dict
-) -> Optional[Dict]:
-    """Create or update a file"""
+    owner: str,
+    repo_name: str,
+    path: str,
+    file_data: Dict,
+    username: Optional[str] = None,
+) -> Optional[Union[Dict, Tuple[int, Dict]]]:
+    """Create or update a file
+
+    Returns (422, error) when the path goes through a file or is a directory.
+    """
     repo_key = f"{owner}/{repo_name}"
-    if repo_key not in REPOSITORY_CONTENT_METADATA:
+    if repo_key not in REPOSITORIES:
         return None
 
     # Path normalization
@@ -155,181 +286,629 @@ def create_or_update_file(
     if not path:
         return None
 
-    # Check and create directory structure
-    dir_path = os.path.dirname(path)
-    if dir_path:
-        if dir_path not in REPOSITORY_CONTENT_METADATA[repo_key]:
-            # Create parent directory if it does not exist
-            parent_dir = os.path.dirname(dir_path) or ""
-            if parent_dir not in REPOSITORY_CONTENT_METADATA[repo_key]:
-                return None  # Fail if parent directory does not exist
-
-            REPOSITORY_CONTENT_METADATA[repo_key][dir_path] = {
-                "type": "dir",
-                "name": os.path.basename(dir_path),
-                "path": dir_path,
-                "sha": generate_sha(),
-                "contents": [],
-            }
-
-            # Add to parent directory contents
-            REPOSITORY_CONTENT_METADATA[repo_key][parent_dir]["contents"].append(
-                os.path.basename(dir_path)
-            )
-
     # Decode file content
     try:
-        content = base64.b64decode(file_data["content"]).decode("utf-8")
+        content = base64.b64decode(file_data["content"])
     except Exception:
         return None  # Fail if decode fails
 
-    # Check SHA for updates
-    is_update = path in REPOSITORY_CONTENT_METADATA[repo_key]
-    if is_update and "sha" in file_data:
-        if REPOSITORY_CONTENT_METADATA[repo_key][path]["sha"] != file_data["sha"]:
-            return None  # Fail if SHA does not match
-
-    # Generate new SHA
-    new_sha = generate_sha()
-
-    # Create or update file
-    if not is_update:
-        # Add to parent directory contents
-        parent_dir = dir_path or ""
-        if parent_dir not in REPOSITORY_CONTENT_METADATA[repo_key]:
-            parent_dir = ""  # Root directory
-
-        if (
-            os.path.basename(path)
-            not in REPOSITORY_CONTENT_METADATA[repo_key][parent_dir]["contents"]
-        ):
-            REPOSITORY_CONTENT_METADATA[repo_key][parent_dir]["contents"].append(
-                os.path.basename(path)
-            )
-
-    # Update file data
-    REPOSITORY_CONTENT_METADATA[repo_key][path] = {
-        "type": "file",
-        "name": os.path.basename(path),
-        "path": path,
-        "sha": new_sha,
-        "content": content,
-    }
+    # Check SHA for updates and commit under one transaction
+    branch = file_data.get("branch") or _default_branch(owner, repo_name)
+    with backend.transaction():
+        head = _branch_head(repo_key, branch)
+        root = get_root_tree(owner, repo_name, head) if head is not None else None
+        if root is not None:
+            trees = TreeStore(GIT_TREES[repo_key])
+            conflict = path_conflict(trees, root, path)
+            if conflict is not None:
+                return (422, {"message": conflict, "documentation_url": CONTENTS_DOCS})
+
+            existing = trees.lookup(root, path)
+            if existing is not None:
+                if "sha" in file_data and existing["sha"] != file_data["sha"]:
+                    return None  # Fail if SHA does not match
+
+        commit = commit_files(
+            owner,
+            repo_name,
+            branch,
+            {path: content},
+            file_data["message"],
+            author=file_data.get("author"),
+            committer=file_data.get("committer"),
+            username=username,
+        )
+    if commit is None:
+        return None
 
     # Create response
+    entry = TreeStore(GIT_TREES[repo_key]).lookup(
+        COMMIT_TREES[repo_key][commit["sha"]], path
+    )
+    if entry is None:
+        raise RuntimeError(f"{path} is missing from commit {commit['sha']}")
     file_response = format_file_response(
-        owner, repo_name, REPOSITORY_CONTENT_METADATA[repo_key][path]
+        owner,
+        repo_name,
+        _content_item(path, entry),
+        branch,
     )
 
     # Create commit information
-    commit = {
-        "sha": generate_sha(),
-        "url": f"/api/v3/repos/{owner}/{repo_name}/git/commits/{new_sha}",
-        "html_url": f"/{owner}/{repo_name}/commit/{new_sha}",
-        "author": {
-            "name": file_data.get("author", {}).get("name", "User"),
-            "email": file_data.get("author", {}).get("email", "user@example.com"),
-        },
-        "committer": {
-            "name": file_data.get("committer", {}).get("name", "User"),
-            "email": file_data.get("committer", {}).get("email", "user@example.com"),
-        },
-        "message": file_data["message"],
-        "tree": {
-            "sha": generate_sha(),
-            "url": f"/api/v3/repos/{owner}/{repo_name}/git/trees/{new_sha}",
-        },
-        "parents": [],
+    commit_response = {
+        "sha": commit["sha"],
+        "url": commit["commit"]["url"],
+        "html_url": commit["html_url"],
+        "author": commit["commit"]["author"],
+        "committer": commit["commit"]["committer"],
+        "message": commit["commit"]["message"],
+        "tree": commit["commit"]["tree"],
+        "parents": [
+            {**parent, "html_url": f"/{repo_key}/commit/{parent['sha']}"}
+            for parent in commit["parents"]
+        ],
     }
 
-    # Add parent commit for updates
-    if is_update:
-        commit["parents"] = [
-            {
-                "sha": REPOSITORY_CONTENT_METADATA[repo_key][path]["sha"],
-                "url": f"/api/v3/repos/{owner}/{repo_name}/git/commits/{REPOSITORY_CONTENT_METADATA[repo_key][path]['sha']}",
-                "html_url": f"/{owner}/{repo_name}/commit/{REPOSITORY_CONTENT_METADATA[repo_key][path]['sha']}",
-            }
-        ]
+    return {"content": file_response, "commit": commit_response}
 
-    return {"content": file_response, "commit": commit}
 
+def path_conflict(trees: TreeStore, root: str, path: str) -> Optional[str]:
+    """Tell why a file cannot be written at a path of a snapshot, if it cannot
 
-def get_raw_content(owner: str, repo_name: str, path: str) -> Optional[str]:
-    """Get raw file contents
+    Writing through a file as if it were a directory, or over a directory,
+    would silently replace it, so both are refused.
+    """
+    names = path.strip("/").split("/")
+    entry: Optional[Dict] = {"type": "tree", "sha": root}
+    for depth, name in enumerate(names):
+        if entry is None:
+            return None
+        if entry["type"] != "tree":
+            return f"Invalid path: {'/'.join(names[:depth])} is a file"
+        entry = (trees.get(entry["sha"]) or {}).get(name)
+
+    if entry is not None and entry["type"] != "blob":
+        return f"Invalid path: {path.strip('/')} is a directory"
+    return None
 
-    The path parameter should be in the format: {ref}/{file_path}
-    where ref is the branch/commit/tag and file_path is the path to the file.
-    For this mock implementation, we ignore the ref part and use the file_path.
+
+def create_commit(
+    owner: str, repo_name: str, commit_data: Dict, username: Optional[str] = None
+) -> Optional[Union[Dict, Tuple[int, Dict]]]:
+    """Create one commit from several file additions, updates and deletions
+
+    Every change is checked against the branch head (create: the path must
+    not exist, update and delete: the file must exist and match its sha when
+    given, and no file is written through a file or over a directory) and
+    the commit is written atomically, or not at all.
+    Returns None when the repository does not exist, (404, error) when the
+    branch does not, (409, error) when a sha does not match the branch, and
+    (422, error) for invalid changes.
     """
     repo_key = f"{owner}/{repo_name}"
-    if repo_key not in REPOSITORY_CONTENT_METADATA:
+    if repo_key not in REPOSITORIES:
         return None
 
-    # Parse path to extract ref and file_path
-    # Format: {ref}/{file_path}
-    path_parts = path.strip("/").split("/", 1)
-    if len(path_parts) < 2:
-        # If no ref is provided, treat the entire path as file_path
-        file_path = path.strip("/")
-    else:
-        # Extract ref and file_path
-        # ref = path_parts[0]  # Currently ignored in mock implementation
-        file_path = path_parts[1]
+    # Decode file contents
+    files: Dict[str, Optional[bytes]] = {}
+    try:
+        for change in commit_data["files"]:
+            path = change["path"].strip("/")
+            files[path] = (
+                None
+                if change["action"] == "delete"
+                else base64.b64decode(change["content"])
+            )
+    except (binascii.Error, ValueError, KeyError):
+        return _commit_error(422, "Invalid file content")
+
+    # Fail if a path is a directory of another one
+    for path in files:
+        names = path.split("/")
+        if any("/".join(names[:depth]) in files for depth in range(1, len(names))):
+            return _commit_error(
+                422, f"Invalid path: {path} is under another changed file"
+            )
 
-    if not file_path or file_path not in REPOSITORY_CONTENT_METADATA[repo_key]:
+    branch = commit_data.get("branch") or _default_branch(owner, repo_name)
+    with backend.transaction():
+        head = _branch_head(repo_key, branch)
+        if head is None and branch != _default_branch(owner, repo_name):
+            return _commit_error(404, f"Branch not found: {branch}")
+        root = get_root_tree(owner, repo_name, head) if head is not None else None
+        if head is not None and root is None:
+            return _commit_error(409, f"Branch {branch} has no tree")
+
+        trees = TreeStore(GIT_TREES[repo_key] if repo_key in GIT_TREES else {})
+        for change in commit_data["files"]:
+            path = change["path"].strip("/")
+            conflict = path_conflict(trees, root or EMPTY_TREE, path)
+            if conflict is not None:
+                return _commit_error(422, conflict)
+
+            entry = trees.lookup(root or EMPTY_TREE, path)
+            if change["action"] == "create":
+                if entry is not None:
+                    return _commit_error(422, f"File already exists: {path}")
+            elif entry is None or entry["type"] != "blob":
+                return _commit_error(422, f"File not found: {path}")
+            elif change.get("sha") and change["sha"] != entry["sha"]:
+                return _commit_error(409, f"{path} does not match {change['sha']}")
+
+        commit = commit_files(
+            owner,
+            repo_name,
+            branch,
+            files,
+            commit_data["message"],
+            author=commit_data.get("author"),
+            committer=commit_data.get("committer"),
+            username=username,
+        )
+    if commit is None:
+        return _commit_error(409, f"Branch {branch} was updated during the commit")
+
+    # Patches are computed once the branch has moved, outside the transaction
+    return with_file_patches(repo_key, commit)
+
+
+def _commit_error(status_code: int, message: str) -> Tuple[int, Dict]:
+    """Build the error of a refused commit"""
+    return (status_code, {"message": message, "documentation_url": COMMIT_DOCS})
+
+
+def commit_files(
+    owner: str,
+    repo_name: str,
+    branch: Optional[str],
+    files: Dict[str, Optional[bytes]],
+    message: str,
+    author: Optional[Dict] = None,
+    committer: Optional[Dict] = None,
+    username: Optional[str] = None,
+) -> Optional[Dict]:
+    """Commit file changes on top of a branch and move the branch to the commit
+
+    ``files`` maps paths to their new content, or to None to delete them.
+    The new root tree shares every unchanged subtree with the parent commit.
+    Blobs, trees, the commit and the branch move are written in one
+    transaction, the branch being moved only from the head the commit was
+    built on, and publish one change event (see ``data.events``).
+    Returns the new commit, or None when the branch cannot be committed to.
+    """
+    repo_key = f"{owner}/{repo_name}"
+    if repo_key not in REPOSITORIES:
         return None
 
-    item_data = REPOSITORY_CONTENT_METADATA[repo_key][file_path]
-    if item_data["type"] != "file":
+    branch = branch or _default_branch(owner, repo_name)
+    with backend.transaction():
+        # Only the default branch of an empty repository can be created here
+        head = _branch_head(repo_key, branch)
+        if head is None and branch != _default_branch(owner, repo_name):
+            return None
+
+        for table in (GIT_TREES, COMMIT_TREES, REPOSITORY_REFS):
+            if repo_key not in table:
+                table[repo_key] = {}
+
+        old_root = EMPTY_TREE
+        if head is not None:
+            if head not in COMMIT_TREES[repo_key]:
+                return None
+            old_root = COMMIT_TREES[repo_key][head]
+
+        trees = TreeStore(GIT_TREES[repo_key])
+
+        # Store the new blobs and collect the tree changes
+        changes: Dict[str, Optional[Dict]] = {}
+        changed_files = []
+        for path, content in files.items():
+            path = path.strip("/")
+            old_entry = trees.lookup(old_root, path)
+            old_blob = (
+                old_entry["sha"]
+                if old_entry is not None and old_entry["type"] == "blob"
+                else None
+            )
+
+            if content is None:
+                if old_blob is not None:
+                    changes[path] = None
+                    changed_files.append((path, "removed", old_blob, None))
+                continue
+
+            blob = BLOBS.put(content)
+            if blob == old_blob:
+                continue
+
+            changes[path] = blob_entry(blob, len(content))
+            status = "added" if old_blob is None else "modified"
+            changed_files.append((path, status, old_blob, blob))
+
+        root = trees.update(old_root, changes)
+        return _write_commit(
+            owner,
+            repo_name,
+            branch,
+            head,
+            [head] if head is not None else [],
+            root,
+            changed_files,
+            message,
+            author,
+            committer,
+            username,
+        )
+
+
+def merge_branch(
+    owner: str,
+    repo_name: str,
+    branch: str,
+    sha: str,
+    message: str,
+    username: Optional[str] = None,
+    squash: bool = False,
+) -> Optional[Dict]:
+    """Merge a commit into a branch and move the branch to the merge commit
+
+    The changes from the merge base of the branch head and the commit to the
+    commit are merged into the branch head (see ``data.tree_merge``). The
+    merge commit has both as parents, or only the branch head when
+    squashing. Returns the new commit, or None when the branch or commit
+    does not exist or when the merge conflicts.
+    """
+    repo_key = f"{owner}/{repo_name}"
+    if repo_key not in REPOSITORIES or repo_key not in COMMIT_TREES:
+        return None
+
+    with backend.transaction():
+        head = _branch_head(repo_key, branch)
+        commit_trees = COMMIT_TREES[repo_key]
+        commit_dag = get_commit_dag(owner, repo_name)
+        if head is None or head not in commit_trees or sha not in commit_trees:
+            return None
+        if commit_dag is None:
+            return None
+
+        # With several merge bases (criss-cross merges), the first one is used
+        merge_bases = commit_dag.merge_bases(head, sha)
+        base_root = commit_trees.get(merge_bases[0]) if merge_bases else None
+
+        old_root = commit_trees[head]
+        trees = TreeStore(GIT_TREES[repo_key])
+        merge = merge_trees(trees, BLOBS.get, base_root, old_root, commit_trees[sha])
+        if merge.conflicts:
+            return None
+
+        changes = dict(merge.changes)
+        for path, content in merge.merged.items():
+            changes[path] = blob_entry(BLOBS.put(content), len(content))
+        root = trees.update(old_root, changes)
+
+        return _write_commit(
+            owner,
+            repo_name,
+            branch,
+            head,
+            [head] if squash else [head, sha],
+            root,
+            list(trees.diff(old_root, root)),
+            message,
+            None,
+            None,
+            username,
+        )
+
+
+def _write_commit(
+    owner: str,
+    repo_name: str,
+    branch: str,
+    head: Optional[str],
+    parents: List[str],
+    root: str,
+    changed_files: List[Tuple[str, str, Optional[str], Optional[str]]],
+    message: str,
+    author: Optional[Dict],
+    committer: Optional[Dict],
+    username: Optional[str],
+) -> Optional[Dict]:
+    """Create the commit of a root tree and move the branch to it from head
+
+    ``changed_files`` are (path, status, old blob, new blob) as produced by
+    ``TreeStore.diff``. Must be called inside ``backend.transaction()``.
+    """
+    repo_key = f"{owner}/{repo_name}"
+    now = datetime.now()
+    user = USERS.get(username) if username else None
+    committer = _person(committer, user, now)
+    author = _person(author, user, now) if author else committer
+    sha = commit_sha(root, parents, author, committer, message)
+
+    commit = format_stored_commit(
+        repo_key, sha, root, parents, author, committer, message, user, changed_files
+    )
+
+    # Move the branch to the new commit
+    ref = f"refs/heads/{branch}"
+    if compare_and_swap_ref(owner, repo_name, ref, head, sha) is None:
         return None
 
-    return item_data["content"]
+    COMMIT_TREES[repo_key][sha] = root
+    add_commit(owner, repo_name, commit)
+    return commit
+
 
+def get_raw_content(owner: str, repo_name: str, path: str) -> Optional[Buffer]:
+    """Get raw file contents
 
-def format_file_response(owner: str, repo_name: str, file_data: Dict) -> Dict:
+    The path parameter should be in the format: {ref}/{file_path}
+    where ref is the branch/commit/tag and file_path is the path to the file.
+    The content is returned as bytes, memory-mapped for large files.
+    See ``resolve_ref_path`` for how ref and file_path are split.
+    """
+    resolved = resolve_ref_path(owner, repo_name, path)
+    if resolved is None:
+        return None
+
+    _, snapshot, file_path = resolved
+    entry = snapshot.trees.lookup(snapshot.root, file_path)
+    if entry is None or entry["type"] != "blob":
+        return None
+    return snapshot.blobs.get(entry["sha"])
+
+
+def format_file_response(
+    owner: str,
+    repo_name: str,
+    file_data: Dict,
+    ref: Optional[str] = None,
+    base64_cache: Optional[Base64Cache] = None,
+) -> Dict:
     """Format file response"""
-    content = file_data["content"]
-    encoded_content = base64.b64encode(content.encode("utf-8")).decode("utf-8")
-
-    return {
-        "type": "file",
-        "name": file_data["name"],
-        "path": file_data["path"],
-        "sha": file_data["sha"],
-        "content": encoded_content,
-        "encoding": "base64",
-        "download_url": f"/api/v3/repos/{owner}/{repo_name}/raw/{file_data['path']}",
-    }
+    return format_content_response(
+        owner, repo_name, file_data, ref, base64_cache=base64_cache
+    )
 
 
 def format_content_response(
-    owner: str, repo_name: str, item_data: Dict, include_content: bool = True
+    owner: str,
+    repo_name: str,
+    item_data: Dict,
+    ref: Optional[str] = None,
+    include_content: bool = True,
+    base64_cache: Optional[Base64Cache] = None,
 ) -> Dict:
     """Format content response"""
+    base64_cache = base64_cache or BASE64_CACHE
+    raw_path = f"{ref}/{item_data['path']}" if ref else item_data["path"]
     response = {
         "type": item_data["type"],
         "name": item_data["name"],
         "path": item_data["path"],
         "sha": item_data["sha"],
-        "download_url": f"/api/v3/repos/{owner}/{repo_name}/raw/{item_data['path']}"
+        "size": base64_cache.size(item_data["sha"])
+        if item_data["type"] == "file"
+        else 0,
+        "download_url": f"/api/v3/repos/{owner}/{repo_name}/raw/{raw_path}"
         if item_data["type"] == "file"
         else None,
     }
 
+    # Encodings are cached per blob SHA
     if include_content and item_data["type"] == "file":
-        content = item_data["content"]
-        encoded_content = base64.b64encode(content.encode("utf-8")).decode("utf-8")
-        response["content"] = encoded_content
+        response["content"] = base64_cache.encoded(item_data["sha"])
         response["encoding"] = "base64"
 
     return response
 
 
-def generate_sha() -> str:
-    """Generate random SHA"""
-    import random
-    import string
+def _default_branch(owner: str, repo_name: str) -> str:
+    """Get the default branch of a repository"""
+    disk = get_disk_repository(owner, repo_name)
+    if disk is not None:
+        return disk.default_branch()
+
+    repository = REPOSITORIES.get(f"{owner}/{repo_name}")
+    return repository["default_branch"] if repository else "main"
+
+
+def _branch_head(repo_key: str, branch: str) -> Optional[str]:
+    """Get the head commit SHA of a branch"""
+    ref = f"refs/heads/{branch}"
+    if repo_key not in REPOSITORY_REFS or ref not in REPOSITORY_REFS[repo_key]:
+        return None
+    return REPOSITORY_REFS[repo_key][ref]["object"]["sha"]
+
+
+def get_root_tree(owner: str, repo_name: str, ref: str) -> Optional[str]:
+    """Get the root tree SHA of the commit a ref (or commit SHA) points to"""
+    repo_key = f"{owner}/{repo_name}"
+    if repo_key not in COMMIT_TREES:
+        return None
+
+    # Snapshots are also reachable by the SHA of their commit
+    if ref in COMMIT_TREES[repo_key]:
+        return COMMIT_TREES[repo_key][ref]
+
+    sha = resolve_ref_to_sha(owner, repo_name, ref)
+    if sha is None:
+        return None
+    return COMMIT_TREES[repo_key].get(sha)
 
-    # Generate 40-character random hexadecimal
-    return "".join(random.choice(string.hexdigits.lower()) for _ in range(40))
+
+class Snapshot(NamedTuple):
+    """Trees, root tree and blobs of one commit"""
+
+    trees: TreeStore
+    root: str
+    blobs: Any  # BlobStore, or a repository on disk
+    base64: Base64Cache
+
+
+def get_snapshot(owner: str, repo_name: str, ref: str) -> Optional[Snapshot]:
+    """Get the snapshot of a ref, from disk or from the tree store"""
+    disk = get_disk_repository(owner, repo_name)
+    if disk is not None:
+        # Commit SHAs are looked up directly, without listing the refs
+        root = disk.root_tree(ref) if len(ref) == 40 else None
+        if root is None:
+            sha = disk.resolve(ref)
+            root = disk.root_tree(sha) if sha is not None else None
+        if root is None:
+            return None
+        return Snapshot(disk.trees, root, disk, disk.base64)
+
+    repo_key = f"{owner}/{repo_name}"
+    root = get_root_tree(owner, repo_name, ref)
+    if root is None:
+        return None
+    return Snapshot(TreeStore(GIT_TREES[repo_key]), root, BLOBS, BASE64_CACHE)
+
+
+def resolve_ref_path(
+    owner: str, repo_name: str, path: str
+) -> Optional[Tuple[str, Snapshot, str]]:
+    """Split a {ref}/{file_path} path into (ref, snapshot of ref, file_path)
+
+    Refs may contain slashes, so the shortest leading part of the path that
+    resolves to a commit is the ref. A path without a ref is read from the
+    default branch.
+    """
+    repo_key = f"{owner}/{repo_name}"
+    if repo_key not in COMMIT_TREES and get_disk_repository(owner, repo_name) is None:
+        return None
+
+    # Parse path to extract ref and file_path
+    path_parts = path.strip("/").split("/")
+    if len(path_parts) < 2:
+        candidates = [(_default_branch(owner, repo_name), path_parts[0])]
+    else:
+        candidates = [
+            ("/".join(path_parts[:i]), "/".join(path_parts[i:]))
+            for i in range(1, len(path_parts))
+        ]
+
+    for ref, file_path in candidates:
+        snapshot = get_snapshot(owner, repo_name, ref)
+        if snapshot is not None:
+            return ref, snapshot, file_path
+
+    return None
+
+
+def diff_commits(
+    owner: str,
+    repo_name: str,
+    base: Optional[str],
+    head: str,
+    start: int = 0,
+    limit: int = COMMIT_FILE_LIMIT,
+) -> Optional[List[Dict]]:
+    """Get the files changed from one commit to another
+
+    Without base, every file of head is added. Files are listed from
+    ``start``, at most ``limit`` of them (``COMMIT_FILE_LIMIT`` as in the
+    GitHub API by default). None when head has no snapshot.
+    """
+    head_snapshot = get_snapshot(owner, repo_name, head)
+    if head_snapshot is None:
+        return None
+    base_snapshot = get_snapshot(owner, repo_name, base) if base is not None else None
+
+    repo_key = f"{owner}/{repo_name}"
+    changes = head_snapshot.trees.diff(
+        base_snapshot.root if base_snapshot else None, head_snapshot.root
+    )
+    return [
+        format_commit_file(
+            repo_key, head, path, status, old_blob, blob, head_snapshot.blobs.get
+        )
+        for path, status, old_blob, blob in islice(changes, start, start + limit)
+    ]
+
+
+def iter_diff(
+    owner: str, repo_name: str, base: Optional[str], head: str
+) -> Optional[Iterator[bytes]]:
+    """Iterate the whole diff from one commit to another, as git, in chunks
+
+    The diff is computed as it is read, file by file, and its patches are
+    not truncated. None when head has no snapshot.
+    """
+    head_snapshot = get_snapshot(owner, repo_name, head)
+    if head_snapshot is None:
+        return None
+    base_snapshot = get_snapshot(owner, repo_name, base) if base is not None else None
+
+    changes = head_snapshot.trees.diff(
+        base_snapshot.root if base_snapshot else None, head_snapshot.root
+    )
+    return _iter_chunks(_iter_diff_lines(changes, head_snapshot.blobs.get))
+
+
+def _iter_diff_lines(
+    changes: Iterator[Tuple[str, str, Optional[str], Optional[str]]],
+    read_blob: ReadBlob,
+) -> Iterator[str]:
+    """Iterate the lines of the git diff of changed files"""
+    for path, status, old_blob, blob in changes:
+        yield f"diff --git a/{path} b/{path}"
+        index = f"index {(old_blob or '0' * 7)[:7]}..{(blob or '0' * 7)[:7]}"
+        if status == "added":
+            yield "new file mode 100644"
+        elif status == "removed":
+            yield "deleted file mode 100644"
+        else:
+            index += " 100644"
+        yield index
+
+        old_name = f"a/{path}" if old_blob else "/dev/null"
+        new_name = f"b/{path}" if blob else "/dev/null"
+        lines = iter_patch(old_blob, blob, read_blob)
+        if lines is None:
+            yield f"Binary files {old_name} and {new_name} differ"
+            continue
+        yield f"--- {old_name}"
+        yield f"+++ {new_name}"
+        yield from lines
+
+
+def _iter_chunks(lines: Iterator[str]) -> Iterator[bytes]:
+    """Join lines into chunks of about ``DIFF_CHUNK_SIZE`` bytes"""
+    buffer = []
+    size = 0
+    for line in lines:
+        buffer.append(line)
+        size += len(line) + 1
+        if size >= DIFF_CHUNK_SIZE:
+            buffer.append("")
+            yield "\n".join(buffer).encode()
+            buffer = []
+            size = 0
+    if buffer:
+        buffer.append("")
+        yield "\n".join(buffer).encode()
+
+
+def _content_item(path: str, entry: Dict, include_content: bool = False) -> Dict:
+    """Build the content data of a tree entry"""
+    item = {
+        "type": "file" if entry["type"] == "blob" else "dir",
+        "name": path.rsplit("/", 1)[-1],
+        "path": path,
+        "sha": entry["sha"],
+    }
+    if include_content:
+        item["content"] = BLOBS.get(entry["sha"])
+    return item
+
+
+def _person(person: Optional[Dict], user: Optional[Dict], date: datetime) -> Dict:
+    """Get the author or committer of a new commit"""
+    if person:
+        return {"name": person["name"], "email": person["email"], "date": date}
+    if user:
+        return {"name": user["login"], "email": user["email"], "date": date}
+    return {"name": "User", "email": "user@example.com", "date": date}
@@ -0,0 +1,331 @@
+"""Line diffs and patches of blobs
+
+Patches are computed with Myers' O(ND) difference algorithm in linear space
+(divide and conquer on the middle snake), as git's xdiff does:
+
+- lines are interned to integers, so comparing two lines is an integer
+  comparison.
+- lines found on one side only are changed whatever the diff, and are left
+  out of the search: a rewritten file costs no search at all.
+- the common prefix and suffix of each region are stripped.
+- the search for the shortest edit script of a region stops after
+  ``sqrt(lines)`` steps (at least ``MIN_EDIT_COST``) and splits the region
+  at the furthest point reached instead: the diff stays correct, only
+  possibly longer than the shortest one.
+
+Patches are cached by (old blob SHA, new blob SHA): blobs are content
+addressed, so the patch of a pair never changes and is shared by every
+commit, comparison and pull request showing that change. Patches in API
+responses are cut after ``MAX_PATCH_SIZE`` bytes; ``iter_patch`` produces
+whole patches lazily, for streamed diffs.
+"""
+
+from itertools import islice
+from math import isqrt
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from data.blob_store import LARGE_BLOB_SIZE, Buffer, is_binary
+from data.git_repository import ObjectCache
+
+# Memory used by the cached patches, in bytes
+PATCH_CACHE_SIZE = 64 * 1024 * 1024
+
+# Patches in API responses are cut after this many bytes
+MAX_PATCH_SIZE = 256 * 1024
+
+# Lines of context around changes, as in git
+CONTEXT_LINES = 3
+
+# Steps of the shortest edit script search before splitting heuristically:
+# the square root of the number of lines, at least MIN_EDIT_COST, as in xdiff
+MIN_EDIT_COST = 256
+
+# Reads a blob by SHA
+ReadBlob = Callable[[str], Optional[Buffer]]
+
+# Changed region: (old start, old end, new start, new end)
+Change = Tuple[int, int, int, int]
+
+
+class FilePatch(NamedTuple):
+    """Patch of one file between two blobs"""
+
+    additions: int
+    deletions: int
+    patch: str  # Empty for binary and large files
+    truncated: bool  # Cut after MAX_PATCH_SIZE bytes
+    binary: bool  # Binary or large file
+
+
+_PATCHES = ObjectCache(PATCH_CACHE_SIZE)
+
+
+def get_patch(
+    old_blob: Optional[str], blob: Optional[str], read_blob: ReadBlob
+) -> FilePatch:
+    """Get the patch from one blob to another (None: no file), cached
+
+    Binary and large files get no patch and no line counts.
+    """
+    key = (old_blob, blob)
+    patch = _PATCHES.get(key)
+    if patch is not None:
+        return patch
+
+    lines = _read_lines(old_blob, blob, read_blob)
+    if lines is None:
+        patch = FilePatch(0, 0, "", False, True)
+    else:
+        old_lines, new_lines = lines
+        changes = diff_lines(old_lines, new_lines)
+        additions = sum(new_end - new_start for _, _, new_start, new_end in changes)
+        deletions = sum(old_end - old_start for old_start, old_end, _, _ in changes)
+
+        # Keep whole lines up to the size limit
+        text = []
+        size = 0
+        truncated = False
+        for line in _hunk_lines(old_lines, new_lines, changes):
+            size += len(line) + 1
+            if size > MAX_PATCH_SIZE:
+                truncated = True
+                break
+            text.append(line)
+        patch = FilePatch(additions, deletions, "\n".join(text), truncated, False)
+
+    _PATCHES.put(key, patch, len(patch.patch) + 100)
+    return patch
+
+
+def iter_patch(
+    old_blob: Optional[str], blob: Optional[str], read_blob: ReadBlob
+) -> Optional[Iterator[str]]:
+    """Iterate the lines of the whole patch between two blobs
+
+    None for binary and large files.
+    """
+    patch = _PATCHES.get((old_blob, blob))
+    if patch is not None and patch.binary:
+        return None
+    if patch is not None and not patch.truncated:
+        return iter(patch.patch.split("\n") if patch.patch else ())
+
+    lines = _read_lines(old_blob, blob, read_blob)
+    if lines is None:
+        return None
+    old_lines, new_lines = lines
+    return _hunk_lines(old_lines, new_lines, diff_lines(old_lines, new_lines))
+
+
+def diff_lines(old: Sequence[str], new: Sequence[str]) -> List[Change]:
+    """Get the changed regions between two lists of lines, in order"""
+    ids: Dict[str, int] = {}
+    old_ids = [ids.setdefault(line, len(ids)) for line in old]
+    new_ids = [ids.setdefault(line, len(ids)) for line in new]
+
+    # Only lines found on both sides can match
+    common = set(old_ids).intersection(new_ids)
+    old_lines = [index for index, id in enumerate(old_ids) if id in common]
+    new_lines = [index for index, id in enumerate(new_ids) if id in common]
+    old_ids = [old_ids[index] for index in old_lines]
+    new_ids = [new_ids[index] for index in new_lines]
+    max_cost = max(isqrt(len(old_ids) + len(new_ids) + 3), MIN_EDIT_COST)
+
+    # Lines matched between the sides, as (old line, new line), in order
+    matches: List[Tuple[int, int]] = []
+    stack = [(0, len(old_ids), 0, len(new_ids))]
+    while stack:
+        region = stack.pop()
+        old_start, old_end, new_start, new_end = region
+
+        # Common prefix and suffix
+        while (
+            old_start < old_end
+            and new_start < new_end
+            and old_ids[old_start] == new_ids[new_start]
+        ):
+            old_start += 1
+            new_start += 1
+        while (
+            old_start < old_end
+            and new_start < new_end
+            and old_ids[old_end - 1] == new_ids[new_end - 1]
+        ):
+            old_end -= 1
+            new_end -= 1
+
+        if old_start < old_end and new_start < new_end:
+            x, y = _middle_snake(
+                old_ids, new_ids, old_start, old_end, new_start, new_end, max_cost
+            )
+            if (x, y) not in ((old_start, new_start), (old_end, new_end)):
+                # Both halves keep the prefix and suffix, matched again there;
+                # the first half is popped first
+                stack.append((x, region[1], y, region[3]))
+                stack.append((region[0], x, region[2], y))
+                continue
+
+        for offset in range(old_start - region[0]):
+            matches.append(
+                (old_lines[region[0] + offset], new_lines[region[2] + offset])
+            )
+        for offset in range(region[1] - old_end):
+            matches.append((old_lines[old_end + offset], new_lines[new_end + offset]))
+
+    # Changes are the gaps between matched lines
+    changes: List[Change] = []
+    old_position = new_position = 0
+    for old_line, new_line in matches + [(len(old), len(new))]:
+        if old_line > old_position or new_line > new_position:
+            changes.append((old_position, old_line, new_position, new_line))
+        old_position, new_position = old_line + 1, new_line + 1
+    return changes
+
+
+def _middle_snake(
+    old: List[int],
+    new: List[int],
+    old_start: int,
+    old_end: int,
+    new_start: int,
+    new_end: int,
+    max_cost: int,
+) -> Tuple[int, int]:
+    """Find a point of a shortest edit script, searching from both ends
+
+    Diagonal k holds the points with x - y = k (x in old, y in new, both
+    relative to the region). The search from the end runs on the reversed
+    sequences, where the same point lies on diagonal delta - k. After
+    ``max_cost`` steps, the furthest point reached from the start is used.
+    """
+    n = old_end - old_start
+    m = new_end - new_start
+    delta = n - m
+    odd = delta & 1
+    limit = min((n + m + 1) // 2, max_cost)
+    offset = limit + 1
+    forward = [0] * (2 * offset + 1)
+    backward = [0] * (2 * offset + 1)
+
+    for cost in range(limit + 1):
+        for k in range(-cost, cost + 1, 2):
+            if k == -cost or (
+                k != cost and forward[offset + k - 1] < forward[offset + k + 1]
+            ):
+                x = forward[offset + k + 1]
+            else:
+                x = forward[offset + k - 1] + 1
+            y = x - k
+            while x < n and y < m and old[old_start + x] == new[new_start + y]:
+                x += 1
+                y += 1
+            forward[offset + k] = x
+
+            if odd and -(cost - 1) <= delta - k <= cost - 1:
+                if x + backward[offset + delta - k] >= n:
+                    return old_start + x, new_start + y
+
+        for k in range(-cost, cost + 1, 2):
+            if k == -cost or (
+                k != cost and backward[offset + k - 1] < backward[offset + k + 1]
+            ):
+                x = backward[offset + k + 1]
+            else:
+                x = backward[offset + k - 1] + 1
+            y = x - k
+            while x < n and y < m and old[old_end - 1 - x] == new[new_end - 1 - y]:
+                x += 1
+                y += 1
+            backward[offset + k] = x
+
+            if not odd and -cost <= delta - k <= cost:
+                if forward[offset + delta - k] + x >= n:
+                    return old_end - x, new_end - y
+
+    # Too expensive: split at the forward point that got furthest
+    _, x, y = max(
+        (2 * x - k, x, x - k)
+        for x, k in ((forward[offset + k], k) for k in range(-limit, limit + 1, 2))
+        if x <= n and 0 <= x - k <= m
+    )
+    return old_start + x, new_start + y
+
+
+def _hunk_lines(
+    old: Sequence[str], new: Sequence[str], changes: List[Change]
+) -> Iterator[str]:
+    """Iterate the lines of the unified diff hunks of changes"""
+    index = 0
+    while index < len(changes):
+        # Changes closer than twice the context share a hunk
+        last = index
+        while (
+            last + 1 < len(changes)
+            and changes[last + 1][0] - changes[last][1] <= 2 * CONTEXT_LINES
+        ):
+            last += 1
+
+        old_start = max(changes[index][0] - CONTEXT_LINES, 0)
+        new_start = changes[index][2] - (changes[index][0] - old_start)
+        old_end = min(changes[last][1] + CONTEXT_LINES, len(old))
+        new_end = changes[last][3] + (old_end - changes[last][1])
+        yield (
+            f"@@ -{_hunk_range(old_start, old_end - old_start)} "
+            f"+{_hunk_range(new_start, new_end - new_start)} @@"
+        )
+
+        position = old_start
+        for (
+            change_old_start,
+            change_old_end,
+            change_new_start,
+            change_new_end,
+        ) in islice(changes, index, last + 1):
+            for line in old[position:change_old_start]:
+                yield f" {line}"
+            for line in old[change_old_start:change_old_end]:
+                yield f"-{line}"
+            for line in new[change_new_start:change_new_end]:
+                yield f"+{line}"
+            position = change_old_end
+        for line in old[position:old_end]:
+            yield f" {line}"
+
+        index = last + 1
+
+
+def _hunk_range(start: int, length: int) -> str:
+    """Format the line range of a hunk header, as git does"""
+    if length == 1:
+        return str(start + 1)
+    if length == 0:
+        return f"{start},0"
+    return f"{start + 1},{length}"
+
+
+def split_lines(data: Buffer) -> List[str]:
+    """Split a text blob into lines at newlines only, as git does
+
+    Unlike ``str.splitlines``, carriage returns, form feeds and Unicode line
+    separators stay in their line. The newline at the end of the last line,
+    if any, does not start another line.
+    """
+    text = bytes(data).decode("utf-8", "replace")
+    lines = text.split("\n")
+    if lines[-1] == "":
+        lines.pop()
+    return lines
+
+
+def _read_lines(
+    old_blob: Optional[str], blob: Optional[str], read_blob: ReadBlob
+) -> Optional[Tuple[List[str], List[str]]]:
+    """Read the lines of two blobs, or None if either is binary or large"""
+    contents = []
+    for sha in (old_blob, blob):
+        data = (read_blob(sha) or b"") if sha else b""
+        if len(data) >= LARGE_BLOB_SIZE or is_binary(data):
+            return None
+        contents.append(split_lines(data))
+
+    return contents[0], contents[1]
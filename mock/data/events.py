@@ -0,0 +1,84 @@
+"""Repository change events
+
+The functions that change the git data of a repository (new commits, moved
+refs and branches) record what they change in a ``RepositoryChange``. All
+the changes made to a repository in one storage transaction are merged into
+one event, published once the outermost transaction ends and only if its
+changes were kept. Caches and indexes derived from the git data subscribe to
+these events and update themselves incrementally.
+"""
+
+from typing import Callable, Dict, List, Optional, Tuple
+
+from data.storage import backend
+
+# (old SHA, new SHA), None when the ref or branch does not exist
+Move = Tuple[Optional[str], Optional[str]]
+
+
+class RepositoryChange:
+    """Changes made to the git data of one repository"""
+
+    def __init__(self, repo_key: str):
+        self.repo_key = repo_key
+        self.commits: List[Dict] = []
+        self.refs: Dict[str, Move] = {}
+        self.branches: Dict[str, Move] = {}
+
+    def add_commit(self, commit: Dict) -> None:
+        """Record a new commit"""
+        self.commits.append(commit)
+
+    def move_ref(
+        self, ref: str, old_sha: Optional[str], new_sha: Optional[str]
+    ) -> None:
+        """Record that a full ref was created, moved or deleted"""
+        self.refs[ref] = (self.refs.get(ref, (old_sha,))[0], new_sha)
+
+    def move_branch(
+        self, branch_name: str, old_sha: Optional[str], new_sha: Optional[str]
+    ) -> None:
+        """Record that a branch was created, moved or deleted"""
+        self.branches[branch_name] = (
+            self.branches.get(branch_name, (old_sha,))[0],
+            new_sha,
+        )
+
+
+Subscriber = Callable[[RepositoryChange], None]
+
+_subscribers: List[Subscriber] = []
+
+# Changes of the running transaction (only used while holding it)
+_pending: Dict[str, RepositoryChange] = {}
+
+
+def subscribe(subscriber: Subscriber) -> Subscriber:
+    """Call a function with every published change (usable as a decorator)"""
+    _subscribers.append(subscriber)
+    return subscriber
+
+
+def record(repo_key: str) -> RepositoryChange:
+    """Get the change of a repository in the running transaction
+
+    Must be called inside ``backend.transaction()``.
+    """
+    if not _pending:
+        backend.after_transaction(_publish)
+    if repo_key not in _pending:
+        _pending[repo_key] = RepositoryChange(repo_key)
+
+    return _pending[repo_key]
+
+
+def _publish(kept: bool) -> None:
+    """Deliver the changes of the transaction that just ended"""
+    changes = list(_pending.values())
+    _pending.clear()
+    if not kept:
+        return
+
+    for change in changes:
+        for subscriber in _subscribers:
+            subscriber(change)
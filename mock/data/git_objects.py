@@ -0,0 +1,80 @@
+"""Git object hashing
+
+Object IDs are computed the way git computes them, a SHA-1 over
+``"<type> <size>\\0" + body``, so the blobs, trees and commits created by the
+mock get the same SHAs git would give them.
+"""
+
+import hashlib
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+BLOB_MODE = "100644"
+TREE_MODE = "040000"
+
+
+def hash_object(object_type: str, body: bytes) -> str:
+    """Get the SHA-1 of a git object"""
+    header = f"{object_type} {len(body)}\0".encode()
+    return hashlib.sha1(header + body).hexdigest()
+
+
+def blob_sha(content: bytes) -> str:
+    """Get the SHA-1 of a blob"""
+    return hash_object("blob", content)
+
+
+def tree_body(entries: Dict[str, Dict]) -> bytes:
+    """Encode tree entries ({name: {mode, type, sha}}) as a git tree object
+
+    Entries are sorted by name, directories comparing as if their name ended
+    with a slash. Tree modes are written without their leading zero.
+    """
+    body = bytearray()
+    for name, entry in tree_entries(entries):
+        body += f"{entry['mode'].lstrip('0')} {name}\0".encode()
+        body += bytes.fromhex(entry["sha"])
+
+    return bytes(body)
+
+
+def tree_entries(entries: Dict[str, Dict]) -> List[Tuple[str, Dict]]:
+    """Get the (name, entry) pairs of a tree in git order"""
+    return sorted(entries.items(), key=lambda item: _tree_order(*item))
+
+
+def tree_sha(entries: Dict[str, Dict]) -> str:
+    """Get the SHA-1 of a tree"""
+    return hash_object("tree", tree_body(entries))
+
+
+def commit_body(
+    tree: str, parents: List[str], author: Dict, committer: Dict, message: str
+) -> bytes:
+    """Encode a commit object (author and committer are {name, email, date})"""
+    lines = [f"tree {tree}"]
+    lines.extend(f"parent {parent}" for parent in parents)
+    lines.append(f"author {_signature(author)}")
+    lines.append(f"committer {_signature(committer)}")
+    return ("\n".join(lines) + "\n\n" + message).encode()
+
+
+def commit_sha(
+    tree: str, parents: List[str], author: Dict, committer: Dict, message: str
+) -> str:
+    """Get the SHA-1 of a commit"""
+    return hash_object("commit", commit_body(tree, parents, author, committer, message))
+
+
+def _tree_order(name: str, entry: Dict) -> bytes:
+    """Get the sort key of a tree entry"""
+    return (name + "/" if entry["type"] == "tree" else name).encode()
+
+
+def _signature(person: Dict) -> str:
+    """Format a git signature (dates are naive local times)"""
+    date: datetime = person["date"].astimezone()
+    return (
+        f"{person['name']} <{person['email']}> "
+        f"{int(date.timestamp())} {date.strftime('%z')}"
+    )
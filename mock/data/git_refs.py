@@ -1,5 +1,10 @@
 from typing import Dict, List, Optional
 
+from data.branches import delete_branch, set_branch_head
+from data.events import record
+from data.git_repository import get_disk_repository
+from data.storage import backend
+
 # Repository Git reference data
 # Format: {repo_key: {ref: {ref: str, node_id: str, url: str, object: {sha: str, type: str, url: str}}}}
 REPOSITORY_REFS = {
@@ -71,9 +76,19 @@ REPOSITORY_REFS = {
     },
 }
 
+# Load the fixture data into the storage backend
+REPOSITORY_REFS = backend.repo_table("repository_refs", REPOSITORY_REFS)
+
 
 def get_all_refs(owner: str, repo_name: str) -> Optional[List[Dict]]:
     """Get all references for a repository"""
+    disk = get_disk_repository(owner, repo_name)
+    if disk is not None:
+        return [
+            format_ref(owner, repo_name, ref, sha, disk.object_type(sha) or "commit")
+            for ref, sha in disk.refs().items()
+        ]
+
     repo_key = f"{owner}/{repo_name}"
     if repo_key not in REPOSITORY_REFS:
         return None
@@ -106,25 +121,23 @@ def create_ref(owner: str, repo_name: str, ref_data: Dict) -> Optional[Dict]:
     ref = ref_data["ref"]
     sha = ref_data["sha"]
 
-    # Fail if ref already exists
-    if ref in REPOSITORY_REFS[repo_key]:
-        return None
+    with backend.transaction():
+        # Fail if ref already exists
+        if ref in REPOSITORY_REFS[repo_key]:
+            return None
 
-    # Check SHA existence (omitted in mock implementation)
+        # Check SHA existence (omitted in mock implementation)
 
-    # Create new reference
-    new_ref = {
-        "ref": ref,
-        "node_id": generate_node_id(ref),
-        "url": f"/api/v3/repos/{owner}/{repo_name}/git/refs/{ref.replace('refs/', '')}",
-        "object": {
-            "sha": sha,
-            "type": "commit",
-            "url": f"/api/v3/repos/{owner}/{repo_name}/git/commits/{sha}",
-        },
-    }
+        # Create new reference
+        new_ref = format_ref(owner, repo_name, ref, sha)
+
+        REPOSITORY_REFS[repo_key][ref] = new_ref
+        record(repo_key).move_ref(ref, None, sha)
+
+        # Branch refs create the branch as well
+        if ref.startswith("refs/heads/"):
+            set_branch_head(owner, repo_name, ref[len("refs/heads/") :], sha)
 
-    REPOSITORY_REFS[repo_key][ref] = new_ref
     return new_ref
 
 
@@ -140,18 +153,62 @@ def update_ref(
     if not ref.startswith("refs/"):
         ref = f"refs/{ref}"
 
-    if ref not in REPOSITORY_REFS[repo_key]:
-        return None
-
     sha = update_data["sha"]
     # force = update_data.get("force", False)  # Unused variable
 
-    # Check SHA existence (omitted in mock implementation)
+    with backend.transaction():
+        if ref not in REPOSITORY_REFS[repo_key]:
+            return None
 
-    # Update reference
-    REPOSITORY_REFS[repo_key][ref]["object"]["sha"] = sha
+        # Check SHA existence (omitted in mock implementation)
 
-    return REPOSITORY_REFS[repo_key][ref]
+        # Update reference
+        # A new record, so that a failed transaction restores the old one
+        reference = REPOSITORY_REFS[repo_key][ref]
+        old_sha = reference["object"]["sha"]
+        reference = {
+            **reference,
+            "object": {
+                **reference["object"],
+                "sha": sha,
+                "url": f"/api/v3/repos/{owner}/{repo_name}/git/commits/{sha}",
+            },
+        }
+        REPOSITORY_REFS[repo_key][ref] = reference
+        record(repo_key).move_ref(ref, old_sha, sha)
+
+        # Branch refs move the branch as well
+        if ref.startswith("refs/heads/"):
+            set_branch_head(owner, repo_name, ref[len("refs/heads/") :], sha)
+
+    return reference
+
+
+def compare_and_swap_ref(
+    owner: str,
+    repo_name: str,
+    ref: str,
+    old_sha: Optional[str],
+    new_sha: str,
+) -> Optional[Dict]:
+    """Move a full reference only if it still points to old_sha
+
+    An old_sha of None creates the reference, which must not exist yet.
+    Returns the reference, or None when it was moved by someone else.
+    """
+    repo_key = f"{owner}/{repo_name}"
+    with backend.transaction():
+        if repo_key not in REPOSITORY_REFS:
+            REPOSITORY_REFS[repo_key] = {}
+
+        current = REPOSITORY_REFS[repo_key].get(ref)
+        current_sha = current["object"]["sha"] if current is not None else None
+        if current_sha != old_sha:
+            return None
+
+        if old_sha is None:
+            return create_ref(owner, repo_name, {"ref": ref, "sha": new_sha})
+        return update_ref(owner, repo_name, ref, {"sha": new_sha})
 
 
 def delete_ref(owner: str, repo_name: str, ref: str) -> bool:
@@ -164,14 +221,38 @@ def delete_ref(owner: str, repo_name: str, ref: str) -> bool:
     if not ref.startswith("refs/"):
         ref = f"refs/{ref}"
 
-    if ref not in REPOSITORY_REFS[repo_key]:
-        return False
+    with backend.transaction():
+        if ref not in REPOSITORY_REFS[repo_key]:
+            return False
+
+        # Delete reference
+        reference = REPOSITORY_REFS[repo_key][ref]
+        del REPOSITORY_REFS[repo_key][ref]
+        record(repo_key).move_ref(ref, reference["object"]["sha"], None)
+
+        # Branch refs delete the branch as well
+        if ref.startswith("refs/heads/"):
+            delete_branch(owner, repo_name, ref[len("refs/heads/") :])
 
-    # Delete reference
-    del REPOSITORY_REFS[repo_key][ref]
     return True
 
 
+def format_ref(
+    owner: str, repo_name: str, ref: str, sha: str, object_type: str = "commit"
+) -> Dict:
+    """Format reference response"""
+    return {
+        "ref": ref,
+        "node_id": generate_node_id(ref),
+        "url": f"/api/v3/repos/{owner}/{repo_name}/git/refs/{ref.replace('refs/', '')}",
+        "object": {
+            "sha": sha,
+            "type": object_type,
+            "url": f"/api/v3/repos/{owner}/{repo_name}/git/{object_type}s/{sha}",
+        },
+    }
+
+
 def generate_node_id(ref: str) -> str:
     """Generate node_id for reference"""
     import base64
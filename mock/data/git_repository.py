@@ -0,0 +1,1048 @@
+"""Read-only access to bare git repositories on disk
+
+When ``GITBUCKET_MOCK_GIT_ROOT`` points to a directory of bare repositories
+laid out as GitBucket does (``{root}/{owner}/{repository}.git``), those
+repositories are read from disk by the commit, contents, ref and branch
+functions. Every other repository keeps using the fixture tables, which
+remain the default.
+
+The object database is read directly, without a git binary or library:
+
+- loose objects (zlib-compressed files under ``objects/``)
+- pack files through their version 2 index, both memory-mapped. An object
+  is found with the fan-out table and a binary search of the index, and
+  offset and ref deltas are resolved against their bases.
+- refs from ``packed-refs`` and the loose files under ``refs/``
+- the commit-graph (``objects/info/commit-graph`` or a split chain), which
+  gives the parents, root tree, commit date and generation of a commit
+  without inflating it, so history walks only read the commits they return.
+  Commits newer than the commit-graph are read from the object database.
+
+Objects are cached per repository in an LRU bounded in bytes. Delta chains
+keep their intermediate objects in the same cache, so a base shared by many
+objects is inflated once.
+"""
+
+import bisect
+import heapq
+import mmap
+import os
+import re
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+from datetime import datetime
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    MutableMapping,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+
+from data.blob_store import Base64Cache
+from data.git_objects import TREE_MODE
+from data.tree_store import TreeStore
+
+# Memory used by the cached objects and parsed trees of one repository
+OBJECT_CACHE_SIZE = 64 * 1024 * 1024
+TREE_CACHE_SIZE = 16 * 1024 * 1024
+
+# Memory used by the cached base64 encodings of one repository
+BASE64_CACHE_SIZE = 16 * 1024 * 1024
+
+# Memory used by the cached path lookups of one repository, and the
+# approximate size of one lookup
+ENTRY_CACHE_SIZE = 4 * 1024 * 1024
+ENTRY_SIZE = 200
+
+# Pack object types
+OBJECT_TYPES = {1: "commit", 2: "tree", 3: "blob", 4: "tag"}
+OFS_DELTA = 6
+REF_DELTA = 7
+
+# Commit-graph parent markers
+GRAPH_NO_PARENT = 0x70000000
+GRAPH_EXTRA_EDGES = 0x80000000
+
+# Mode of the submodule commits (gitlinks) in trees
+GITLINK_MODE = "160000"
+
+# Compressed bytes read at once when inflating a packed object
+INFLATE_CHUNK_SIZE = 64 * 1024
+
+HEX_DIGITS = set("0123456789abcdef")
+
+# Entries of a raw tree object: raw mode and binary SHA
+TREE_ENTRY = re.compile(rb"([0-7]+) [^\0]*\0(.{20})", re.DOTALL)
+
+# Owner and repository names allowed in repository paths
+REPOSITORY_NAME = re.compile(r"^[A-Za-z0-9_][A-Za-z0-9_.-]*$")
+
+
+class Commit(NamedTuple):
+    """Parsed commit object (dates are naive local times)"""
+
+    sha: str
+    tree: str
+    parents: List[str]
+    author: Dict
+    committer: Dict
+    message: str
+    time: int  # Committer date in epoch seconds
+
+
+class ObjectCache:
+    """Values bounded by their size in bytes, least recently used out"""
+
+    def __init__(self, max_bytes: int):
+        self._max_bytes = max_bytes
+        self._values: "OrderedDict[Any, Tuple[Any, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Any) -> Any:
+        """Get a cached value, or None"""
+        with self._lock:
+            if key not in self._values:
+                return None
+            self._values.move_to_end(key)
+            return self._values[key][0]
+
+    def put(self, key: Any, value: Any, size: int) -> None:
+        """Cache a value (values larger than the whole cache are skipped)"""
+        if size > self._max_bytes:
+            return
+
+        with self._lock:
+            if key in self._values:
+                return
+            self._values[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self._max_bytes:
+                _, (_, evicted_size) = self._values.popitem(last=False)
+                self._bytes -= evicted_size
+
+
+class PackFile:
+    """A pack file and its version 2 index, both memory-mapped"""
+
+    def __init__(self, index_path: str):
+        self._index = _map_file(index_path)
+        if self._index[:8] != b"\377tOc\0\0\0\2":
+            raise ValueError(f"Unsupported pack index: {index_path}")
+
+        self._fanout = struct.unpack_from(">256I", self._index, 8)
+        self.count = self._fanout[255]
+        # SHAs, then CRC32s, then offsets, then large offsets
+        self._shas = 8 + 256 * 4
+        self._offsets = self._shas + 24 * self.count
+        self._large_offsets = self._offsets + 4 * self.count
+        self._pack = _map_file(index_path[: -len(".idx")] + ".pack")
+        # Offsets in pack order and the index positions of their objects
+        self._reverse: Optional[Tuple[List[int], List[int]]] = None
+
+    def find(self, sha: bytes) -> Optional[int]:
+        """Get the offset of an object in the pack"""
+        position = self._search(sha)
+        if position < self.count and self._sha(position) == sha:
+            return self._offset(position)
+        return None
+
+    def find_prefix(self, prefix: str, limit: int) -> List[str]:
+        """Get the SHAs starting with a hex prefix (at most limit SHAs)"""
+        shas = []
+        position = self._search(bytes.fromhex(prefix.ljust(40, "0")))
+        while position < self.count and len(shas) < limit:
+            sha = self._sha(position).hex()
+            if not sha.startswith(prefix):
+                break
+            shas.append(sha)
+            position += 1
+
+        return shas
+
+    def entry(self, offset: int) -> Tuple[int, int, int, Any]:
+        """Read an object header: (type, size, data offset, delta base)
+
+        The delta base is an offset in this pack for offset deltas and a
+        binary SHA for ref deltas.
+        """
+        pack = self._pack
+        start = offset
+        byte = pack[offset]
+        offset += 1
+        type_number = (byte >> 4) & 7
+        size = byte & 0x0F
+        shift = 4
+        while byte & 0x80:
+            byte = pack[offset]
+            offset += 1
+            size |= (byte & 0x7F) << shift
+            shift += 7
+
+        base = None
+        if type_number == OFS_DELTA:
+            byte = pack[offset]
+            offset += 1
+            distance = byte & 0x7F
+            while byte & 0x80:
+                byte = pack[offset]
+                offset += 1
+                distance = ((distance + 1) << 7) | (byte & 0x7F)
+            base = start - distance
+        elif type_number == REF_DELTA:
+            base = pack[offset : offset + 20]
+            offset += 20
+
+        return type_number, size, offset, base
+
+    def inflate(self, offset: int, size: int) -> bytes:
+        """Inflate the data of an object"""
+        decompressor = zlib.decompressobj()
+        parts = []
+        chunk_size = size + 64
+        while not decompressor.eof:
+            chunk = self._pack[offset : offset + chunk_size]
+            if not chunk:
+                raise ValueError("Truncated pack file")
+            parts.append(decompressor.decompress(chunk))
+            offset += len(chunk)
+            chunk_size = INFLATE_CHUNK_SIZE
+
+        return b"".join(parts)
+
+    def compressed(self, offset: int, data_offset: int) -> bytes:
+        """Get the compressed data of the object at offset, as stored"""
+        offsets, _ = self._reverse_index()
+        index = bisect.bisect_right(offsets, offset)
+        end = offsets[index] if index < len(offsets) else len(self._pack) - 20
+        return self._pack[data_offset:end]
+
+    def sha_at(self, offset: int) -> Optional[bytes]:
+        """Get the SHA of the object at an offset"""
+        offsets, positions = self._reverse_index()
+        index = bisect.bisect_left(offsets, offset)
+        if index < len(offsets) and offsets[index] == offset:
+            return self._sha(positions[index])
+        return None
+
+    def delta_size(self, offset: int) -> int:
+        """Get the size of the object a delta rebuilds, from the delta header"""
+        header = zlib.decompressobj().decompress(self._pack[offset : offset + 256], 32)
+        _, position = _delta_varint(header, 0)
+        size, _ = _delta_varint(header, position)
+        return size
+
+    def _search(self, sha: bytes) -> int:
+        """Get the first index position whose SHA is not below sha"""
+        first = sha[0]
+        low = self._fanout[first - 1] if first else 0
+        high = self._fanout[first]
+        index, shas = self._index, self._shas
+        while low < high:
+            middle = (low + high) // 2
+            start = shas + 20 * middle
+            if index[start : start + 20] < sha:
+                low = middle + 1
+            else:
+                high = middle
+
+        return low
+
+    def _reverse_index(self) -> Tuple[List[int], List[int]]:
+        """Build the reverse index on first use (git's .rev files are not read)"""
+        if self._reverse is None:
+            positions = sorted(range(self.count), key=self._offset)
+            self._reverse = ([self._offset(p) for p in positions], positions)
+        return self._reverse
+
+    def _sha(self, position: int) -> bytes:
+        start = self._shas + 20 * position
+        return self._index[start : start + 20]
+
+    def _offset(self, position: int) -> int:
+        (offset,) = struct.unpack_from(">I", self._index, self._offsets + 4 * position)
+        if offset & 0x80000000:
+            (offset,) = struct.unpack_from(
+                ">Q", self._index, self._large_offsets + 8 * (offset & 0x7FFFFFFF)
+            )
+        return offset
+
+
+class CommitGraph:
+    """Commit-graph of a repository (a single file or a split chain)
+
+    Commits are identified by their position in the concatenated layers,
+    the base layers first, as parent positions are in the file format.
+    """
+
+    def __init__(self, paths: List[str]):
+        self._layers: List[Tuple[Any, int, int, int, Optional[int], int]] = []
+        self.count = 0
+        for path in paths:
+            data = _map_file(path)
+            if data[:4] != b"CGPH" or data[4] != 1 or data[5] != 1:
+                raise ValueError(f"Unsupported commit-graph: {path}")
+
+            chunks = {}
+            for index in range(data[6]):
+                chunk_id, offset = struct.unpack_from(">4sQ", data, 8 + 12 * index)
+                chunks[chunk_id] = offset
+
+            (count,) = struct.unpack_from(">I", data, chunks[b"OIDF"] + 255 * 4)
+            self._layers.append(
+                (
+                    data,
+                    chunks[b"OIDF"],
+                    chunks[b"OIDL"],
+                    chunks[b"CDAT"],
+                    chunks.get(b"EDGE"),
+                    self.count,
+                )
+            )
+            self.count += count
+
+    @classmethod
+    def load(cls, objects_path: str) -> Optional["CommitGraph"]:
+        """Load the commit-graph of an object database, if there is one"""
+        info_path = os.path.join(objects_path, "info")
+        chain_path = os.path.join(info_path, "commit-graphs", "commit-graph-chain")
+        if os.path.isfile(chain_path):
+            with open(chain_path) as chain_file:
+                hashes = chain_file.read().split()
+            paths = [
+                os.path.join(info_path, "commit-graphs", f"graph-{graph_hash}.graph")
+                for graph_hash in hashes
+            ]
+        elif os.path.isfile(os.path.join(info_path, "commit-graph")):
+            paths = [os.path.join(info_path, "commit-graph")]
+        else:
+            return None
+
+        try:
+            return cls(paths)
+        except (OSError, ValueError, KeyError):
+            return None  # Unreadable graphs are ignored, as git does
+
+    def position(self, sha: str) -> Optional[int]:
+        """Get the position of a commit, or None when it is not in the graph"""
+        binary = bytes.fromhex(sha)
+        for data, fanout, oids, _, _, base in self._layers:
+            first = binary[0]
+            low = (
+                struct.unpack_from(">I", data, fanout + 4 * (first - 1))[0]
+                if first
+                else 0
+            )
+            (high,) = struct.unpack_from(">I", data, fanout + 4 * first)
+            while low < high:
+                middle = (low + high) // 2
+                current = data[oids + 20 * middle : oids + 20 * middle + 20]
+                if current < binary:
+                    low = middle + 1
+                elif current > binary:
+                    high = middle
+                else:
+                    return base + middle
+
+        return None
+
+    def sha(self, position: int) -> str:
+        """Get the SHA of the commit at a position"""
+        data, _, oids, _, _, base = self._layer(position)
+        start = oids + 20 * (position - base)
+        return data[start : start + 20].hex()
+
+    def commit(self, position: int) -> Tuple[str, List[int], int, int]:
+        """Get (root tree, parent positions, generation, commit time)"""
+        data, _, _, commit_data, edges, base = self._layer(position)
+        offset = commit_data + 36 * (position - base)
+        tree = data[offset : offset + 20].hex()
+        first, second, high, low = struct.unpack_from(">IIII", data, offset + 20)
+
+        parents = []
+        if first != GRAPH_NO_PARENT:
+            parents.append(first)
+        if second != GRAPH_NO_PARENT and not second & GRAPH_EXTRA_EDGES:
+            parents.append(second)
+        elif second != GRAPH_NO_PARENT and edges is not None:
+            # Octopus merges list their other parents in the edge chunk
+            edge = second & 0x7FFFFFFF
+            while True:
+                (value,) = struct.unpack_from(">I", data, edges + 4 * edge)
+                parents.append(value & 0x7FFFFFFF)
+                if value & GRAPH_EXTRA_EDGES:
+                    break
+                edge += 1
+
+        return tree, parents, high >> 2, ((high & 3) << 32) | low
+
+    def _layer(self, position: int):
+        """Get the layer holding a position"""
+        for layer in reversed(self._layers):
+            if position >= layer[5]:
+                return layer
+        raise IndexError(position)
+
+
+class _Trees(MutableMapping):
+    """Read-only mapping view of the trees of a repository, for TreeStore
+
+    Trees are only looked up by SHA: they cannot be written or listed.
+    """
+
+    def __init__(self, repository: "GitRepository"):
+        self._repository = repository
+
+    def __getitem__(self, sha: str) -> Dict[str, Dict]:
+        entries = self._repository.tree(sha)
+        if entries is None:
+            raise KeyError(sha)
+        return entries
+
+    def __contains__(self, sha: object) -> bool:
+        return isinstance(sha, str) and self._repository.tree(sha) is not None
+
+    def __setitem__(self, sha: str, entries: Dict[str, Dict]) -> None:
+        raise TypeError("Trees of repositories on disk are read-only")
+
+    def __delitem__(self, sha: str) -> None:
+        raise TypeError("Trees of repositories on disk are read-only")
+
+    def __iter__(self) -> Iterator[str]:
+        raise TypeError("Trees of repositories on disk are not listed")
+
+    def __len__(self) -> int:
+        raise TypeError("Trees of repositories on disk are not listed")
+
+
+class PackedObject(NamedTuple):
+    """An object as stored in a pack, for copying into other packs"""
+
+    type_number: int  # Pack object type (OFS_DELTA and REF_DELTA for deltas)
+    size: int  # Size of the object, or of the delta
+    base: Optional[str]  # SHA of the delta base
+    data: bytes  # Compressed data
+
+
+class GitRepository:
+    """A bare git repository on disk"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._objects_path = os.path.join(path, "objects")
+        self._objects = ObjectCache(OBJECT_CACHE_SIZE)
+        self._trees = ObjectCache(TREE_CACHE_SIZE)
+        self._entries = ObjectCache(ENTRY_CACHE_SIZE)
+        self._packs: List[PackFile] = []
+        self._pack_names: set = set()
+        self._packed_refs: Tuple[int, Dict[str, str]] = (-1, {})
+        self._lock = threading.Lock()
+        self.graph = CommitGraph.load(self._objects_path)
+        self.trees = TreeStore(_Trees(self))
+        self.base64 = Base64Cache(self, BASE64_CACHE_SIZE)
+        self._load_packs()
+
+    # Objects
+
+    def read(self, sha: str) -> Optional[Tuple[str, bytes]]:
+        """Get the (type, data) of an object"""
+        location = self._locate(sha)
+        if location is None:
+            return None
+        if isinstance(location, str):
+            return self._read_loose(location)
+        return self._read_packed(*location)
+
+    def get(self, sha: str) -> Optional[bytes]:
+        """Get the content of a blob"""
+        obj = self.read(sha)
+        if obj is None or obj[0] != "blob":
+            return None
+        return obj[1]
+
+    def size(self, sha: str) -> Optional[int]:
+        """Get the size of an object without inflating it"""
+        header = self._header(sha)
+        return header[1] if header is not None else None
+
+    def object_type(self, sha: str) -> Optional[str]:
+        """Get the type of an object without inflating it"""
+        header = self._header(sha)
+        return header[0] if header is not None else None
+
+    def packed(self, sha: str) -> Optional[PackedObject]:
+        """Get an object as stored in its pack, None for loose objects"""
+        location = self._locate(sha)
+        if location is None or isinstance(location, str):
+            return None
+
+        number, offset = location
+        pack = self._packs[number]
+        type_number, size, data_offset, base = pack.entry(offset)
+        if type_number == OFS_DELTA:
+            base = pack.sha_at(base)
+            if base is None:
+                return None
+        return PackedObject(
+            type_number,
+            size,
+            base.hex() if base is not None else None,
+            pack.compressed(offset, data_offset),
+        )
+
+    def tree(self, sha: str) -> Optional[Dict[str, Dict]]:
+        """Get the entries of a tree ({name: {mode, type, sha}})"""
+        entries = self._trees.get(sha)
+        if entries is not None:
+            return entries
+
+        obj = self.read(sha)
+        if obj is None or obj[0] != "tree":
+            return None
+
+        data = obj[1]
+        entries = {}
+        position = 0
+        while position < len(data):
+            space = data.index(b" ", position)
+            end = data.index(b"\0", space)
+            mode = data[position:space].decode().rjust(6, "0")
+            name = data[space + 1 : end].decode("utf-8", "replace")
+            entries[name] = {
+                "mode": mode,
+                "type": "tree"
+                if mode == TREE_MODE
+                else "commit"
+                if mode == GITLINK_MODE
+                else "blob",
+                "sha": data[end + 1 : end + 21].hex(),
+            }
+            position = end + 21
+
+        self._trees.put(sha, entries, len(data))
+        return entries
+
+    def tree_items(self, sha: str) -> Optional[List[Tuple[bytes, str]]]:
+        """Get the (raw mode, SHA) of the entries of a tree, without names
+
+        Much cheaper than ``tree`` when only the objects of a tree are needed.
+        """
+        obj = self.read(sha)
+        if obj is None or obj[0] != "tree":
+            return None
+        return [(mode, sha.hex()) for mode, sha in TREE_ENTRY.findall(obj[1])]
+
+    def commit(self, sha: str) -> Optional[Commit]:
+        """Get a parsed commit"""
+        obj = self.read(sha)
+        if obj is None or obj[0] != "commit":
+            return None
+
+        header, _, message = obj[1].partition(b"\n\n")
+        tree = ""
+        parents = []
+        author: Dict = {}
+        committer: Dict = {}
+        time = 0
+        for line in header.split(b"\n"):
+            key, _, value = line.partition(b" ")
+            if key == b"tree":
+                tree = value.decode()
+            elif key == b"parent":
+                parents.append(value.decode())
+            elif key == b"author":
+                author, _ = _signature(value)
+            elif key == b"committer":
+                committer, time = _signature(value)
+
+        return Commit(
+            sha,
+            tree,
+            parents,
+            author,
+            committer,
+            message.decode("utf-8", "replace"),
+            time,
+        )
+
+    def root_tree(self, sha: str) -> Optional[str]:
+        """Get the root tree of a commit"""
+        graph = self.graph
+        position = graph.position(sha) if graph is not None else None
+        if graph is not None and position is not None:
+            return graph.commit(position)[0]
+
+        commit = self.commit(sha)
+        return commit.tree if commit is not None else None
+
+    def find_prefix(self, prefix: str, limit: int = 2) -> List[str]:
+        """Get the object SHAs starting with a hex prefix (at most limit)"""
+        shas = set()
+        for pack in self._packs:
+            shas.update(pack.find_prefix(prefix, limit))
+
+        loose_path = os.path.join(self._objects_path, prefix[:2])
+        if len(prefix) >= 2 and os.path.isdir(loose_path):
+            for name in os.listdir(loose_path):
+                if (prefix[:2] + name).startswith(prefix) and len(name) == 38:
+                    shas.add(prefix[:2] + name)
+
+        return sorted(shas)[:limit]
+
+    # Refs
+
+    def refs(self) -> Dict[str, str]:
+        """Get every ref ({full ref name: SHA}), loose refs overriding packed ones"""
+        refs = dict(self._read_packed_refs())
+        symbolic = {}
+        refs_path = os.path.join(self.path, "refs")
+        for directory, _, names in os.walk(refs_path):
+            for name in names:
+                path = os.path.join(directory, name)
+                ref = os.path.relpath(path, self.path).replace(os.sep, "/")
+                try:
+                    with open(path) as ref_file:
+                        value = ref_file.read().strip()
+                except OSError:
+                    continue
+                if value.startswith("ref: "):
+                    symbolic[ref] = value[len("ref: ") :]
+                elif len(value) == 40:
+                    refs[ref] = value
+
+        # Symbolic refs (such as refs/remotes/origin/HEAD) take their target SHA
+        for ref, target in symbolic.items():
+            if target in refs:
+                refs[ref] = refs[target]
+
+        return dict(sorted(refs.items()))
+
+    def ref(self, ref: str, follow: bool = True) -> Optional[str]:
+        """Get the SHA of one full ref name, as ``refs`` would give it
+
+        Reads the loose ref file, else looks the ref up in packed-refs, without
+        listing the other refs. Symbolic refs take the SHA of their target
+        (one level, as in ``refs``).
+        """
+        names = ref.split("/")
+        if names[0] != "refs" or any(
+            name in ("", ".", "..") or "\\" in name or "\0" in name for name in names
+        ):
+            return None
+
+        try:
+            with open(os.path.join(self.path, *names)) as ref_file:
+                value = ref_file.read().strip()
+        except OSError:
+            value = ""
+        if value.startswith("ref: ") and follow:
+            sha = self.ref(value[len("ref: ") :], False)
+            if sha is not None:
+                return sha
+        elif len(value) == 40:
+            return value
+        return self._read_packed_refs().get(ref)
+
+    def head(self) -> Optional[str]:
+        """Get the ref HEAD points to (refs/heads/...), None when detached"""
+        try:
+            with open(os.path.join(self.path, "HEAD")) as head_file:
+                value = head_file.read().strip()
+        except OSError:
+            return None
+
+        return value[len("ref: ") :] if value.startswith("ref: ") else None
+
+    def default_branch(self) -> str:
+        """Get the branch HEAD points to"""
+        head = self.head() or "refs/heads/main"
+        return head[len("refs/heads/") :] if head.startswith("refs/heads/") else head
+
+    def resolve(self, name: str) -> Optional[str]:
+        """Resolve a ref (branch, tag, full ref, HEAD or SHA) to a commit SHA
+
+        Branches take precedence over tags, as in the fixture ref tables.
+        """
+        if name == "HEAD":
+            name = self.head() or name
+
+        for ref in (name, f"refs/heads/{name}", f"refs/tags/{name}", f"refs/{name}"):
+            sha = self.ref(ref)
+            if sha is not None:
+                return self.peel(sha)
+
+        name = name.lower()
+        if not 4 <= len(name) <= 40 or not set(name) <= HEX_DIGITS:
+            return None
+        if len(name) == 40:
+            return self.peel(name)
+
+        # Abbreviated SHAs must be unique
+        matches = self.find_prefix(name)
+        return self.peel(matches[0]) if len(matches) == 1 else None
+
+    def peel(self, sha: str) -> Optional[str]:
+        """Follow annotated tags down to a commit"""
+        while True:
+            obj = self.read(sha)
+            if obj is None:
+                return None
+            if obj[0] == "commit":
+                return sha
+            if obj[0] != "tag":
+                return None
+            sha = obj[1][len(b"object ") : len(b"object ") + 40].decode()
+
+    # History
+
+    def parents(self, sha: str) -> Optional[Tuple[int, List[str]]]:
+        """Get (commit time, parent SHAs), from the commit-graph when possible"""
+        graph = self.graph
+        position = graph.position(sha) if graph is not None else None
+        if graph is not None and position is not None:
+            _, parents, _, time = graph.commit(position)
+            return time, [graph.sha(parent) for parent in parents]
+
+        commit = self.commit(sha)
+        return (commit.time, commit.parents) if commit is not None else None
+
+    def generation(self, sha: str) -> Optional[int]:
+        """Get the generation number of a commit in the commit-graph"""
+        graph = self.graph
+        position = graph.position(sha) if graph is not None else None
+        if graph is None or position is None:
+            return None
+        return graph.commit(position)[2]
+
+    def walk(self, starts: Iterable[str]) -> Iterator[str]:
+        """Iterate the commits reachable from starts, newest commit date first
+
+        Only the commit-graph is read for the commits it holds: a commit is
+        inflated only when the caller reads it.
+        """
+        heap: List[Tuple[int, str, List[str]]] = []
+        seen = set()
+        for sha in starts:
+            info = self.parents(sha)
+            if info is not None and sha not in seen:
+                seen.add(sha)
+                heapq.heappush(heap, (-info[0], sha, info[1]))
+
+        while heap:
+            _, sha, parents = heapq.heappop(heap)
+            yield sha
+            for parent in parents:
+                if parent in seen:
+                    continue
+                seen.add(parent)
+                info = self.parents(parent)
+                if info is not None:
+                    heapq.heappush(heap, (-info[0], parent, info[1]))
+
+    def touches(self, sha: str, parents: List[str], path: str) -> bool:
+        """Check whether a commit changed a path
+
+        As in ``git log -- path``, a merge counts only when the path differs
+        from every parent.
+        """
+        root = self.root_tree(sha)
+        if root is None:
+            return False
+        entry = self.path_entry(root, path)
+        if not parents:
+            return entry is not None
+
+        for parent in parents:
+            parent_root = self.root_tree(parent)
+            if parent_root == root:
+                return False
+            parent_entry = self.path_entry(parent_root, path) if parent_root else None
+            if parent_entry == entry:
+                return False
+        return True
+
+    def path_entry(self, root: str, path: str) -> Optional[Tuple[bytes, str]]:
+        """Get the (raw mode, SHA) at a path of a tree
+
+        Scans the raw trees instead of parsing them, which is cheaper for the
+        one-off lookups of history walks. The entries found are cached, as a
+        walk looks each tree up again for the next commit.
+        """
+        mode, sha = b"40000", root
+        for name in filter(None, path.split("/")):
+            if mode != b"40000":
+                return None
+            found = self._entries.get((sha, name))
+            if found is None:
+                obj = self.read(sha)
+                if obj is None or obj[0] != "tree":
+                    return None
+                found = _find_tree_entry(obj[1], name.encode()) or (b"", "")
+                self._entries.put((sha, name), found, ENTRY_SIZE)
+            if not found[0]:
+                return None
+            mode, sha = found
+
+        return mode, sha
+
+    # Internals
+
+    def _locate(self, sha: str) -> Any:
+        """Get the (pack number, offset) of an object, or its loose object path"""
+        if len(sha) != 40 or not set(sha) <= HEX_DIGITS:
+            return None
+
+        binary = bytes.fromhex(sha)
+        for attempt in range(2):
+            for number, pack in enumerate(self._packs):
+                offset = pack.find(binary)
+                if offset is not None:
+                    return number, offset
+
+            path = os.path.join(self._objects_path, sha[:2], sha[2:])
+            if os.path.isfile(path):
+                return path
+
+            # Objects may have been repacked since the packs were listed
+            if attempt == 0 and not self._load_packs():
+                break
+
+        return None
+
+    def _load_packs(self) -> bool:
+        """Open the packs not opened yet, and tell whether there were any"""
+        pack_path = os.path.join(self._objects_path, "pack")
+        if not os.path.isdir(pack_path):
+            return False
+
+        with self._lock:
+            names = sorted(
+                name
+                for name in os.listdir(pack_path)
+                if name.endswith(".idx") and name not in self._pack_names
+            )
+            for name in names:
+                try:
+                    self._packs.append(PackFile(os.path.join(pack_path, name)))
+                except (OSError, ValueError):
+                    continue  # Packs being written are picked up later
+                self._pack_names.add(name)
+
+        return bool(names)
+
+    def _read_packed_refs(self) -> Dict[str, str]:
+        """Read packed-refs (parsed again only when the file changes)"""
+        path = os.path.join(self.path, "packed-refs")
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return {}
+        if self._packed_refs[0] == mtime:
+            return self._packed_refs[1]
+
+        refs = {}
+        with open(path) as refs_file:
+            for line in refs_file:
+                # Skip the header and the peeled SHAs of tags
+                if line.startswith(("#", "^")):
+                    continue
+                sha, _, ref = line.strip().partition(" ")
+                if ref:
+                    refs[ref] = sha
+
+        self._packed_refs = (mtime, refs)
+        return refs
+
+    def _read_loose(self, path: str) -> Optional[Tuple[str, bytes]]:
+        """Read a loose object"""
+        cached = self._objects.get(path)
+        if cached is not None:
+            return cached
+
+        with open(path, "rb") as object_file:
+            data = zlib.decompress(object_file.read())
+        header, _, body = data.partition(b"\0")
+        obj = (header.split(b" ")[0].decode(), body)
+        self._objects.put(path, obj, len(body))
+        return obj
+
+    def _read_packed(self, number: int, offset: int) -> Tuple[str, bytes]:
+        """Read a packed object, resolving its delta chain without recursion"""
+        chain = []
+        key: Any = (number, offset)
+        while True:
+            cached = self._objects.get(key)
+            if cached is not None:
+                object_type, data = cached
+                break
+
+            pack = self._packs[key[0]]
+            type_number, size, data_offset, base = pack.entry(key[1])
+            if type_number == OFS_DELTA:
+                chain.append((key, pack, data_offset, size))
+                key = (key[0], base)
+            elif type_number == REF_DELTA:
+                chain.append((key, pack, data_offset, size))
+                location = self._locate(base.hex())
+                if location is None:
+                    raise ValueError(f"Missing delta base {base.hex()}")
+                if isinstance(location, str):
+                    loose = self._read_loose(location)
+                    if loose is None:
+                        raise ValueError(f"Missing delta base {base.hex()}")
+                    object_type, data = loose
+                    break
+                key = location
+            else:
+                object_type = OBJECT_TYPES[type_number]
+                data = pack.inflate(data_offset, size)
+                self._objects.put(key, (object_type, data), len(data))
+                break
+
+        # Apply the deltas from the base up, caching every intermediate object
+        for key, pack, data_offset, size in reversed(chain):
+            data = apply_delta(data, pack.inflate(data_offset, size))
+            self._objects.put(key, (object_type, data), len(data))
+
+        return object_type, data
+
+    def _header(self, sha: str) -> Optional[Tuple[str, int]]:
+        """Get the (type, size) of an object, reading as little as possible"""
+        location = self._locate(sha)
+        if location is None:
+            return None
+
+        if isinstance(location, str):
+            with open(location, "rb") as object_file:
+                data = zlib.decompressobj().decompress(object_file.read(512), 64)
+            object_type, _, size = data.partition(b"\0")[0].partition(b" ")
+            return object_type.decode(), int(size)
+
+        number, offset = location
+        pack = self._packs[number]
+        type_number, size, data_offset, base = pack.entry(offset)
+        if type_number not in (OFS_DELTA, REF_DELTA):
+            return OBJECT_TYPES[type_number], size
+
+        # The size is in the delta, the type is the type of the chain base
+        size = pack.delta_size(data_offset)
+        while type_number in (OFS_DELTA, REF_DELTA):
+            if type_number == REF_DELTA:
+                base_header = self._header(base.hex())
+                return (base_header[0], size) if base_header else None
+            type_number, _, _, base = pack.entry(base)
+        return OBJECT_TYPES[type_number], size
+
+
+def apply_delta(base: bytes, delta: bytes) -> bytes:
+    """Rebuild an object from its base and a git delta"""
+    _, position = _delta_varint(delta, 0)
+    size, position = _delta_varint(delta, position)
+    base_view = memoryview(base)
+    result = bytearray()
+    while position < len(delta):
+        opcode = delta[position]
+        position += 1
+        if opcode & 0x80:
+            # Copy a range of the base
+            copy_offset = copy_size = 0
+            for index in range(4):
+                if opcode & (1 << index):
+                    copy_offset |= delta[position] << (8 * index)
+                    position += 1
+            for index in range(3):
+                if opcode & (0x10 << index):
+                    copy_size |= delta[position] << (8 * index)
+                    position += 1
+            result += base_view[copy_offset : copy_offset + (copy_size or 0x10000)]
+        elif opcode:
+            # Insert the next bytes of the delta
+            result += delta[position : position + opcode]
+            position += opcode
+        else:
+            raise ValueError("Invalid delta opcode")
+
+    if len(result) != size:
+        raise ValueError("Delta result size mismatch")
+    return bytes(result)
+
+
+def _find_tree_entry(data: bytes, name: bytes) -> Optional[Tuple[bytes, str]]:
+    """Find an entry of a raw tree object: (raw mode, SHA)"""
+    position = 0
+    while position < len(data):
+        space = data.index(b" ", position)
+        end = data.index(b"\0", space)
+        if end - space - 1 == len(name) and data.startswith(name, space + 1):
+            return data[position:space], data[end + 1 : end + 21].hex()
+        position = end + 21
+
+    return None
+
+
+def _delta_varint(data: bytes, position: int) -> Tuple[int, int]:
+    """Read a size of a delta header: (value, next position)"""
+    value = shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            return value, position
+
+
+def _signature(value: bytes) -> Tuple[Dict, int]:
+    """Parse a git signature: ({name, email, date}, epoch seconds)"""
+    text = value.decode("utf-8", "replace")
+    name, _, rest = text.partition(" <")
+    email, _, when = rest.partition("> ")
+    timestamp = int(when.split()[0]) if when.split() else 0
+    return {
+        "name": name,
+        "email": email,
+        "date": datetime.fromtimestamp(timestamp),
+    }, timestamp
+
+
+def _map_file(path: str) -> mmap.mmap:
+    """Memory-map a whole file for reading"""
+    with open(path, "rb") as mapped_file:
+        return mmap.mmap(mapped_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+# Opened repositories, by repository key
+_REPOSITORIES: Dict[str, GitRepository] = {}
+_REPOSITORIES_LOCK = threading.Lock()
+
+
+def get_disk_repository(owner: str, repo_name: str) -> Optional[GitRepository]:
+    """Get the bare repository of {owner}/{repo_name} on disk, if served from disk"""
+    root = os.environ.get("GITBUCKET_MOCK_GIT_ROOT")
+    if not root:
+        return None
+
+    repo_key = f"{owner}/{repo_name}"
+    repository = _REPOSITORIES.get(repo_key)
+    if repository is not None:
+        return repository
+
+    if not (REPOSITORY_NAME.match(owner) and REPOSITORY_NAME.match(repo_name)):
+        return None
+
+    for name in (f"{repo_name}.git", repo_name):
+        path = os.path.join(root, owner, name)
+        if os.path.isdir(os.path.join(path, "objects")):
+            with _REPOSITORIES_LOCK:
+                if repo_key not in _REPOSITORIES:
+                    _REPOSITORIES[repo_key] = GitRepository(path)
+                return _REPOSITORIES[repo_key]
+
+    return None
@@ -0,0 +1,679 @@
+"""Git smart HTTP fetches (upload-pack)
+
+Repositories are served to ``git clone`` and ``git fetch`` over the smart
+HTTP protocol, version 0 in its stateless form: ``info/refs`` advertises the
+refs, and each ``git-upload-pack`` request negotiates the common commits
+with the client and, once the client is done, sends a pack of the objects it
+is missing.
+
+Repositories on disk (see ``data.git_repository``) are served from their
+object database, and packed objects are copied as they are stored: deltas
+are reused, never recomputed, and nothing is recompressed. Other
+repositories are served from the commit, tree and blob tables. Commits
+written through the API have real git SHAs, but the commits of the fixtures
+have placeholder SHAs that no object hashes to: refs whose history reaches
+one of them are not advertised, as it cannot be sent. Only repositories
+whose whole history was written through the API (such as the ones created
+with ``auto_init``) can be cloned, and a fetch of commits whose history
+cannot be sent is answered with an ``ERR`` line instead of a pack.
+
+A pack only depends on the objects wanted and the commits the client has,
+so built packs are cached by these two sets, in an LRU bounded in bytes.
+"""
+
+import hashlib
+import heapq
+import itertools
+import struct
+import zlib
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+from data.commits import REPOSITORY_COMMITS
+from data.contents import BLOBS, GIT_TREES
+from data.git_objects import commit_body, hash_object, tree_body
+from data.git_refs import REPOSITORY_REFS
+from data.git_repository import (
+    OFS_DELTA,
+    REF_DELTA,
+    ObjectCache,
+    get_disk_repository,
+)
+from data.repositories import REPOSITORIES
+from data.tree_store import EMPTY_TREE
+
+# Raw modes of subtrees and submodule commits in tree objects
+TREE_MODE = b"40000"
+GITLINK_MODE = b"160000"
+
+# Capabilities advertised to clients
+CAPABILITIES = (
+    "multi_ack_detailed no-done side-band side-band-64k ofs-delta thin-pack "
+    "include-tag no-progress agent=gitbucket-mock"
+)
+
+# Memory used by the cached packs of all repositories
+PACK_CACHE_SIZE = 256 * 1024 * 1024
+
+# Bytes of pack data sent at once, and in one side-band packet
+PACK_CHUNK_SIZE = 64 * 1024
+SIDE_BAND_SIZES = {"side-band-64k": 65515, "side-band": 995}
+
+FLUSH = b"0000"
+
+# Pack object type numbers
+TYPE_NUMBERS = {"commit": 1, "tree": 2, "blob": 3, "tag": 4}
+
+_PACKS = ObjectCache(PACK_CACHE_SIZE)
+
+# Commits of the tables whose whole history can be sent, per repository
+_complete: Dict[str, Set[str]] = {}
+
+
+class FetchRequest(NamedTuple):
+    """One upload-pack request of a stateless fetch"""
+
+    wants: List[str]
+    haves: List[str]
+    capabilities: Set[str]
+    done: bool
+
+
+class StoredRepository:
+    """Git objects of a repository kept in the commit, tree and blob tables"""
+
+    def __init__(self, owner: str, repo_name: str):
+        self.repo_key = f"{owner}/{repo_name}"
+
+    def refs(self) -> Dict[str, str]:
+        """Get the refs whose history can be served ({full ref name: SHA})"""
+        refs = {}
+        if self.repo_key in REPOSITORY_REFS:
+            for ref, reference in REPOSITORY_REFS[self.repo_key].items():
+                sha = reference["object"]["sha"]
+                if self._complete(sha):
+                    refs[ref] = sha
+
+        return dict(sorted(refs.items()))
+
+    def head(self) -> Optional[str]:
+        """Get the ref HEAD points to"""
+        repository = REPOSITORIES.get(self.repo_key)
+        return f"refs/heads/{repository['default_branch']}" if repository else None
+
+    def read(self, sha: str) -> Optional[Tuple[str, bytes]]:
+        """Get the (type, data) of an object"""
+        commit = self._commit(sha)
+        if commit is not None:
+            return "commit", commit[0]
+
+        tree = self.tree(sha)
+        if tree is not None:
+            return "tree", tree_body(tree)
+
+        blob = BLOBS.get(sha)
+        return ("blob", bytes(blob)) if blob is not None else None
+
+    def object_type(self, sha: str) -> Optional[str]:
+        """Get the type of an object"""
+        if self._commit(sha) is not None:
+            return "commit"
+        if self.tree(sha) is not None:
+            return "tree"
+        return "blob" if BLOBS.size(sha) is not None else None
+
+    def tree(self, sha: str) -> Optional[Dict[str, Dict]]:
+        """Get the entries of a tree ({name: {mode, type, sha}})"""
+        if sha == EMPTY_TREE:
+            return {}
+        if self.repo_key not in GIT_TREES:
+            return None
+        return GIT_TREES[self.repo_key].get(sha)
+
+    def tree_items(self, sha: str) -> Optional[List[Tuple[bytes, str]]]:
+        """Get the (raw mode, SHA) of the entries of a tree"""
+        entries = self.tree(sha)
+        if entries is None:
+            return None
+        return [
+            (entry["mode"].lstrip("0").encode(), entry["sha"])
+            for entry in entries.values()
+        ]
+
+    def root_tree(self, sha: str) -> Optional[str]:
+        """Get the root tree of a commit"""
+        commit = self._commit(sha)
+        return commit[1]["commit"]["tree"]["sha"] if commit is not None else None
+
+    def parents(self, sha: str) -> Optional[Tuple[int, List[str]]]:
+        """Get (commit time, parent SHAs)"""
+        commit = self._commit(sha)
+        if commit is None:
+            return None
+
+        record = commit[1]
+        time = int(record["commit"]["committer"]["date"].timestamp())
+        return time, [parent["sha"] for parent in record["parents"]]
+
+    def peel(self, sha: str) -> Optional[str]:
+        """Follow annotated tags down to a commit (there are none in the tables)"""
+        return sha if self._commit(sha) is not None else None
+
+    def packed(self, sha: str) -> None:
+        """Objects in the tables are not packed"""
+        return None
+
+    def _complete(self, sha: str) -> bool:
+        """Check whether every commit reachable from a commit can be served
+
+        Commits never change, so the commits found complete are remembered
+        and later walks stop at them.
+        """
+        complete = _complete.setdefault(self.repo_key, set())
+        stack = [sha]
+        seen = {sha}
+        while stack:
+            commit = stack.pop()
+            if commit in complete:
+                continue
+            if self._commit(commit) is None:
+                return False
+            for parent in REPOSITORY_COMMITS[self.repo_key][commit]["parents"]:
+                if parent["sha"] not in seen:
+                    seen.add(parent["sha"])
+                    stack.append(parent["sha"])
+
+        complete.update(seen)
+        return True
+
+    def _commit(self, sha: str) -> Optional[Tuple[bytes, Dict]]:
+        """Get the (object data, record) of a commit whose record hashes to sha"""
+        if self.repo_key not in REPOSITORY_COMMITS:
+            return None
+        record = REPOSITORY_COMMITS[self.repo_key].get(sha)
+        if record is None:
+            return None
+
+        body = commit_body(
+            record["commit"]["tree"]["sha"],
+            [parent["sha"] for parent in record["parents"]],
+            record["commit"]["author"],
+            record["commit"]["committer"],
+            record["commit"]["message"],
+        )
+        return (body, record) if hash_object("commit", body) == sha else None
+
+
+def get_upload_pack_advertisement(owner: str, repo_name: str) -> Optional[bytes]:
+    """Get the ref advertisement of ``info/refs?service=git-upload-pack``"""
+    source = _git_source(owner, repo_name)
+    if source is None:
+        return None
+
+    refs = source.refs()
+    head = source.head()
+    capabilities = CAPABILITIES
+    advertised = []
+    if head in refs:
+        capabilities += f" symref=HEAD:{head}"
+        advertised.append(("HEAD", refs[head]))
+    for ref, sha in refs.items():
+        advertised.append((ref, sha))
+        peeled = source.peel(sha)
+        if peeled is not None and peeled != sha:
+            advertised.append((f"{ref}^{{}}", peeled))
+
+    # An empty repository still advertises its capabilities
+    if not advertised:
+        advertised.append(("capabilities^{}", "0" * 40))
+
+    lines = [pkt_line(b"# service=git-upload-pack\n"), FLUSH]
+    for index, (name, sha) in enumerate(advertised):
+        line = f"{sha} {name}\0{capabilities}\n" if index == 0 else f"{sha} {name}\n"
+        lines.append(pkt_line(line.encode()))
+    lines.append(FLUSH)
+
+    return b"".join(lines)
+
+
+def upload_pack(owner: str, repo_name: str, body: bytes) -> Optional[Iterator[bytes]]:
+    """Answer an upload-pack request of a stateless fetch
+
+    Returns the response as an iterator of chunks, the pack being built
+    while it is sent, or None when the repository does not exist.
+    """
+    source = _git_source(owner, repo_name)
+    if source is None:
+        return None
+
+    try:
+        request = _parse_request(body)
+    except ValueError as error:
+        return iter([pkt_line(f"ERR {error}\n".encode())])
+
+    return _respond(source, f"{owner}/{repo_name}", request)
+
+
+def pkt_line(data: bytes) -> bytes:
+    """Frame data as a pkt-line"""
+    return f"{len(data) + 4:04x}".encode() + data
+
+
+def _git_source(owner: str, repo_name: str) -> Any:
+    """Get the objects of a repository: on disk, or in the tables"""
+    disk = get_disk_repository(owner, repo_name)
+    if disk is not None:
+        return disk
+    if f"{owner}/{repo_name}" in REPOSITORIES:
+        return StoredRepository(owner, repo_name)
+    return None
+
+
+def _parse_request(body: bytes) -> FetchRequest:
+    """Parse the want, have and done lines of a request"""
+    wants: List[str] = []
+    haves: List[str] = []
+    capabilities: Set[str] = set()
+    done = False
+    position = 0
+    while position < len(body):
+        try:
+            length = int(body[position : position + 4], 16)
+        except ValueError:
+            raise ValueError("invalid pkt-line") from None
+        if length == 0 or length == 1:
+            position += 4  # Flush and delimiter packets
+            continue
+        if length < 4 or position + length > len(body):
+            raise ValueError("invalid pkt-line")
+
+        line = body[position + 4 : position + length].rstrip(b"\n").decode()
+        position += length
+        command, _, argument = line.partition(" ")
+        if command == "want":
+            sha, _, rest = argument.partition(" ")
+            wants.append(sha)
+            if not capabilities:
+                capabilities.update(rest.split())
+        elif command == "have":
+            haves.append(argument)
+        elif command == "done":
+            done = True
+        elif command not in ("shallow", "deepen", "deepen-since", "deepen-not"):
+            raise ValueError(f"unexpected line '{line}'")
+
+    if not wants:
+        raise ValueError("no want lines")
+    return FetchRequest(wants, haves, capabilities, done)
+
+
+def _respond(source: Any, repo_key: str, request: FetchRequest) -> Iterator[bytes]:
+    """Negotiate as upload-pack does with multi_ack_detailed, then send the pack"""
+    for want in request.wants:
+        if source.object_type(want) is None:
+            yield pkt_line(f"ERR upload-pack: not our ref {want}\n".encode())
+            return
+
+    common = [have for have in request.haves if source.parents(have) is not None]
+    ready = bool(common) and _ready(source, request.wants, common)
+    last = common[-1] if common else None
+
+    lines = []
+    known = set(common)
+    for have in request.haves:
+        if have in known:
+            lines.append(f"ACK {have} common\n")
+        elif ready:
+            lines.append(f"ACK {have} ready\n")
+    if not request.done:
+        # The client sends more haves unless the commits in common are enough
+        if ready and len(common) == len(request.haves):
+            lines.append(f"ACK {last} ready\n")
+        lines.append("NAK\n")
+        if not (ready and "no-done" in request.capabilities):
+            yield b"".join(pkt_line(line.encode()) for line in lines)
+            return
+        lines.append(f"ACK {last}\n")
+    else:
+        lines.append(f"ACK {last}\n" if last else "NAK\n")
+
+    # The objects to send are found before answering, so that history that
+    # cannot be sent is reported instead of the pack
+    pack = _get_pack(source, repo_key, request, common)
+    try:
+        first = next(pack, b"")
+    except ValueError as error:
+        yield pkt_line(f"ERR upload-pack: {error}\n".encode())
+        return
+    yield b"".join(pkt_line(line.encode()) for line in lines)
+
+    band_size = next(
+        (
+            size
+            for capability, size in SIDE_BAND_SIZES.items()
+            if capability in request.capabilities
+        ),
+        None,
+    )
+    try:
+        for chunk in itertools.chain([first], pack):
+            if band_size is None:
+                yield chunk
+                continue
+            for start in range(0, len(chunk), band_size):
+                yield pkt_line(b"\1" + chunk[start : start + band_size])
+    except ValueError as error:
+        message = f"upload-pack: {error}\n".encode()
+        yield pkt_line(b"\3" + message) if band_size else pkt_line(b"ERR " + message)
+        return
+
+    if band_size is not None:
+        yield FLUSH
+
+
+def _ready(source: Any, wants: List[str], common: List[str]) -> bool:
+    """Check whether every wanted commit reaches a commit in common
+
+    Commits older than every commit in common cannot reach one, so the walk
+    stops there.
+    """
+    targets = set(common)
+    oldest = min(source.parents(sha)[0] for sha in common)
+    for want in wants:
+        commit = source.peel(want)
+        if commit is None:
+            continue
+
+        found = False
+        stack = [commit]
+        seen = {commit}
+        while stack:
+            sha = stack.pop()
+            if sha in targets:
+                found = True
+                break
+            info = source.parents(sha)
+            if info is None or info[0] < oldest:
+                continue
+            for parent in info[1]:
+                if parent not in seen:
+                    seen.add(parent)
+                    stack.append(parent)
+        if not found:
+            return False
+
+    return True
+
+
+def _get_pack(
+    source: Any, repo_key: str, request: FetchRequest, common: List[str]
+) -> Iterator[bytes]:
+    """Get the pack of a request, from the cache or built while sent"""
+    include_tags = "include-tag" in request.capabilities
+    ofs_delta = "ofs-delta" in request.capabilities
+    thin = "thin-pack" in request.capabilities
+    key = (
+        repo_key,
+        frozenset(request.wants),
+        frozenset(common),
+        include_tags,
+        ofs_delta,
+        thin,
+    )
+    pack = _PACKS.get(key)
+    if pack is not None:
+        for start in range(0, len(pack), PACK_CHUNK_SIZE):
+            yield pack[start : start + PACK_CHUNK_SIZE]
+        return
+
+    objects, excluded = _objects_to_send(source, request.wants, common, include_tags)
+    chunks = []
+    size = 0
+    for chunk in _write_pack(source, objects, excluded, ofs_delta, thin):
+        if size <= PACK_CACHE_SIZE:
+            chunks.append(chunk)
+            size += len(chunk)
+        yield chunk
+
+    if size <= PACK_CACHE_SIZE:
+        _PACKS.put(key, b"".join(chunks), size)
+
+
+def _commits_to_send(
+    source: Any, wants: Iterable[str], common: Iterable[str]
+) -> Tuple[List[str], Set[str]]:
+    """Get the commits reachable from wants but not from common, newest first
+
+    Returns the commits and the edge: the commits in common that are parents
+    of sent commits. Commits are walked by commit time, so the walk stops
+    once only commits reachable from common are left.
+    """
+    # Commit SHA -> reachable from common
+    uninteresting: Dict[str, bool] = {}
+    queued: Set[str] = set()
+    heap: List[Tuple[int, str, List[str]]] = []
+    interesting = 0
+
+    def push(sha: str, known: bool) -> None:
+        nonlocal interesting
+        if sha in uninteresting:
+            # Commits already sent stay sent (commit dates may be skewed)
+            if known and sha in queued and not uninteresting[sha]:
+                uninteresting[sha] = True
+                interesting -= 1
+            return
+        info = source.parents(sha)
+        if info is None:
+            if known:
+                return  # History the client has may be unknown here
+            raise ValueError(f"missing commit {sha}")
+        uninteresting[sha] = known
+        interesting += not known
+        queued.add(sha)
+        heapq.heappush(heap, (-info[0], sha, info[1]))
+
+    for sha in common:
+        push(sha, True)
+    for sha in wants:
+        push(sha, False)
+
+    commits = []
+    edge = set()
+    while heap and interesting:
+        _, sha, parents = heapq.heappop(heap)
+        queued.discard(sha)
+        if uninteresting[sha]:
+            for parent in parents:
+                push(parent, True)
+            continue
+
+        interesting -= 1
+        commits.append(sha)
+        for parent in parents:
+            push(parent, False)
+
+    for sha in commits:
+        edge.update(
+            parent for parent in source.parents(sha)[1] if uninteresting.get(parent)
+        )
+
+    return commits, edge
+
+
+def _objects_to_send(
+    source: Any, wants: Iterable[str], common: List[str], include_tags: bool
+) -> Tuple[List[str], Set[str]]:
+    """Get the objects of the pack, and the objects the client already has
+
+    The objects the client has are the ones of the edge commits: objects
+    shared with them are not sent, and thin packs may use them as delta
+    bases. With ``include_tags``, the annotated tags of the sent commits are
+    sent too.
+    """
+    objects: List[str] = []
+    commit_wants = []
+    other_wants = []
+    for sha in wants:
+        # Annotated tags are sent along with the objects they point to
+        sha = _add_tag_objects(source, sha, objects)
+        if source.object_type(sha) == "commit":
+            commit_wants.append(sha)
+        else:
+            other_wants.append(sha)
+
+    commits, edge = _commits_to_send(source, commit_wants, common)
+    excluded: Set[str] = set()
+    for sha in edge:
+        _add_tree_objects(source, source.root_tree(sha), excluded, None)
+
+    if include_tags:
+        sent = set(commits)
+        for ref, sha in source.refs().items():
+            if (
+                ref.startswith("refs/tags/")
+                and sha not in objects
+                and source.object_type(sha) == "tag"
+                and source.peel(sha) in sent
+            ):
+                _add_tag_objects(source, sha, objects)
+
+    seen = set(excluded)
+    seen.update(objects)
+    objects.extend(commits)
+    seen.update(commits)
+    for sha in commits:
+        _add_tree_objects(source, source.root_tree(sha), seen, objects)
+    for sha in other_wants:
+        if source.object_type(sha) == "tree":
+            _add_tree_objects(source, sha, seen, objects)
+        elif sha not in seen:
+            seen.add(sha)
+            objects.append(sha)
+
+    return objects, excluded
+
+
+def _add_tag_objects(source: Any, sha: str, objects: List[str]) -> str:
+    """Add the chain of annotated tags starting at sha, and get its target"""
+    while source.object_type(sha) == "tag":
+        if sha not in objects:
+            objects.append(sha)
+        data = source.read(sha)[1]
+        sha = data[len(b"object ") : len(b"object ") + 40].decode()
+    return sha
+
+
+def _add_tree_objects(
+    source: Any, root: Optional[str], seen: Set[str], objects: Optional[List[str]]
+) -> None:
+    """Add a tree and everything under it not seen yet, skipping seen subtrees"""
+    if root is None or root in seen:
+        return
+
+    seen.add(root)
+    if objects is not None:
+        objects.append(root)
+    stack = [root]
+    while stack:
+        items = source.tree_items(stack.pop())
+        if items is None:
+            raise ValueError("missing tree")
+        for mode, sha in items:
+            # Submodule commits belong to other repositories
+            if mode == GITLINK_MODE or sha in seen:
+                continue
+            seen.add(sha)
+            if objects is not None:
+                objects.append(sha)
+            if mode == TREE_MODE:
+                stack.append(sha)
+
+
+def _write_pack(
+    source: Any, objects: List[str], excluded: Set[str], ofs_delta: bool, thin: bool
+) -> Iterator[bytes]:
+    """Write a version 2 pack, reusing the stored deltas whose base is usable
+
+    A delta is reused when its base is in the pack (written first, as an
+    offset delta when the client supports them) or, in thin packs, when the
+    client has it. Other objects are sent whole, packed ones as stored.
+    """
+    checksum = hashlib.sha1()
+    buffer = bytearray(b"PACK" + struct.pack(">II", 2, len(objects)))
+    sending = set(objects)
+    offsets: Dict[str, int] = {}
+    position = len(buffer)
+    for sha in objects:
+        stack = [sha]
+        while stack:
+            current = stack[-1]
+            if current in offsets:
+                stack.pop()
+                continue
+
+            entry = None
+            packed = source.packed(current)
+            if packed is not None and packed.base is None:
+                entry = _entry_header(packed.type_number, packed.size) + packed.data
+            elif packed is not None and packed.base in sending and ofs_delta:
+                if packed.base not in offsets and packed.base not in stack:
+                    stack.append(packed.base)  # Write the base first
+                    continue
+                if packed.base in offsets:
+                    entry = (
+                        _entry_header(OFS_DELTA, packed.size)
+                        + _offset_encoding(position - offsets[packed.base])
+                        + packed.data
+                    )
+            elif packed is not None and (
+                packed.base in sending or (thin and packed.base in excluded)
+            ):
+                entry = (
+                    _entry_header(REF_DELTA, packed.size)
+                    + bytes.fromhex(packed.base)
+                    + packed.data
+                )
+
+            if entry is None:
+                obj = source.read(current)
+                if obj is None:
+                    raise ValueError(f"missing object {current}")
+                entry = _entry_header(
+                    TYPE_NUMBERS[obj[0]], len(obj[1])
+                ) + zlib.compress(obj[1])
+
+            offsets[current] = position
+            position += len(entry)
+            buffer += entry
+            stack.pop()
+            if len(buffer) >= PACK_CHUNK_SIZE:
+                checksum.update(buffer)
+                yield bytes(buffer)
+                buffer.clear()
+
+    checksum.update(buffer)
+    buffer += checksum.digest()
+    yield bytes(buffer)
+
+
+def _entry_header(type_number: int, size: int) -> bytes:
+    """Encode the type and size header of a pack entry"""
+    header = bytearray()
+    byte = (type_number << 4) | (size & 0x0F)
+    size >>= 4
+    while size:
+        header.append(byte | 0x80)
+        byte = size & 0x7F
+        size >>= 7
+    header.append(byte)
+    return bytes(header)
+
+
+def _offset_encoding(distance: int) -> bytes:
+    """Encode the distance to the base of an offset delta"""
+    encoded = bytearray([distance & 0x7F])
+    distance >>= 7
+    while distance:
+        distance -= 1
+        encoded.append(0x80 | (distance & 0x7F))
+        distance >>= 7
+    return bytes(reversed(encoded))
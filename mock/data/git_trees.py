@@ -0,0 +1,77 @@
+from itertools import islice
+from typing import Dict, Optional
+
+from data.blob_store import Base64Cache
+from data.contents import BASE64_CACHE, GIT_TREES, get_snapshot
+from data.git_repository import get_disk_repository
+from data.tree_store import TreeStore
+
+# Maximum number of entries of a tree response, as in the GitHub API
+TREE_ENTRY_LIMIT = 100000
+
+
+def get_tree(
+    owner: str,
+    repo_name: str,
+    tree_sha: str,
+    recursive: bool = False,
+    limit: int = TREE_ENTRY_LIMIT,
+) -> Optional[Dict]:
+    """Get a tree, or the root tree of a commit, branch or tag
+
+    Trees are read from the repository on disk when there is one, as
+    contents are. Recursive listings walk the whole tree lazily and stop
+    after ``limit`` entries, marking the response as truncated.
+    """
+    repo_key = f"{owner}/{repo_name}"
+    disk = get_disk_repository(owner, repo_name)
+    if disk is not None:
+        trees, base64 = disk.trees, disk.base64
+    elif repo_key in GIT_TREES:
+        trees, base64 = TreeStore(GIT_TREES[repo_key]), BASE64_CACHE
+    else:
+        return None
+
+    # Other names than tree SHAs name the root tree of a commit
+    root = tree_sha
+    if trees.get(tree_sha) is None:
+        snapshot = get_snapshot(owner, repo_name, tree_sha)
+        if snapshot is None:
+            return None
+        root = snapshot.root
+
+    # One extra entry tells whether the listing is truncated
+    entries = list(islice(trees.walk(root, recursive), limit + 1))
+    truncated = len(entries) > limit
+
+    return {
+        "sha": root,
+        "url": f"/api/v3/repos/{repo_key}/git/trees/{root}",
+        "tree": [
+            format_tree_entry(repo_key, path, entry, base64)
+            for path, entry in entries[:limit]
+        ],
+        "truncated": truncated,
+    }
+
+
+def format_tree_entry(
+    repo_key: str, path: str, entry: Dict, base64: Base64Cache = BASE64_CACHE
+) -> Dict:
+    """Format tree entry response (base64 gives the sizes of the blobs)"""
+    response = {
+        "path": path,
+        "mode": entry["mode"],
+        "type": entry["type"],
+        "sha": entry["sha"],
+    }
+
+    if entry["type"] == "blob":
+        response["size"] = entry.get("size")
+        if response["size"] is None:
+            response["size"] = base64.size(entry["sha"])
+        response["url"] = f"/api/v3/repos/{repo_key}/git/blobs/{entry['sha']}"
+    else:
+        response["url"] = f"/api/v3/repos/{repo_key}/git/trees/{entry['sha']}"
+
+    return response
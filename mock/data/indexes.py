@@ -0,0 +1,100 @@
+"""Cache for derived in-memory indexes
+
+Indexes are derived from the tables in the storage backend. They are built
+lazily per repository, updated incrementally by the functions that modify
+the underlying records (or by the subscribers of ``data.events`` for the git
+data), and dropped when another process changes the data (see
+``StorageBackend.data_version``). Updates made in a storage transaction are
+applied when it ends, and only if its changes were kept.
+"""
+
+from typing import Callable, Dict, Generic, Optional, TypeVar
+
+from data.storage import backend
+
+T = TypeVar("T")
+
+
+class RepoIndexCache(Generic[T]):
+    """Per-repository index cache"""
+
+    def __init__(self, build: Callable[[str], T]):
+        self._build = build
+        self._indexes: Dict[str, T] = {}
+        self._version: Optional[int] = None
+
+    def get(self, repo_key: str) -> T:
+        """Get the index for a repository, building it if needed"""
+        version = backend.data_version()
+        if version != self._version:
+            self._indexes.clear()
+            self._version = version
+
+        if repo_key not in self._indexes:
+            self._indexes[repo_key] = self._build(repo_key)
+        return self._indexes[repo_key]
+
+    def peek(self, repo_key: str) -> Optional[T]:
+        """Get the index for a repository only if it is already built"""
+        if backend.data_version() != self._version:
+            return None
+
+        return self._indexes.get(repo_key)
+
+    def discard(self, repo_key: str) -> None:
+        """Drop the index for a repository so it is rebuilt on next use"""
+        self._indexes.pop(repo_key, None)
+
+    def update(self, repo_key: str, change: Callable[[T], None]) -> None:
+        """Change the index of a repository once the running transaction is kept
+
+        Must be called inside ``backend.transaction()``. When the transaction
+        is rolled back, the index is dropped instead: it may have been built
+        from the changes being undone. Indexes not built yet are left alone.
+        """
+
+        def apply(kept: bool) -> None:
+            index = self.peek(repo_key)
+            if index is None:
+                return
+            if kept:
+                change(index)
+            else:
+                self.discard(repo_key)
+
+        backend.after_transaction(apply)
+
+
+class IndexCache(Generic[T]):
+    """Cache for one index over a whole table"""
+
+    def __init__(self, build: Callable[[], T]):
+        self._build = build
+        self._index: Optional[T] = None
+        self._version: Optional[int] = None
+
+    def get(self) -> T:
+        """Get the index, building it if needed"""
+        version = backend.data_version()
+        if self._index is None or version != self._version:
+            self._index = self._build()
+            self._version = version
+
+        return self._index
+
+    def update(self, change: Callable[[T], None]) -> None:
+        """Change the index once the running transaction is kept
+
+        Must be called inside ``backend.transaction()``. When the transaction
+        is rolled back, the index is dropped instead.
+        """
+
+        def apply(kept: bool) -> None:
+            if self._index is None or backend.data_version() != self._version:
+                return
+            if kept:
+                change(self._index)
+            else:
+                self._index = None
+
+        backend.after_transaction(apply)
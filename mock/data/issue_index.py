@@ -0,0 +1,256 @@
+"""Issue index for filtered listing
+
+Keeps the issues of one repository in structures that answer the issue list
+filters without scanning the repository:
+
+- issue numbers in ascending sorted lists per state (plus one for "all").
+  Numbers are allocated in creation order, so these lists double as the
+  ``sort=created`` order.
+- ``(updated_at, number)`` and ``(comments, number)`` sorted lists per state
+  for the other sort orders and for ``since`` (a bisect gives every issue
+  updated since a timestamp).
+- sets of issue numbers per assignee, creator and milestone, including the
+  ``*`` (any) and ``none`` keys of the GitHub API.
+
+Label sets are kept next to the labels (``data.labels.LABEL_ISSUES``) and
+passed in by the caller. A filtered query walks the smallest matching set and
+checks the other filters by membership, so its cost follows the size of that
+set instead of the number of issues in the repository. Without set filters,
+a page is sliced from the sorted list of its order and state, except for
+``since`` with ``sort=created`` or ``sort=comments``: those lists are
+filtered linearly.
+"""
+
+import bisect
+from datetime import datetime
+from itertools import islice
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+)
+
+ANY = "*"
+NONE = "none"
+
+
+class IssueEntry(NamedTuple):
+    """Indexed fields of an issue"""
+
+    number: int
+    state: str
+    creator: str
+    assignees: Tuple[str, ...]
+    milestone: str
+    updated_at: datetime
+    comments: int
+
+    @classmethod
+    def from_issue(cls, issue: Dict, comments: int) -> "IssueEntry":
+        milestone = issue.get("milestone")
+        return cls(
+            number=issue["number"],
+            state=issue["state"],
+            creator=issue["user"]["login"],
+            assignees=tuple(user["login"] for user in issue.get("assignees") or []),
+            milestone=str(milestone["number"]) if milestone else NONE,
+            updated_at=issue["updated_at"],
+            comments=comments,
+        )
+
+
+class IssueIndex:
+    """Issue numbers of a repository indexed by the issue list filters"""
+
+    def __init__(self, issues: Iterable[Tuple[Dict, int]]):
+        self._entries: Dict[int, IssueEntry] = {}
+        self._states: Dict[str, List[int]] = {"all": []}
+        self._updated: Dict[str, List[Tuple[datetime, int]]] = {"all": []}
+        self._comments: Dict[str, List[Tuple[int, int]]] = {"all": []}
+        self._sets: Dict[str, Dict[str, Set[int]]] = {
+            "assignee": {},
+            "creator": {},
+            "milestone": {},
+        }
+
+        # Append everything first and sort the lists once
+        for issue, comments in issues:
+            self._index(IssueEntry.from_issue(issue, comments), _append)
+
+        for lists in (self._states, self._updated, self._comments):
+            for values in lists.values():
+                values.sort()
+
+    def put(self, issue: Dict, comments: int) -> None:
+        """Add an issue or update it after a change"""
+        entry = IssueEntry.from_issue(issue, comments)
+        old_entry = self._entries.get(entry.number)
+        if old_entry == entry:
+            return
+
+        if old_entry is not None:
+            self._unindex(old_entry)
+        self._index(entry, _insert)
+
+    def query(
+        self,
+        state: str = "open",
+        label_sets: Iterable[Set[int]] = (),
+        assignee: Optional[str] = None,
+        creator: Optional[str] = None,
+        milestone: Optional[str] = None,
+        since: Optional[datetime] = None,
+        sort: str = "created",
+        direction: str = "desc",
+        page: int = 1,
+        per_page: int = 30,
+    ) -> List[int]:
+        """Get one page of issue numbers matching every filter"""
+        sets = list(label_sets)
+        for field, value in (
+            ("assignee", assignee),
+            ("creator", creator),
+            ("milestone", milestone),
+        ):
+            if value is not None:
+                sets.append(self._sets[field].get(value, set()))
+
+        start = (page - 1) * per_page
+        reverse = direction == "desc"
+
+        # Without set filters, take the page from the requested order
+        if not sets:
+            return self._page(state, since, sort, reverse, start, per_page)
+
+        # Otherwise walk the smallest set and check the others by membership
+        sets.sort(key=len)
+        base, others = sets[0], sets[1:]
+        matched = [
+            number
+            for number in base
+            if all(number in other for other in others)
+            and self._matches(number, state, since)
+        ]
+        matched.sort(key=self._sort_key(sort), reverse=reverse)
+
+        return matched[start : start + per_page]
+
+    def _page(
+        self,
+        state: str,
+        since: Optional[datetime],
+        sort: str,
+        reverse: bool,
+        start: int,
+        count: int,
+    ) -> List[int]:
+        """Get one page of issue numbers in a sort order, filtered by state and since"""
+        if sort == "updated":
+            pairs = self._updated.get(state, [])
+            low = 0 if since is None else bisect.bisect_left(pairs, (since,))
+            return [number for _, number in _slice(pairs, low, start, count, reverse)]
+
+        if since is None:
+            if sort == "comments":
+                pairs = self._comments.get(state, [])
+                return [number for _, number in _slice(pairs, 0, start, count, reverse)]
+            return _slice(self._states.get(state, []), 0, start, count, reverse)
+
+        # No list is sorted by update time in these orders: filter linearly
+        numbers: Iterable[int]
+        if sort == "comments":
+            pairs = self._comments.get(state, [])
+            numbers = (number for _, number in (reversed(pairs) if reverse else pairs))
+        else:
+            values = self._states.get(state, [])
+            numbers = reversed(values) if reverse else values
+        matching = (
+            number for number in numbers if self._entries[number].updated_at >= since
+        )
+        return list(islice(matching, start, start + count))
+
+    def _matches(self, number: int, state: str, since: Optional[datetime]) -> bool:
+        """Check the state and since filters for an issue"""
+        entry = self._entries[number]
+        if state != "all" and entry.state != state:
+            return False
+        return since is None or entry.updated_at >= since
+
+    def _sort_key(self, sort: str) -> Callable[[int], tuple]:
+        """Get the sort key function for a sort order"""
+        if sort == "updated":
+            return lambda number: (self._entries[number].updated_at, number)
+        if sort == "comments":
+            return lambda number: (self._entries[number].comments, number)
+        return lambda number: (number,)
+
+    def _index(self, entry: IssueEntry, insert: Callable[[list, object], None]) -> None:
+        """Add an entry to every structure"""
+        self._entries[entry.number] = entry
+        insert(self._states["all"], entry.number)
+        insert(self._states.setdefault(entry.state, []), entry.number)
+        for key in ("all", entry.state):
+            insert(self._updated.setdefault(key, []), (entry.updated_at, entry.number))
+            insert(self._comments.setdefault(key, []), (entry.comments, entry.number))
+        for field, keys in self._set_keys(entry):
+            for key in keys:
+                self._sets[field].setdefault(key, set()).add(entry.number)
+
+    def _unindex(self, entry: IssueEntry) -> None:
+        """Remove an entry from every structure"""
+        del self._entries[entry.number]
+        _remove(self._states["all"], entry.number)
+        _remove(self._states.get(entry.state, []), entry.number)
+        for key in ("all", entry.state):
+            _remove(self._updated.get(key, []), (entry.updated_at, entry.number))
+            _remove(self._comments.get(key, []), (entry.comments, entry.number))
+        for field, keys in self._set_keys(entry):
+            for key in keys:
+                self._sets[field][key].discard(entry.number)
+
+    @staticmethod
+    def _set_keys(entry: IssueEntry) -> List[Tuple[str, Tuple[str, ...]]]:
+        """Get the set keys an entry belongs to"""
+        assignees = entry.assignees + (ANY,) if entry.assignees else (NONE,)
+        milestones = (
+            (entry.milestone,) if entry.milestone == NONE else (entry.milestone, ANY)
+        )
+        return [
+            ("assignee", assignees),
+            ("creator", (entry.creator,)),
+            ("milestone", milestones),
+        ]
+
+
+def _append(values: list, value) -> None:
+    """Append a value (the list is sorted afterwards)"""
+    values.append(value)
+
+
+def _slice(values: list, low: int, start: int, count: int, reverse: bool) -> list:
+    """Get ``count`` values from ``start`` in ``values[low:]``, from the end if reverse"""
+    if not reverse:
+        return values[low + start : low + start + count]
+
+    high = max(low, len(values) - start)
+    return values[max(low, high - count) : high][::-1]
+
+
+def _insert(values: list, value) -> None:
+    """Insert a value into a sorted list (appending in the common case)"""
+    if not values or values[-1] < value:
+        values.append(value)
+    else:
+        bisect.insort(values, value)
+
+
+def _remove(values: list, value) -> None:
+    """Remove a value from a sorted list"""
+    position = bisect.bisect_left(values, value)
+    if position < len(values) and values[position] == value:
+        del values[position]
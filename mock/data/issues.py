@@ -1,6 +1,11 @@
 from datetime import datetime
 from typing import Dict, List, Optional
 
+from data.indexes import RepoIndexCache
+from data.issue_index import IssueIndex
+from data.labels import LABEL_ISSUES
+from data.sequences import next_id, next_number
+from data.storage import backend
 from data.users import USERS
 
 # Repository issue data
@@ -145,28 +150,81 @@ for repo_key, issues in ISSUE_COMMENTS.items():
                 "data": comment_data,
             }
 
+# Load the fixture data into the storage backend
+REPOSITORY_ISSUES = backend.repo_table("repository_issues", REPOSITORY_ISSUES)
+ISSUE_COMMENTS = backend.repo_table("issue_comments", ISSUE_COMMENTS)
+ALL_COMMENTS = backend.table("all_comments", ALL_COMMENTS)
+
+
+def _build_issue_index(repo_key: str) -> IssueIndex:
+    """Build the issue index of a repository"""
+    comments = ISSUE_COMMENTS[repo_key] if repo_key in ISSUE_COMMENTS else {}
+    return IssueIndex(
+        (issue, len(comments.get(issue["number"], {})))
+        for issue in REPOSITORY_ISSUES[repo_key].values()
+    )
+
+
+# Issue numbers per repository, indexed by the issue list filters
+ISSUE_INDEXES = RepoIndexCache(_build_issue_index)
+
+
+def _reindex_issue(repo_key: str, issue: Dict) -> None:
+    """Update the issue index after an issue or its comments changed
+
+    Must be called inside ``backend.transaction()``: the index is updated
+    once the transaction is kept.
+    """
+    comments = ISSUE_COMMENTS[repo_key] if repo_key in ISSUE_COMMENTS else {}
+    count = len(comments.get(issue["number"], {}))
+    ISSUE_INDEXES.update(repo_key, lambda index: index.put(issue, count))
+
 
 def get_repository_issues(
-    owner: str, repo_name: str, state: str = "open", page: int = 1, per_page: int = 30
+    owner: str,
+    repo_name: str,
+    state: str = "open",
+    page: int = 1,
+    per_page: int = 30,
+    labels: Optional[str] = None,
+    assignee: Optional[str] = None,
+    creator: Optional[str] = None,
+    milestone: Optional[str] = None,
+    since: Optional[datetime] = None,
+    sort: str = "created",
+    direction: str = "desc",
 ) -> Optional[List[Dict]]:
     """Get list of issues for a repository"""
     repo_key = f"{owner}/{repo_name}"
     if repo_key not in REPOSITORY_ISSUES:
         return None
 
-    issues = []
-    for issue_data in REPOSITORY_ISSUES[repo_key].values():
-        if state == "all" or issue_data["state"] == state:
-            issues.append(issue_data)
-
-    # Sort (by number, descending)
-    issues.sort(key=lambda i: i["number"], reverse=True)
-
-    # Pagination
-    start = (page - 1) * per_page
-    end = start + per_page
-
-    return issues[start:end]
+    # Issues must have every listed label
+    label_sets = []
+    if labels:
+        label_issues = LABEL_ISSUES.get(repo_key)
+        for label_name in labels.split(","):
+            label_sets.append(label_issues.get(label_name.strip(), set()))
+
+    # Stored dates are naive local times
+    if since is not None and since.tzinfo is not None:
+        since = since.astimezone().replace(tzinfo=None)
+
+    issue_numbers = ISSUE_INDEXES.get(repo_key).query(
+        state,
+        label_sets,
+        assignee,
+        creator,
+        milestone,
+        since,
+        sort,
+        direction,
+        page,
+        per_page,
+    )
+
+    repo_issues = REPOSITORY_ISSUES[repo_key]
+    return [repo_issues[issue_number] for issue_number in issue_numbers]
 
 
 def get_issue(owner: str, repo_name: str, issue_number: int) -> Optional[Dict]:
@@ -189,16 +247,18 @@ def create_issue(
     if repo_key not in REPOSITORY_ISSUES:
         return None
 
-    # Generate new issue number
-    issue_number = 1
-    if REPOSITORY_ISSUES[repo_key]:
-        issue_number = max(REPOSITORY_ISSUES[repo_key].keys()) + 1
-
     # Get creator information
     creator = USERS.get(creator_username)
     if not creator:
         return None
 
+    # Generate new issue number
+    issue_number = next_number(
+        "issue_number",
+        repo_key,
+        lambda: max(REPOSITORY_ISSUES[repo_key].keys(), default=0),
+    )
+
     # Resolve assignee users
     assignees = []
     assignee = None
@@ -228,19 +288,21 @@ def create_issue(
         "updated_at": now,
         "body": issue_data.get("body", ""),
         "milestone": milestone,
-        "id": len(ALL_COMMENTS) + 1000,
+        "id": get_next_issue_id(),
         "assignee": assignee,
         "comments_url": f"/api/v3/repos/{owner}/{repo_name}/issues/{issue_number}/comments",
         "html_url": f"/{owner}/{repo_name}/issues/{issue_number}",
         "pull_request": None,
     }
 
-    REPOSITORY_ISSUES[repo_key][issue_number] = new_issue
+    with backend.transaction():
+        REPOSITORY_ISSUES[repo_key][issue_number] = new_issue
+        _reindex_issue(repo_key, new_issue)
 
-    # Initialize dictionary for issue comments
-    if repo_key not in ISSUE_COMMENTS:
-        ISSUE_COMMENTS[repo_key] = {}
-    ISSUE_COMMENTS[repo_key][issue_number] = {}
+        # Initialize dictionary for issue comments
+        if repo_key not in ISSUE_COMMENTS:
+            ISSUE_COMMENTS[repo_key] = {}
+        ISSUE_COMMENTS[repo_key][issue_number] = {}
 
     return new_issue
 
@@ -256,34 +318,37 @@ def update_issue(
     ):
         return None
 
-    issue = REPOSITORY_ISSUES[repo_key][issue_number]
+    with backend.transaction():
+        issue = REPOSITORY_ISSUES[repo_key][issue_number]
 
-    # Process updatable fields
-    if "title" in update_data:
-        issue["title"] = update_data["title"]
+        # Process updatable fields
+        if "title" in update_data:
+            issue["title"] = update_data["title"]
 
-    if "body" in update_data:
-        issue["body"] = update_data["body"]
+        if "body" in update_data:
+            issue["body"] = update_data["body"]
 
-    if "state" in update_data:
-        issue["state"] = update_data["state"]
+        if "state" in update_data and update_data["state"] is not None:
+            issue["state"] = update_data["state"]
 
-    # Update assignee users
-    if "assignees" in update_data:
-        assignees = []
-        for username in update_data["assignees"]:
-            if username in USERS:
-                assignees.append(USERS[username])
-        issue["assignees"] = assignees
-        issue["assignee"] = assignees[0] if assignees else None
+        # Update assignee users
+        if "assignees" in update_data:
+            assignees = []
+            for username in update_data["assignees"]:
+                if username in USERS:
+                    assignees.append(USERS[username])
+            issue["assignees"] = assignees
+            issue["assignee"] = assignees[0] if assignees else None
 
-    # Update milestone (omitted in mock implementation)
+        # Update milestone (omitted in mock implementation)
 
-    # Update labels (omitted in mock implementation)
+        # Update labels (omitted in mock implementation)
 
-    # Update modification time
-    issue["updated_at"] = datetime.now()
+        # Update modification time
+        issue["updated_at"] = datetime.now()
 
+        REPOSITORY_ISSUES[repo_key][issue_number] = issue
+        _reindex_issue(repo_key, issue)
     return issue
 
 
@@ -321,22 +386,14 @@ def create_comment(
     ):
         return None
 
-    # Initialize comment dictionary for repository and issue
-    if repo_key not in ISSUE_COMMENTS:
-        ISSUE_COMMENTS[repo_key] = {}
-    if issue_number not in ISSUE_COMMENTS[repo_key]:
-        ISSUE_COMMENTS[repo_key][issue_number] = {}
-
-    # Generate new comment ID
-    comment_id = 1
-    if ALL_COMMENTS:
-        comment_id = max(ALL_COMMENTS.keys()) + 1
-
     # Get creator information
     creator = USERS.get(creator_username)
     if not creator:
         return None
 
+    # Generate new comment ID
+    comment_id = next_id("comment_id", lambda: max(ALL_COMMENTS.keys(), default=0))
+
     # Create new comment
     now = datetime.now()
     new_comment = {
@@ -348,49 +405,84 @@ def create_comment(
         "html_url": f"/{owner}/{repo_name}/issues/{issue_number}#comment-{comment_id}",
     }
 
-    # Save comment
-    ISSUE_COMMENTS[repo_key][issue_number][comment_id] = new_comment
-    ALL_COMMENTS[comment_id] = {
-        "repo_key": repo_key,
-        "issue_number": issue_number,
-        "data": new_comment,
-    }
+    with backend.transaction():
+        if repo_key not in ISSUE_COMMENTS:
+            ISSUE_COMMENTS[repo_key] = {}
+        comments = ISSUE_COMMENTS[repo_key].get(issue_number, {})
+        comments[comment_id] = new_comment
+        ISSUE_COMMENTS[repo_key][issue_number] = comments
+        ALL_COMMENTS[comment_id] = {
+            "repo_key": repo_key,
+            "issue_number": issue_number,
+            "data": new_comment,
+        }
 
-    # Update issue modification time
-    REPOSITORY_ISSUES[repo_key][issue_number]["updated_at"] = now
+        # Update issue modification time
+        issue = REPOSITORY_ISSUES[repo_key][issue_number]
+        issue["updated_at"] = now
+        REPOSITORY_ISSUES[repo_key][issue_number] = issue
+        _reindex_issue(repo_key, issue)
 
     return new_comment
 
 
 def update_comment(comment_id: int, update_data: Dict) -> Optional[Dict]:
     """Update a comment"""
-    if comment_id not in ALL_COMMENTS:
-        return None
+    with backend.transaction():
+        if comment_id not in ALL_COMMENTS:
+            return None
 
-    comment_info = ALL_COMMENTS[comment_id]
-    comment = comment_info["data"]
+        comment_info = ALL_COMMENTS[comment_id]
+        comment = comment_info["data"]
 
-    # Process updatable fields
-    if "body" in update_data:
-        comment["body"] = update_data["body"]
+        # Process updatable fields
+        if "body" in update_data:
+            comment["body"] = update_data["body"]
 
-    # Update modification time
-    comment["updated_at"] = datetime.now()
+        # Update modification time
+        comment["updated_at"] = datetime.now()
+
+        # Store the comment in both the comment map and the issue comments
+        ALL_COMMENTS[comment_id] = comment_info
+        repo_key = comment_info["repo_key"]
+        issue_number = comment_info["issue_number"]
+        comments = ISSUE_COMMENTS[repo_key][issue_number]
+        comments[comment_id] = comment
+        ISSUE_COMMENTS[repo_key][issue_number] = comments
 
     return comment
 
 
 def delete_comment(comment_id: int) -> bool:
     """Delete a comment"""
-    if comment_id not in ALL_COMMENTS:
-        return False
+    with backend.transaction():
+        if comment_id not in ALL_COMMENTS:
+            return False
 
-    comment_info = ALL_COMMENTS[comment_id]
-    repo_key = comment_info["repo_key"]
-    issue_number = comment_info["issue_number"]
+        comment_info = ALL_COMMENTS[comment_id]
+        repo_key = comment_info["repo_key"]
+        issue_number = comment_info["issue_number"]
 
-    # Delete comment
-    del ISSUE_COMMENTS[repo_key][issue_number][comment_id]
-    del ALL_COMMENTS[comment_id]
+        # Delete comment
+        comments = ISSUE_COMMENTS[repo_key][issue_number]
+        del comments[comment_id]
+        ISSUE_COMMENTS[repo_key][issue_number] = comments
+        del ALL_COMMENTS[comment_id]
+        _reindex_issue(repo_key, REPOSITORY_ISSUES[repo_key][issue_number])
 
     return True
+
+
+def get_next_issue_id() -> int:
+    """Generate next issue ID"""
+    return next_id(
+        "issue_id",
+        lambda: max(
+            (
+                issue["id"]
+                for repo_issues in REPOSITORY_ISSUES.values()
+                for issue in repo_issues.values()
+            ),
+            default=1000,
+        ),
+    )
@@ -1,4 +1,7 @@
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Set
+
+from data.indexes import RepoIndexCache
+from data.storage import backend
 
 # Repository label data
 # Format: {repo_key: {label_name: {name: str, color: str, url: str}}}
@@ -38,6 +41,26 @@ REPOSITORY_LABELS = {
 # Format: {repo_key: {issue_number: set(label_name)}}
 ISSUE_LABELS = {"admin/repo1": {1: {"bug"}}, "user1/repo2": {1: {"enhancement"}}}
 
+# Load the fixture data into the storage backend
+REPOSITORY_LABELS = backend.repo_table("repository_labels", REPOSITORY_LABELS)
+ISSUE_LABELS = backend.repo_table("issue_labels", ISSUE_LABELS)
+
+
+def _build_label_issues(repo_key: str) -> Dict[str, Set[int]]:
+    """Build the label -> issue numbers index of a repository"""
+    label_issues: Dict[str, Set[int]] = {}
+    if repo_key in ISSUE_LABELS:
+        for issue_number, labels in ISSUE_LABELS[repo_key].items():
+            for label_name in labels:
+                label_issues.setdefault(label_name, set()).add(issue_number)
+
+    return label_issues
+
+
+# Reverse index of ISSUE_LABELS
+# Format: {repo_key: {label_name: set(issue_number)}}
+LABEL_ISSUES = RepoIndexCache(_build_label_issues)
+
 
 def get_repository_labels(owner: str, repo_name: str) -> Optional[List[Dict]]:
     """Get list of labels for a repository"""
@@ -63,24 +86,25 @@ def get_label(owner: str, repo_name: str, label_name: str) -> Optional[Dict]:
 def create_label(owner: str, repo_name: str, label_data: Dict) -> Optional[Dict]:
     """Create a label"""
     repo_key = f"{owner}/{repo_name}"
-    if repo_key not in REPOSITORY_LABELS:
-        REPOSITORY_LABELS[repo_key] = {}
+    with backend.transaction():
+        if repo_key not in REPOSITORY_LABELS:
+            REPOSITORY_LABELS[repo_key] = {}
 
-    label_name = label_data["name"]
+        label_name = label_data["name"]
 
-    # Fail if already exists
-    if label_name in REPOSITORY_LABELS[repo_key]:
-        return None
+        # Fail if already exists
+        if label_name in REPOSITORY_LABELS[repo_key]:
+            return None
 
-    # Create new label
-    new_label = {
-        "name": label_name,
-        "color": label_data["color"],
-        "url": f"/api/v3/repos/{owner}/{repo_name}/labels/{label_name.replace(' ', '%20')}",
-    }
+        # Create new label
+        new_label = {
+            "name": label_name,
+            "color": label_data["color"],
+            "url": f"/api/v3/repos/{owner}/{repo_name}/labels/{label_name.replace(' ', '%20')}",
+        }
 
-    REPOSITORY_LABELS[repo_key][label_name] = new_label
-    return new_label
+        REPOSITORY_LABELS[repo_key][label_name] = new_label
+        return new_label
 
 
 def update_label(
@@ -88,61 +112,73 @@ def update_label(
 ) -> Optional[Dict]:
     """Update a label"""
     repo_key = f"{owner}/{repo_name}"
-    if (
-        repo_key not in REPOSITORY_LABELS
-        or old_label_name not in REPOSITORY_LABELS[repo_key]
-    ):
-        return None
-
-    new_label_name = label_data["name"]
-
-    # If name is changed, check if new name already exists
-    if (
-        old_label_name != new_label_name
-        and new_label_name in REPOSITORY_LABELS[repo_key]
-    ):
-        return None
-
-    # Update label
-    updated_label = {
-        "name": new_label_name,
-        "color": label_data["color"],
-        "url": f"/api/v3/repos/{owner}/{repo_name}/labels/{new_label_name.replace(' ', '%20')}",
-    }
-
-    # Delete old label and add new label
-    del REPOSITORY_LABELS[repo_key][old_label_name]
-    REPOSITORY_LABELS[repo_key][new_label_name] = updated_label
-
-    # Update issue labels as well
-    if repo_key in ISSUE_LABELS:
-        for issue_number, labels in ISSUE_LABELS[repo_key].items():
-            if old_label_name in labels:
-                labels.remove(old_label_name)
-                labels.add(new_label_name)
-
-    return updated_label
+    with backend.transaction():
+        if (
+            repo_key not in REPOSITORY_LABELS
+            or old_label_name not in REPOSITORY_LABELS[repo_key]
+        ):
+            return None
+
+        new_label_name = label_data["name"]
+
+        # If name is changed, check if new name already exists
+        if (
+            old_label_name != new_label_name
+            and new_label_name in REPOSITORY_LABELS[repo_key]
+        ):
+            return None
+
+        # Update label
+        updated_label = {
+            "name": new_label_name,
+            "color": label_data["color"],
+            "url": f"/api/v3/repos/{owner}/{repo_name}/labels/{new_label_name.replace(' ', '%20')}",
+        }
+
+        # Delete old label and add new label
+        del REPOSITORY_LABELS[repo_key][old_label_name]
+        REPOSITORY_LABELS[repo_key][new_label_name] = updated_label
+
+        # Update issue labels as well (only the issues carrying the label)
+        issue_numbers = LABEL_ISSUES.get(repo_key).get(old_label_name, set())
+        for issue_number in issue_numbers:
+            labels = set(ISSUE_LABELS[repo_key][issue_number])
+            labels.discard(old_label_name)
+            labels.add(new_label_name)
+            ISSUE_LABELS[repo_key][issue_number] = labels
+
+        def rename(label_issues: Dict[str, Set[int]]) -> None:
+            moved = label_issues.pop(old_label_name, set())
+            label_issues.setdefault(new_label_name, set()).update(moved)
+
+        LABEL_ISSUES.update(repo_key, rename)
+        return updated_label
 
 
 def delete_label(owner: str, repo_name: str, label_name: str) -> bool:
     """Delete a label"""
     repo_key = f"{owner}/{repo_name}"
-    if (
-        repo_key not in REPOSITORY_LABELS
-        or label_name not in REPOSITORY_LABELS[repo_key]
-    ):
-        return False
+    with backend.transaction():
+        if (
+            repo_key not in REPOSITORY_LABELS
+            or label_name not in REPOSITORY_LABELS[repo_key]
+        ):
+            return False
 
-    # Delete label
-    del REPOSITORY_LABELS[repo_key][label_name]
+        # Delete label
+        del REPOSITORY_LABELS[repo_key][label_name]
 
-    # Remove label from issues as well
-    if repo_key in ISSUE_LABELS:
-        for issue_number, labels in ISSUE_LABELS[repo_key].items():
-            if label_name in labels:
-                labels.remove(label_name)
+        # Remove label from issues as well (only the issues carrying the label)
+        for issue_number in LABEL_ISSUES.get(repo_key).get(label_name, set()):
+            labels = set(ISSUE_LABELS[repo_key][issue_number])
+            labels.discard(label_name)
+            ISSUE_LABELS[repo_key][issue_number] = labels
+
+        def drop(label_issues: Dict[str, Set[int]]) -> None:
+            label_issues.pop(label_name, None)
 
-    return True
+        LABEL_ISSUES.update(repo_key, drop)
+        return True
 
 
 def get_issue_labels(
@@ -169,27 +205,36 @@ def add_labels_to_issue(
 ) -> Optional[List[Dict]]:
     """Add labels to an issue"""
     repo_key = f"{owner}/{repo_name}"
-    if repo_key not in REPOSITORY_LABELS:
-        return None
+    with backend.transaction():
+        if repo_key not in REPOSITORY_LABELS:
+            return None
 
-    # Initialize issue labels
-    if repo_key not in ISSUE_LABELS:
-        ISSUE_LABELS[repo_key] = {}
+        # Initialize issue labels
+        if repo_key not in ISSUE_LABELS:
+            ISSUE_LABELS[repo_key] = {}
 
-    if issue_number not in ISSUE_LABELS[repo_key]:
-        ISSUE_LABELS[repo_key][issue_number] = set()
+        if issue_number not in ISSUE_LABELS[repo_key]:
+            ISSUE_LABELS[repo_key][issue_number] = set()
 
-    added_labels = []
-    for label_name in label_names:
-        # Create label if it does not exist
-        if label_name not in REPOSITORY_LABELS[repo_key]:
-            create_label(owner, repo_name, {"name": label_name, "color": "ededed"})
+        issue_labels = set(ISSUE_LABELS[repo_key][issue_number])
+        added_labels = []
+        for label_name in label_names:
+            # Create label if it does not exist
+            if label_name not in REPOSITORY_LABELS[repo_key]:
+                create_label(owner, repo_name, {"name": label_name, "color": "ededed"})
 
-        # Add label to issue
-        ISSUE_LABELS[repo_key][issue_number].add(label_name)
-        added_labels.append(REPOSITORY_LABELS[repo_key][label_name])
+            # Add label to issue
+            issue_labels.add(label_name)
+            added_labels.append(REPOSITORY_LABELS[repo_key][label_name])
 
-    return added_labels
+        ISSUE_LABELS[repo_key][issue_number] = issue_labels
+
+        def add(label_issues: Dict[str, Set[int]]) -> None:
+            for label_name in label_names:
+                label_issues.setdefault(label_name, set()).add(issue_number)
+
+        LABEL_ISSUES.update(repo_key, add)
+        return added_labels
 
 
 def remove_label_from_issue(
@@ -197,22 +242,28 @@ def remove_label_from_issue(
 ) -> Optional[List[Dict]]:
     """Remove a label from an issue"""
     repo_key = f"{owner}/{repo_name}"
-    if (
-        repo_key not in REPOSITORY_LABELS
-        or repo_key not in ISSUE_LABELS
-        or issue_number not in ISSUE_LABELS[repo_key]
-        or label_name not in ISSUE_LABELS[repo_key][issue_number]
-    ):
-        return None
-
-    # Remove label from issue
-    ISSUE_LABELS[repo_key][issue_number].remove(label_name)
-
-    # Return removed label
-    if label_name in REPOSITORY_LABELS[repo_key]:
-        return [REPOSITORY_LABELS[repo_key][label_name]]
+    with backend.transaction():
+        if (
+            repo_key not in REPOSITORY_LABELS
+            or repo_key not in ISSUE_LABELS
+            or issue_number not in ISSUE_LABELS[repo_key]
+            or label_name not in ISSUE_LABELS[repo_key][issue_number]
+        ):
+            return None
+
+        # Remove label from issue
+        issue_labels = set(ISSUE_LABELS[repo_key][issue_number])
+        issue_labels.remove(label_name)
+        ISSUE_LABELS[repo_key][issue_number] = issue_labels
+        LABEL_ISSUES.update(
+            repo_key, lambda index: index.get(label_name, set()).discard(issue_number)
+        )
+
+        # Return removed label
+        if label_name in REPOSITORY_LABELS[repo_key]:
+            return [REPOSITORY_LABELS[repo_key][label_name]]
 
-    return []
+        return []
 
 
 def replace_all_labels(
@@ -220,26 +271,44 @@ def replace_all_labels(
 ) -> Optional[List[Dict]]:
     """Replace all labels for an issue"""
     repo_key = f"{owner}/{repo_name}"
-    if repo_key not in REPOSITORY_LABELS:
-        return None
+    with backend.transaction():
+        if repo_key not in REPOSITORY_LABELS:
+            return None
 
-    # Initialize issue labels
-    if repo_key not in ISSUE_LABELS:
-        ISSUE_LABELS[repo_key] = {}
+        # Initialize issue labels
+        if repo_key not in ISSUE_LABELS:
+            ISSUE_LABELS[repo_key] = {}
 
-    # Clear existing labels
-    ISSUE_LABELS[repo_key][issue_number] = set()
+        # Clear existing labels
+        _discard_issue_labels(repo_key, issue_number)
+        ISSUE_LABELS[repo_key][issue_number] = set()
 
-    # Add new labels
-    return add_labels_to_issue(owner, repo_name, issue_number, label_names)
+        # Add new labels
+        return add_labels_to_issue(owner, repo_name, issue_number, label_names)
 
 
 def remove_all_labels(owner: str, repo_name: str, issue_number: int) -> bool:
     """Remove all labels from an issue"""
     repo_key = f"{owner}/{repo_name}"
-    if repo_key not in ISSUE_LABELS or issue_number not in ISSUE_LABELS[repo_key]:
-        return False
+    with backend.transaction():
+        if repo_key not in ISSUE_LABELS or issue_number not in ISSUE_LABELS[repo_key]:
+            return False
+
+        # Clear issue labels
+        _discard_issue_labels(repo_key, issue_number)
+        ISSUE_LABELS[repo_key][issue_number] = set()
+        return True
+
+
+def _discard_issue_labels(repo_key: str, issue_number: int) -> None:
+    """Remove an issue from the reverse index of its current labels"""
+    if issue_number not in ISSUE_LABELS[repo_key]:
+        return
+
+    label_names = set(ISSUE_LABELS[repo_key][issue_number])
+
+    def discard(label_issues: Dict[str, Set[int]]) -> None:
+        for label_name in label_names:
+            label_issues.get(label_name, set()).discard(issue_number)
 
-    # Clear issue labels
-    ISSUE_LABELS[repo_key][issue_number] = set()
-    return True
+    LABEL_ISSUES.update(repo_key, discard)
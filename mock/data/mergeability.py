@@ -0,0 +1,132 @@
+"""Background mergeability checks
+
+Whether a head commit merges cleanly into a base commit is computed in the
+background, as GitBucket does with its cached ``checkConflict()``: reading a
+pull request never waits for a merge. The result of a (base, head) pair is
+unknown (None) until a worker thread has run the three-way merge (see
+``data.tree_merge``), then True (mergeable) or False (conflicting). A check
+that fails is logged and not recorded: the result stays unknown and the
+check runs again on the next read.
+
+Checks are queued when a pull request is created, when its base or head
+branch moves and when an unknown result is read. Each pair is queued once
+until its result is known. Merge results are cached by the root trees of
+the merge base, base and head, so commits with the same trees (a branch
+rebased or amended without changing its files) are not merged again.
+"""
+
+import logging
+import queue
+import threading
+from typing import Optional, Tuple
+
+from data.commits import get_commit_dag
+from data.contents import BLOBS, GIT_TREES, get_root_tree
+from data.git_repository import ObjectCache
+from data.tree_merge import merge_trees
+from data.tree_store import TreeStore
+
+# Memory used by the cached results, in bytes
+RESULT_CACHE_SIZE = 4 * 1024 * 1024
+MERGE_CACHE_SIZE = 16 * 1024 * 1024
+
+# Approximate size of one cached result
+RESULT_SIZE = 200
+
+# (repository key, base commit, head commit) of a check
+Check = Tuple[str, str, str]
+
+# Mergeability per checked commit pair: (True/False, or None when unknowable)
+_RESULTS = ObjectCache(RESULT_CACHE_SIZE)
+
+# Conflicting paths per (repository key, merge base, base, head) root trees
+_MERGES = ObjectCache(MERGE_CACHE_SIZE)
+
+_logger = logging.getLogger(__name__)
+
+_queue: "queue.Queue[Check]" = queue.Queue()
+_pending: set = set()
+_lock = threading.Lock()
+_worker: Optional[threading.Thread] = None
+
+
+def get_mergeability(
+    owner: str, repo_name: str, base_sha: str, head_sha: str, default: Optional[bool]
+) -> Optional[bool]:
+    """Get whether head merges cleanly into base, without waiting
+
+    None while the check is running (the check is queued if needed).
+    ``default`` when the commits have no snapshot to merge.
+    """
+    result = _RESULTS.get((f"{owner}/{repo_name}", base_sha, head_sha))
+    if result is None:
+        check_mergeability(owner, repo_name, base_sha, head_sha)
+        return None
+
+    return default if result[0] is None else result[0]
+
+
+def check_mergeability(
+    owner: str, repo_name: str, base_sha: str, head_sha: str
+) -> None:
+    """Queue the mergeability check of head into base, unless known or queued"""
+    global _worker
+
+    check = (f"{owner}/{repo_name}", base_sha, head_sha)
+    with _lock:
+        if check in _pending or _RESULTS.get(check) is not None:
+            return
+        _pending.add(check)
+
+        if _worker is None:
+            _worker = threading.Thread(target=_work, name="mergeability", daemon=True)
+            _worker.start()
+
+    _queue.put(check)
+
+
+def _work() -> None:
+    """Run the queued checks, one at a time"""
+    while True:
+        check = _queue.get()
+        try:
+            result: Optional[Tuple[Optional[bool]]] = (_is_mergeable(*check),)
+        except Exception:
+            _logger.exception("Mergeability check of %s %s..%s failed", *check)
+            result = None
+
+        with _lock:
+            if result is not None:
+                _RESULTS.put(check, result, RESULT_SIZE)
+            _pending.discard(check)
+
+
+def _is_mergeable(repo_key: str, base_sha: str, head_sha: str) -> Optional[bool]:
+    """Merge head into base, or None without snapshots of both commits"""
+    owner, _, repo_name = repo_key.partition("/")
+    base_root = get_root_tree(owner, repo_name, base_sha)
+    head_root = get_root_tree(owner, repo_name, head_sha)
+    commit_dag = get_commit_dag(owner, repo_name)
+    if base_root is None or head_root is None or commit_dag is None:
+        return None
+
+    # With several merge bases (criss-cross merges), the first one is used
+    merge_bases = commit_dag.merge_bases(base_sha, head_sha) or []
+    merge_base_root = (
+        get_root_tree(owner, repo_name, merge_bases[0]) if merge_bases else None
+    )
+
+    key = (repo_key, merge_base_root, base_root, head_root)
+    conflicts = _MERGES.get(key)
+    if conflicts is None:
+        merge = merge_trees(
+            TreeStore(GIT_TREES[repo_key]),
+            BLOBS.get,
+            merge_base_root,
+            base_root,
+            head_root,
+        )
+        conflicts = tuple(merge.conflicts)
+        _MERGES.put(key, conflicts, RESULT_SIZE + sum(map(len, conflicts)))
+
+    return not conflicts
@@ -1,6 +1,9 @@
 from datetime import datetime
 from typing import Dict, List, Optional
 
+from data.sequences import next_id, next_number
+from data.storage import backend
+
 # Repository milestone data
 # Format: {repo_key: {milestone_number: milestone_data}}
 REPOSITORY_MILESTONES = {
@@ -49,6 +52,11 @@ REPOSITORY_MILESTONES = {
     },
 }
 
+# Load the fixture data into the storage backend
+REPOSITORY_MILESTONES = backend.repo_table(
+    "repository_milestones", REPOSITORY_MILESTONES
+)
+
 
 def get_repository_milestones(
     owner: str, repo_name: str, state: str = "all"
@@ -86,31 +94,34 @@ def create_milestone(
 ) -> Optional[Dict]:
     """Create a milestone"""
     repo_key = f"{owner}/{repo_name}"
-    if repo_key not in REPOSITORY_MILESTONES:
-        REPOSITORY_MILESTONES[repo_key] = {}
-
-    # Generate new milestone number
-    milestone_number = 1
-    if REPOSITORY_MILESTONES[repo_key]:
-        milestone_number = max(REPOSITORY_MILESTONES[repo_key].keys()) + 1
-
-    # Create new milestone
-    new_milestone = {
-        "url": f"/api/v3/repos/{owner}/{repo_name}/milestones/{milestone_number}",
-        "html_url": f"/{owner}/{repo_name}/milestone/{milestone_number}",
-        "id": get_next_milestone_id(),
-        "number": milestone_number,
-        "state": milestone_data.get("state", "open"),
-        "title": milestone_data["title"],
-        "description": milestone_data.get("description", ""),
-        "open_issues": 0,
-        "closed_issues": 0,
-        "closed_at": None,
-        "due_on": milestone_data.get("due_on"),
-    }
-
-    REPOSITORY_MILESTONES[repo_key][milestone_number] = new_milestone
-    return new_milestone
+    with backend.transaction():
+        if repo_key not in REPOSITORY_MILESTONES:
+            REPOSITORY_MILESTONES[repo_key] = {}
+
+        # Generate new milestone number
+        milestone_number = next_number(
+            "milestone_number",
+            repo_key,
+            lambda: max(REPOSITORY_MILESTONES[repo_key].keys(), default=0),
+        )
+
+        # Create new milestone
+        new_milestone = {
+            "url": f"/api/v3/repos/{owner}/{repo_name}/milestones/{milestone_number}",
+            "html_url": f"/{owner}/{repo_name}/milestone/{milestone_number}",
+            "id": get_next_milestone_id(),
+            "number": milestone_number,
+            "state": milestone_data.get("state", "open"),
+            "title": milestone_data["title"],
+            "description": milestone_data.get("description", ""),
+            "open_issues": 0,
+            "closed_issues": 0,
+            "closed_at": None,
+            "due_on": milestone_data.get("due_on"),
+        }
+
+        REPOSITORY_MILESTONES[repo_key][milestone_number] = new_milestone
+        return new_milestone
 
 
 def update_milestone(
@@ -124,51 +135,60 @@ def update_milestone(
     ):
         return None
 
-    milestone = REPOSITORY_MILESTONES[repo_key][milestone_number]
+    with backend.transaction():
+        milestone = REPOSITORY_MILESTONES[repo_key][milestone_number]
 
-    # Process updatable fields
-    if "title" in update_data:
-        milestone["title"] = update_data["title"]
+        # Process updatable fields
+        if "title" in update_data:
+            milestone["title"] = update_data["title"]
 
-    if "description" in update_data:
-        milestone["description"] = update_data["description"]
+        if "description" in update_data:
+            milestone["description"] = update_data["description"]
 
-    if "state" in update_data:
-        old_state = milestone["state"]
-        new_state = update_data["state"]
-        milestone["state"] = new_state
+        if "state" in update_data:
+            old_state = milestone["state"]
+            new_state = update_data["state"]
+            milestone["state"] = new_state
 
-        # Update closed_at if state is changed
-        if old_state != new_state:
-            if new_state == "closed":
-                milestone["closed_at"] = datetime.now()
-            else:
-                milestone["closed_at"] = None
+            # Update closed_at if state is changed
+            if old_state != new_state:
+                if new_state == "closed":
+                    milestone["closed_at"] = datetime.now()
+                else:
+                    milestone["closed_at"] = None
 
-    if "due_on" in update_data:
-        milestone["due_on"] = update_data["due_on"]
+        if "due_on" in update_data:
+            milestone["due_on"] = update_data["due_on"]
 
-    return milestone
+        REPOSITORY_MILESTONES[repo_key][milestone_number] = milestone
+        return milestone
 
 
 def delete_milestone(owner: str, repo_name: str, milestone_number: int) -> bool:
     """Delete a milestone"""
     repo_key = f"{owner}/{repo_name}"
-    if (
-        repo_key not in REPOSITORY_MILESTONES
-        or milestone_number not in REPOSITORY_MILESTONES[repo_key]
-    ):
-        return False
+    with backend.transaction():
+        if (
+            repo_key not in REPOSITORY_MILESTONES
+            or milestone_number not in REPOSITORY_MILESTONES[repo_key]
+        ):
+            return False
 
-    # Delete milestone
-    del REPOSITORY_MILESTONES[repo_key][milestone_number]
-    return True
+        # Delete milestone
+        del REPOSITORY_MILESTONES[repo_key][milestone_number]
+        return True
 
 
 def get_next_milestone_id() -> int:
     """Generate next milestone ID"""
-    max_id = 0
-    for repo_milestones in REPOSITORY_MILESTONES.values():
-        for milestone in repo_milestones.values():
-            max_id = max(max_id, milestone["id"])
-    return max_id + 1
+    return next_id(
+        "milestone_id",
+        lambda: max(
+            (
+                milestone["id"]
+                for repo_milestones in REPOSITORY_MILESTONES.values()
+                for milestone in repo_milestones.values()
+            ),
+            default=0,
+        ),
+    )
@@ -1,5 +1,8 @@
 from datetime import datetime
 
+from data.sequences import next_id
+from data.storage import backend
+
 # Organization data
 ORGANIZATIONS = {
     "org1": {
@@ -25,6 +28,10 @@ ORGANIZATIONS = {
 # User-organization associations
 USER_ORGANIZATIONS = {"admin": ["org1", "org2"], "user1": ["org1"]}
 
+# Load the fixture data into the storage backend
+ORGANIZATIONS = backend.table("organizations", ORGANIZATIONS)
+USER_ORGANIZATIONS = backend.table("user_organizations", USER_ORGANIZATIONS)
+
 
 def get_organization_by_name(org_name):
     """Get organization by name"""
@@ -50,20 +57,26 @@ def create_organization(org_data):
         "login": org_name,
         "description": org_data.get("profile_name", ""),
         "created_at": datetime.now(),
-        "id": len(ORGANIZATIONS) + 101,
+        "id": next_id(
+            "organization_id",
+            lambda: max((org["id"] for org in ORGANIZATIONS.values()), default=100),
+        ),
         "url": f"/api/v3/orgs/{org_name}",
         "html_url": f"/{org_name}",
         "avatar_url": f"/{org_name}/avatar",
     }
 
-    ORGANIZATIONS[org_name] = new_org
+    with backend.transaction():
+        ORGANIZATIONS[org_name] = new_org
 
-    # Associate admin with organization
-    admin_username = org_data["admin"]
-    if admin_username not in USER_ORGANIZATIONS:
-        USER_ORGANIZATIONS[admin_username] = []
+        # Associate admin with organization
+        admin_username = org_data["admin"]
+        if admin_username not in USER_ORGANIZATIONS:
+            USER_ORGANIZATIONS[admin_username] = []
 
-    if org_name not in USER_ORGANIZATIONS[admin_username]:
-        USER_ORGANIZATIONS[admin_username].append(org_name)
+        user_orgs = USER_ORGANIZATIONS[admin_username]
+        if org_name not in user_orgs:
+            user_orgs.append(org_name)
+            USER_ORGANIZATIONS[admin_username] = user_orgs
 
-    return new_org
+        return new_org
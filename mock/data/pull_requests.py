@@ -1,8 +1,20 @@
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple, Union
-
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from data.commits import resolve_ref_to_sha
+from data.compare import (
+    COMPARE_COMMIT_LIMIT,
+    get_commit_range,
+    get_range_files,
+    iter_range_diff,
+)
+from data.contents import get_root_tree, merge_branch
+from data.events import RepositoryChange, subscribe
 from data.issues import REPOSITORY_ISSUES
+from data.mergeability import check_mergeability, get_mergeability
 from data.repositories import REPOSITORIES
+from data.sequences import next_id, next_number
+from data.storage import backend
 from data.users import USERS
 
 # Repository pull request data
@@ -102,56 +114,13 @@ REPOSITORY_PULL_REQUESTS = {
     }
 }
 
-# Pull request commit data
-# Format: {repo_key: {pr_number: [commit_data]}}
-PULL_REQUEST_COMMITS = {
-    "admin/repo1": {
-        1: [
-            {
-                "sha": "1234567890abcdef1234567890abcdef12345678",
-                "commit": {
-                    "author": {
-                        "name": "Admin User",
-                        "email": "admin@example.com",
-                        "date": datetime(2023, 1, 25, 10, 0, 0),
-                    },
-                    "committer": {
-                        "name": "Admin User",
-                        "email": "admin@example.com",
-                        "date": datetime(2023, 1, 25, 10, 0, 0),
-                    },
-                    "message": "Add new feature",
-                    "tree": {"sha": "9876543210fedcba9876543210fedcba98765432"},
-                },
-                "author": USERS["admin"],
-                "committer": USERS["admin"],
-                "parents": [{"sha": "abcdef1234567890abcdef1234567890abcdef12"}],
-            }
-        ],
-        2: [
-            {
-                "sha": "2345678901abcdef2345678901abcdef23456789",
-                "commit": {
-                    "author": {
-                        "name": "User 1",
-                        "email": "user1@example.com",
-                        "date": datetime(2023, 1, 26, 10, 0, 0),
-                    },
-                    "committer": {
-                        "name": "User 1",
-                        "email": "user1@example.com",
-                        "date": datetime(2023, 1, 26, 10, 0, 0),
-                    },
-                    "message": "Fix bug",
-                    "tree": {"sha": "8765432109fedcba8765432109fedcba87654321"},
-                },
-                "author": USERS["user1"],
-                "committer": USERS["user1"],
-                "parents": [{"sha": "abcdef1234567890abcdef1234567890abcdef12"}],
-            }
-        ],
-    }
-}
+# Load the fixture data into the storage backend
+REPOSITORY_PULL_REQUESTS = backend.repo_table(
+    "repository_pull_requests", REPOSITORY_PULL_REQUESTS
+)
+
+# Maximum number of files listed for a pull request, as in the GitHub API
+PULL_REQUEST_FILE_LIMIT = 3000
 
 
 def get_repository_pull_requests(
@@ -178,7 +147,12 @@ def get_repository_pull_requests(
 
 
 def get_pull_request(owner: str, repo_name: str, pr_number: int) -> Optional[Dict]:
-    """Get a specific pull request"""
+    """Get a specific pull request
+
+    ``mergeable`` of open pull requests is the result of the background
+    check for their current commits: None until it is known (see
+    ``data.mergeability``).
+    """
     repo_key = f"{owner}/{repo_name}"
     if (
         repo_key not in REPOSITORY_PULL_REQUESTS
@@ -186,7 +160,31 @@ def get_pull_request(owner: str, repo_name: str, pr_number: int) -> Optional[Dic
     ):
         return None
 
-    return REPOSITORY_PULL_REQUESTS[repo_key][pr_number]
+    pr = REPOSITORY_PULL_REQUESTS[repo_key][pr_number]
+    if pr["state"] != "open":
+        return pr
+
+    base_sha, head_sha = _pull_request_heads(owner, repo_name, pr)
+    mergeable = get_mergeability(owner, repo_name, base_sha, head_sha, pr["mergeable"])
+    return {**pr, "mergeable": mergeable}
+
+
+def _pull_request_heads(owner: str, repo_name: str, pr: Dict) -> Tuple[str, str]:
+    """Get the (base, head) commits of a pull request
+
+    Open pull requests follow their branches; closed ones keep the commits
+    recorded on the pull request. Branches of other repositories are not
+    followed.
+    """
+    base_sha, head_sha = pr["base"]["sha"], pr["head"]["sha"]
+    if pr["state"] == "open":
+        base_sha = resolve_ref_to_sha(owner, repo_name, pr["base"]["ref"]) or base_sha
+        if pr["head"]["repo"]["full_name"] == f"{owner}/{repo_name}":
+            head_sha = (
+                resolve_ref_to_sha(owner, repo_name, pr["head"]["ref"]) or head_sha
+            )
+
+    return base_sha, head_sha
 
 
 def create_pull_request(
@@ -202,13 +200,8 @@ def create_pull_request(
     if not creator:
         return None
 
-    # Generate new pull request number
-    pr_number = 1
-    if repo_key in REPOSITORY_PULL_REQUESTS and REPOSITORY_PULL_REQUESTS[repo_key]:
-        pr_number = max(REPOSITORY_PULL_REQUESTS[repo_key].keys()) + 1
-
     # When creating pull request from issue
-    if "issue" in pr_data:
+    if pr_data.get("issue") is not None:
         issue_number = pr_data["issue"]
         if (
             repo_key not in REPOSITORY_ISSUES
@@ -221,7 +214,7 @@ def create_pull_request(
         body = issue["body"]
     else:
         title = pr_data["title"]
-        body = pr_data.get("body", "")
+        body = pr_data.get("body") or ""
 
     # Parse head and base
     head_ref = pr_data["head"]
@@ -240,6 +233,14 @@ def create_pull_request(
 
     # Get head repository
     head_repo = REPOSITORIES.get(head_repo_key, REPOSITORIES[repo_key])
+    head_owner_name, _, head_repo_name = head_repo["full_name"].partition("/")
+
+    # Generate new pull request number
+    pr_number = next_number(
+        "pull_request_number",
+        repo_key,
+        lambda: max(REPOSITORY_PULL_REQUESTS.get(repo_key, {}).keys(), default=0),
+    )
 
     # Create new pull request
     now = datetime.now()
@@ -249,20 +250,21 @@ def create_pull_request(
         "updated_at": now,
         "created_at": now,
         "head": {
-            "sha": generate_sha(),
+            "sha": resolve_ref_to_sha(head_owner_name, head_repo_name, head_branch)
+            or generate_sha(),
             "ref": head_branch,
             "repo": head_repo,
             "label": f"{head_owner}:{head_branch}",
             "user": USERS.get(head_owner, creator),
         },
         "base": {
-            "sha": generate_sha(),
+            "sha": resolve_ref_to_sha(owner, repo_name, base_ref) or generate_sha(),
             "ref": base_ref,
             "repo": REPOSITORIES[repo_key],
             "label": f"{owner}:{base_ref}",
             "user": USERS.get(owner, creator),
         },
-        "mergeable": True,
+        "mergeable": None,
         "merged": False,
         "merged_at": None,
         "merged_by": None,
@@ -283,19 +285,17 @@ def create_pull_request(
         "statuses_url": f"/api/v3/repos/{owner}/{repo_name}/statuses/{generate_sha()}",
     }
 
-    # Save pull request
-    if repo_key not in REPOSITORY_PULL_REQUESTS:
-        REPOSITORY_PULL_REQUESTS[repo_key] = {}
-
-    REPOSITORY_PULL_REQUESTS[repo_key][pr_number] = new_pr
+    with backend.transaction():
+        # Save pull request
+        if repo_key not in REPOSITORY_PULL_REQUESTS:
+            REPOSITORY_PULL_REQUESTS[repo_key] = {}
 
-    # Initialize commit data
-    if repo_key not in PULL_REQUEST_COMMITS:
-        PULL_REQUEST_COMMITS[repo_key] = {}
+        REPOSITORY_PULL_REQUESTS[repo_key][pr_number] = new_pr
 
-    PULL_REQUEST_COMMITS[repo_key][pr_number] = []
-
-    return new_pr
+        check_mergeability(
+            owner, repo_name, *_pull_request_heads(owner, repo_name, new_pr)
+        )
+        return new_pr
 
 
 def update_pull_request(
@@ -309,41 +309,119 @@ def update_pull_request(
     ):
         return None
 
-    pr = REPOSITORY_PULL_REQUESTS[repo_key][pr_number]
+    with backend.transaction():
+        pr = REPOSITORY_PULL_REQUESTS[repo_key][pr_number]
 
-    # Process updatable fields
-    if "title" in update_data:
-        pr["title"] = update_data["title"]
+        # Process updatable fields
+        if "title" in update_data:
+            pr["title"] = update_data["title"]
 
-    if "body" in update_data:
-        pr["body"] = update_data["body"]
+        if "body" in update_data:
+            pr["body"] = update_data["body"]
 
-    if "state" in update_data:
-        pr["state"] = update_data["state"]
+        if "state" in update_data:
+            pr["state"] = update_data["state"]
 
-    if "base" in update_data:
-        base_ref = update_data["base"]
-        pr["base"]["ref"] = base_ref
-        pr["base"]["label"] = f"{owner}:{base_ref}"
+        if "base" in update_data:
+            base_ref = update_data["base"]
+            pr["base"]["ref"] = base_ref
+            pr["base"]["label"] = f"{owner}:{base_ref}"
 
-    # Update modification time
-    pr["updated_at"] = datetime.now()
+        # Update modification time
+        pr["updated_at"] = datetime.now()
 
-    return pr
+        REPOSITORY_PULL_REQUESTS[repo_key][pr_number] = pr
+        if pr["state"] == "open":
+            check_mergeability(
+                owner, repo_name, *_pull_request_heads(owner, repo_name, pr)
+            )
+        return pr
+
+
+@subscribe
+def _check_moved_pull_requests(change: RepositoryChange) -> None:
+    """Queue the mergeability checks of the open pull requests whose branches moved"""
+    moved = set(change.branches)
+    for ref in change.refs:
+        if ref.startswith("refs/heads/"):
+            moved.add(ref[len("refs/heads/") :])
+
+    repo_key = change.repo_key
+    if not moved or repo_key not in REPOSITORY_PULL_REQUESTS:
+        return
+
+    owner, _, repo_name = repo_key.partition("/")
+    for pr in REPOSITORY_PULL_REQUESTS[repo_key].values():
+        if pr["state"] == "open" and (
+            pr["base"]["ref"] in moved or pr["head"]["ref"] in moved
+        ):
+            check_mergeability(
+                owner, repo_name, *_pull_request_heads(owner, repo_name, pr)
+            )
 
 
 def get_pull_request_commits(
     owner: str, repo_name: str, pr_number: int
 ) -> Optional[List[Dict]]:
-    """Get list of commits for a pull request"""
+    """Get list of commits for a pull request
+
+    The commits of head that base does not have, oldest first. Commits
+    outside the base repository are not listed.
+    """
     repo_key = f"{owner}/{repo_name}"
     if (
-        repo_key not in PULL_REQUEST_COMMITS
-        or pr_number not in PULL_REQUEST_COMMITS[repo_key]
+        repo_key not in REPOSITORY_PULL_REQUESTS
+        or pr_number not in REPOSITORY_PULL_REQUESTS[repo_key]
     ):
         return None
 
-    return PULL_REQUEST_COMMITS[repo_key][pr_number]
+    pr = REPOSITORY_PULL_REQUESTS[repo_key][pr_number]
+    base_sha, head_sha = _pull_request_heads(owner, repo_name, pr)
+    commits = get_commit_range(
+        owner, repo_name, base_sha, head_sha, COMPARE_COMMIT_LIMIT
+    )
+    return commits if commits is not None else []
+
+
+def get_pull_request_files(
+    owner: str, repo_name: str, pr_number: int, page: int = 1, per_page: int = 30
+) -> Optional[List[Dict]]:
+    """Get list of files changed by a pull request
+
+    Files are compared from the merge base of base and head to head, at
+    most ``PULL_REQUEST_FILE_LIMIT`` of them as in the GitHub API. Patches
+    come from the blob pair cache (see ``data.diff``).
+    """
+    repo_key = f"{owner}/{repo_name}"
+    if (
+        repo_key not in REPOSITORY_PULL_REQUESTS
+        or pr_number not in REPOSITORY_PULL_REQUESTS[repo_key]
+    ):
+        return None
+
+    pr = REPOSITORY_PULL_REQUESTS[repo_key][pr_number]
+    base_sha, head_sha = _pull_request_heads(owner, repo_name, pr)
+    start = (page - 1) * per_page
+    limit = max(min(per_page, PULL_REQUEST_FILE_LIMIT - start), 0)
+    files = get_range_files(owner, repo_name, base_sha, head_sha, start, limit)
+    return files if files is not None else []
+
+
+def iter_pull_request_diff(
+    owner: str, repo_name: str, pr_number: int
+) -> Optional[Iterator[bytes]]:
+    """Iterate the git diff of a pull request in chunks, as it is computed"""
+    repo_key = f"{owner}/{repo_name}"
+    if (
+        repo_key not in REPOSITORY_PULL_REQUESTS
+        or pr_number not in REPOSITORY_PULL_REQUESTS[repo_key]
+    ):
+        return None
+
+    pr = REPOSITORY_PULL_REQUESTS[repo_key][pr_number]
+    base_sha, head_sha = _pull_request_heads(owner, repo_name, pr)
+    lines = iter_range_diff(owner, repo_name, base_sha, head_sha)
+    return lines if lines is not None else iter(())
 
 
 def is_pull_request_merged(owner: str, repo_name: str, pr_number: int) -> bool:
@@ -385,72 +463,106 @@ def merge_pull_request(
     ):
         return None
 
-    pr = REPOSITORY_PULL_REQUESTS[repo_key][pr_number]
+    with backend.transaction():
+        pr = REPOSITORY_PULL_REQUESTS[repo_key][pr_number]
 
-    # Return 405 error if already merged
-    if pr["merged"]:
-        return (
-            405,
-            {
-                "documentation_url": "https://docs.github.com/rest/reference/pulls#merge-a-pull-request",
-                "message": "Pull request is already merged",
-            },
-        )
-
-    # Return 405 error if not mergeable
-    if not pr["mergeable"]:
-        return (
-            405,
-            {
-                "documentation_url": "https://docs.github.com/rest/reference/pulls#merge-a-pull-request",
-                "message": "Pull request is not mergeable",
-            },
-        )
-
-    # Return 405 error if closed
-    if pr["state"] == "closed":
-        return (
-            405,
-            {
-                "documentation_url": "https://docs.github.com/rest/reference/pulls#merge-a-pull-request",
-                "message": "Pull request is closed",
-            },
-        )
-
-    # Get merge executor
-    merger = USERS.get(merger_username)
-    if not merger:
-        return None
+        # Return 405 error if already merged
+        if pr["merged"]:
+            return (
+                405,
+                {
+                    "documentation_url": "https://docs.github.com/rest/reference/pulls#merge-a-pull-request",
+                    "message": "Pull request is already merged",
+                },
+            )
 
-    # Get merge method
-    # merge_method = merge_data.get("merge_method", "merge-commit")  # Unused variable
+        # Return 405 error if closed
+        if pr["state"] == "closed":
+            return (
+                405,
+                {
+                    "documentation_url": "https://docs.github.com/rest/reference/pulls#merge-a-pull-request",
+                    "message": "Pull request is closed",
+                },
+            )
 
-    # SHA of merge commit
-    merge_sha = generate_sha()
+        # Get merge executor
+        merger = USERS.get(merger_username)
+        if not merger:
+            return None
 
-    # Merge pull request
-    now = datetime.now()
-    pr["merged"] = True
-    pr["merged_at"] = now
-    pr["merged_by"] = merger
-    pr["state"] = "closed"
-    pr["updated_at"] = now
-
-    # Return merge success response
-    return {
-        "sha": merge_sha,
-        "merged": True,
-        "message": "Pull request successfully merged",
-    }
+        # Merge the head commit into the base branch. Pull requests without
+        # snapshots of their commits (fixtures) use their stored mergeability.
+        base_sha, head_sha = _pull_request_heads(owner, repo_name, pr)
+        if get_root_tree(owner, repo_name, head_sha) is None:
+            merge_sha = generate_sha() if pr["mergeable"] else None
+        else:
+            merge_method = merge_data.get("merge_method") or "merge"
+            if merge_method == "squash":
+                title = (
+                    merge_data.get("commit_title") or f"{pr['title']} (#{pr_number})"
+                )
+                body = merge_data.get("commit_message") or ""
+            else:
+                title = (
+                    merge_data.get("commit_title")
+                    or f"Merge pull request #{pr_number} from {pr['head']['label']}"
+                )
+                body = merge_data.get("commit_message") or pr["title"]
+
+            commit = merge_branch(
+                owner,
+                repo_name,
+                pr["base"]["ref"],
+                head_sha,
+                f"{title}\n\n{body}" if body else title,
+                merger_username,
+                squash=merge_method == "squash",
+            )
+            merge_sha = commit["sha"] if commit is not None else None
+
+        # Return 405 error if not mergeable
+        if merge_sha is None:
+            return (
+                405,
+                {
+                    "documentation_url": "https://docs.github.com/rest/reference/pulls#merge-a-pull-request",
+                    "message": "Pull request is not mergeable",
+                },
+            )
+
+        # Merge pull request
+        now = datetime.now()
+        pr["base"]["sha"] = base_sha
+        pr["head"]["sha"] = head_sha
+        pr["merged"] = True
+        pr["merged_at"] = now
+        pr["merged_by"] = merger
+        pr["state"] = "closed"
+        pr["updated_at"] = now
+        REPOSITORY_PULL_REQUESTS[repo_key][pr_number] = pr
+
+        # Return merge success response
+        return {
+            "sha": merge_sha,
+            "merged": True,
+            "message": "Pull request successfully merged",
+        }
 
 
 def get_next_pr_id() -> int:
     """Generate next pull request ID"""
-    max_id = 2000
-    for repo_prs in REPOSITORY_PULL_REQUESTS.values():
-        for pr in repo_prs.values():
-            max_id = max(max_id, pr["id"])
-    return max_id + 1
+    return next_id(
+        "pull_request_id",
+        lambda: max(
+            (
+                pr["id"]
+                for repo_prs in REPOSITORY_PULL_REQUESTS.values()
+                for pr in repo_prs.values()
+            ),
+            default=2000,
+        ),
+    )
 
 
 def generate_sha() -> str:
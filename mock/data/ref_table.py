@@ -0,0 +1,121 @@
+"""Unified ref table
+
+Maps every name that can identify a commit of a repository to its SHA, so
+resolving a ref is a single dict lookup. Names come from several sources,
+listed here by precedence (the first source defining a name wins, following
+the existing resolution order of full SHA, branch, then tag):
+
+1. full commit SHAs
+2. branch names (``REPOSITORY_BRANCHES``)
+3. tag names (``REPOSITORY_TAGS``)
+4. full ref names (``refs/heads/main``) and their ``heads/main`` form
+5. short names of refs without a branch or tag record (heads, then tags)
+6. abbreviated (7 character) commit SHAs, when unambiguous
+
+Each source is kept separately so that removing a name from one source
+reveals the next one, and the merged ``name -> sha`` dict is refreshed only
+for the names that changed.
+"""
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+ABBREV_LENGTH = 7
+
+# Source layers, by precedence
+COMMITS, BRANCHES, TAGS, REFS, REF_HEADS, REF_TAGS, ABBREVIATIONS = range(7)
+
+# Layers of the short names of full refs
+SHORT_NAME_LAYERS = {"refs/heads/": REF_HEADS, "refs/tags/": REF_TAGS}
+
+
+class RefTable:
+    """Names resolving to commit SHAs in one repository"""
+
+    def __init__(
+        self,
+        commit_shas: Iterable[str],
+        branches: Iterable[Tuple[str, str]],
+        tags: Iterable[Tuple[str, str]],
+        refs: Iterable[Tuple[str, str]],
+    ):
+        self._layers: List[Dict[str, Optional[str]]] = [{} for _ in range(7)]
+        self._names: Dict[str, str] = {}
+
+        for sha in commit_shas:
+            self.add_commit(sha)
+        for name, sha in branches:
+            self.set_name(BRANCHES, name, sha)
+        for name, sha in tags:
+            self.set_name(TAGS, name, sha)
+        for ref, sha in refs:
+            self.set_ref(ref, sha)
+
+    def resolve(self, name: str) -> Optional[str]:
+        """Get the SHA a name points to"""
+        return self._names.get(name)
+
+    def add_commit(self, sha: str) -> None:
+        """Add a commit SHA and its abbreviation"""
+        self.set_name(COMMITS, sha, sha)
+
+        # An abbreviation shared by several commits resolves to nothing
+        abbrev = sha[:ABBREV_LENGTH]
+        abbreviations = self._layers[ABBREVIATIONS]
+        if abbrev in abbreviations and abbreviations[abbrev] != sha:
+            self.set_name(ABBREVIATIONS, abbrev, None)
+        else:
+            self.set_name(ABBREVIATIONS, abbrev, sha)
+
+    def set_branch(self, name: str, sha: str) -> None:
+        """Add or move a branch"""
+        self.set_name(BRANCHES, name, sha)
+
+    def delete_branch(self, name: str) -> None:
+        """Remove a branch"""
+        self.delete_name(BRANCHES, name)
+
+    def set_ref(self, ref: str, sha: str) -> None:
+        """Add or move a full ref (refs/heads/..., refs/tags/...)"""
+        for name in _ref_names(ref):
+            self.set_name(REFS, name, sha)
+        for prefix, layer in SHORT_NAME_LAYERS.items():
+            if ref.startswith(prefix):
+                self.set_name(layer, ref[len(prefix) :], sha)
+
+    def delete_ref(self, ref: str) -> None:
+        """Remove a full ref"""
+        for name in _ref_names(ref):
+            self.delete_name(REFS, name)
+        for prefix, layer in SHORT_NAME_LAYERS.items():
+            if ref.startswith(prefix):
+                self.delete_name(layer, ref[len(prefix) :])
+
+    def set_name(self, layer: int, name: str, sha: Optional[str]) -> None:
+        """Set a name in one source layer"""
+        self._layers[layer][name] = sha
+        self._refresh(name)
+
+    def delete_name(self, layer: int, name: str) -> None:
+        """Remove a name from one source layer"""
+        self._layers[layer].pop(name, None)
+        self._refresh(name)
+
+    def _refresh(self, name: str) -> None:
+        """Recompute the merged entry of a name from its layers"""
+        for layer in self._layers:
+            if name in layer:
+                sha = layer[name]
+                if sha is None:
+                    break
+                self._names[name] = sha
+                return
+
+        self._names.pop(name, None)
+
+
+def _ref_names(ref: str) -> List[str]:
+    """Get the full names of a ref (refs/heads/main and heads/main)"""
+    names = [ref]
+    if ref.startswith("refs/"):
+        names.append(ref[len("refs/") :])
+    return names
@@ -1,6 +1,10 @@
 from datetime import datetime
 from typing import List, Optional
 
+from data.indexes import IndexCache
+from data.repository_index import RepositoryIndex
+from data.sequences import next_id
+from data.storage import backend
 from data.users import USERS
 
 # Repository data
@@ -107,18 +111,12 @@ REPOSITORY_TAGS = {
     ],
 }
 
-# Repository file contents
-REPOSITORY_CONTENTS = {
-    "admin/repo1": {
-        "README.md": "# Repository 1\n\nThis is a test repository.",
-        "file.txt": "This is a test file.",
-    },
-    "user1/repo2": {"README.md": "# Repository 2\n\nThis is another test repository."},
-    "org1/repo3": {
-        "README.md": "# Repository 3\n\nThis is an organization repository.",
-        "src/main.py": "print('Hello, World!')",
-    },
-}
+# Load the fixture data into the storage backend
+REPOSITORIES = backend.table("repositories", REPOSITORIES)
+REPOSITORY_TAGS = backend.table("repository_tags", REPOSITORY_TAGS)
+
+# Repository keys per owner and for public repositories
+REPOSITORY_INDEX = IndexCache(lambda: RepositoryIndex(REPOSITORIES.values()))
 
 
 def get_repository(owner: str, repo_name: str) -> Optional[dict]:
@@ -127,81 +125,91 @@ def get_repository(owner: str, repo_name: str) -> Optional[dict]:
     return REPOSITORIES.get(repo_key)
 
 
-def get_user_repositories(username: str) -> List[dict]:
+def get_user_repositories(
+    username: str, page: int = 1, per_page: int = 30
+) -> List[dict]:
     """Get repositories for a user"""
-    return [
-        repo
-        for repo_key, repo in REPOSITORIES.items()
-        if repo_key.startswith(f"{username}/")
-    ]
+    repo_keys = REPOSITORY_INDEX.get().owner_page(username, page, per_page)
+    return [REPOSITORIES[repo_key] for repo_key in repo_keys]
 
 
-def get_organization_repositories(org_name: str) -> List[dict]:
+def get_organization_repositories(
+    org_name: str, page: int = 1, per_page: int = 30
+) -> List[dict]:
     """Get repositories for an organization"""
-    return [
-        repo
-        for repo_key, repo in REPOSITORIES.items()
-        if repo_key.startswith(f"{org_name}/")
-    ]
+    repo_keys = REPOSITORY_INDEX.get().owner_page(org_name, page, per_page)
+    return [REPOSITORIES[repo_key] for repo_key in repo_keys]
 
 
-def get_all_public_repositories() -> List[dict]:
+def get_all_public_repositories(page: int = 1, per_page: int = 30) -> List[dict]:
     """Get all public repositories"""
-    return [repo for repo in REPOSITORIES.values() if not repo["private"]]
+    repo_keys = REPOSITORY_INDEX.get().public_page(page, per_page)
+    return [REPOSITORIES[repo_key] for repo_key in repo_keys]
 
 
 def create_repository(owner: str, repo_data: dict) -> Optional[dict]:
     """Create a new repository"""
     repo_name = repo_data["name"]
     repo_key = f"{owner}/{repo_name}"
+    with backend.transaction():
+        if repo_key in REPOSITORIES:
+            return None
+
+        # Get owner information
+        from data.organizations import get_organization_by_name
+        from data.users import get_user_by_username
+
+        owner_info = get_user_by_username(owner) or get_organization_by_name(owner)
+        if not owner_info:
+            return None
+
+        # Create new repository
+        new_repo = {
+            "name": repo_name,
+            "full_name": repo_key,
+            "description": repo_data.get("description", ""),
+            "watchers": 0,
+            "forks": 0,
+            "private": repo_data.get("private", False),
+            "default_branch": "main",
+            "owner": owner_info,
+            "has_issues": True,
+            "id": next_id(
+                "repository_id",
+                lambda: max(
+                    (repo["id"] for repo in REPOSITORIES.values()), default=1000
+                ),
+            ),
+            "forks_count": 0,
+            "watchers_count": 0,
+            "url": f"/api/v3/repos/{repo_key}",
+            "clone_url": f"https://example.com/{repo_key}.git",
+            "html_url": f"/{repo_key}",
+            "ssh_url": f"git@example.com:{repo_key}.git",
+        }
 
-    if repo_key in REPOSITORIES:
-        return None
-
-    # Get owner information
-    from data.organizations import get_organization_by_name
-    from data.users import get_user_by_username
-
-    owner_info = get_user_by_username(owner) or get_organization_by_name(owner)
-    if not owner_info:
-        return None
-
-    # Create new repository
-    new_repo = {
-        "name": repo_name,
-        "full_name": repo_key,
-        "description": repo_data.get("description", ""),
-        "watchers": 0,
-        "forks": 0,
-        "private": repo_data.get("private", False),
-        "default_branch": "main",
-        "owner": owner_info,
-        "has_issues": True,
-        "id": len(REPOSITORIES) + 1001,
-        "forks_count": 0,
-        "watchers_count": 0,
-        "url": f"/api/v3/repos/{repo_key}",
-        "clone_url": f"https://example.com/{repo_key}.git",
-        "html_url": f"/{repo_key}",
-        "ssh_url": f"git@example.com:{repo_key}.git",
-    }
-
-    REPOSITORIES[repo_key] = new_repo
+        REPOSITORIES[repo_key] = new_repo
+        REPOSITORY_INDEX.update(lambda index: index.add(new_repo))
 
-    # Create initial content (if auto_init is True)
-    if repo_data.get("auto_init", False):
-        if repo_key not in REPOSITORY_CONTENTS:
-            REPOSITORY_CONTENTS[repo_key] = {}
+        # Create initial content (if auto_init is True)
+        if repo_data.get("auto_init", False):
+            from data.contents import commit_files
 
-        REPOSITORY_CONTENTS[repo_key]["README.md"] = (
-            f"# {repo_name}\n\n{repo_data.get('description', '')}"
-        )
+            readme = f"# {repo_name}\n\n{repo_data.get('description', '')}"
+            commit_files(
+                owner,
+                repo_name,
+                None,
+                {"README.md": readme.encode("utf-8")},
+                "Initial commit",
+                username=owner,
+            )
 
-    # Initialize empty list for tags
-    if repo_key not in REPOSITORY_TAGS:
-        REPOSITORY_TAGS[repo_key] = []
+        # Initialize empty list for tags
+        if repo_key not in REPOSITORY_TAGS:
+            REPOSITORY_TAGS[repo_key] = []
 
-    return new_repo
+        return new_repo
 
 
 def get_repository_tags(owner: str, repo_name: str) -> Optional[List[dict]]:
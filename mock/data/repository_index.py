@@ -0,0 +1,57 @@
+"""Repository listing index
+
+Keeps repository keys in creation (id) order per owner and for public
+repositories, so a page of a listing is a slice of one list instead of a
+scan over every repository.
+"""
+
+import bisect
+from typing import Dict, Iterable, List, Tuple
+
+
+class RepositoryIndex:
+    """Repository keys ordered by id, per owner and for public repositories"""
+
+    def __init__(self, repos: Iterable[Dict]):
+        self._owners: Dict[str, List[Tuple[int, str]]] = {}
+        self._public: List[Tuple[int, str]] = []
+
+        # Append everything first and sort the lists once
+        for repo in repos:
+            owner, _ = repo["full_name"].split("/", 1)
+            self._owners.setdefault(owner, []).append((repo["id"], repo["full_name"]))
+            if not repo["private"]:
+                self._public.append((repo["id"], repo["full_name"]))
+
+        for repo_keys in self._owners.values():
+            repo_keys.sort()
+        self._public.sort()
+
+    def add(self, repo: Dict) -> None:
+        """Add a new repository"""
+        owner, _ = repo["full_name"].split("/", 1)
+        entry = (repo["id"], repo["full_name"])
+        _insert(self._owners.setdefault(owner, []), entry)
+        if not repo["private"]:
+            _insert(self._public, entry)
+
+    def owner_page(self, owner: str, page: int, per_page: int) -> List[str]:
+        """Get one page of the repository keys of an owner"""
+        return _page(self._owners.get(owner, []), page, per_page)
+
+    def public_page(self, page: int, per_page: int) -> List[str]:
+        """Get one page of the public repository keys"""
+        return _page(self._public, page, per_page)
+
+
+def _insert(entries: List[Tuple[int, str]], entry: Tuple[int, str]) -> None:
+    """Insert an entry into a sorted list unless it is already there"""
+    position = bisect.bisect_left(entries, entry)
+    if position == len(entries) or entries[position] != entry:
+        entries.insert(position, entry)
+
+
+def _page(entries: List[Tuple[int, str]], page: int, per_page: int) -> List[str]:
+    """Slice one page of repository keys"""
+    start = (page - 1) * per_page
+    return [repo_key for _, repo_key in entries[start : start + per_page]]
@@ -0,0 +1,22 @@
+"""Monotonic ID and number allocation
+
+Counters live in the storage backend, so allocation is a single atomic
+increment regardless of how many records exist. A counter is restored from
+the existing data the first time it is used: ``initial`` returns the highest
+value already taken (fixture data or a persisted SQLite database) and is not
+called again afterwards.
+"""
+
+from typing import Callable
+
+from data.storage import backend
+
+
+def next_id(name: str, initial: Callable[[], int]) -> int:
+    """Allocate the next global ID for an entity type"""
+    return backend.next_sequence(name, "", initial)
+
+
+def next_number(name: str, repo_key: str, initial: Callable[[], int]) -> int:
+    """Allocate the next per-repository number for an entity type"""
+    return backend.next_sequence(name, repo_key, initial)
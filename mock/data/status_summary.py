@@ -0,0 +1,55 @@
+"""Combined commit status summary
+
+Keeps, for the statuses of one commit, the position of the latest status of
+each context and the number of contexts in each state. Finding the status of
+a context, updating it and computing the combined state are all O(1),
+whatever the number of contexts.
+"""
+
+from typing import Dict, Iterable, Optional
+
+# Combined state precedence: the first state with a context wins
+STATE_PRECEDENCE = ("failure", "error", "pending")
+
+
+class StatusSummary:
+    """Latest status per context of a commit, with counts per state"""
+
+    def __init__(self, statuses: Iterable[Dict]):
+        self._positions: Dict[str, int] = {}
+        self._states: Dict[str, str] = {}
+        self._counts: Dict[str, int] = {}
+
+        for position, status in enumerate(statuses):
+            self.set(status["context"], position, status["state"])
+
+    @property
+    def total_count(self) -> int:
+        """Get the number of contexts"""
+        return len(self._positions)
+
+    @property
+    def state(self) -> str:
+        """Get the combined state"""
+        if not self._positions:
+            return "pending"
+
+        for state in STATE_PRECEDENCE:
+            if self._counts.get(state):
+                return state
+
+        return "success"
+
+    def find(self, context: str) -> Optional[int]:
+        """Get the position of the status of a context"""
+        return self._positions.get(context)
+
+    def set(self, context: str, position: int, state: str) -> None:
+        """Record the status of a context"""
+        old_state = self._states.get(context)
+        if old_state is not None:
+            self._counts[old_state] -= 1
+
+        self._positions[context] = position
+        self._states[context] = state
+        self._counts[state] = self._counts.get(state, 0) + 1
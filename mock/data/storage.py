@@ -0,0 +1,497 @@
+"""Storage backends for the mock data tables
+
+Every module in the data package keeps its records in module-level tables
+such as ``REPOSITORY_ISSUES`` or ``REPOSITORY_COMMITS``. Those tables are
+created through the active storage backend, so the data functions only rely
+on the mapping interface:
+
+- ``memory`` (default): the tables are dicts holding the fixture data.
+  State is lost when the process exits.
+- ``sqlite``: the tables are views over an embedded SQLite database in WAL
+  mode. State survives restarts and several uvicorn workers can read the
+  same database in parallel.
+
+The backend is selected with the ``GITBUCKET_MOCK_STORAGE`` environment
+variable (``memory`` or ``sqlite``). The SQLite database file is taken from
+``GITBUCKET_MOCK_SQLITE_PATH`` (default: ``gitbucket-mock.sqlite3``).
+
+Records read from the SQLite backend are copies, so functions that modify a
+record in place must store it back into its table
+(``TABLE[repo_key][key] = record``). With the memory backend that assignment
+changes nothing but is recorded for rollback.
+
+Both backends undo the changes of a transaction that raises. The memory
+backend does so by restoring the keys assigned or deleted in the
+transaction to their previous values: a record changed in place keeps its
+changes, so functions whose changes must be undone store new records
+instead of changing the ones they read.
+"""
+
+import os
+import pickle
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    ItemsView,
+    Iterator,
+    List,
+    MutableMapping,
+    Optional,
+    Tuple,
+    Union,
+    ValuesView,
+)
+
+Seed = Union[Dict, Callable[[], Dict]]
+
+# Value of a key that did not exist, in the rollback journal
+_MISSING = object()
+
+
+class StorageBackend:
+    """Interface for storage backends"""
+
+    name = ""
+
+    # File of the database, None when the data is not stored in a file
+    path: Optional[str] = None
+
+    def table(self, name: str, seed: Seed) -> MutableMapping:
+        """Get a flat table ({key: value}), seeding it on first use"""
+        raise NotImplementedError
+
+    def repo_table(self, name: str, seed: Seed) -> MutableMapping:
+        """Get a per-repository table ({repo_key: {key: value}}), seeding it on first use"""
+        raise NotImplementedError
+
+    def next_sequence(self, name: str, scope: str, initial: Callable[[], int]) -> int:
+        """Atomically increment a counter and return the new value
+
+        ``initial`` is only called when the counter does not exist yet and
+        must return the highest value already in use.
+        """
+        raise NotImplementedError
+
+    def data_version(self) -> int:
+        """Get a value that changes whenever another process modifies the data
+
+        Derived in-memory indexes compare it to decide whether they must be
+        rebuilt. Changes made through this backend do not affect it.
+        """
+        raise NotImplementedError
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """Run several table operations atomically"""
+        raise NotImplementedError
+        yield
+
+    def after_transaction(self, callback: Callable[[bool], None]) -> None:
+        """Call a function when the outermost running transaction ends
+
+        The callback gets whether the changes made in the transaction were
+        kept (False when they were rolled back). Callbacks run in the order
+        they were added, before another transaction can start.
+        """
+        self._callbacks.append(callback)
+
+    def _end_transaction(self, kept: bool) -> None:
+        """Run the callbacks of the transaction that just ended"""
+        callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback(kept)
+
+
+class MemoryBackend(StorageBackend):
+    """Keep every table in process memory
+
+    Tables are ``MemoryTable`` dicts. While a transaction runs, they record
+    the previous value of every key its thread assigns or deletes, and the
+    transaction restores them if it raises.
+    """
+
+    name = "memory"
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._owner: Optional[int] = None
+        self._journal: List[Tuple[Dict, Any, Any]] = []
+        self._callbacks: List[Callable[[bool], None]] = []
+        self._sequences: Dict[tuple, int] = {}
+
+    def table(self, name: str, seed: Seed) -> MutableMapping:
+        return MemoryTable(self, seed() if callable(seed) else seed)
+
+    def repo_table(self, name: str, seed: Seed) -> MutableMapping:
+        return MemoryRepoTable(self, seed() if callable(seed) else seed)
+
+    def next_sequence(self, name: str, scope: str, initial: Callable[[], int]) -> int:
+        with self._lock:
+            key = (name, scope)
+            if key not in self._sequences:
+                self._sequences[key] = initial()
+            self._sequences[key] += 1
+            return self._sequences[key]
+
+    def data_version(self) -> int:
+        return 0
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        with self._lock:
+            if self._depth == 0:
+                self._owner = threading.get_ident()
+            self._depth += 1
+            try:
+                yield
+            except BaseException:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._rollback()
+                    self._end_transaction(False)
+                raise
+            self._depth -= 1
+            if self._depth == 0:
+                self._owner = None
+                self._journal = []
+                self._end_transaction(True)
+
+    def record_change(self, table: Dict, key: Any) -> None:
+        """Keep the value of a key about to change, if in a transaction"""
+        if self._owner == threading.get_ident():
+            self._journal.append((table, key, dict.get(table, key, _MISSING)))
+
+    def _rollback(self) -> None:
+        """Restore the keys changed in the transaction, latest change first"""
+        journal, self._journal, self._owner = self._journal, [], None
+        for table, key, value in reversed(journal):
+            if value is _MISSING:
+                dict.pop(table, key, None)
+            else:
+                dict.__setitem__(table, key, value)
+
+
+class MemoryTable(dict):
+    """Dict table of the memory backend, recording changes for rollback"""
+
+    def __init__(self, backend: MemoryBackend, records: Any = ()):
+        super().__init__(records)
+        self._backend = backend
+
+    def __setitem__(self, key: Any, value: Any) -> None:
+        self._backend.record_change(self, key)
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key: Any) -> None:
+        self._backend.record_change(self, key)
+        super().__delitem__(key)
+
+    def pop(self, key: Any, *default: Any) -> Any:
+        if key in self:
+            self._backend.record_change(self, key)
+        return super().pop(key, *default)
+
+    def popitem(self) -> Tuple[Any, Any]:
+        key = next(reversed(self))
+        return key, self.pop(key)
+
+    def setdefault(self, key: Any, default: Any = None) -> Any:
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def update(self, *args: Any, **kwargs: Any) -> None:
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def clear(self) -> None:
+        for key in list(self):
+            del self[key]
+
+
+class MemoryRepoTable(MemoryTable):
+    """Per-repository table of the memory backend, of MemoryTable records"""
+
+    def __init__(self, backend: MemoryBackend, records: Any = ()):
+        super().__init__(backend)
+        for repo_key, repo_records in dict(records).items():
+            dict.__setitem__(self, repo_key, MemoryTable(backend, repo_records))
+
+    def __setitem__(self, repo_key: Any, records: Any) -> None:
+        super().__setitem__(repo_key, MemoryTable(self._backend, records))
+
+
+class SqliteBackend(StorageBackend):
+    """Keep every table in an embedded SQLite database (WAL mode)
+
+    Each logical table is stored in its own SQL table keyed by
+    ``(scope, key)``, where ``scope`` is the repository key for per-repository
+    tables and an empty string for flat tables. Values are pickled.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._callbacks: List[Callable[[bool], None]] = []
+        self._conn = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None, timeout=30
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self.transaction():
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS _seeded (tbl TEXT PRIMARY KEY)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS _scopes ("
+                "tbl TEXT NOT NULL, scope TEXT NOT NULL, PRIMARY KEY (tbl, scope)"
+                ") WITHOUT ROWID"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS _sequences ("
+                "name TEXT NOT NULL, scope TEXT NOT NULL, value INTEGER NOT NULL, "
+                "PRIMARY KEY (name, scope)"
+                ") WITHOUT ROWID"
+            )
+
+    def execute(self, sql: str, params: tuple = ()) -> list:
+        """Execute a statement and fetch all rows"""
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        with self._lock:
+            if self._depth == 0:
+                self._conn.execute("BEGIN IMMEDIATE")
+            self._depth += 1
+            try:
+                yield
+            except BaseException:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._conn.execute("ROLLBACK")
+                    self._end_transaction(False)
+                raise
+            self._depth -= 1
+            if self._depth == 0:
+                self._conn.execute("COMMIT")
+                self._end_transaction(True)
+
+    def table(self, name: str, seed: Seed) -> MutableMapping:
+        self._create(name, seed, per_repository=False)
+        return SqliteTable(self, name, "")
+
+    def repo_table(self, name: str, seed: Seed) -> MutableMapping:
+        self._create(name, seed, per_repository=True)
+        return SqliteRepoTable(self, name)
+
+    def next_sequence(self, name: str, scope: str, initial: Callable[[], int]) -> int:
+        with self.transaction():
+            rows = self.execute(
+                "UPDATE _sequences SET value = value + 1 "
+                "WHERE name = ? AND scope = ? RETURNING value",
+                (name, scope),
+            )
+            if rows:
+                return rows[0][0]
+
+            value = initial() + 1
+            self.execute(
+                "INSERT INTO _sequences (name, scope, value) VALUES (?, ?, ?)",
+                (name, scope, value),
+            )
+            return value
+
+    def data_version(self) -> int:
+        return self.execute("PRAGMA data_version")[0][0]
+
+    def _create(self, name: str, seed: Seed, per_repository: bool) -> None:
+        """Create the SQL table and load the fixture data the first time"""
+        with self.transaction():
+            self.execute(
+                f'CREATE TABLE IF NOT EXISTS "{name}" ('
+                "scope TEXT NOT NULL, key NOT NULL, value BLOB NOT NULL, "
+                "PRIMARY KEY (scope, key)"
+                ") WITHOUT ROWID"
+            )
+            if self.execute("SELECT 1 FROM _seeded WHERE tbl = ?", (name,)):
+                return
+
+            records = seed() if callable(seed) else seed
+            if per_repository:
+                for repo_key, repo_records in records.items():
+                    SqliteRepoTable(self, name)[repo_key] = repo_records
+            else:
+                for key, value in records.items():
+                    SqliteTable(self, name, "")[key] = value
+
+            self.execute("INSERT INTO _seeded (tbl) VALUES (?)", (name,))
+
+
+class SqliteTable(MutableMapping):
+    """Mapping view over the rows of one scope of a SQLite table"""
+
+    def __init__(self, backend: SqliteBackend, name: str, scope: str):
+        self._backend = backend
+        self._name = name
+        self._scope = scope
+
+    def __getitem__(self, key: Any) -> Any:
+        rows = self._backend.execute(
+            f'SELECT value FROM "{self._name}" WHERE scope = ? AND key = ?',
+            (self._scope, key),
+        )
+        if not rows:
+            raise KeyError(key)
+        return pickle.loads(rows[0][0])
+
+    def __setitem__(self, key: Any, value: Any) -> None:
+        self._backend.execute(
+            f'INSERT OR REPLACE INTO "{self._name}" (scope, key, value) VALUES (?, ?, ?)',
+            (self._scope, key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL)),
+        )
+
+    def __delitem__(self, key: Any) -> None:
+        rows = self._backend.execute(
+            f'DELETE FROM "{self._name}" WHERE scope = ? AND key = ? RETURNING key',
+            (self._scope, key),
+        )
+        if not rows:
+            raise KeyError(key)
+
+    def __contains__(self, key: object) -> bool:
+        return bool(
+            self._backend.execute(
+                f'SELECT 1 FROM "{self._name}" WHERE scope = ? AND key = ?',
+                (self._scope, key),
+            )
+        )
+
+    def __iter__(self) -> Iterator[Any]:
+        rows = self._backend.execute(
+            f'SELECT key FROM "{self._name}" WHERE scope = ? ORDER BY key',
+            (self._scope,),
+        )
+        return iter([row[0] for row in rows])
+
+    def __len__(self) -> int:
+        rows = self._backend.execute(
+            f'SELECT COUNT(*) FROM "{self._name}" WHERE scope = ?', (self._scope,)
+        )
+        return rows[0][0]
+
+    def items(self) -> ItemsView:
+        return SqliteItemsView(self)
+
+    def values(self) -> ValuesView:
+        return SqliteValuesView(self)
+
+    def rows(self) -> List[Tuple[Any, Any]]:
+        """Read the (key, value) pairs of the scope with one query"""
+        rows = self._backend.execute(
+            f'SELECT key, value FROM "{self._name}" WHERE scope = ? ORDER BY key',
+            (self._scope,),
+        )
+        return [(key, pickle.loads(value)) for key, value in rows]
+
+
+class SqliteItemsView(ItemsView):
+    """Items of a SqliteTable, read with one query per iteration"""
+
+    _mapping: SqliteTable
+
+    def __iter__(self) -> Iterator[Tuple[Any, Any]]:
+        return iter(self._mapping.rows())
+
+
+class SqliteValuesView(ValuesView):
+    """Values of a SqliteTable, read with one query per iteration"""
+
+    _mapping: SqliteTable
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter([value for _, value in self._mapping.rows()])
+
+
+class SqliteRepoTable(MutableMapping):
+    """Mapping of repository keys to SqliteTable views"""
+
+    def __init__(self, backend: SqliteBackend, name: str):
+        self._backend = backend
+        self._name = name
+
+    def __getitem__(self, repo_key: str) -> SqliteTable:
+        if repo_key not in self:
+            raise KeyError(repo_key)
+        return SqliteTable(self._backend, self._name, repo_key)
+
+    def __setitem__(self, repo_key: str, records: Any) -> None:
+        with self._backend.transaction():
+            records = dict(records.items())
+            self._backend.execute(
+                f'DELETE FROM "{self._name}" WHERE scope = ?', (repo_key,)
+            )
+            self._backend.execute(
+                "INSERT OR IGNORE INTO _scopes (tbl, scope) VALUES (?, ?)",
+                (self._name, repo_key),
+            )
+            table = SqliteTable(self._backend, self._name, repo_key)
+            for key, value in records.items():
+                table[key] = value
+
+    def __delitem__(self, repo_key: str) -> None:
+        with self._backend.transaction():
+            rows = self._backend.execute(
+                "DELETE FROM _scopes WHERE tbl = ? AND scope = ? RETURNING scope",
+                (self._name, repo_key),
+            )
+            if not rows:
+                raise KeyError(repo_key)
+            self._backend.execute(
+                f'DELETE FROM "{self._name}" WHERE scope = ?', (repo_key,)
+            )
+
+    def __contains__(self, repo_key: object) -> bool:
+        return bool(
+            self._backend.execute(
+                "SELECT 1 FROM _scopes WHERE tbl = ? AND scope = ?",
+                (self._name, repo_key),
+            )
+        )
+
+    def __iter__(self) -> Iterator[str]:
+        rows = self._backend.execute(
+            "SELECT scope FROM _scopes WHERE tbl = ? ORDER BY scope", (self._name,)
+        )
+        return iter([row[0] for row in rows])
+
+    def __len__(self) -> int:
+        rows = self._backend.execute(
+            "SELECT COUNT(*) FROM _scopes WHERE tbl = ?", (self._name,)
+        )
+        return rows[0][0]
+
+
+def create_backend() -> StorageBackend:
+    """Create the backend selected by the environment"""
+    backend_name = os.environ.get("GITBUCKET_MOCK_STORAGE", "memory")
+    if backend_name == "memory":
+        return MemoryBackend()
+    if backend_name == "sqlite":
+        return SqliteBackend(
+            os.environ.get("GITBUCKET_MOCK_SQLITE_PATH", "gitbucket-mock.sqlite3")
+        )
+    raise ValueError(f"Unknown storage backend: {backend_name}")
+
+
+# Active storage backend shared by all data modules
+backend = create_backend()
@@ -0,0 +1,166 @@
+"""Three-way merges of trees
+
+``merge_trees`` merges the changes made from a merge base to one side
+("theirs") into the other side ("ours"), as ``git merge`` does for one
+merge base:
+
+- a path changed on one side only takes that side.
+- a path changed the same way on both sides is kept.
+- a text file changed differently on both sides is merged line by line:
+  changes to separate lines both apply, changes to the same or adjacent
+  lines conflict.
+- anything else conflicts (a file deleted on one side and changed on the
+  other, a file on one side and a directory on the other, binary or large
+  files changed on both sides).
+
+Subtrees with the same SHA on two sides are decided without being read, so
+the cost of a merge follows the size of the changes, not of the trees.
+"""
+
+import difflib
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from data.blob_store import LARGE_BLOB_SIZE, Buffer, is_binary
+from data.tree_store import TreeStore
+
+# Reads a blob by SHA
+ReadBlob = Callable[[str], Optional[Buffer]]
+
+
+class TreeMerge(NamedTuple):
+    """Result of a three-way tree merge, as changes to apply on ours"""
+
+    changes: Dict[str, Optional[Dict]]  # Tree entries taken from theirs (None: delete)
+    merged: Dict[str, bytes]  # Contents of the files merged line by line
+    conflicts: List[str]  # Paths that could not be merged
+
+
+def merge_trees(
+    trees: TreeStore,
+    read_blob: ReadBlob,
+    base: Optional[str],
+    ours: str,
+    theirs: str,
+) -> TreeMerge:
+    """Merge the changes from base (None: no merge base) to theirs into ours"""
+    merge = TreeMerge({}, {}, [])
+    _merge_tree(trees, read_blob, base, ours, theirs, "", merge)
+    return merge
+
+
+def merge_lines(
+    base: List[bytes], ours: List[bytes], theirs: List[bytes]
+) -> Optional[List[bytes]]:
+    """Merge two edits of the same lines, or None when they conflict"""
+    hunks = sorted(_hunks(base, ours) + _hunks(base, theirs))
+
+    merged: List[bytes] = []
+    position = 0
+    previous: Optional[Tuple[int, int, List[bytes]]] = None
+    for hunk in hunks:
+        start, end, lines = hunk
+        if previous is not None and start <= previous[1]:
+            # Overlapping or adjacent edits merge only when they are the same
+            if hunk == previous:
+                continue
+            return None
+
+        merged.extend(base[position:start])
+        merged.extend(lines)
+        position = end
+        previous = hunk
+
+    merged.extend(base[position:])
+    return merged
+
+
+def _merge_tree(
+    trees: TreeStore,
+    read_blob: ReadBlob,
+    base: Optional[str],
+    ours: str,
+    theirs: str,
+    prefix: str,
+    merge: TreeMerge,
+) -> None:
+    """Merge one directory level (see ``merge_trees``)"""
+    base_entries = (trees.get(base) or {}) if base else {}
+    our_entries = trees.get(ours) or {}
+    their_entries = trees.get(theirs) or {}
+    names = base_entries.keys() | our_entries.keys() | their_entries.keys()
+    for name in sorted(names):
+        old = base_entries.get(name)
+        our = our_entries.get(name)
+        their = their_entries.get(name)
+        if _key(our) == _key(their) or _key(their) == _key(old):
+            continue  # Same on both sides, or only changed on ours
+
+        path = prefix + name
+        if _key(our) == _key(old):
+            merge.changes[path] = their
+            continue
+
+        # Changed on both sides: deleted on one of them conflicts
+        if our is None or their is None:
+            merge.conflicts.append(path)
+            continue
+
+        if _is_tree(our) and _is_tree(their) and (old is None or _is_tree(old)):
+            _merge_tree(
+                trees,
+                read_blob,
+                old["sha"] if old else None,
+                our["sha"],
+                their["sha"],
+                f"{path}/",
+                merge,
+            )
+            continue
+
+        if _is_blob(our) and _is_blob(their) and (old is None or _is_blob(old)):
+            content = _merge_blob(read_blob, old["sha"] if old else None, our, their)
+            if content is not None:
+                merge.merged[path] = content
+                continue
+
+        merge.conflicts.append(path)
+
+
+def _merge_blob(
+    read_blob: ReadBlob, base: Optional[str], ours: Dict, theirs: Dict
+) -> Optional[bytes]:
+    """Merge the lines of a file changed on both sides, or None on conflict"""
+    contents = []
+    for sha in (base, ours["sha"], theirs["sha"]):
+        data = (read_blob(sha) if sha else b"") or b""
+        if len(data) >= LARGE_BLOB_SIZE or is_binary(data):
+            return None
+        contents.append(bytes(data).splitlines(keepends=True))
+
+    lines = merge_lines(*contents)
+    return b"".join(lines) if lines is not None else None
+
+
+def _hunks(base: List[bytes], other: List[bytes]) -> List[Tuple[int, int, List[bytes]]]:
+    """Get the edits from base to other as (start, end, new lines) on base"""
+    matcher = difflib.SequenceMatcher(None, base, other, autojunk=False)
+    return [
+        (base_start, base_end, other[other_start:other_end])
+        for tag, base_start, base_end, other_start, other_end in matcher.get_opcodes()
+        if tag != "equal"
+    ]
+
+
+def _key(entry: Optional[Dict]) -> Optional[Tuple[str, str, str]]:
+    """Identify a tree entry by what git compares (type, mode and SHA)"""
+    if entry is None:
+        return None
+    return entry["type"], entry.get("mode", ""), entry["sha"]
+
+
+def _is_tree(entry: Optional[Dict]) -> bool:
+    return entry is not None and entry["type"] == "tree"
+
+
+def _is_blob(entry: Optional[Dict]) -> bool:
+    return entry is not None and entry["type"] == "blob"
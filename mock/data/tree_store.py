@@ -0,0 +1,164 @@
+"""Versioned tree store
+
+Directories are stored as immutable git trees keyed by their SHA-1, each one
+mapping entry names to ``{mode, type, sha}`` (``type`` is ``blob`` or
+``tree``). The snapshot of a commit is a single root tree SHA:
+
+- looking up a path walks one tree per path component, so reading a file at
+  any commit costs O(path depth) whatever the history length.
+- changing files rewrites only the trees on the paths from the changed files
+  to the root. Every other subtree is shared with the previous version, so
+  storage grows with the amount of change and not with the repository size.
+
+Identical trees have identical SHAs, so they are stored once.
+"""
+
+from typing import Dict, Iterator, MutableMapping, Optional, Tuple
+
+from data.git_objects import BLOB_MODE, TREE_MODE, tree_entries, tree_sha
+
+# SHA of the tree without entries (the root of an empty repository)
+EMPTY_TREE = tree_sha({})
+
+
+class PathConflictError(ValueError):
+    """A change goes through a file as if it were a directory"""
+
+    def __init__(self, path: str):
+        super().__init__(f"{path} is not a directory")
+        self.path = path
+
+
+def blob_entry(sha: str, size: int) -> Dict:
+    """Build the tree entry of a file
+
+    The size is not part of the git tree, it is kept so that listings do not
+    have to read the blobs.
+    """
+    return {"mode": BLOB_MODE, "type": "blob", "sha": sha, "size": size}
+
+
+class TreeStore:
+    """Immutable trees of a repository, keyed by SHA"""
+
+    def __init__(self, trees: MutableMapping[str, Dict[str, Dict]]):
+        self._trees = trees
+
+    def get(self, sha: str) -> Optional[Dict[str, Dict]]:
+        """Get the entries of a tree"""
+        if sha == EMPTY_TREE:
+            return {}
+        return self._trees.get(sha)
+
+    def lookup(self, root: str, path: str) -> Optional[Dict]:
+        """Get the entry at a path of a snapshot ("" is the root tree itself)"""
+        entry = {"mode": TREE_MODE, "type": "tree", "sha": root}
+        for name in filter(None, path.split("/")):
+            if entry["type"] != "tree":
+                return None
+            entry = (self.get(entry["sha"]) or {}).get(name)
+            if entry is None:
+                return None
+
+        return entry
+
+    def walk(self, root: str, recursive: bool = True) -> Iterator[Tuple[str, Dict]]:
+        """Iterate the (path, entry) pairs below a tree in git order
+
+        Subtrees are entered right after their own entry (depth first). The
+        walk keeps one iterator per open directory instead of recursing, so
+        entries are produced lazily in time linear in their number.
+        """
+        stack = [("", iter(tree_entries(self.get(root) or {})))]
+        while stack:
+            prefix, entries = stack[-1]
+            item = next(entries, None)
+            if item is None:
+                stack.pop()
+                continue
+
+            name, entry = item
+            path = prefix + name
+            yield path, entry
+            if recursive and entry["type"] == "tree":
+                subtree = self.get(entry["sha"]) or {}
+                stack.append((f"{path}/", iter(tree_entries(subtree))))
+
+    def diff(
+        self, old_root: Optional[str], new_root: Optional[str], prefix: str = ""
+    ) -> Iterator[Tuple[str, str, Optional[str], Optional[str]]]:
+        """Iterate the files changed between two trees, in path order
+
+        Yields (path, status, old blob SHA, new blob SHA) with a status of
+        ``added``, ``removed`` or ``modified``. Subtrees with the same SHA on
+        both sides are skipped without being read.
+        """
+        old_entries = (self.get(old_root) or {}) if old_root else {}
+        new_entries = (self.get(new_root) or {}) if new_root else {}
+        for name in sorted(old_entries.keys() | new_entries.keys()):
+            old = old_entries.get(name)
+            new = new_entries.get(name)
+            if old == new:
+                continue
+
+            path = prefix + name
+            old_tree = old["sha"] if old and old["type"] == "tree" else None
+            new_tree = new["sha"] if new and new["type"] == "tree" else None
+            if old_tree or new_tree:
+                yield from self.diff(old_tree, new_tree, f"{path}/")
+
+            old_blob = old["sha"] if old and old["type"] == "blob" else None
+            new_blob = new["sha"] if new and new["type"] == "blob" else None
+            if old_blob == new_blob:
+                continue
+            if old_blob is None:
+                yield path, "added", None, new_blob
+            elif new_blob is None:
+                yield path, "removed", old_blob, None
+            else:
+                yield path, "modified", old_blob, new_blob
+
+    def update(self, root: str, changes: Dict[str, Optional[Dict]]) -> str:
+        """Apply changes ({path: entry, or None to delete}) and get the new root
+
+        Missing directories are created and directories left empty are
+        removed, as in git. Raises PathConflictError when a change goes
+        through an entry that is not a directory and is not replaced itself.
+        """
+        entries = dict(self.get(root) or {})
+
+        # Split the changes between this tree and its subtrees
+        nested: Dict[str, Dict[str, Optional[Dict]]] = {}
+        for path, entry in changes.items():
+            name, _, rest = path.strip("/").partition("/")
+            if rest:
+                nested.setdefault(name, {})[rest] = entry
+            elif entry is None:
+                entries.pop(name, None)
+            else:
+                entries[name] = entry
+
+        for name, subtree_changes in nested.items():
+            current = entries.get(name)
+            if current is not None and current["type"] != "tree":
+                raise PathConflictError(name)
+
+            try:
+                subtree = self.update(
+                    current["sha"] if current else EMPTY_TREE, subtree_changes
+                )
+            except PathConflictError as error:
+                raise PathConflictError(f"{name}/{error.path}") from None
+            if subtree == EMPTY_TREE:
+                entries.pop(name, None)
+            else:
+                entries[name] = {"mode": TREE_MODE, "type": "tree", "sha": subtree}
+
+        return self.put(entries)
+
+    def put(self, entries: Dict[str, Dict]) -> str:
+        """Store a tree and get its SHA"""
+        sha = tree_sha(entries)
+        if sha != EMPTY_TREE and sha not in self._trees:
+            self._trees[sha] = entries
+        return sha
@@ -1,5 +1,8 @@
 from datetime import datetime
 
+from data.sequences import next_id
+from data.storage import backend
+
 # User data
 USERS = {
     "admin": {
@@ -26,29 +29,43 @@ USERS = {
     },
 }
 
+# Load the fixture data into the storage backend
+USERS = backend.table("users", USERS)
+
 
 def get_user_by_username(username):
     """Get user by username"""
     return USERS.get(username)
 
 
+def get_next_user_id():
+    """Generate next user ID"""
+    return next_id(
+        "user_id", lambda: max((user["id"] for user in USERS.values()), default=0)
+    )
+
+
 def create_user(user_data):
     """Create a new user"""
-    username = user_data["login"]
-    if username in USERS:
-        return None
+    with backend.transaction():
+        username = user_data["login"]
+        if username in USERS:
+            return None
 
-    USERS[username] = user_data
-    return user_data
+        USERS[username] = user_data
+        return user_data
 
 
 def update_user(username, update_data):
     """Update user information"""
-    if username not in USERS:
-        return None
+    with backend.transaction():
+        if username not in USERS:
+            return None
 
-    for key, value in update_data.items():
-        if value is not None:
-            USERS[username][key] = value
+        user = USERS[username]
+        for key, value in update_data.items():
+            if value is not None:
+                user[key] = value
 
-    return USERS[username]
+        USERS[username] = user
+        return user
@@ -1,6 +1,6 @@
 from fastapi import FastAPI
 
-from routers import api_router
+from routers import api_router, root_router
 
 app = FastAPI(
     title="GitBucket Mock API",
@@ -10,6 +10,7 @@ app = FastAPI(
 
 # Register all API routers at once
 app.include_router(api_router)
+app.include_router(root_router)
 
 if __name__ == "__main__":
     import uvicorn
@@ -19,11 +19,14 @@ from .commits import (
     ApiCommitStatus,
     ApiCommitTree,
     ApiPersonIdent,
+    CommitFileChange,
+    CreateACommit,
     CreateAStatus,
 )
 from .contents import ApiCommit, ApiCommitParent, ApiContents, ApiPusher, CreateAFile
 from .contents import ApiCommitTree as ContentApiCommitTree
 from .git_refs import ApiRef, ApiRefCommit, CreateARef, UpdateARef
+from .git_trees import ApiTree, ApiTreeEntry
 from .issues import (
     ApiComment,
     ApiIssue,
@@ -95,6 +98,8 @@ __all__ = [
     "ApiCommitStatus",
     "ApiCombinedCommitStatus",
     "CreateAStatus",
+    "CommitFileChange",
+    "CreateACommit",
     # Contents
     "ApiContents",
     "CreateAFile",
@@ -107,6 +112,9 @@ __all__ = [
     "ApiRefCommit",
     "CreateARef",
     "UpdateARef",
+    # Git Trees
+    "ApiTree",
+    "ApiTreeEntry",
     # Issues
     "ApiIssue",
     "ApiLabel",
@@ -14,6 +14,9 @@ class ApiBranchForList(BaseApiModel):
 
     name: str
     commit: ApiBranchCommit
+    # Commits ahead of and behind the default branch
+    ahead_by: Optional[int] = None
+    behind_by: Optional[int] = None
 
 
 class ApiBranchProtectionStatus(BaseApiModel):
@@ -2,6 +2,7 @@ from datetime import datetime
 from typing import List, Optional
 
 from .base import ApiPath, BaseApiModel
+from .contents import ApiPusher
 from .repositories import ApiRepository
 from .users import ApiUser
 
@@ -81,6 +82,38 @@ class ApiCommitListItem(BaseApiModel):
     parents: List[ApiCommitTree]
 
 
+class ApiComparison(BaseApiModel):
+    """Comparison of two commits model for API responses."""
+
+    url: ApiPath
+    html_url: ApiPath
+    status: str
+    ahead_by: int
+    behind_by: int
+    total_commits: int
+    base_commit: ApiCommitListItem
+    merge_base_commit: Optional[ApiCommitListItem] = None
+    commits: List[ApiCommitListItem]
+    files: List[ApiCommitFile]
+
+
+class ApiBlameRange(BaseApiModel):
+    """Blame range model for API responses."""
+
+    starting_line: int
+    ending_line: int
+    original_starting_line: int
+    commit: ApiCommitListItem
+
+
+class ApiBlame(BaseApiModel):
+    """Blame of a file model for API responses."""
+
+    sha: str
+    path: str
+    ranges: List[ApiBlameRange]
+
+
 class ApiCommitStatus(BaseApiModel):
     """Commit status model for API responses."""
 
@@ -106,6 +139,23 @@ class ApiCombinedCommitStatus(BaseApiModel):
     url: ApiPath
 
 
+class ApiContributorWeek(BaseApiModel):
+    """Weekly contributor activity model for API responses."""
+
+    w: int
+    a: int
+    d: int
+    c: int
+
+
+class ApiContributorStats(BaseApiModel):
+    """Contributor statistics model for API responses."""
+
+    author: ApiUser
+    total: int
+    weeks: List[ApiContributorWeek]
+
+
 class CreateAStatus(BaseApiModel):
     """Model for creating a commit status."""
 
@@ -140,3 +190,45 @@ class CreateAStatus(BaseApiModel):
             return False
 
         return True
+
+
+class CommitFileChange(BaseApiModel):
+    """Model for one file change of a commit."""
+
+    path: str
+    action: str  # "create", "update" or "delete"
+    content: Optional[str] = None  # Base64-encoded, for create and update
+    sha: Optional[str] = None  # Current blob SHA, checked for update and delete
+
+
+class CreateACommit(BaseApiModel):
+    """Model for creating a commit with several file changes."""
+
+    message: str
+    branch: Optional[str] = None
+    files: List[CommitFileChange]
+    author: Optional[ApiPusher] = None
+    committer: Optional[ApiPusher] = None
+
+    def is_valid(self) -> bool:
+        """Validate the file changes."""
+        paths = set()
+        for change in self.files:
+            path = change.path.strip("/")
+            if not path or path in paths:
+                return False
+            paths.add(path)
+
+            if change.action not in ("create", "update", "delete"):
+                return False
+            if change.action != "delete" and change.content is None:
+                return False
+
+        # A path cannot be both a file and a directory of another file
+        for path in paths:
+            names = path.split("/")
+            for depth in range(1, len(names)):
+                if "/".join(names[:depth]) in paths:
+                    return False
+
+        return bool(self.files)
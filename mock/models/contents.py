@@ -18,9 +18,10 @@ class ApiContents(BaseApiModel):
     name: str
     path: str
     sha: str
+    size: Optional[int] = None  # Size in bytes (0 for directories)
     content: Optional[str] = None  # Base64-encoded content, only present for files
     encoding: Optional[str] = None  # Always "base64" when present, only for files
-    download_url: ApiPath
+    download_url: Optional[ApiPath] = None  # None for directories
 
 
 class CreateAFile(BaseApiModel):
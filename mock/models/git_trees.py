@@ -0,0 +1,23 @@
+from typing import List, Optional
+
+from .base import ApiPath, BaseApiModel
+
+
+class ApiTreeEntry(BaseApiModel):
+    """Git tree entry model for API responses."""
+
+    path: str
+    mode: str
+    type: str  # "blob" or "tree"
+    sha: str
+    size: Optional[int] = None  # Only for blobs
+    url: ApiPath
+
+
+class ApiTree(BaseApiModel):
+    """Git tree model for API responses."""
+
+    sha: str
+    url: ApiPath
+    tree: List[ApiTreeEntry]
+    truncated: bool
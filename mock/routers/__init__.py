@@ -7,6 +7,9 @@ from fastapi import APIRouter
 # Main router to store API routers
 api_router = APIRouter(prefix="/api/v3")
 
+# Router for the paths outside the API, such as the git clone URLs
+root_router = APIRouter()
+
 # Get all Python files in the routers directory
 router_files = [
     f[:-3]
@@ -20,5 +23,7 @@ for router_file in router_files:
         module = import_module(f".{router_file}", package="routers")
         if hasattr(module, "router"):
             api_router.include_router(module.router)
+        if hasattr(module, "root_router"):
+            root_router.include_router(module.root_router)
     except ImportError as e:
         print(f"Error importing router {router_file}: {e}")
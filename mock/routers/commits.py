@@ -1,23 +1,34 @@
 from datetime import datetime
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
 
 from auth import verify_token
 from data import (
+    compare_commits,
+    create_commit,
     create_commit_status,
+    get_blame,
     get_branches_for_head_commit,
     get_combined_status,
     get_commit,
     get_commit_statuses,
+    get_contributor_stats,
     get_repository_commits,
+    iter_range_diff,
 )
 from models.branches import ApiBranchForHeadCommit
 from models.commits import (
+    ApiBlame,
+    ApiBlameRange,
     ApiCombinedCommitStatus,
     ApiCommitListItem,
     ApiCommits,
     ApiCommitStatus,
+    ApiComparison,
+    ApiContributorStats,
+    CreateACommit,
     CreateAStatus,
 )
 
@@ -45,7 +56,34 @@ async def get_commits(
     if commits is None:
         raise HTTPException(status_code=404, detail="Repository not found")
 
-    return [ApiCommitListItem(**commit) for commit in commits]
+    return [
+        ApiCommitListItem(comments_url=commit["comment_url"], **commit)
+        for commit in commits
+    ]
+
+
+@router.post("/repos/{owner}/{repository}/commits", response_model=ApiCommits)
+async def create_repository_commit(
+    owner: str,
+    repository: str,
+    commit_data: CreateACommit,
+    user: dict = Depends(verify_token),
+):
+    """Create a commit with several file changes and advance the branch"""
+    # File changes validation
+    if not commit_data.is_valid():
+        raise HTTPException(status_code=400, detail="Invalid file changes")
+
+    commit = create_commit(
+        owner, repository, commit_data.model_dump(), user["username"]
+    )
+    if commit is None:
+        raise HTTPException(status_code=404, detail="Repository not found")
+    if isinstance(commit, tuple):
+        status_code, error_data = commit
+        raise HTTPException(status_code=status_code, detail=error_data["message"])
+
+    return ApiCommits(**commit)
 
 
 @router.get("/repos/{owner}/{repository}/commits/{sha}", response_model=ApiCommits)
@@ -117,3 +155,99 @@ async def create_status(
         raise HTTPException(status_code=404, detail="Commit or repository not found")
 
     return ApiCommitStatus(**status)
+
+
+@router.get(
+    "/repos/{owner}/{repository}/stats/contributors",
+    response_model=List[ApiContributorStats],
+)
+async def get_contributors_stats(
+    owner: str,
+    repository: str,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+):
+    """Get weekly commit statistics per contributor"""
+    stats = get_contributor_stats(owner, repository, since, until)
+    if stats is None:
+        raise HTTPException(status_code=404, detail="Repository not found")
+
+    return [ApiContributorStats(**contributor) for contributor in stats]
+
+
+@router.get(
+    "/repos/{owner}/{repository}/compare/{basehead:path}",
+    response_model=ApiComparison,
+)
+def compare_repository_commits(
+    owner: str,
+    repository: str,
+    basehead: str,
+    page: int = Query(1, ge=1),
+    per_page: int = Query(250, ge=1, le=250),
+    accept: Optional[str] = Header(None),
+):
+    """Compare two commits ({base}...{head})
+
+    With the diff media type (Accept: application/vnd.github.diff), the git
+    diff from the merge base to head is streamed instead. A plain function,
+    so that FastAPI runs the history walk in its thread pool.
+    """
+    base, separator, head = basehead.partition("...")
+    if not separator or not base or not head:
+        raise HTTPException(status_code=404, detail="Invalid comparison")
+
+    if accept is not None and accept.endswith(".diff"):
+        diff = iter_range_diff(owner, repository, base, head)
+        if diff is None:
+            raise HTTPException(
+                status_code=404, detail="Repository or commit not found"
+            )
+        return StreamingResponse(diff, media_type="text/plain; charset=utf-8")
+
+    comparison = compare_commits(owner, repository, base, head, page, per_page)
+    if comparison is None:
+        raise HTTPException(status_code=404, detail="Repository or commit not found")
+
+    merge_base_commit = comparison["merge_base_commit"]
+    return ApiComparison(
+        **{
+            **comparison,
+            "base_commit": _commit_list_item(comparison["base_commit"]),
+            "merge_base_commit": _commit_list_item(merge_base_commit)
+            if merge_base_commit
+            else None,
+            "commits": [_commit_list_item(commit) for commit in comparison["commits"]],
+        }
+    )
+
+
+@router.get("/repos/{owner}/{repository}/blame/{path:path}", response_model=ApiBlame)
+def get_file_blame(owner: str, repository: str, path: str):
+    """Get the blame of a file
+
+    The path parameter should be in the format: {ref}/{file_path}, as for
+    raw contents. Each range of lines comes with the commit that last
+    changed it. A plain function, so that FastAPI runs the blame walk in its
+    thread pool.
+    """
+    blame = get_blame(owner, repository, path)
+    if blame is None:
+        raise HTTPException(status_code=404, detail="File not found")
+
+    return ApiBlame(
+        **{
+            **blame,
+            "ranges": [
+                ApiBlameRange(
+                    **{**line_range, "commit": _commit_list_item(line_range["commit"])}
+                )
+                for line_range in blame["ranges"]
+            ],
+        }
+    )
+
+
+def _commit_list_item(commit: dict) -> ApiCommitListItem:
+    """Build a commit list item from a commit record"""
+    return ApiCommitListItem(comments_url=commit["comment_url"], **commit)
@@ -1,18 +1,24 @@
-from typing import List, Optional, Union
+from typing import Iterator, List, Optional, Tuple, Union
 
-from fastapi import APIRouter, Depends, HTTPException, Path, Query, Response
+from fastapi import APIRouter, Depends, Header, HTTPException, Path, Query
+from fastapi.responses import StreamingResponse
 
 from auth import verify_token
 from data import (
     create_or_update_file,
+    get_archive,
     get_contents,
     get_raw_content,
     get_repository_readme,
+    is_binary,
 )
 from models.contents import ApiCommit, ApiContents, CreateAFile
 
 router = APIRouter(tags=["Contents"])
 
+# Size of the chunks of streamed raw files
+CHUNK_SIZE = 64 * 1024
+
 
 @router.get("/repos/{owner}/{repository}/readme", response_model=ApiContents)
 async def get_readme(owner: str, repository: str, ref: Optional[str] = None):
@@ -57,11 +63,16 @@ async def create_update_file(
     user: dict = Depends(verify_token),
 ):
     """Create or update a file"""
-    result = create_or_update_file(owner, repository, path, file_data.model_dump())
+    result = create_or_update_file(
+        owner, repository, path, file_data.model_dump(), user["username"]
+    )
     if result is None:
         raise HTTPException(
             status_code=404, detail="Repository not found or SHA mismatch"
         )
+    if isinstance(result, tuple):
+        status_code, error_data = result
+        raise HTTPException(status_code=status_code, detail=error_data["message"])
 
     # Format response structure
     response = {
@@ -73,15 +84,108 @@ async def create_update_file(
 
 
 @router.get("/repos/{owner}/{repository}/raw/{path:path}")
-async def get_raw_file_content(owner: str, repository: str, path: str):
+async def get_raw_file_content(
+    owner: str,
+    repository: str,
+    path: str,
+    range_header: Optional[str] = Header(None, alias="Range"),
+):
     """Get raw file contents
 
     The path parameter should be in the format: {ref}/{file_path}
     where ref is the branch/commit/tag and file_path is the path to the file.
     Example: /api/v3/repos/owner/repo/raw/main/src/file.txt
+
+    A single byte range (Range: bytes=start-end) returns 206 Partial Content.
     """
     content = get_raw_content(owner, repository, path)
     if content is None:
         raise HTTPException(status_code=404, detail="File not found")
 
-    return Response(content=content, media_type="text/plain")
+    size = len(content)
+    start, end = 0, size
+    status_code = 200
+    headers = {"Accept-Ranges": "bytes"}
+
+    if range_header is not None:
+        byte_range = _parse_range(range_header, size)
+        if byte_range is not None:
+            start, end = byte_range
+            status_code = 206
+            headers["Content-Range"] = f"bytes {start}-{end - 1}/{size}"
+
+    headers["Content-Length"] = str(end - start)
+    media_type = "application/octet-stream" if is_binary(content) else "text/plain"
+
+    # Stream slices of the stored (or memory-mapped) bytes without copying
+    return StreamingResponse(
+        _iter_chunks(memoryview(content)[start:end]),
+        status_code=status_code,
+        media_type=media_type,
+        headers=headers,
+    )
+
+
+@router.get("/repos/{owner}/{repository}/zipball/{ref:path}")
+async def download_zipball(owner: str, repository: str, ref: str):
+    """Download a repository archive (zip)"""
+    return _archive_response(owner, repository, ref, "zip", "application/zip")
+
+
+@router.get("/repos/{owner}/{repository}/tarball/{ref:path}")
+async def download_tarball(owner: str, repository: str, ref: str):
+    """Download a repository archive (tar.gz)"""
+    return _archive_response(owner, repository, ref, "tar", "application/x-gzip")
+
+
+def _archive_response(
+    owner: str, repository: str, ref: str, archive_format: str, media_type: str
+) -> StreamingResponse:
+    """Stream the archive of a ref, built once and then served from disk"""
+    archive = get_archive(owner, repository, ref, archive_format)
+    if archive is None:
+        raise HTTPException(status_code=404, detail="Repository or ref not found")
+
+    headers = {"Content-Disposition": f'attachment; filename="{archive.filename}"'}
+    if archive.size is not None:
+        headers["Content-Length"] = str(archive.size)
+    return StreamingResponse(archive.chunks, media_type=media_type, headers=headers)
+
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single byte range into (start, end)
+
+    Returns None when the header is ignored (malformed or several ranges).
+    """
+    unit, _, byte_range = header.partition("=")
+    if unit.strip() != "bytes" or "," in byte_range:
+        return None
+
+    first, _, last = byte_range.strip().partition("-")
+    if not (first or last) or not (first or "0").isdigit():
+        return None
+    if last and not last.isdigit():
+        return None
+
+    if not first:
+        # Suffix range: the last bytes of the file
+        start, end = max(size - int(last), 0), size
+    else:
+        start = int(first)
+        if last and int(last) < start:
+            return None
+        end = min(int(last) + 1, size) if last else size
+
+    if start >= end:
+        raise HTTPException(
+            status_code=416,
+            detail="Range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+    return (start, end)
+
+
+def _iter_chunks(data: memoryview) -> Iterator[memoryview]:
+    """Iterate a buffer in chunks"""
+    for offset in range(0, len(data), CHUNK_SIZE):
+        yield data[offset : offset + CHUNK_SIZE]
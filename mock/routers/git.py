@@ -0,0 +1,57 @@
+import gzip
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+
+from data import get_upload_pack_advertisement, upload_pack
+
+# Served outside /api/v3, at the clone URLs of the repositories. GitBucket
+# serves them under /git too.
+root_router = APIRouter(tags=["Git"])
+
+NO_CACHE = {"Cache-Control": "no-cache"}
+
+
+@root_router.get("/{owner}/{repository}.git/info/refs")
+@root_router.get("/git/{owner}/{repository}.git/info/refs")
+async def get_info_refs(owner: str, repository: str, service: Optional[str] = None):
+    """Advertise the refs of a repository to git clone and git fetch
+
+    Only the smart HTTP protocol is served: service must be git-upload-pack
+    (pushes are not supported).
+    """
+    if service != "git-upload-pack":
+        raise HTTPException(status_code=403, detail="Only git-upload-pack is served")
+
+    advertisement = get_upload_pack_advertisement(owner, repository)
+    if advertisement is None:
+        raise HTTPException(status_code=404, detail="Repository not found")
+
+    return Response(
+        content=advertisement,
+        media_type="application/x-git-upload-pack-advertisement",
+        headers=NO_CACHE,
+    )
+
+
+@root_router.post("/{owner}/{repository}.git/git-upload-pack")
+@root_router.post("/git/{owner}/{repository}.git/git-upload-pack")
+async def post_upload_pack(owner: str, repository: str, request: Request):
+    """Negotiate with git clone or git fetch and stream the pack"""
+    body = await request.body()
+    if request.headers.get("content-encoding") == "gzip":
+        try:
+            body = gzip.decompress(body)
+        except (OSError, EOFError):
+            raise HTTPException(status_code=400, detail="Invalid gzip body")
+
+    response = upload_pack(owner, repository, body)
+    if response is None:
+        raise HTTPException(status_code=404, detail="Repository not found")
+
+    return StreamingResponse(
+        response,
+        media_type="application/x-git-upload-pack-result",
+        headers=NO_CACHE,
+    )
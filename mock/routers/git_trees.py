@@ -0,0 +1,26 @@
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException
+
+from data import get_tree
+from models.git_trees import ApiTree
+
+router = APIRouter(tags=["GitTrees"])
+
+
+@router.get("/repos/{owner}/{repository}/git/trees/{sha:path}", response_model=ApiTree)
+def get_git_tree(
+    owner: str, repository: str, sha: str, recursive: Optional[str] = None
+):
+    """Get a tree
+
+    sha is a tree SHA, or a commit SHA, branch or tag whose root tree is
+    returned. As in the GitHub API, any value of recursive lists every
+    subtree, up to 100,000 entries (truncated is then true). A plain
+    function, so that FastAPI runs the tree walk in its thread pool.
+    """
+    tree = get_tree(owner, repository, sha, recursive=recursive is not None)
+    if tree is None:
+        raise HTTPException(status_code=404, detail="Tree or repository not found")
+
+    return ApiTree(**tree)
@@ -1,4 +1,5 @@
-from typing import List
+from datetime import datetime
+from typing import List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query
 
@@ -24,11 +25,31 @@ async def get_issues(
     owner: str,
     repository: str,
     state: str = "open",
+    labels: Optional[str] = None,
+    assignee: Optional[str] = None,
+    creator: Optional[str] = None,
+    milestone: Optional[str] = None,
+    since: Optional[datetime] = None,
+    sort: str = Query("created", pattern="^(created|updated|comments)$"),
+    direction: str = Query("desc", pattern="^(asc|desc)$"),
     page: int = Query(1, ge=1),
     per_page: int = Query(30, ge=1, le=100),
 ):
     """Get list of issues for a repository"""
-    issues = get_repository_issues(owner, repository, state, page, per_page)
+    issues = get_repository_issues(
+        owner,
+        repository,
+        state,
+        page,
+        per_page,
+        labels,
+        assignee,
+        creator,
+        milestone,
+        since,
+        sort,
+        direction,
+    )
     if issues is None:
         raise HTTPException(status_code=404, detail="Repository not found")
 
@@ -13,21 +13,24 @@ IMPORTANT: GitBucket's Pull Request API has implementation issues that differ fr
 This implementation follows GitBucket's actual (flawed) API behavior.
 """
 
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
 
 from auth import verify_token
 from data import (
     create_pull_request,
     get_pull_request,
     get_pull_request_commits,
+    get_pull_request_files,
     get_repository_pull_requests,
     is_pull_request_merged,
+    iter_pull_request_diff,
     merge_pull_request,
     update_pull_request,
 )
-from models.commits import ApiCommitListItem
+from models.commits import ApiCommitFile, ApiCommitListItem
 from models.pull_requests import (
     ApiPullRequest,
     CreateAPullRequest,
@@ -60,8 +63,22 @@ async def get_pull_requests(
 @router.get(
     "/repos/{owner}/{repository}/pulls/{pr_number}", response_model=ApiPullRequest
 )
-async def get_pull_request_info(owner: str, repository: str, pr_number: int):
-    """Get a specific pull request"""
+async def get_pull_request_info(
+    owner: str, repository: str, pr_number: int, accept: Optional[str] = Header(None)
+):
+    """Get a specific pull request
+
+    With the diff media type (Accept: application/vnd.github.diff), the git
+    diff of the pull request is streamed instead.
+    """
+    if accept is not None and accept.endswith(".diff"):
+        diff = iter_pull_request_diff(owner, repository, pr_number)
+        if diff is None:
+            raise HTTPException(
+                status_code=404, detail="Pull request or repository not found"
+            )
+        return StreamingResponse(diff, media_type="text/plain; charset=utf-8")
+
     pr = get_pull_request(owner, repository, pr_number)
     if pr is None:
         raise HTTPException(
@@ -124,7 +141,31 @@ async def get_pull_request_commit_list(owner: str, repository: str, pr_number: i
             status_code=404, detail="Pull request or repository not found"
         )
 
-    return [ApiCommitListItem(**commit) for commit in commits]
+    return [
+        ApiCommitListItem(comments_url=commit["comment_url"], **commit)
+        for commit in commits
+    ]
+
+
+@router.get(
+    "/repos/{owner}/{repository}/pulls/{pr_number}/files",
+    response_model=List[ApiCommitFile],
+)
+async def get_pull_request_file_list(
+    owner: str,
+    repository: str,
+    pr_number: int,
+    page: int = Query(1, ge=1),
+    per_page: int = Query(30, ge=1, le=100),
+):
+    """Get list of files changed by a pull request"""
+    files = get_pull_request_files(owner, repository, pr_number, page, per_page)
+    if files is None:
+        raise HTTPException(
+            status_code=404, detail="Pull request or repository not found"
+        )
+
+    return [ApiCommitFile(**commit_file) for commit_file in files]
 
 
 @router.get("/repos/{owner}/{repository}/pulls/{pr_number}/merge")
@@ -1,6 +1,6 @@
 from typing import List
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 
 from auth import verify_token
 from data import (
@@ -17,29 +17,45 @@ router = APIRouter(tags=["Repositories"])
 
 
 @router.get("/repositories", response_model=List[ApiRepository])
-async def get_repositories():
+async def get_repositories(
+    page: int = Query(1, ge=1),
+    per_page: int = Query(30, ge=1, le=100),
+):
     """Get all public repositories"""
-    return [ApiRepository(**repo) for repo in get_all_public_repositories()]
+    repos = get_all_public_repositories(page, per_page)
+    return [ApiRepository(**repo) for repo in repos]
 
 
 @router.get("/user/repos", response_model=List[ApiRepository])
-async def get_authenticated_user_repositories(user: dict = Depends(verify_token)):
+async def get_authenticated_user_repositories(
+    page: int = Query(1, ge=1),
+    per_page: int = Query(30, ge=1, le=100),
+    user: dict = Depends(verify_token),
+):
     """Get repositories for authenticated user"""
-    repos = get_user_repositories(user["username"])
+    repos = get_user_repositories(user["username"], page, per_page)
     return [ApiRepository(**repo) for repo in repos]
 
 
 @router.get("/users/{username}/repos", response_model=List[ApiRepository])
-async def get_user_repos(username: str):
+async def get_user_repos(
+    username: str,
+    page: int = Query(1, ge=1),
+    per_page: int = Query(30, ge=1, le=100),
+):
     """Get repositories for a specific user"""
-    repos = get_user_repositories(username)
+    repos = get_user_repositories(username, page, per_page)
     return [ApiRepository(**repo) for repo in repos]
 
 
 @router.get("/orgs/{org_name}/repos", response_model=List[ApiRepository])
-async def get_organization_repos(org_name: str):
+async def get_organization_repos(
+    org_name: str,
+    page: int = Query(1, ge=1),
+    per_page: int = Query(30, ge=1, le=100),
+):
     """Get repositories for an organization"""
-    repos = get_organization_repositories(org_name)
+    repos = get_organization_repositories(org_name, page, per_page)
     return [ApiRepository(**repo) for repo in repos]
 
 
@@ -3,7 +3,13 @@ from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException
 
 from auth import verify_admin, verify_token
-from data import USERS, create_user, get_user_by_username, update_user
+from data import (
+    USERS,
+    create_user,
+    get_next_user_id,
+    get_user_by_username,
+    update_user,
+)
 from models.users import ApiUser, CreateAUser, UpdateAUser
 
 router = APIRouter(tags=["Users"])
@@ -52,7 +58,7 @@ async def create_new_user(user_data: CreateAUser, admin: dict = Depends(verify_a
     # Create new user
     new_user = {
         "login": user_data.login,
-        "id": len(USERS) + 1,
+        "id": get_next_user_id(),
         "email": user_data.email,
         "type": "User",
         "site_admin": user_data.isAdmin or False,
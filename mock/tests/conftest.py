@@ -0,0 +1,60 @@
+"""Shared fixtures of the tests"""
+
+import shutil
+import subprocess
+
+import pytest
+from fastapi.testclient import TestClient
+
+from data.git_repository import _REPOSITORIES
+from main import app
+
+
+@pytest.fixture
+def client():
+    client = TestClient(app)
+    client.headers["Authorization"] = "Bearer admin-token"
+    return client
+
+
+def git(cwd, *args):
+    """Run git with fixed identities and dates, and get its output"""
+    env = {
+        "GIT_AUTHOR_NAME": "Alice",
+        "GIT_AUTHOR_EMAIL": "alice@example.com",
+        "GIT_AUTHOR_DATE": "2024-01-01T00:00:00Z",
+        "GIT_COMMITTER_NAME": "Alice",
+        "GIT_COMMITTER_EMAIL": "alice@example.com",
+        "GIT_COMMITTER_DATE": "2024-01-01T00:00:00Z",
+        "HOME": str(cwd),
+    }
+    return subprocess.run(
+        ["git", *args], cwd=cwd, env=env, check=True, capture_output=True, text=True
+    ).stdout.strip()
+
+
+@pytest.fixture
+def disk_repository(tmp_path, monkeypatch):
+    """Serve disk/pkg from a bare repository built with git, and get its work tree
+
+    The work tree has README.md and src/main.py on main, in two commits.
+    """
+    if shutil.which("git") is None:
+        pytest.skip("git is not installed")
+
+    work = tmp_path / "work"
+    work.mkdir()
+    git(work, "init", "-q", "-b", "main")
+    (work / "README.md").write_text("# pkg\n")
+    git(work, "add", ".")
+    git(work, "commit", "-q", "-m", "Add the README")
+    (work / "src").mkdir()
+    (work / "src" / "main.py").write_text("print('main')\n")
+    git(work, "add", ".")
+    git(work, "commit", "-q", "-m", "Add main.py")
+    git(tmp_path, "clone", "-q", "--bare", str(work), "root/disk/pkg.git")
+
+    monkeypatch.setenv("GITBUCKET_MOCK_GIT_ROOT", str(tmp_path / "root"))
+    monkeypatch.delitem(_REPOSITORIES, "disk/pkg", raising=False)
+    yield work
+    _REPOSITORIES.pop("disk/pkg", None)
@@ -0,0 +1,95 @@
+"""Tests of the repository archives (data.archives)"""
+
+import io
+import os
+import stat
+import tarfile
+import threading
+import zipfile
+
+import pytest
+
+from data import archives
+
+
+@pytest.fixture(autouse=True)
+def archive_directory(tmp_path, monkeypatch):
+    directory = tmp_path / "archives"
+    monkeypatch.setattr(archives, "_directory", str(directory))
+    return directory
+
+
+def _download(client, archive_format, ref="main", repository="disk/pkg"):
+    response = client.get(f"/api/v3/repos/{repository}/{archive_format}ball/{ref}")
+    assert response.status_code == 200
+    return response.content
+
+
+def test_zipballs_hold_the_files_under_one_directory(client, disk_repository):
+    data = _download(client, "zip")
+
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert archive.testzip() is None
+        assert archive.namelist() == [
+            "pkg-main/",
+            "pkg-main/README.md",
+            "pkg-main/src/",
+            "pkg-main/src/main.py",
+        ]
+        assert archive.read("pkg-main/README.md") == b"# pkg\n"
+        mode = archive.getinfo("pkg-main/src/main.py").external_attr >> 16
+        assert stat.S_IMODE(mode) == 0o644
+
+
+def test_tarballs_hold_the_same_files(client, disk_repository):
+    data = _download(client, "tar")
+
+    with tarfile.open(fileobj=io.BytesIO(data), mode="r:gz") as archive:
+        assert archive.getnames() == [
+            "pkg-main",
+            "pkg-main/README.md",
+            "pkg-main/src",
+            "pkg-main/src/main.py",
+        ]
+        member = archive.extractfile("pkg-main/src/main.py")
+        assert member is not None and member.read() == b"print('main')\n"
+        assert {member.mtime for member in archive} == {archives.ARCHIVE_DATE}
+
+
+def test_archives_are_built_once(client, disk_repository, archive_directory):
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(_download(client, "zip")))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(set(results)) == 1
+    assert len(os.listdir(archive_directory)) == 1
+    assert _download(client, "zip") == results[0]
+
+
+def test_archives_of_missing_refs_are_not_found(client, disk_repository):
+    response = client.get("/api/v3/repos/disk/pkg/zipball/missing")
+    assert response.status_code == 404
+    response = client.get("/api/v3/repos/nobody/none/tarball/main")
+    assert response.status_code == 404
+
+
+def test_temporary_archive_directories_are_removed_at_exit(monkeypatch):
+    registered = []
+    monkeypatch.setattr(archives, "_directory", None)
+    monkeypatch.delenv("GITBUCKET_MOCK_ARCHIVE_DIR", raising=False)
+    monkeypatch.setattr(archives.backend, "name", "memory")
+    monkeypatch.setattr(
+        archives.atexit, "register", lambda *args, **kwargs: registered.append(args)
+    )
+
+    directory = archives._archive_directory()
+    try:
+        assert registered == [(archives.shutil.rmtree, directory)]
+    finally:
+        os.rmdir(directory)
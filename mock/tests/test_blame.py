@@ -0,0 +1,95 @@
+"""Tests of the line blame of files (data.blame)"""
+
+import base64
+
+from conftest import git
+
+from data.blame import _blame
+from data.commits import get_commit_dag
+from data.contents import BLOBS
+
+
+def _origins(response):
+    """Get the (commit, original line) of every line of a blame response"""
+    assert response.status_code == 200
+    origins = []
+    for line_range in response.json()["ranges"]:
+        count = line_range["ending_line"] - line_range["starting_line"] + 1
+        start = line_range["original_starting_line"]
+        sha = line_range["commit"]["sha"]
+        origins.extend((sha, start + offset) for offset in range(count))
+    return origins
+
+
+def _git_blame(work, path):
+    """Get the (commit, original line) of every line, as git blame gives them"""
+    origins = []
+    for line in git(work, "blame", "--porcelain", "main", "--", path).splitlines():
+        fields = line.split()
+        if len(fields) >= 3 and len(fields[0]) == 40:
+            origins.append((fields[0], int(fields[1])))
+    return origins
+
+
+def test_blame_of_a_disk_repository_matches_git(client, disk_repository):
+    work = disk_repository
+    (work / "src" / "main.py").write_text("import sys\nprint('main')\n")
+    git(work, "commit", "-qam", "Import sys")
+    git(work, "checkout", "-qb", "topic", "HEAD~1")
+    (work / "src" / "main.py").write_text("print('main')\nprint('topic')\n")
+    git(work, "commit", "-qam", "Print the topic")
+    git(work, "checkout", "-q", "main")
+    git(work, "merge", "-q", "--no-edit", "topic")
+    git(work, "push", "-q", str(work.parent / "root" / "disk" / "pkg.git"), "main")
+
+    response = client.get("/api/v3/repos/disk/pkg/blame/main/src/main.py")
+    assert _origins(response) == _git_blame(work, "src/main.py")
+
+
+def test_blame_follows_the_commits_that_changed_lines(client):
+    def write(content, sha=None):
+        response = client.put(
+            "/api/v3/repos/admin/repo1/contents/blamed.txt",
+            json={
+                "message": "Write blamed.txt",
+                "content": base64.b64encode(content).decode(),
+                **({"sha": sha} if sha else {}),
+            },
+        )
+        assert response.status_code == 200
+        return response.json()
+
+    first = write(b"a\nb\nc\n")
+    second = write(b"a\nB\nc\nd\n", first["content"]["sha"])
+
+    response = client.get("/api/v3/repos/admin/repo1/blame/main/blamed.txt")
+    first_sha, second_sha = first["commit"]["sha"], second["commit"]["sha"]
+    assert _origins(response) == [
+        (first_sha, 1),
+        (second_sha, 2),
+        (first_sha, 3),
+        (second_sha, 4),
+    ]
+    assert client.get("/api/v3/repos/admin/repo1/blame/main/none").status_code == 404
+
+
+def test_blame_of_a_file_missing_at_the_commit_is_none():
+    commit_dag = get_commit_dag("admin", "repo1")
+    sha = "abcdef1234567890abcdef1234567890abcdef12"
+    assert commit_dag is not None
+
+    assert _blame("admin", "repo1", commit_dag, BLOBS.get, "missing.txt", sha) is None
+
+
+def test_blame_splits_lines_at_newlines_only(client, disk_repository):
+    work = disk_repository
+    (work / "page.txt").write_bytes(b"one\x0ctwo\r\nthree\xe2\x80\xa8four\n")
+    git(work, "add", ".")
+    git(work, "commit", "-qm", "Add page.txt")
+    (work / "page.txt").write_bytes(b"one\x0ctwo\r\nthree\xe2\x80\xa8four\nfive\n")
+    git(work, "commit", "-qam", "Add a line")
+    git(work, "push", "-q", str(work.parent / "root" / "disk" / "pkg.git"), "main")
+
+    response = client.get("/api/v3/repos/disk/pkg/blame/main/page.txt")
+    assert _origins(response) == _git_blame(work, "page.txt")
+    assert len(_origins(response)) == 3
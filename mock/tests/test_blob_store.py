@@ -0,0 +1,110 @@
+"""Tests of the blob store (data.blob_store)"""
+
+import gc
+import mmap
+
+import pytest
+
+from data import blob_store
+from data.blob_store import (
+    ENTRY_SIZE,
+    LARGE_BLOB_SIZE,
+    Base64Cache,
+    BlobStore,
+    is_binary,
+)
+from data.git_objects import blob_sha
+
+
+@pytest.fixture
+def blob_directory(tmp_path, monkeypatch):
+    monkeypatch.setattr(blob_store, "_directory", str(tmp_path))
+    return tmp_path
+
+
+def test_small_blobs_are_kept_in_the_table(blob_directory):
+    table = {}
+    store = BlobStore(table)
+
+    sha = store.put(b"hello\n")
+
+    assert sha == blob_sha(b"hello\n")
+    assert table == {sha: b"hello\n"}
+    assert store.get(sha) == b"hello\n"
+    assert store.size(sha) == 6
+    assert store.get(blob_sha(b"other")) is None
+    assert list(blob_directory.iterdir()) == []
+
+
+def test_large_blobs_are_mapped_once_from_the_blob_directory(blob_directory):
+    table = {}
+    store = BlobStore(table)
+    data = b"x" * LARGE_BLOB_SIZE
+
+    sha = store.put(data)
+    mapped = store.get(sha)
+
+    assert table == {sha: None}
+    assert (blob_directory / sha[:2] / sha[2:]).read_bytes() == data
+    assert isinstance(mapped, mmap.mmap)
+    assert mapped[:] == data
+    assert store.get(sha) is mapped
+    assert store.size(sha) == LARGE_BLOB_SIZE
+
+
+def test_maps_are_closed_with_their_store(blob_directory):
+    store = BlobStore({})
+    mapped = store.get(store.put(b"x" * LARGE_BLOB_SIZE))
+    assert isinstance(mapped, mmap.mmap)
+
+    del store
+    gc.collect()
+
+    assert mapped.closed
+
+
+def test_binary_blobs_have_a_nul_byte_near_their_start():
+    assert is_binary(b"text\0")
+    assert not is_binary(b"text\n")
+    assert not is_binary(b"x" * blob_store.BINARY_CHECK_SIZE + b"\0")
+
+
+class CountingBlobs:
+    """Blob source counting its reads"""
+
+    def __init__(self, blobs):
+        self.blobs = blobs
+        self.reads = 0
+
+    def get(self, sha):
+        self.reads += 1
+        return self.blobs.get(sha)
+
+    def size(self, sha):
+        self.reads += 1
+        data = self.blobs.get(sha)
+        return len(data) if data is not None else None
+
+
+def test_base64_cache_keeps_encodings_and_sizes_together():
+    blobs = CountingBlobs({"a": b"aaa", "b": b"bbb"})
+    cache = Base64Cache(blobs, 2 * (ENTRY_SIZE + 4))
+
+    assert cache.encoded("a") == "YWFh"
+    assert cache.size("a") == 3
+    assert cache.encoded("a") == "YWFh"
+    assert blobs.reads == 1
+    assert cache.encoded("missing") is None
+
+
+def test_base64_cache_evicts_sizes_with_encodings():
+    blobs = {f"{index}": b"x" * index for index in range(100)}
+    cache = Base64Cache(CountingBlobs(blobs), 10 * ENTRY_SIZE)
+
+    for sha in blobs:
+        cache.size(sha)
+        cache.encoded(sha)
+
+    assert len(cache._entries) < 10
+    assert cache._bytes <= 10 * ENTRY_SIZE
+    assert cache.size("99") == 99
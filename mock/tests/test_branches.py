@@ -0,0 +1,51 @@
+"""Tests of the branch head index (data.branches.BRANCH_HEADS)"""
+
+from data.branches import (
+    BRANCH_HEADS,
+    _build_branch_heads,
+    delete_branch,
+    get_branch_names_for_head,
+    set_branch_head,
+)
+from data.commits import get_branches_for_head_commit, resolve_ref_to_sha
+
+MAIN = "3456789012abcdef3456789012abcdef34567890"
+FEATURE = "4567890123abcdef4567890123abcdef45678901"
+
+
+def test_moved_branches_are_found_by_head():
+    # Build the index first, so the moves below update it in place
+    assert get_branch_names_for_head("org1", "repo3", MAIN) == ["main"]
+
+    set_branch_head("org1", "repo3", "heads-a", MAIN)
+    set_branch_head("org1", "repo3", "heads-b", MAIN)
+    assert get_branch_names_for_head("org1", "repo3", MAIN) == [
+        "heads-a",
+        "heads-b",
+        "main",
+    ]
+
+    set_branch_head("org1", "repo3", "heads-a", FEATURE)
+    assert get_branch_names_for_head("org1", "repo3", FEATURE) == [
+        "feature",
+        "heads-a",
+    ]
+    assert resolve_ref_to_sha("org1", "repo3", "heads-a") == FEATURE
+
+    delete_branch("org1", "repo3", "heads-a")
+    delete_branch("org1", "repo3", "heads-b")
+    assert get_branch_names_for_head("org1", "repo3", FEATURE) == ["feature"]
+    assert resolve_ref_to_sha("org1", "repo3", "heads-a") is None
+
+    # The updated index is the one built from the branches
+    assert BRANCH_HEADS.get("org1/repo3") == _build_branch_heads("org1/repo3")
+
+
+def test_branches_where_head():
+    branches = get_branches_for_head_commit("org1", "repo3", FEATURE)
+
+    assert branches is not None
+    assert [branch["name"] for branch in branches] == ["feature"]
+    assert branches[0]["commit"]["sha"] == FEATURE
+    assert get_branches_for_head_commit("org1", "repo3", "0" * 40) == []
+    assert get_branches_for_head_commit("org1", "missing", FEATURE) is None
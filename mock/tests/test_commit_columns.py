@@ -0,0 +1,71 @@
+"""Tests of the columnar commit metadata (data.commit_columns)"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from data.commit_columns import WEEK, CommitColumns
+
+START = datetime(2024, 1, 3, 12, tzinfo=timezone.utc)  # A Wednesday
+
+
+def _commit(sha, days, login, additions=1, deletions=0):
+    return {
+        "sha": sha,
+        "commit": {"author": {"date": START + timedelta(days=days)}},
+        "author": {"login": login} if login else None,
+        "stats": {"additions": additions, "deletions": deletions},
+    }
+
+
+@pytest.fixture
+def columns():
+    return CommitColumns(
+        [
+            _commit("c", 8, "bob", 5, 1),
+            _commit("a", 0, "alice", 2, 0),
+            _commit("b", 1, "alice", 3, 4),
+            _commit("d", 9, None),
+            _commit("e", 20, "alice", 1, 1),
+        ]
+    )
+
+
+def test_rows_are_sorted_by_date(columns):
+    assert columns.shas == ["a", "b", "c", "d", "e"]
+
+
+def test_window_selects_the_commits_between_two_dates(columns):
+    assert columns.window() == (0, 5)
+    assert columns.window(START + timedelta(days=1), START + timedelta(days=9)) == (
+        1,
+        4,
+    )
+    assert columns.window(START + timedelta(days=30)) == (5, 5)
+
+
+def test_contributor_stats_count_weeks_per_author(columns):
+    stats = columns.contributor_stats()
+
+    assert [entry["author"]["login"] for entry in stats] == ["bob", "alice"]
+    assert [entry["total"] for entry in stats] == [1, 3]
+    alice = stats[1]["weeks"]
+    assert [week["c"] for week in alice] == [2, 0, 0, 1]
+    assert [week["a"] for week in alice] == [5, 0, 0, 1]
+    assert [week["d"] for week in alice] == [4, 0, 0, 1]
+    assert alice[1]["w"] - alice[0]["w"] == WEEK
+    assert datetime.fromtimestamp(alice[0]["w"], timezone.utc).weekday() == 6
+
+
+def test_python_aggregation_matches_numpy(columns):
+    pytest.importorskip("numpy")
+
+    for since, until in [(None, None), (START + timedelta(days=1), None)]:
+        low, high = columns.window(since, until)
+        assert columns._contributor_stats_python(
+            low, high
+        ) == columns.contributor_stats(since, until)
+
+
+def test_commits_without_users_have_no_statistics():
+    assert CommitColumns([_commit("a", 0, None)]).contributor_stats() == []
@@ -0,0 +1,133 @@
+"""Tests of the commit DAG (data.commit_dag)"""
+
+import random
+
+import pytest
+from conftest import git
+
+from data import branches, commit_dag
+from data.commit_dag import DiskCommitDag, TableCommitDag
+from data.git_repository import GitRepository
+
+
+def _dag(parents):
+    """Build a DAG from {sha: [parent SHAs]}"""
+    return TableCommitDag(
+        {"sha": sha, "parents": [{"sha": parent} for parent in shas]}
+        for sha, shas in parents.items()
+    )
+
+
+# a - b - c - f      (f merges e into c)
+#      \     /
+#       d - e
+#  x                 (unrelated root)
+HISTORY = {
+    "a": [],
+    "b": ["a"],
+    "c": ["b"],
+    "d": ["b"],
+    "e": ["d"],
+    "f": ["c", "e"],
+    "x": [],
+}
+
+
+def test_ancestry_queries():
+    dag = _dag(HISTORY)
+
+    assert dag.is_ancestor("a", "f") and dag.is_ancestor("e", "e")
+    assert not dag.is_ancestor("f", "a") and not dag.is_ancestor("c", "e")
+    assert dag.merge_bases("c", "e") == ["b"]
+    assert dag.merge_bases("c", "f") == ["c"]
+    assert dag.merge_bases("a", "x") == []
+    assert dag.merge_bases("a", "unknown") is None
+    assert dag.ahead_behind("c", "e") == (2, 1)
+    assert dag.ahead_behind("f", "f") == (0, 0)
+    assert dag.range("c", "f") == ["d", "e", "f"]
+    assert dag.range(None, "c") == ["a", "b", "c"]
+
+
+def test_criss_cross_merges_have_two_merge_bases():
+    dag = _dag({"a": [], "b": ["a"], "c": ["a"], "m1": ["b", "c"], "m2": ["c", "b"]})
+
+    assert sorted(dag.merge_bases("m1", "m2") or []) == ["b", "c"]
+
+
+def test_placeholder_parents_are_left_out():
+    dag = _dag({"a": ["placeholder"], "b": ["a"]})
+
+    assert dag.position("placeholder") is None
+    assert dag.range(None, "b") == ["a", "b"]
+
+
+def _ancestors(parents, sha):
+    seen = set()
+    stack = [sha]
+    while stack:
+        current = stack.pop()
+        if current not in seen:
+            seen.add(current)
+            stack.extend(parents[current])
+    return seen
+
+
+def test_checkpoint_bitmaps_match_a_full_walk(monkeypatch):
+    monkeypatch.setattr(commit_dag, "BITMAP_INTERVAL", 4)
+    generator = random.Random(7)
+    parents = {}
+    for index in range(200):
+        shas = list(parents)
+        count = min(len(shas), generator.choice([1, 1, 1, 2]))
+        parents[f"c{index}"] = generator.sample(shas[-20:], count)
+    dag = _dag(parents)
+
+    for _ in range(200):
+        base, head = generator.sample(list(parents), 2)
+        base_ancestors = _ancestors(parents, base)
+        head_ancestors = _ancestors(parents, head)
+        assert dag.is_ancestor(base, head) == (base in head_ancestors)
+        assert dag.ahead_behind(base, head) == (
+            len(head_ancestors - base_ancestors),
+            len(base_ancestors - head_ancestors),
+        )
+        assert set(dag.range(base, head) or []) == head_ancestors - base_ancestors
+
+
+@pytest.mark.parametrize("commit_graph", [False, True])
+def test_disk_dags_number_commits_as_git_does(disk_repository, commit_graph):
+    bare = disk_repository.parent / "root" / "disk" / "pkg.git"
+    if commit_graph:
+        git(bare, "commit-graph", "write", "--reachable")
+    dag = DiskCommitDag(GitRepository(str(bare)))
+    first, second = git(disk_repository, "rev-list", "--reverse", "main").split()
+
+    assert dag.range(None, second) == [first, second]
+    assert dag.ahead_behind(first, second) == (1, 0)
+    assert dag.merge_bases(first, second) == [first]
+    assert dag.position("0" * 40) is None
+
+
+def test_disk_dags_see_commits_pushed_later(disk_repository):
+    bare = disk_repository.parent / "root" / "disk" / "pkg.git"
+    dag = DiskCommitDag(GitRepository(str(bare)))
+    (disk_repository / "later.txt").write_text("later\n")
+    git(disk_repository, "add", ".")
+    git(disk_repository, "commit", "-q", "-m", "Add later.txt")
+    later = git(disk_repository, "rev-parse", "HEAD").strip()
+    first = git(disk_repository, "rev-list", "--max-parents=0", "HEAD").strip()
+
+    assert dag.position(later) is None
+    git(disk_repository, "push", "-q", str(bare), "main")
+    assert dag.ahead_behind(first, later) == (2, 0)
+
+
+def test_branch_counts_are_cached_by_heads(client, monkeypatch):
+    client.get("/api/v3/repos/admin/repo1/branches")
+
+    def fail(owner, repo_name):
+        raise AssertionError("the history was walked again")
+
+    monkeypatch.setattr(branches, "get_commit_dag", fail)
+    response = client.get("/api/v3/repos/admin/repo1/branches")
+    assert response.status_code == 200
@@ -0,0 +1,89 @@
+"""Tests of the commit log index (data.commit_index)"""
+
+import hashlib
+import random
+from datetime import datetime, timedelta, timezone
+
+from data.commit_index import CommitIndex
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+PATHS = ["README.md", "src/main.py", "src/util.py"]
+USERS = ["alice", "bob"]
+
+
+def _commit(generator, index):
+    login = generator.choice(USERS + [None])
+    return {
+        "sha": hashlib.sha1(str(index).encode()).hexdigest(),
+        "commit": {
+            "author": {
+                "email": f"{login or 'ghost'}@example.com",
+                "date": START + timedelta(hours=generator.randint(0, 50)),
+            }
+        },
+        "author": {"login": login} if login else None,
+        "files": [{"filename": path} for path in generator.sample(PATHS, 2)],
+    }
+
+
+def _expected(commits, sha, path, author, since, until):
+    """Filter and sort commits the slow way, newest first"""
+    matched = [
+        commit
+        for commit in commits
+        if (not sha or commit["sha"].startswith(sha))
+        and (not path or path in [f["filename"] for f in commit["files"]])
+        and (
+            not author
+            or author == commit["commit"]["author"]["email"]
+            or author == (commit["author"] or {}).get("login")
+        )
+        and (since is None or commit["commit"]["author"]["date"] >= since)
+        and (until is None or commit["commit"]["author"]["date"] <= until)
+    ]
+    matched.sort(key=lambda commit: (commit["commit"]["author"]["date"], commit["sha"]))
+    return [commit["sha"] for commit in reversed(matched)]
+
+
+def test_queries_match_a_full_scan():
+    generator = random.Random(17)
+    commits = [_commit(generator, index) for index in range(120)]
+    index = CommitIndex(commits[:80])
+    for commit in commits[80:] + commits[:5]:
+        index.add(commit)
+
+    for _ in range(300):
+        filters = (
+            generator.choice([None, "", commits[0]["sha"][:1], commits[1]["sha"]]),
+            generator.choice([None, "src/main.py", "missing"]),
+            generator.choice([None, "alice", "ghost@example.com"]),
+            generator.choice([None, START + timedelta(hours=10)]),
+            generator.choice([None, START + timedelta(hours=40)]),
+        )
+        expected = _expected(commits, *filters)
+
+        sha, path, author, since, until = filters
+        for page in (1, 2, 5):
+            assert (
+                index.query(
+                    sha=sha,
+                    path=path,
+                    author=author,
+                    since=since,
+                    until=until,
+                    page=page,
+                    per_page=25,
+                )
+                == expected[(page - 1) * 25 : page * 25]
+            )
+
+
+def test_sha_prefixes_are_found():
+    generator = random.Random(19)
+    commits = [_commit(generator, index) for index in range(50)]
+    index = CommitIndex(commits)
+    shas = sorted(commit["sha"] for commit in commits)
+
+    for prefix in ["", "a", "0", shas[3][:6], shas[3], "zz"]:
+        assert index.find_prefix(prefix) == [s for s in shas if s.startswith(prefix)]
+    assert index.find_prefix("", limit=3) == shas[:3]
@@ -0,0 +1,144 @@
+"""Tests of the commits created from file changes (data.contents)"""
+
+import base64
+
+from data.commits import REPOSITORY_COMMITS
+from models.commits import CommitFileChange, CreateACommit
+
+
+def _change(path, action="create", content=b"x"):
+    change = {"path": path, "action": action}
+    if action != "delete":
+        change["content"] = base64.b64encode(content).decode()
+    return change
+
+
+def _model(*changes):
+    files = [CommitFileChange(**change) for change in changes]
+    return CreateACommit(message="Batch", files=files)
+
+
+def _commit(client, *changes):
+    return client.post(
+        "/api/v3/repos/admin/repo1/commits",
+        json={"message": "Batch", "files": list(changes)},
+    )
+
+
+def _read(client, path):
+    response = client.get(f"/api/v3/repos/admin/repo1/contents/{path}")
+    if response.status_code != 200:
+        return None
+    return base64.b64decode(response.json()["content"])
+
+
+def test_batches_are_committed_at_once(client):
+    response = _commit(
+        client, _change("batch/a.txt", content=b"a"), _change("batch/b.txt")
+    )
+    assert response.status_code == 200
+    assert _read(client, "batch/a.txt") == b"a"
+
+    response = _commit(
+        client,
+        _change("batch/a.txt", "update", b"new"),
+        _change("batch/b.txt", "delete"),
+    )
+    assert response.status_code == 200
+    assert _read(client, "batch/a.txt") == b"new"
+    assert _read(client, "batch/b.txt") is None
+
+
+def test_batches_writing_through_files_are_refused(client):
+    assert (
+        _commit(client, _change("nested/file.txt", content=b"kept")).status_code == 200
+    )
+
+    assert _commit(client, _change("nested/file.txt/zz")).status_code == 422
+    assert _commit(client, _change("nested", "update")).status_code == 422
+    assert _read(client, "nested/file.txt") == b"kept"
+
+
+def test_batches_with_a_path_under_another_are_refused(client):
+    assert _commit(client, _change("q"), _change("q/r")).status_code == 400
+    assert _read(client, "q") is None
+
+    assert not _model(_change("q/r/s"), _change("q", "delete")).is_valid()
+    assert _model(_change("q"), _change("qr")).is_valid()
+
+
+def test_commit_patches_are_computed_on_read(client):
+    response = _commit(client, _change("lazy.txt", content=b"one\ntwo\n"))
+    assert response.status_code == 200
+    sha = response.json()["sha"]
+
+    stored = REPOSITORY_COMMITS["admin/repo1"][sha]
+    assert "stats" not in stored
+    assert [sorted(commit_file) for commit_file in stored["files"]] == [
+        ["blob", "filename", "old_blob", "status"]
+    ]
+
+    commit = client.get(f"/api/v3/repos/admin/repo1/commits/{sha}").json()
+    assert commit["stats"] == {"additions": 2, "deletions": 0, "total": 2}
+    assert commit["files"][0]["patch"] == "@@ -0,0 +1,2 @@\n+one\n+two"
+
+
+def test_refused_batches_get_distinct_statuses(client):
+    assert _commit(client, _change("status.txt", content=b"v1")).status_code == 200
+    sha = client.get("/api/v3/repos/admin/repo1/contents/status.txt").json()["sha"]
+
+    response = client.post(
+        "/api/v3/repos/admin/missing/commits",
+        json={"message": "Batch", "files": [_change("a.txt")]},
+    )
+    assert response.status_code == 404
+
+    response = client.post(
+        "/api/v3/repos/admin/repo1/commits",
+        json={"message": "Batch", "branch": "missing", "files": [_change("a.txt")]},
+    )
+    assert response.status_code == 404
+
+    stale = {**_change("status.txt", "update", b"v2"), "sha": "0" * 40}
+    assert _commit(client, stale).status_code == 409
+    assert _commit(client, {**stale, "sha": sha}).status_code == 200
+
+    assert _commit(client, _change("status.txt")).status_code == 422
+    assert _commit(client, {**_change("bad.txt"), "content": "a"}).status_code == 422
+    assert _read(client, "status.txt") == b"v2"
+
+
+def test_raw_files_serve_byte_ranges(client):
+    assert (
+        _commit(client, _change("range.txt", content=b"0123456789")).status_code == 200
+    )
+    url = "/api/v3/repos/admin/repo1/raw/main/range.txt"
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.content == b"0123456789"
+    assert response.headers["Accept-Ranges"] == "bytes"
+
+    response = client.get(url, headers={"Range": "bytes=2-4"})
+    assert response.status_code == 206
+    assert response.content == b"234"
+    assert response.headers["Content-Range"] == "bytes 2-4/10"
+    assert response.headers["Content-Length"] == "3"
+
+    response = client.get(url, headers={"Range": "bytes=7-"})
+    assert response.status_code == 206
+    assert response.content == b"789"
+
+    response = client.get(url, headers={"Range": "bytes=-3"})
+    assert response.status_code == 206
+    assert response.content == b"789"
+    assert response.headers["Content-Range"] == "bytes 7-9/10"
+
+    response = client.get(url, headers={"Range": "bytes=10-"})
+    assert response.status_code == 416
+    assert response.headers["Content-Range"] == "bytes */10"
+
+    # Several ranges are not supported: the whole file is returned
+    response = client.get(url, headers={"Range": "bytes=0-1,4-5"})
+    assert response.status_code == 200
+    assert response.content == b"0123456789"
@@ -0,0 +1,188 @@
+"""Tests of the line diffs and patches (data.diff)"""
+
+import random
+
+import pytest
+
+from data import diff
+from data.diff import MAX_PATCH_SIZE, diff_lines, get_patch, iter_patch
+
+
+def _edit_cost(old, new):
+    """Count the lines added and removed by a shortest edit script"""
+    lengths = [[0] * (len(new) + 1) for _ in range(len(old) + 1)]
+    for i in range(len(old) - 1, -1, -1):
+        for j in range(len(new) - 1, -1, -1):
+            if old[i] == new[j]:
+                lengths[i][j] = lengths[i + 1][j + 1] + 1
+            else:
+                lengths[i][j] = max(lengths[i + 1][j], lengths[i][j + 1])
+    return len(old) + len(new) - 2 * lengths[0][0]
+
+
+def _apply(old, new, changes):
+    """Rebuild the new lines from the old ones and the changes"""
+    result = []
+    position = 0
+    for old_start, old_end, new_start, new_end in changes:
+        assert old_start >= position
+        result.extend(old[position:old_start])
+        result.extend(new[new_start:new_end])
+        position = old_end
+    return result + list(old[position:])
+
+
+def _apply_patch(old, lines):
+    """Rebuild the new lines from the old ones and unified diff hunks"""
+    result = []
+    position = 0
+    for line in lines:
+        if line.startswith("@@"):
+            start = line.split()[1][1:].split(",")
+            old_start = int(start[0]) - (0 if start[1:] == ["0"] else 1)
+            result.extend(old[position:old_start])
+            position = old_start
+        elif line[0] == "+":
+            result.append(line[1:])
+        else:
+            assert old[position] == line[1:]
+            if line[0] == " ":
+                result.append(line[1:])
+            position += 1
+    return result + old[position:]
+
+
+def _lines(generator, count):
+    return [generator.choice("abcdefg") for _ in range(count)]
+
+
+def test_changes_rebuild_the_new_lines_with_the_fewest_edits():
+    generator = random.Random(7)
+    for _ in range(300):
+        old = _lines(generator, generator.randint(0, 30))
+        new = _lines(generator, generator.randint(0, 30))
+        changes = diff_lines(old, new)
+
+        assert _apply(old, new, changes) == new
+        cost = sum(
+            old_end - old_start + new_end - new_start
+            for old_start, old_end, new_start, new_end in changes
+        )
+        assert cost == _edit_cost(old, new)
+
+
+def test_expensive_searches_split_regions_and_stay_correct(monkeypatch):
+    monkeypatch.setattr(diff, "MIN_EDIT_COST", 1)
+    generator = random.Random(11)
+    for _ in range(100):
+        old = _lines(generator, generator.randint(0, 60))
+        new = _lines(generator, generator.randint(0, 60))
+
+        assert _apply(old, new, diff_lines(old, new)) == new
+
+
+def test_patches_are_unified_diffs():
+    old = [str(line) for line in range(1, 21)]
+    new = old[:1] + ["x"] + old[2:15] + old[16:] + ["end"]
+    blobs = {"old": "\n".join(old).encode(), "new": "\n".join(new).encode()}
+
+    patch = get_patch("old", "new", blobs.get)
+
+    assert (patch.additions, patch.deletions) == (2, 2)
+    assert not patch.truncated and not patch.binary
+    assert patch.patch.split("\n") == [
+        "@@ -1,5 +1,5 @@",
+        " 1",
+        "-2",
+        "+x",
+        " 3",
+        " 4",
+        " 5",
+        "@@ -13,8 +13,8 @@",
+        " 13",
+        " 14",
+        " 15",
+        "-16",
+        " 17",
+        " 18",
+        " 19",
+        " 20",
+        "+end",
+    ]
+
+
+def test_random_patches_apply():
+    generator = random.Random(13)
+    for index in range(100):
+        old = _lines(generator, generator.randint(0, 40))
+        new = _lines(generator, generator.randint(0, 40))
+        blobs = {
+            f"old{index}": "\n".join(old).encode(),
+            f"new{index}": "\n".join(new).encode(),
+        }
+
+        patch = get_patch(f"old{index}", f"new{index}", blobs.get)
+        lines = patch.patch.split("\n") if patch.patch else []
+        assert _apply_patch(old, lines) == new
+
+
+def test_added_and_removed_files():
+    blobs = {"file": b"a\nb\n"}
+
+    assert get_patch(None, "file", blobs.get).patch == "@@ -0,0 +1,2 @@\n+a\n+b"
+    assert get_patch("file", None, blobs.get).patch == "@@ -1,2 +0,0 @@\n-a\n-b"
+
+
+def test_lines_are_split_at_newlines_only():
+    blobs = {"feed-old": b"a\x0cb\r\nc\n", "feed-new": b"a\x0cb\r\nd"}
+
+    patch = get_patch("feed-old", "feed-new", blobs.get)
+    assert patch.patch == "@@ -1,2 +1,2 @@\n a\x0cb\r\n-c\n+d"
+    assert (patch.additions, patch.deletions) == (1, 1)
+
+
+def test_binary_files_have_no_patch():
+    blobs = {"text": b"a\n", "binary": b"a\0b"}
+
+    patch = get_patch("text", "binary", blobs.get)
+
+    assert patch.binary and patch.patch == ""
+    assert iter_patch("text", "binary", blobs.get) is None
+
+
+def test_long_patches_are_cut_but_can_be_streamed():
+    line = "x" * 99
+    blobs = {"long": "\n".join([line] * (MAX_PATCH_SIZE // 50)).encode()}
+
+    patch = get_patch(None, "long", blobs.get)
+    streamed = iter_patch(None, "long", blobs.get)
+
+    assert patch.truncated and len(patch.patch) <= MAX_PATCH_SIZE
+    assert streamed is not None
+    lines = list(streamed)
+    assert len(lines) == MAX_PATCH_SIZE // 50 + 1
+    assert "\n".join(lines).startswith(patch.patch)
+
+
+def test_patches_are_cached_by_blob_pair():
+    reads = []
+
+    def read_blob(sha):
+        reads.append(sha)
+        return b"a\n" if sha == "cached-old" else b"b\n"
+
+    first = get_patch("cached-old", "cached-new", read_blob)
+    assert get_patch("cached-old", "cached-new", read_blob) is first
+    assert reads == ["cached-old", "cached-new"]
+
+    streamed = iter_patch("cached-old", "cached-new", read_blob)
+    assert streamed is not None and list(streamed) == first.patch.split("\n")
+    assert len(reads) == 2
+
+
+@pytest.mark.parametrize(
+    "old, new",
+    [([], []), (["a"], ["a"]), (["a", "b"], []), ([], ["a"]), (["a"], ["b"])],
+)
+def test_small_inputs(old, new):
+    assert _apply(old, new, diff_lines(old, new)) == new
@@ -0,0 +1,73 @@
+"""Tests of the repository change events (data.events)"""
+
+import pytest
+
+from data import events
+from data.branches import delete_branch, set_branch_head
+from data.events import record, subscribe
+from data.storage import SqliteBackend
+
+MAIN = "3456789012abcdef3456789012abcdef34567890"
+FEATURE = "4567890123abcdef4567890123abcdef45678901"
+
+
+@pytest.fixture
+def published():
+    changes = []
+    subscribe(changes.append)
+    yield changes
+    events._subscribers.remove(changes.append)
+
+
+@pytest.fixture
+def sqlite_backend(tmp_path, monkeypatch):
+    """Record events in transactions of a SQLite backend, which rolls back"""
+    storage = SqliteBackend(str(tmp_path / "events.sqlite3"))
+    monkeypatch.setattr(events, "backend", storage)
+    return storage
+
+
+def test_changes_are_merged_until_the_outermost_transaction_ends(
+    published, sqlite_backend
+):
+    with sqlite_backend.transaction():
+        record("events/repo").add_commit({"sha": "1"})
+        record("events/repo").move_branch("main", "0", "1")
+        with sqlite_backend.transaction():
+            record("events/repo").move_branch("main", "1", "2")
+            record("events/repo").move_ref("refs/tags/v1", None, "2")
+            record("events/other").move_branch("main", None, "3")
+        assert published == []
+
+    assert [change.repo_key for change in published] == ["events/repo", "events/other"]
+    change = published[0]
+    assert change.commits == [{"sha": "1"}]
+    assert change.branches == {"main": ("0", "2")}
+    assert change.refs == {"refs/tags/v1": (None, "2")}
+
+
+def test_rolled_back_changes_are_not_published(published, sqlite_backend):
+    with pytest.raises(RuntimeError):
+        with sqlite_backend.transaction():
+            record("events/repo").move_branch("main", "0", "1")
+            raise RuntimeError
+
+    assert published == []
+
+    with sqlite_backend.transaction():
+        record("events/repo").move_branch("topic", None, "1")
+
+    assert len(published) == 1
+    assert published[0].branches == {"topic": (None, "1")}
+
+
+def test_branch_moves_are_published(published):
+    set_branch_head("org1", "repo3", "events-topic", MAIN)
+    set_branch_head("org1", "repo3", "events-topic", FEATURE)
+    delete_branch("org1", "repo3", "events-topic")
+
+    assert [change.branches for change in published] == [
+        {"events-topic": (None, MAIN)},
+        {"events-topic": (MAIN, FEATURE)},
+        {"events-topic": (FEATURE, None)},
+    ]
@@ -0,0 +1,96 @@
+"""Tests of the repositories read from disk (data.git_repository)"""
+
+import pytest
+from conftest import git
+
+from data.git_objects import blob_sha
+from data.git_repository import GitRepository, get_disk_repository
+from data.tree_store import blob_entry
+
+EMPTY_BLOB = blob_sha(b"")
+
+
+@pytest.fixture(params=["loose", "packed"])
+def repository(request, disk_repository):
+    """Open disk/pkg with loose objects, or packed with a commit-graph"""
+    bare = disk_repository.parent / "root" / "disk" / "pkg.git"
+    if request.param == "packed":
+        git(bare, "repack", "-adq", "--depth=10")
+        git(bare, "commit-graph", "write", "--reachable")
+    return GitRepository(str(bare))
+
+
+def test_objects_are_read_as_git_stores_them(repository, disk_repository):
+    head = git(disk_repository, "rev-parse", "main")
+    readme = git(disk_repository, "rev-parse", "main:README.md")
+
+    assert repository.resolve("main") == head
+    assert repository.get(readme) == b"# pkg\n"
+    assert repository.size(readme) == 6
+    assert repository.object_type(head) == "commit"
+    assert repository.get(head) is None
+    assert repository.read("0" * 40) is None
+    assert repository.read("not a sha") is None
+
+    commit = repository.commit(head)
+    assert commit is not None
+    assert commit.message.strip() == "Add main.py"
+    assert commit.author["name"] == "Alice"
+    assert repository.root_tree(head) == git(
+        disk_repository, "rev-parse", "main^{tree}"
+    )
+
+
+def test_history_is_walked_newest_first(repository, disk_repository):
+    first, second = git(disk_repository, "rev-list", "--reverse", "main").split()
+
+    assert repository.parents(second)[1] == [first]
+    assert repository.parents(first)[1] == []
+    assert list(repository.walk([second])) == [second, first]
+
+
+def test_trees_are_read_only(repository):
+    root = repository.root_tree(repository.resolve("main"))
+
+    assert repository.trees.lookup(root, "src/main.py")["type"] == "blob"
+    with pytest.raises(TypeError):
+        repository.trees.update(root, {"new.txt": blob_entry(EMPTY_BLOB, 0)})
+
+
+def test_disk_repositories_are_opened_once(disk_repository):
+    repository = get_disk_repository("disk", "pkg")
+
+    assert repository is not None
+    assert get_disk_repository("disk", "pkg") is repository
+    assert get_disk_repository("disk", "missing") is None
+    assert get_disk_repository("..", "pkg") is None
+
+
+def test_refs_are_resolved_without_listing_them(disk_repository, monkeypatch):
+    bare = disk_repository.parent / "root" / "disk" / "pkg.git"
+    first, second = git(disk_repository, "rev-list", "--reverse", "main").split()
+    git(bare, "branch", "v1", second)
+    git(bare, "tag", "v1", first)
+    git(bare, "tag", "-a", "-m", "Release", "v2", first)
+    git(bare, "symbolic-ref", "refs/heads/alias", "refs/heads/main")
+    repository = GitRepository(str(bare))
+
+    def fail():
+        raise AssertionError("every ref was listed")
+
+    monkeypatch.setattr(repository, "refs", fail)
+    for packed in (False, True):
+        # Branches take precedence over tags
+        assert repository.resolve("v1") == second
+        assert repository.resolve("tags/v1") == first
+        assert repository.resolve("refs/tags/v2") == first
+        assert repository.resolve("alias") == second
+        assert repository.resolve("missing") is None
+        assert repository.resolve("../HEAD") is None
+        if not packed:
+            git(bare, "pack-refs", "--all")
+            assert not (bare / "refs" / "tags" / "v1").exists()
+
+    # Loose refs override packed ones
+    git(bare, "update-ref", "refs/heads/v1", first)
+    assert repository.resolve("v1") == first
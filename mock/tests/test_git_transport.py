@@ -0,0 +1,84 @@
+"""Tests of the git smart HTTP fetches (data.git_transport)"""
+
+import base64
+import shutil
+import subprocess
+
+import pytest
+
+from data.git_transport import FLUSH, pkt_line
+
+
+def _pkt_lines(data):
+    position = 0
+    while position < len(data):
+        length = int(data[position : position + 4], 16)
+        yield data[position + 4 : position + length] if length else None
+        position += length or 4
+
+
+def _advertised(client, repository):
+    response = client.get(
+        f"/admin/{repository}.git/info/refs", params={"service": "git-upload-pack"}
+    )
+    assert response.status_code == 200
+    refs = {}
+    for line in list(_pkt_lines(response.content))[2:]:
+        if line is not None:
+            sha, _, name = line.split(b"\0")[0].rstrip(b"\n").partition(b" ")
+            refs[name.decode()] = sha.decode()
+    return refs
+
+
+def _fetch(client, repository, want, capabilities="ofs-delta"):
+    body = pkt_line(f"want {want} {capabilities}\n".encode()) + FLUSH
+    body += pkt_line(b"done\n")
+    response = client.post(f"/admin/{repository}.git/git-upload-pack", content=body)
+    assert response.status_code == 200
+    return response.content
+
+
+def _write(client, repository, path):
+    response = client.put(
+        f"/api/v3/repos/admin/{repository}/contents/{path}",
+        json={"message": path, "content": base64.b64encode(b"x").decode()},
+    )
+    assert response.status_code == 200
+    return response.json()["commit"]["sha"]
+
+
+@pytest.fixture
+def repository(client):
+    response = client.post(
+        "/api/v3/user/repos",
+        json={"name": "transport", "description": "", "auto_init": True},
+    )
+    assert response.status_code in (200, 400)  # Created by an earlier test
+    return "transport"
+
+
+def test_repositories_written_through_the_api_are_served(client, repository, tmp_path):
+    sha = _write(client, repository, "served.txt")
+
+    assert _advertised(client, repository)["refs/heads/main"] == sha
+    pack = _fetch(client, repository, sha)
+    assert pack.startswith(pkt_line(b"NAK\n") + b"PACK")
+
+    if shutil.which("git"):
+        subprocess.run(["git", "init", "-q", str(tmp_path)], check=True)
+        result = subprocess.run(
+            ["git", "index-pack", "--stdin", "--strict"],
+            input=pack[8:],
+            capture_output=True,
+            cwd=tmp_path,
+        )
+        assert result.returncode == 0, result.stderr
+
+
+def test_history_reaching_placeholder_commits_is_not_served(client):
+    sha = _write(client, "repo1", "transport.txt")
+
+    assert "refs/heads/main" not in _advertised(client, "repo1")
+    response = _fetch(client, "repo1", sha, "side-band-64k ofs-delta")
+    assert response[4:].startswith(b"ERR upload-pack: missing commit")
+    assert b"PACK" not in response
@@ -0,0 +1,35 @@
+"""Tests of the git trees API (data.git_trees)"""
+
+from conftest import git
+
+
+def _paths(response):
+    assert response.status_code == 200
+    return [(entry["path"], entry["type"]) for entry in response.json()["tree"]]
+
+
+def test_trees_are_listed_by_sha_or_ref(client):
+    response = client.get("/api/v3/repos/admin/repo1/git/trees/main")
+    root = response.json()["sha"]
+
+    by_sha = client.get(f"/api/v3/repos/admin/repo1/git/trees/{root}")
+    assert _paths(by_sha) == _paths(response)
+    assert client.get("/api/v3/repos/admin/repo1/git/trees/nothing").status_code == 404
+
+
+def test_trees_of_disk_repositories_are_read_from_disk(client, disk_repository):
+    root = git(disk_repository, "rev-parse", "main^{tree}")
+    src = git(disk_repository, "rev-parse", "main:src")
+
+    response = client.get(f"/api/v3/repos/disk/pkg/git/trees/{root}")
+    assert _paths(response) == [("README.md", "blob"), ("src", "tree")]
+    assert response.json()["tree"][0]["size"] == len("# pkg\n")
+
+    response = client.get(
+        "/api/v3/repos/disk/pkg/git/trees/main", params={"recursive": 1}
+    )
+    assert response.json()["sha"] == root
+    assert _paths(response)[-1] == ("src/main.py", "blob")
+
+    response = client.get(f"/api/v3/repos/disk/pkg/git/trees/{src}")
+    assert _paths(response) == [("main.py", "blob")]
@@ -0,0 +1,85 @@
+"""Tests of the caches of derived indexes (data.indexes)"""
+
+import pytest
+
+from data import indexes
+from data.indexes import IndexCache, RepoIndexCache
+
+
+@pytest.fixture
+def data_version(monkeypatch):
+    version = [0]
+    monkeypatch.setattr(indexes.backend, "data_version", lambda: version[0])
+    return version
+
+
+def test_repository_indexes_are_built_once_per_data_version(data_version):
+    builds = []
+    cache = RepoIndexCache(lambda repo_key: builds.append(repo_key) or len(builds))
+
+    assert cache.get("admin/repo1") == 1
+    assert cache.get("admin/repo1") == 1
+    assert cache.get("admin/repo2") == 2
+
+    cache.discard("admin/repo1")
+    assert cache.get("admin/repo1") == 3
+
+    # Another process changed the data: every index is rebuilt
+    data_version[0] += 1
+    assert cache.get("admin/repo2") == 4
+
+
+def test_table_indexes_are_rebuilt_when_the_data_changes(data_version):
+    builds = []
+    cache = IndexCache(lambda: builds.append(1) or len(builds))
+
+    assert cache.get() == 1
+    assert cache.get() == 1
+    data_version[0] += 1
+    assert cache.get() == 2
+
+
+def test_peeking_does_not_build_indexes(data_version):
+    cache = RepoIndexCache(lambda repo_key: {"repo_key": repo_key})
+
+    assert cache.peek("admin/repo1") is None
+    index = cache.get("admin/repo1")
+    assert cache.peek("admin/repo1") is index
+
+    data_version[0] += 1
+    assert cache.peek("admin/repo1") is None
+
+
+def test_updates_wait_for_the_transaction(data_version):
+    cache = RepoIndexCache(lambda repo_key: [])
+    index = cache.get("admin/repo1")
+
+    with indexes.backend.transaction():
+        cache.update("admin/repo1", lambda index: index.append("kept"))
+        cache.update("admin/repo2", lambda index: index.append("unbuilt"))
+        assert index == []
+    assert cache.get("admin/repo1") == ["kept"]
+    assert cache.peek("admin/repo2") is None
+
+    with pytest.raises(RuntimeError):
+        with indexes.backend.transaction():
+            cache.update("admin/repo1", lambda index: index.append("undone"))
+            raise RuntimeError
+    assert cache.peek("admin/repo1") is None
+    assert cache.get("admin/repo1") == []
+
+
+def test_table_index_updates_wait_for_the_transaction(data_version):
+    cache = IndexCache(lambda: [])
+    index = cache.get()
+
+    with indexes.backend.transaction():
+        cache.update(lambda index: index.append("kept"))
+        assert index == []
+    assert cache.get() == ["kept"]
+
+    with pytest.raises(RuntimeError):
+        with indexes.backend.transaction():
+            cache.update(lambda index: index.append("undone"))
+            raise RuntimeError
+    assert cache.get() == []
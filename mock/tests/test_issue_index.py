@@ -0,0 +1,152 @@
+"""Tests of the issue index (data.issue_index) behind the issue list"""
+
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from data.issue_index import IssueIndex
+from data.issues import (
+    REPOSITORY_ISSUES,
+    create_issue,
+    get_repository_issues,
+    update_issue,
+)
+from data.storage import backend
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+USERS = ["alice", "bob", "carol"]
+
+
+def _issue(generator, number):
+    assignees = generator.sample(USERS, generator.randint(0, 2))
+    milestone = generator.choice([None, 1, 2])
+    return {
+        "number": number,
+        "state": generator.choice(["open", "closed"]),
+        "user": {"login": generator.choice(USERS)},
+        "assignees": [{"login": login} for login in assignees],
+        "milestone": {"number": milestone} if milestone else None,
+        "updated_at": START + timedelta(hours=generator.randint(0, 100)),
+    }
+
+
+def _expected(issues, comments, state, assignee, creator, milestone, since, sort):
+    """Filter and sort issues the slow way"""
+    matched = []
+    for issue in issues.values():
+        logins = [user["login"] for user in issue["assignees"]]
+        number = str(issue["milestone"]["number"]) if issue["milestone"] else "none"
+        if state != "all" and issue["state"] != state:
+            continue
+        if assignee == "*" and not logins or assignee == "none" and logins:
+            continue
+        if assignee not in (None, "*", "none") and assignee not in logins:
+            continue
+        if creator is not None and issue["user"]["login"] != creator:
+            continue
+        if milestone == "*" and number == "none":
+            continue
+        if milestone not in (None, "*") and number != milestone:
+            continue
+        if since is not None and issue["updated_at"] < since:
+            continue
+        matched.append(issue)
+
+    keys = {
+        "created": lambda issue: (issue["number"],),
+        "updated": lambda issue: (issue["updated_at"], issue["number"]),
+        "comments": lambda issue: (comments[issue["number"]], issue["number"]),
+    }
+    return [issue["number"] for issue in sorted(matched, key=keys[sort])]
+
+
+def test_queries_match_a_full_scan():
+    generator = random.Random(3)
+    issues = {number: _issue(generator, number) for number in range(1, 80)}
+    comments = {number: generator.randint(0, 5) for number in issues}
+    index = IssueIndex((issue, comments[number]) for number, issue in issues.items())
+
+    # Updated issues move in every structure
+    for number in generator.sample(list(issues), 20):
+        issues[number] = _issue(generator, number)
+        comments[number] = generator.randint(0, 5)
+        index.put(issues[number], comments[number])
+
+    for _ in range(300):
+        filters = (
+            generator.choice(["open", "closed", "all"]),
+            generator.choice([None, "*", "none", "alice"]),
+            generator.choice([None, "bob"]),
+            generator.choice([None, "*", "none", "1"]),
+            generator.choice([None, START + timedelta(hours=50)]),
+            generator.choice(["created", "updated", "comments"]),
+        )
+        direction = generator.choice(["asc", "desc"])
+        expected = _expected(issues, comments, *filters)
+        if direction == "desc":
+            expected.reverse()
+
+        state, assignee, creator, milestone, since, sort = filters
+        for page in (1, 2, 4, 9):
+            assert (
+                index.query(
+                    state=state,
+                    assignee=assignee,
+                    creator=creator,
+                    milestone=milestone,
+                    since=since,
+                    sort=sort,
+                    direction=direction,
+                    page=page,
+                    per_page=10,
+                )
+                == expected[(page - 1) * 10 : page * 10]
+            )
+
+
+def test_label_sets_are_intersected():
+    generator = random.Random(5)
+    issues = [(_issue(generator, number), 0) for number in range(1, 10)]
+    index = IssueIndex(issues)
+
+    numbers = index.query(state="all", label_sets=[{1, 2, 3, 4}, {2, 4, 6}])
+    assert numbers == [4, 2]
+
+
+def test_pages_match_a_full_scan():
+    for index in range(25):
+        issue = create_issue("user1", "repo2", {"title": f"Paged {index}"}, "admin")
+        assert issue is not None
+        if index % 3 == 0:
+            update_issue("user1", "repo2", issue["number"], {"state": "closed"})
+
+    issues = REPOSITORY_ISSUES["user1/repo2"].values()
+    for state in ("open", "closed", "all"):
+        numbers = sorted(
+            (i["number"] for i in issues if state in ("all", i["state"])),
+            reverse=True,
+        )
+        for page in (1, 2, 3, 10):
+            listed = get_repository_issues("user1", "repo2", state, page, 10)
+            assert listed is not None
+            assert [i["number"] for i in listed] == numbers[(page - 1) * 10 : page * 10]
+
+
+def test_unknown_repositories_have_no_issues():
+    assert get_repository_issues("user1", "missing") is None
+
+
+def test_rolled_back_issues_leave_the_index():
+    assert get_repository_issues("admin", "repo1", "all") is not None
+
+    with pytest.raises(RuntimeError):
+        with backend.transaction():
+            create_issue("admin", "repo1", {"title": "Rolled back"}, "admin")
+            update_issue("admin", "repo1", 1, {"state": "closed"})
+            raise RuntimeError
+
+    issues = get_repository_issues("admin", "repo1", "all", per_page=100)
+    assert issues is not None
+    numbers = sorted(REPOSITORY_ISSUES["admin/repo1"], reverse=True)
+    assert [issue["number"] for issue in issues] == numbers
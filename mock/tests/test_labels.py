@@ -0,0 +1,99 @@
+"""Tests of the label cascades through the label index (data.labels)"""
+
+import pytest
+
+from data.issues import get_repository_issues
+from data.labels import (
+    LABEL_ISSUES,
+    _build_label_issues,
+    add_labels_to_issue,
+    create_label,
+    delete_label,
+    get_issue_labels,
+    remove_label_from_issue,
+    update_label,
+)
+from data.storage import backend
+
+
+def _label_names(issue_number):
+    labels = get_issue_labels("admin", "repo1", issue_number)
+    assert labels is not None
+    return {label["name"] for label in labels}
+
+
+def _labeled(label_name):
+    issues = get_repository_issues("admin", "repo1", "all", labels=label_name)
+    assert issues is not None
+    return sorted(issue["number"] for issue in issues)
+
+
+def test_renamed_labels_follow_their_issues():
+    create_label("admin", "repo1", {"name": "cascade-old", "color": "ededed"})
+    add_labels_to_issue("admin", "repo1", 1, ["cascade-old"])
+    add_labels_to_issue("admin", "repo1", 2, ["cascade-old", "cascade-other"])
+
+    renamed = update_label(
+        "admin", "repo1", "cascade-old", {"name": "cascade-new", "color": "000000"}
+    )
+
+    assert renamed is not None and renamed["name"] == "cascade-new"
+    assert "cascade-new" in _label_names(1)
+    assert _label_names(2) >= {"cascade-new", "cascade-other"}
+    assert "cascade-old" not in _label_names(1) | _label_names(2)
+    assert _labeled("cascade-new") == [1, 2]
+    assert _labeled("cascade-old") == []
+    assert LABEL_ISSUES.get("admin/repo1") == _build_label_issues("admin/repo1")
+
+    delete_label("admin", "repo1", "cascade-new")
+    delete_label("admin", "repo1", "cascade-other")
+
+
+def test_deleted_labels_leave_their_issues():
+    add_labels_to_issue("admin", "repo1", 1, ["cascade-deleted", "cascade-kept"])
+    add_labels_to_issue("admin", "repo1", 2, ["cascade-deleted"])
+    remove_label_from_issue("admin", "repo1", 2, "cascade-deleted")
+    assert _labeled("cascade-deleted") == [1]
+
+    assert delete_label("admin", "repo1", "cascade-deleted")
+
+    assert "cascade-deleted" not in _label_names(1)
+    assert "cascade-kept" in _label_names(1)
+    assert _labeled("cascade-deleted") == []
+    assert LABEL_ISSUES.get("admin/repo1") == _build_label_issues("admin/repo1")
+
+    delete_label("admin", "repo1", "cascade-kept")
+
+
+def test_renaming_onto_an_existing_label_is_refused():
+    create_label("admin", "repo1", {"name": "cascade-first", "color": "ededed"})
+    create_label("admin", "repo1", {"name": "cascade-second", "color": "ededed"})
+
+    update = {"name": "cascade-second", "color": "ededed"}
+    assert update_label("admin", "repo1", "cascade-first", update) is None
+
+    delete_label("admin", "repo1", "cascade-first")
+    delete_label("admin", "repo1", "cascade-second")
+
+
+def test_rolled_back_label_changes_leave_the_index():
+    add_labels_to_issue("admin", "repo1", 1, ["cascade-stays"])
+
+    with pytest.raises(RuntimeError):
+        with backend.transaction():
+            add_labels_to_issue("admin", "repo1", 2, ["cascade-stays"])
+            update_label(
+                "admin",
+                "repo1",
+                "cascade-stays",
+                {"name": "cascade-moved", "color": "ededed"},
+            )
+            raise RuntimeError
+
+    assert _labeled("cascade-stays") == [1]
+    assert _labeled("cascade-moved") == []
+    assert "cascade-stays" in _label_names(1)
+    assert "cascade-stays" not in _label_names(2)
+    assert LABEL_ISSUES.get("admin/repo1") == _build_label_issues("admin/repo1")
+
+    delete_label("admin", "repo1", "cascade-stays")
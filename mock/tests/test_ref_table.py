@@ -0,0 +1,71 @@
+"""Tests of the unified ref table (data.ref_table)"""
+
+from data.ref_table import TAGS, RefTable
+
+SHA_A = "a" * 40
+SHA_B = "b" * 40
+SHA_C = "c" * 40
+
+
+def test_names_resolve_by_precedence():
+    table = RefTable(
+        [SHA_A, SHA_B, SHA_C],
+        branches=[("main", SHA_A), ("v1", SHA_B)],
+        tags=[("v1", SHA_C), ("release", SHA_C)],
+        refs=[("refs/heads/main", SHA_A), ("refs/tags/v1", SHA_C)],
+    )
+
+    assert table.resolve(SHA_B) == SHA_B
+    assert table.resolve("main") == SHA_A
+    assert table.resolve("v1") == SHA_B  # The branch hides the tag
+    assert table.resolve("release") == SHA_C
+    assert table.resolve("refs/tags/v1") == SHA_C
+    assert table.resolve("tags/v1") == SHA_C
+    assert table.resolve("heads/main") == SHA_A
+    assert table.resolve("missing") is None
+
+
+def test_removed_names_reveal_the_next_source():
+    table = RefTable([SHA_A], [("v1", SHA_A)], [("v1", SHA_B)], [])
+
+    table.delete_branch("v1")
+    assert table.resolve("v1") == SHA_B
+
+    table.set_branch("v1", SHA_C)
+    assert table.resolve("v1") == SHA_C
+
+    table.delete_branch("v1")
+    table.delete_name(TAGS, "v1")
+    assert table.resolve("v1") is None
+
+
+def test_refs_without_records_resolve_by_short_name():
+    table = RefTable([], [], [], [])
+
+    table.set_ref("refs/heads/topic", SHA_A)
+    table.set_ref("refs/tags/topic", SHA_B)
+    table.set_ref("refs/tags/only-tag", SHA_C)
+    assert table.resolve("topic") == SHA_A  # Heads before tags, as in git
+    assert table.resolve("only-tag") == SHA_C
+
+    table.delete_ref("refs/heads/topic")
+    assert table.resolve("topic") == SHA_B
+    assert table.resolve("refs/heads/topic") is None
+    assert table.resolve("heads/topic") is None
+
+
+def test_abbreviations_resolve_when_unambiguous():
+    first = "1234567" + "a" * 33
+    second = "1234567" + "b" * 33
+    table = RefTable([first, SHA_B], [], [], [])
+
+    assert table.resolve("1234567") == first
+    assert table.resolve(SHA_B[:7]) == SHA_B
+
+    table.add_commit(second)
+    assert table.resolve("1234567") is None
+    assert table.resolve(second) == second
+
+    # A branch named like an abbreviation wins over it
+    table.set_branch("1234567", SHA_B)
+    assert table.resolve("1234567") == SHA_B
@@ -0,0 +1,77 @@
+"""Tests of the repository listing index (data.repository_index)"""
+
+import random
+
+import pytest
+
+from data.repositories import (
+    create_repository,
+    get_all_public_repositories,
+    get_user_repositories,
+)
+from data.repository_index import RepositoryIndex
+from data.storage import backend
+
+
+def _repo(generator, repo_id):
+    owner = generator.choice(["admin", "alice", "org"])
+    return {
+        "id": repo_id,
+        "full_name": f"{owner}/repo{repo_id}",
+        "private": generator.random() < 0.3,
+    }
+
+
+def test_pages_match_a_full_scan():
+    generator = random.Random(23)
+    repos = [_repo(generator, repo_id) for repo_id in range(1, 60)]
+    generator.shuffle(repos)
+    index = RepositoryIndex(repos[:40])
+    for repo in repos[40:] + repos[:3]:
+        index.add(repo)
+
+    repos.sort(key=lambda repo: repo["id"])
+    public = [repo["full_name"] for repo in repos if not repo["private"]]
+    for page in (1, 2, 3, 10):
+        assert index.public_page(page, 10) == public[(page - 1) * 10 : page * 10]
+        for owner in ("admin", "alice", "org", "nobody"):
+            owned = [
+                repo["full_name"]
+                for repo in repos
+                if repo["full_name"].startswith(f"{owner}/")
+            ]
+            assert (
+                index.owner_page(owner, page, 10) == owned[(page - 1) * 10 : page * 10]
+            )
+
+
+def test_listings_follow_created_repositories():
+    repo = create_repository("admin", {"name": "index-listed", "description": ""})
+    assert repo is not None
+    hidden = create_repository("admin", {"name": "index-hidden", "private": True})
+    assert hidden is not None
+
+    names = []
+    for page in range(1, 100):
+        repos = get_all_public_repositories(page, 100)
+        if not repos:
+            break
+        names.extend(repo["full_name"] for repo in repos)
+    owned = [repo["full_name"] for repo in get_user_repositories("admin", 1, 100)]
+
+    assert names.count("admin/index-listed") == 1
+    assert "admin/index-hidden" not in names
+    assert owned[-2:] == ["admin/index-listed", "admin/index-hidden"]
+
+
+def test_rolled_back_repositories_are_not_listed():
+    assert get_all_public_repositories() is not None
+
+    with pytest.raises(RuntimeError):
+        with backend.transaction():
+            create_repository("admin", {"name": "index-rolled-back"})
+            raise RuntimeError
+
+    owned = get_user_repositories("admin", 1, 100)
+    assert "admin/index-rolled-back" not in [repo["full_name"] for repo in owned]
+    assert get_all_public_repositories(1, 100) is not None
@@ -0,0 +1,51 @@
+"""Tests of the ID and number allocation (data.sequences)"""
+
+import threading
+
+from data.issues import create_issue
+from data.sequences import next_id, next_number
+
+
+def test_counters_start_after_the_highest_value_in_use():
+    calls = []
+
+    def initial():
+        calls.append(1)
+        return 41
+
+    assert next_id("test_sequence", initial) == 42
+    assert next_id("test_sequence", initial) == 43
+    assert calls == [1]
+
+
+def test_numbers_are_counted_per_repository():
+    assert next_number("test_number", "admin/a", lambda: 0) == 1
+    assert next_number("test_number", "admin/b", lambda: 5) == 6
+    assert next_number("test_number", "admin/a", lambda: 0) == 2
+
+
+def test_concurrent_allocations_are_unique():
+    allocated = []
+
+    def allocate():
+        for _ in range(100):
+            allocated.append(next_id("test_concurrent", lambda: 0))
+
+    threads = [threading.Thread(target=allocate) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(allocated) == list(range(1, 801))
+
+
+def test_created_issues_get_the_next_numbers():
+    numbers = []
+    for title in ("first", "second"):
+        issue = create_issue("admin", "repo1", {"title": title, "body": ""}, "admin")
+        assert issue is not None
+        numbers.append(issue["number"])
+
+    assert numbers[1] == numbers[0] + 1
+    assert numbers[0] > 2  # After the fixture issues
@@ -0,0 +1,60 @@
+"""Tests of the combined commit status (data.status_summary)"""
+
+import pytest
+
+from data.commits import (
+    COMMIT_STATUSES,
+    REPOSITORY_COMMITS,
+    create_commit_status,
+    get_combined_status,
+)
+from data.status_summary import StatusSummary
+from data.storage import backend
+
+
+def _combined(sha):
+    combined = get_combined_status("user1", "repo2", sha)
+    assert combined is not None
+    return combined["state"], combined["total_count"]
+
+
+def test_latest_status_per_context_is_combined():
+    summary = StatusSummary(
+        [
+            {"context": "ci", "state": "failure"},
+            {"context": "lint", "state": "success"},
+            {"context": "ci", "state": "success"},
+        ]
+    )
+    assert (summary.state, summary.total_count) == ("success", 2)
+    assert summary.find("ci") == 2
+
+    summary.set("lint", 1, "pending")
+    assert summary.state == "pending"
+    summary.set("deploy", 3, "error")
+    assert (summary.state, summary.total_count) == ("error", 3)
+    assert StatusSummary([]).state == "pending"
+
+
+def test_rolled_back_statuses_are_not_combined():
+    sha = list(REPOSITORY_COMMITS["user1/repo2"])[-1]
+    create_commit_status("user1", "repo2", sha, {"state": "success", "context": "ci"})
+    before = _combined(sha)
+
+    with pytest.raises(RuntimeError):
+        with backend.transaction():
+            create_commit_status(
+                "user1", "repo2", sha, {"state": "failure", "context": "ci"}
+            )
+            create_commit_status(
+                "user1", "repo2", sha, {"state": "error", "context": "rolled-back"}
+            )
+            raise RuntimeError
+
+    assert _combined(sha) == before
+    statuses = COMMIT_STATUSES["user1/repo2"][sha]
+    summary = StatusSummary(statuses)
+    assert _combined(sha) == (summary.state, summary.total_count)
+    assert [status["state"] for status in statuses if status["context"] == "ci"] == [
+        "success"
+    ]
@@ -0,0 +1,141 @@
+"""Tests of the storage backends (data.storage)"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+from data.storage import MemoryBackend, SqliteBackend
+
+MOCK_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Adds comments to issue #1 and statuses to one commit of admin/repo1
+WRITER = """
+import sys
+from data.commits import create_commit_status
+from data.issues import create_comment
+
+for index in range(int(sys.argv[1])):
+    create_comment("admin", "repo1", 1, {"body": str(index)}, "admin")
+    context = f"{sys.argv[2]}-{index}"
+    create_commit_status(
+        "admin", "repo1", sys.argv[3], {"state": "success", "context": context}
+    )
+"""
+
+# Prints the number of comments of issue #1 and of statuses of a commit
+COUNTER = """
+import sys
+from data.commits import COMMIT_STATUSES
+from data.issues import ALL_COMMENTS, ISSUE_COMMENTS
+
+comments = ISSUE_COMMENTS["admin/repo1"][1]
+stored = [info for info in ALL_COMMENTS.values() if info["issue_number"] == 1]
+print(len(comments), len(stored), len(COMMIT_STATUSES["admin/repo1"][sys.argv[1]]))
+"""
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def storage(request, tmp_path):
+    if request.param == "memory":
+        return MemoryBackend()
+    return SqliteBackend(str(tmp_path / "storage.sqlite3"))
+
+
+def test_tables_are_seeded_once(storage):
+    table = storage.table("users", {"admin": {"id": 1}})
+    table["alice"] = {"id": 2}
+
+    assert dict(table.items()) == {"admin": {"id": 1}, "alice": {"id": 2}}
+    assert list(table.values()) == [{"id": 1}, {"id": 2}]
+    assert len(table.items()) == 2
+    if isinstance(storage, SqliteBackend):
+        reopened = SqliteBackend(str(storage.path)).table("users", {})
+        assert dict(reopened.items()) == {"admin": {"id": 1}, "alice": {"id": 2}}
+
+
+def test_repo_tables_hold_one_table_per_repository(storage):
+    table = storage.repo_table("issues", {"admin/repo1": {1: "first"}})
+    table["admin/repo2"] = {}
+    table["admin/repo2"][1] = "other"
+
+    assert sorted(table) == ["admin/repo1", "admin/repo2"]
+    assert dict(table["admin/repo1"].items()) == {1: "first"}
+    assert dict(table["admin/repo2"].items()) == {1: "other"}
+
+    del table["admin/repo1"]
+    assert "admin/repo1" not in table
+
+
+def test_sequences_increase_from_the_initial_value(storage):
+    assert storage.next_sequence("issue", "admin/repo1", lambda: 10) == 11
+    assert storage.next_sequence("issue", "admin/repo1", lambda: 99) == 12
+    assert storage.next_sequence("issue", "admin/repo2", lambda: 0) == 1
+
+
+def test_failed_transactions_are_rolled_back(storage):
+    table = storage.table("refs", {"main": "a", "old": "b"})
+    repo_table = storage.repo_table("commits", {"admin/repo1": {"a": 1}})
+    results = []
+
+    with pytest.raises(RuntimeError):
+        with storage.transaction():
+            storage.after_transaction(results.append)
+            table["main"] = "c"
+            table["new"] = "d"
+            del table["old"]
+            with storage.transaction():
+                repo_table["admin/repo1"]["c"] = 2
+                repo_table["admin/repo2"] = {"e": 3}
+            raise RuntimeError
+
+    assert dict(table.items()) == {"main": "a", "old": "b"}
+    assert dict(repo_table["admin/repo1"].items()) == {"a": 1}
+    assert "admin/repo2" not in repo_table
+    assert results == [False]
+
+
+def test_transactions_are_kept(storage):
+    table = storage.table("refs", {})
+    results = []
+
+    with storage.transaction():
+        storage.after_transaction(results.append)
+        table["main"] = "a"
+
+    assert dict(table.items()) == {"main": "a"}
+    assert results == [True]
+
+
+def test_concurrent_processes_keep_every_write(tmp_path):
+    from data.commits import REPOSITORY_COMMITS
+
+    sha = next(iter(REPOSITORY_COMMITS["admin/repo1"]))
+    env = dict(
+        os.environ,
+        GITBUCKET_MOCK_STORAGE="sqlite",
+        GITBUCKET_MOCK_SQLITE_PATH=str(tmp_path / "mock.sqlite3"),
+        PYTHONPATH=MOCK_DIR,
+    )
+
+    def count():
+        output = subprocess.run(
+            [sys.executable, "-c", COUNTER, sha],
+            env=env,
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        return tuple(map(int, output.split()))
+
+    # Seed the database first, then write from two processes at the same time
+    subprocess.run([sys.executable, "-c", WRITER, "1", "seed", sha], env=env)
+    comments, stored, statuses = count()
+    writers = [
+        subprocess.Popen([sys.executable, "-c", WRITER, "100", name, sha], env=env)
+        for name in ("first", "second")
+    ]
+    assert [writer.wait() for writer in writers] == [0, 0]
+
+    assert count() == (comments + 200, stored + 200, statuses + 200)
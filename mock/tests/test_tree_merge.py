@@ -0,0 +1,109 @@
+"""Tests of the three-way merges (data.tree_merge, data.mergeability)"""
+
+import time
+
+from data import mergeability
+from data.git_objects import blob_sha
+from data.tree_merge import merge_lines, merge_trees
+from data.tree_store import EMPTY_TREE, TreeStore, blob_entry
+
+
+def _lines(text):
+    return [line.encode() + b"\n" for line in text.split()]
+
+
+def test_separate_line_changes_are_merged():
+    base = _lines("a b c d e")
+    merged = merge_lines(base, _lines("A b c d e"), _lines("a b c d E"))
+    assert merged == _lines("A b c d E")
+
+
+def test_changes_to_adjacent_lines_conflict():
+    base = _lines("a b c")
+    assert merge_lines(base, _lines("A b c"), _lines("a B c")) is None
+    assert merge_lines(base, _lines("A b c"), _lines("A b c")) == _lines("A b c")
+
+
+class Repository:
+    """Trees and blobs built from {path: text} snapshots"""
+
+    def __init__(self):
+        self.trees = TreeStore({})
+        self.blobs = {}
+
+    def snapshot(self, files):
+        changes = {}
+        for path, text in files.items():
+            data = text.encode()
+            self.blobs[blob_sha(data)] = data
+            changes[path] = blob_entry(blob_sha(data), len(data))
+        return self.trees.update(EMPTY_TREE, changes)
+
+    def merge(self, base, ours, theirs):
+        return merge_trees(
+            self.trees,
+            self.blobs.get,
+            self.snapshot(base) if base is not None else None,
+            self.snapshot(ours),
+            self.snapshot(theirs),
+        )
+
+
+def test_paths_changed_on_one_side_take_that_side():
+    repository = Repository()
+    merge = repository.merge(
+        {"a.txt": "a", "dir/b.txt": "b"},
+        {"a.txt": "ours", "dir/b.txt": "b"},
+        {"a.txt": "a", "dir/b.txt": "theirs", "new.txt": "new"},
+    )
+
+    assert sorted(merge.changes) == ["dir", "new.txt"]
+    assert merge.merged == {}
+    assert merge.conflicts == []
+
+
+def test_files_changed_on_both_sides_are_merged_line_by_line():
+    repository = Repository()
+    merge = repository.merge(
+        {"dir/a.txt": "1\n2\n3\n4\n"},
+        {"dir/a.txt": "one\n2\n3\n4\n"},
+        {"dir/a.txt": "1\n2\n3\nfour\n"},
+    )
+
+    assert merge.merged == {"dir/a.txt": b"one\n2\n3\nfour\n"}
+    assert merge.conflicts == []
+
+
+def test_deleted_and_changed_files_conflict():
+    repository = Repository()
+    merge = repository.merge(
+        {"a.txt": "a", "b.txt": "b", "keep.txt": "k"},
+        {"b.txt": "ours", "keep.txt": "k"},
+        {"a.txt": "theirs", "keep.txt": "k"},
+    )
+
+    assert merge.conflicts == ["a.txt", "b.txt"]
+
+
+def test_failed_checks_are_run_again(monkeypatch):
+    calls = []
+
+    def fail_once(repo_key, base_sha, head_sha):
+        calls.append(head_sha)
+        if len(calls) == 1:
+            raise RuntimeError("merge failed")
+        return True
+
+    monkeypatch.setattr(mergeability, "_is_mergeable", fail_once)
+    mergeability.check_mergeability("admin", "repo1", "failing-base", "head")
+
+    result = None
+    for _ in range(100):
+        result = mergeability.get_mergeability(
+            "admin", "repo1", "failing-base", "head", None
+        )
+        if result is not None:
+            break
+        time.sleep(0.01)
+    assert result is True
+    assert len(calls) == 2
@@ -0,0 +1,107 @@
+"""Tests of git object hashing (data.git_objects) and of the tree store"""
+
+import base64
+from datetime import datetime, timezone
+
+import pytest
+
+from data.git_objects import TREE_MODE, blob_sha, commit_sha, tree_sha
+from data.tree_store import EMPTY_TREE, PathConflictError, TreeStore, blob_entry
+
+HELLO = blob_sha(b"hello\n")
+
+
+def test_objects_have_the_shas_git_gives_them():
+    assert blob_sha(b"") == "e69de29bb2d1d6434b8b29ae775ad8c2e48c5391"
+    assert HELLO == "ce013625030ba8dba906f756967f9e9ca394464a"
+    assert EMPTY_TREE == "4b825dc642cb6eb9a060e54bf8d69288fbee4904"
+    assert (
+        tree_sha({"hello.txt": blob_entry(HELLO, 6)})
+        == "aaa96ced2d9a1c8e72c56b253a0e2fe78393feb7"
+    )
+
+    person = {
+        "name": "A",
+        "email": "a@example.com",
+        "date": datetime(2024, 1, 1, tzinfo=timezone.utc),
+    }
+    assert len(commit_sha(EMPTY_TREE, [], person, person, "x")) == 40
+
+
+def test_trees_sort_directories_as_if_they_ended_with_a_slash():
+    tree = {"a": {"mode": TREE_MODE, "type": "tree", "sha": EMPTY_TREE}}
+    file = {"a.txt": blob_entry(HELLO, 6)}
+    # "a.txt" < "a/" in git order, although "a" < "a.txt"
+    assert tree_sha({**tree, **file}) == tree_sha({**file, **tree})
+
+
+@pytest.fixture
+def trees():
+    return TreeStore({})
+
+
+def test_update_shares_unchanged_subtrees(trees):
+    root = trees.update(
+        EMPTY_TREE,
+        {"src/a.py": blob_entry(HELLO, 6), "docs/index.md": blob_entry(HELLO, 6)},
+    )
+    docs = trees.lookup(root, "docs")
+
+    new_root = trees.update(root, {"src/b.py": blob_entry(HELLO, 6)})
+
+    assert trees.lookup(new_root, "docs") == docs
+    assert trees.lookup(new_root, "src/a.py")["sha"] == HELLO
+    assert trees.lookup(new_root, "src/a.py/x") is None
+    assert list(trees.diff(root, new_root)) == [("src/b.py", "added", None, HELLO)]
+
+
+def test_update_removes_directories_left_empty(trees):
+    root = trees.update(EMPTY_TREE, {"a/b/c.txt": blob_entry(HELLO, 6)})
+
+    assert trees.update(root, {"a/b/c.txt": None}) == EMPTY_TREE
+
+
+def test_walk_lists_entries_depth_first(trees):
+    root = trees.update(
+        EMPTY_TREE,
+        {"b.txt": blob_entry(HELLO, 6), "a/c.txt": blob_entry(HELLO, 6)},
+    )
+
+    assert [path for path, _ in trees.walk(root)] == ["a", "a/c.txt", "b.txt"]
+    assert [path for path, _ in trees.walk(root, recursive=False)] == ["a", "b.txt"]
+
+
+def test_update_refuses_to_write_through_a_file(trees):
+    root = trees.update(EMPTY_TREE, {"docs/README.md": blob_entry(HELLO, 6)})
+
+    with pytest.raises(PathConflictError) as error:
+        trees.update(root, {"docs/README.md/x.txt": blob_entry(HELLO, 6)})
+    assert error.value.path == "docs/README.md"
+
+    # Replacing the file by a directory in the same change is allowed
+    new_root = trees.update(
+        root, {"docs/README.md": None, "docs/README.md/x.txt": blob_entry(HELLO, 6)}
+    )
+    assert trees.lookup(new_root, "docs/README.md")["type"] == "tree"
+
+
+def _put(client, path, content=b"x", **data):
+    return client.put(
+        f"/api/v3/repos/admin/repo1/contents/{path}",
+        json={
+            "message": f"Write {path}",
+            "content": base64.b64encode(content).decode(),
+            **data,
+        },
+    )
+
+
+def test_writing_through_a_file_is_refused(client):
+    assert _put(client, "conflict/file.txt", b"kept").status_code == 200
+
+    response = _put(client, "conflict/file.txt/x.txt")
+    assert response.status_code == 422
+    assert _put(client, "conflict").status_code == 422
+
+    content = client.get("/api/v3/repos/admin/repo1/contents/conflict/file.txt")
+    assert base64.b64decode(content.json()["content"]) == b"kept"